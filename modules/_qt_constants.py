@@ -54,6 +54,8 @@ QT_BACKTAB_FOCUS_REASON = QtCore.Qt.FocusReason.BacktabFocusReason
 # for draw_display
 QT_FORMAT_RGB888 = QtGui.QImage.Format.Format_RGB888
 QT_FORMAT_MONO = QtGui.QImage.Format.Format_Mono
+QT_EVENT_PAINT = QtCore.QEvent.Type.Paint
+QT_EVENT_CHILD_ADDED = QtCore.QEvent.Type.ChildAdded
 
 # Color
 QT_COLOR_BLACK = QtCore.Qt.GlobalColor.black
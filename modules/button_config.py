@@ -529,9 +529,8 @@ class Button_Config:
                     self.page_mode = "MAIN"
                     if self.config.G_DUAL_DISPLAY_MODE and mode_key == "MAP":
                         self._dual_map_mode_active = False
-                        map_widget = gui.map_widget
-                        if map_widget is not None:
-                            map_widget.lock_on()
+                        if gui.is_map_built():
+                            gui.map_widget.lock_on()
             elif w_index >= 2:
                 self.page_mode = "MENU"
 
@@ -576,7 +575,7 @@ class Button_Config:
                 return
 
             map_pages = self.button_mode_pages["MAP"]
-            if not map_pages or map_widget is None:
+            if not map_pages or not self.config.gui.is_map_built():
                 self.change_mode_index("MAIN")
                 return
 
@@ -19,13 +19,14 @@ from modules.utils.cmd import (
     exec_cmd,
     is_running_as_service,
 )
+from modules.utils import mbtiles, perf
 from modules.utils.time import init_utc_offset
 from modules.utils.map import (
     get_maptile_ext_from_url,
     normalize_maptile_ext,
     remove_maptiles,
 )
-from modules.utils.timer import Timer
+from modules.utils.timer import Timer, import_modules, log_boot_report, log_timers
 
 
 class Config:
@@ -37,6 +38,15 @@ class Config:
     G_SENSOR_INTERVAL = 1.0  # [s] for sensor_core
     G_ANT_INTERVAL = 0.25  # 1.0  # [s] for ANT+. 0.25, 0.5, 1.0 only.
     G_I2C_INTERVAL = 1.0  # 0.2 #[s] for I2C (altitude, accelerometer, etc)
+    # [s] for the other groups of I2C sensors, None: G_I2C_INTERVAL
+    # (accelerometer, gyro, magnetometer and quaternion are read at G_I2C_INTERVAL)
+    G_I2C_GROUP_INTERVAL = {
+        "PRESSURE": None,
+        "LIGHT": None,
+        # the VOC index algorithm of SGP40 expects 1 Hz
+        "GAS": 1.0,
+        "BATTERY": 5.0,
+    }
     G_GPS_INTERVAL = 1.0  # [s] for GPS
     G_DRAW_INTERVAL = 1000  # [ms] for GUI (QtCore.QTimer)
     G_LOGGING_INTERVAL = 1.0  # [s] for logger_core (log interval)
@@ -86,6 +96,8 @@ class Config:
     # courses
     G_COURSE_DIR = "courses"
     G_COURSE_FILE_PATH = os.path.join(G_COURSE_DIR, ".current")
+    # post-processed courses (.npz) keyed by the hash of the course file
+    G_COURSE_CACHE_DIR = os.path.join(G_COURSE_DIR, ".cache")
     G_CUESHEET_DISPLAY_NUM = 3  # max: 5
     G_CUESHEET_SCROLL = False
     G_OBEXD_CMD = "/usr/libexec/bluetooth/obexd"
@@ -119,6 +131,15 @@ class Config:
     G_DEM_MAP = "mapterhorn"  # mapterhorn, mapbox_terrain_rgb, jpn_kokudo_chiri_in
     G_DEM_MAP_CONFIG = {}
 
+    # prefetch map tiles ahead on the course or the GPS track
+    G_MAP_PREFETCH = {
+        "STATUS": False,
+        "DISTANCE": 3.0,  # [km] look-ahead distance
+        "HORIZON_SEC": 300,  # [s] look-ahead time without course
+        "BYTE_BUDGET_MB": 30,  # [MB] per boot
+        "INTERVAL_SEC": 15,
+    }
+
     # wind speed, direction and headwind
     G_USE_WIND_DATA_SOURCE = True
     G_WIND_DATA_SOURCE = "openmeteo"  # openmeteo(worldwide), jpn_scw(japan)
@@ -138,6 +159,20 @@ class Config:
     # for first run
     G_INIT_ONLY = False
 
+    # heavy modules imported in a thread after the first screen
+    G_PRELOAD_MODULES = ["PIL.Image", "PIL.ImageEnhance"]
+
+    # headless replay benchmark (change with --benchmark option)
+    G_BENCHMARK = {
+        "STATUS": False,
+        "DURATION": 600,  # [s] of replayed ride
+        "SPEED": 10,  # replay speed factor
+        "LOG_DB": "",  # log.db to replay (course if empty)
+        "REPORT": os.path.join("log", "benchmark.json"),
+        "TRACEMALLOC": False,
+        "WORK_DIR": "",
+    }
+
     # dual display mode (map left / values right)
     G_DUAL_DISPLAY_MODE = False
 
@@ -234,6 +269,13 @@ class Config:
         "ORDER": ["HR", "SPD", "CDC", "PWR", "LGT", "CTRL", "TEMP"],
         "USE_AUTO_LIGHT": False,
     }
+    # raw ANT+ pages of the paired sensors (change with --ant_capture option)
+    G_ANT_CAPTURE = ""
+    # replay of a capture instead of the dongle (change with --ant_replay option)
+    G_ANT_REPLAY = {
+        "FILE": "",
+        "SPEED": 1.0,  # replay speed factor, 0: as fast as possible
+    }
 
     # GPS speed cutoff (the distance in 1 seconds at 0.36km/h is 10cm)
     G_GPS_SPEED_CUTOFF = G_AUTOSTOP_CUTOFF  # m/s
@@ -256,6 +298,10 @@ class Config:
         },
         "POWER_SAVE": False,
         "QZSS_DCR": False,
+        # [Hz] of NAV-PVT: 1, 5 or 10 (5 at most on UART)
+        "NAV_RATE": 1,
+        # smooth the fixes with a Kalman filter (useful with NAV_RATE 5 or 10)
+        "FIX_FILTER": False,
         "TX_READY": {
             "STATUS": True,
             "GPIOCHIP": "/dev/gpiochip4",
@@ -492,6 +538,14 @@ class Config:
         parser.add_argument("--gui")
         parser.add_argument("--headless", action="store_true", default=False)
         parser.add_argument("--init", action="store_true", default=False)
+        parser.add_argument("--benchmark", type=float, metavar="SEC")
+        parser.add_argument("--benchmark_speed", type=float)
+        parser.add_argument("--benchmark_log")
+        parser.add_argument("--benchmark_report")
+        parser.add_argument("--benchmark_tracemalloc", action="store_true")
+        parser.add_argument("--ant_capture", metavar="FILE")
+        parser.add_argument("--ant_replay", metavar="FILE")
+        parser.add_argument("--ant_replay_speed", type=float)
 
         args = parser.parse_args()
 
@@ -511,6 +565,25 @@ class Config:
             self.G_HEADLESS = True
         if args.init:
             self.G_INIT_ONLY = True
+        if args.benchmark:
+            self.G_BENCHMARK["STATUS"] = True
+            self.G_BENCHMARK["DURATION"] = args.benchmark
+            if args.benchmark_speed:
+                self.G_BENCHMARK["SPEED"] = args.benchmark_speed
+            if args.benchmark_log and os.path.exists(args.benchmark_log):
+                self.G_BENCHMARK["LOG_DB"] = args.benchmark_log
+            if args.benchmark_report:
+                self.G_BENCHMARK["REPORT"] = args.benchmark_report
+            self.G_BENCHMARK["TRACEMALLOC"] = args.benchmark_tracemalloc
+        if args.ant_capture:
+            self.G_ANT_CAPTURE = args.ant_capture
+        if args.ant_replay and os.path.exists(args.ant_replay):
+            self.G_ANT_REPLAY["FILE"] = args.ant_replay
+            if args.ant_replay_speed is not None:
+                self.G_ANT_REPLAY["SPEED"] = args.ant_replay_speed
+
+        # perf metrics are only collected for the debug log and the benchmark
+        perf.registry.enabled = self.G_DEBUG or self.G_BENCHMARK["STATUS"]
 
         # read setting.conf and state.pickle
         self.setting = Setting(self)
@@ -604,6 +677,11 @@ class Config:
         except:
             pass
 
+        if self.G_BENCHMARK["STATUS"]:
+            from modules.helper.benchmark import setup_benchmark
+
+            setup_benchmark(self)
+
     @property
     def loop(self):
         # return asyncio.get_running_loop()
@@ -631,30 +709,42 @@ class Config:
         await asyncio.sleep(0.01)
         t = Timer(auto_start=True, auto_log=True, text="delay init: {0:.3f} sec")
 
+        # ensure visually alignment for log
+        timers = [
+            Timer(auto_start=False, text="  network  : {0:.3f} sec"),
+            Timer(auto_start=False, text="  bluetooth: {0:.3f} sec"),
+            Timer(auto_start=False, text="  api      : {0:.3f} sec"),
+            Timer(auto_start=False, text="  sensor   : {0:.3f} sec"),
+            Timer(auto_start=False, text="  gadgetbridge: {0:.3f} sec"),
+            Timer(auto_start=False, text="  gui      : {0:.3f} sec"),
+        ]
+
         # network
         await self.gui.set_boot_status("initialize network modules...")
-        from modules.helper.api import api
-        from modules.helper.network import Network
-        from modules.helper.network.wifi_manager import get_wifi_bt_status
+        with timers[0]:
+            from modules.helper.api import api
+            from modules.helper.network import Network
+            from modules.helper.network.wifi_manager import get_wifi_bt_status
 
         # bluetooth
-        _, bt_available = get_wifi_bt_status()
-        if self.G_IS_RASPI and bt_available:
-            await self.gui.set_boot_status("initialize bluetooth modules...")
-
-            from modules.helper.bluetooth.bt_pan import (
-                BTPanDbus,
-                BTPanDbusFast,
-                HAS_DBUS_FAST,
-                HAS_DBUS,
-            )
+        with timers[1]:
+            _, bt_available = get_wifi_bt_status()
+            if self.G_IS_RASPI and bt_available:
+                await self.gui.set_boot_status("initialize bluetooth modules...")
+
+                from modules.helper.bluetooth.bt_pan import (
+                    BTPanDbus,
+                    BTPanDbusFast,
+                    HAS_DBUS_FAST,
+                    HAS_DBUS,
+                )
 
-            if HAS_DBUS_FAST:
-                self.bt_pan = BTPanDbusFast()
-            elif HAS_DBUS:
-                self.bt_pan = BTPanDbus()
-            if HAS_DBUS_FAST or HAS_DBUS:
-                await self.bt_pan.update_bt_pan_devices()
+                if HAS_DBUS_FAST:
+                    self.bt_pan = BTPanDbusFast()
+                elif HAS_DBUS:
+                    self.bt_pan = BTPanDbus()
+                if HAS_DBUS_FAST or HAS_DBUS:
+                    await self.bt_pan.update_bt_pan_devices()
 
         if self.G_AUTO_BT_TETHERING and self.bt_pan is None:
             if not self.G_IS_RASPI:
@@ -668,50 +758,74 @@ class Config:
             )
             self.G_AUTO_BT_TETHERING = False
 
-        self.api = api(self)
-        self.network = Network(self)
+        with timers[2]:
+            self.api = api(self)
+            self.network = Network(self)
 
         # logger, sensor
         await self.gui.set_boot_status("initialize sensor...")
-        self.logger.delay_init()
+        with timers[3]:
+            self.logger.delay_init()
 
         # GadgetBridge (has to be before gui but after sensors for proper init state of buttons)
-        if self.G_IS_RASPI and bt_available:
-            from modules.helper.bluetooth import HAS_GADGETBRIDGE, GadgetbridgeService
-
-            if HAS_GADGETBRIDGE and GadgetbridgeService is not None:
-                self.ble_uart = GadgetbridgeService(
-                    self.G_PRODUCT,
-                    self.logger.sensor.sensor_gps,
-                    self.gui,
-                    (
-                        self.G_GADGETBRIDGE["STATUS"],
-                        self.G_GADGETBRIDGE["USE_GPS"],
-                    ),
-                )
-            else:
-                app_logger.info(
-                    "Gadgetbridge service not initialized: Gadgetbridge dependencies not installed"
-                )
+        with timers[4]:
+            if self.G_IS_RASPI and bt_available:
+                from modules.helper.bluetooth import HAS_GADGETBRIDGE, GadgetbridgeService
+
+                if HAS_GADGETBRIDGE and GadgetbridgeService is not None:
+                    self.ble_uart = GadgetbridgeService(
+                        self.G_PRODUCT,
+                        self.logger.sensor.sensor_gps,
+                        self.gui,
+                        (
+                            self.G_GADGETBRIDGE["STATUS"],
+                            self.G_GADGETBRIDGE["USE_GPS"],
+                        ),
+                    )
+                else:
+                    app_logger.info(
+                        "Gadgetbridge service not initialized: Gadgetbridge dependencies not installed"
+                    )
 
         # gui
         await self.gui.set_boot_status("initialize screens...")
-        self.gui.delay_init()
+        with timers[5]:
+            self.gui.delay_init()
 
         if self.G_HEADLESS:
             asyncio.create_task(self.keyboard_check())
 
         delta = t.stop()
         self.boot_time += delta
+        app_logger.info("Delay init modules:")
+        log_timers(timers, text_total="  total    : {0:.3f} sec", section="delay_init")
+        log_boot_report()
 
         await self.logger.resume_start_stop()
         await self.gui.set_boot_status("")
 
+        # after the first screen: warm up the modules of the screens built on first use
+        asyncio.create_task(self.preload_modules())
+
         if self.G_INIT_ONLY:
             await self.gui.set_boot_status("initializing...")
             await asyncio.sleep(30)
             await self.quit()
 
+        if self.G_BENCHMARK["STATUS"]:
+            from modules.helper.benchmark import Benchmark
+
+            asyncio.create_task(Benchmark(self).run())
+
+    async def preload_modules(self):
+        # imported in a thread, so that the sensor and logger loops keep running
+        await self.loop.run_in_executor(None, import_modules, self.G_PRELOAD_MODULES)
+        # Qt widget modules define classes only, the widgets are created later
+        # in the main thread; one at a time to leave CPU for the loops
+        for name in getattr(self.gui, "preload_modules", ()):
+            await asyncio.sleep(0.5)
+            await self.loop.run_in_executor(None, import_modules, [name])
+
     async def keyboard_check(self):
         try:
             while True:
@@ -850,11 +964,16 @@ class Config:
         await self.logger.quit()
         if self.buzzer is not None:
             await self.buzzer.stop()
-        self.setting.write_config()
+        if self.G_BENCHMARK["STATUS"]:
+            # benchmark settings are not saved
+            shutil.rmtree(self.G_BENCHMARK["WORK_DIR"], ignore_errors=True)
+        else:
+            self.setting.write_config()
         self.state.delete()
         app_logger.info(" 2: logger & state")
 
         self.display.quit()
+        mbtiles.close_all()
         app_logger.info(" 3: display")
 
         self.app_close_event.set()
@@ -926,7 +1045,11 @@ class Config:
 
     def get_courses(self):
         dirs = sorted(
-            glob(os.path.join(self.G_COURSE_DIR, "*.tcx")),
+            [
+                f
+                for ext in ("tcx", "gpx", "fit")
+                for f in glob(os.path.join(self.G_COURSE_DIR, f"*.{ext}"))
+            ],
             key=lambda f: os.stat(f).st_mtime,
             reverse=True,
         )
@@ -1,4 +1,5 @@
 import os
+import hashlib
 import json
 import re
 import shutil
@@ -9,11 +10,12 @@ import oyaml
 import numpy as np
 
 from modules.app_logger import app_logger
-from modules.loaders import JsonLoader, TcxLoader
-from modules.utils.crdp import rdp
+from modules.loaders import FitLoader, GpxLoader, JsonLoader, TcxLoader
+from modules.utils.crdp import rdp_mask
 from modules.utils.filters import savitzky_golay
 from modules.utils.geo import calc_azimuth, get_dist_on_earth, get_dist_on_earth_array
 from modules.utils.navigation import maneuver_to_turn_type
+from modules.utils.segment_index import SegmentGridIndex
 from modules.utils.timer import Timer, log_timers
 
 POLYLINE_DECODER = False
@@ -24,7 +26,33 @@ try:
 except ImportError:
     pass
 
-LOADERS = {"tcx": TcxLoader, "json": JsonLoader}
+LOADERS = {
+    "tcx": TcxLoader,
+    "gpx": GpxLoader,
+    "fit": FitLoader,
+    "json": JsonLoader,
+}
+
+# bump when the processing of the course changes, cached courses are discarded
+COURSE_CACHE_VERSION = 1
+COURSE_CACHE_NUM = 5
+COURSE_CACHE_ARRAYS = (
+    "distance",
+    "altitude",
+    "latitude",
+    "longitude",
+    "slope_smoothing",
+    "colored_altitude",
+)
+COURSE_POINTS_CACHE_ARRAYS = (
+    "name",
+    "type",
+    "altitude",
+    "distance",
+    "latitude",
+    "longitude",
+    "notes",
+)
 
 
 def _categorize_slope(slope_smoothing, slope_cutoff):
@@ -104,6 +132,8 @@ class Course:
     on_route_exit_ratio = 1.2
     on_route_rescue_ratio = 1.35
     on_route_centroid_window = 2
+    # candidate radius of segment_index relative to on_route_cutoff
+    on_route_search_ratio = 3.0
 
     # for course
     info = {}
@@ -111,6 +141,8 @@ class Course:
     altitude = np.array([])
     latitude = np.array([])
     longitude = np.array([])
+    # [m] from downloaded DEM tiles (G_USE_DEM_TILE), nan where missing
+    dem_altitude = np.array([])
 
     course_points = None
     index = None
@@ -118,6 +150,7 @@ class Course:
     # calculated
     points_diff = np.array([])
     azimuth = np.array([])
+    segment_index = None
     slope = np.array([])
     slope_smoothing = np.array([])
     colored_altitude = np.array([])
@@ -173,29 +206,102 @@ class Course:
         return json_path
 
     @staticmethod
-    def _read_first_non_whitespace_char(file_path):
+    def _read_file_head(file_path):
         try:
-            with open(file_path, "r", encoding="utf-8_sig") as f:
-                chunk = f.read(4096)
-        except (OSError, UnicodeDecodeError):
-            return ""
-
-        stripped = chunk.lstrip()
-        if not stripped:
-            return ""
-        return stripped[0]
+            with open(file_path, "rb") as f:
+                return f.read(4096)
+        except OSError:
+            return b""
 
     def _detect_course_file_extension(self, file_path):
         ext = os.path.splitext(file_path)[1].lower().lstrip(".")
         if ext in LOADERS:
             return ext
 
-        first_char = self._read_first_non_whitespace_char(file_path)
-        if first_char == "<":
-            return "tcx"
-        if first_char in ("{", "["):
+        head = self._read_file_head(file_path)
+        if head[8:12] == b".FIT":
+            return "fit"
+
+        text = head.decode("utf-8_sig", errors="ignore").lstrip()
+        if text.startswith("<"):
+            return "gpx" if "<gpx" in text else "tcx"
+        if text[:1] in ("{", "["):
             return "json"
         return ""
+
+    def _get_cache_key(self, file_path):
+        h = hashlib.sha1()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        # settings used by downsample, calc_slope_smoothing and modify_course_points
+        h.update(
+            repr(
+                (
+                    COURSE_CACHE_VERSION,
+                    self.config.G_COURSE_INDEXING,
+                    self.config.G_GPS_ON_ROUTE_CUTOFF,
+                    self.config.G_SLOPE_CUTOFF,
+                    self.config.G_SLOPE_COLOR,
+                    self.config.G_CLIMB_DISTANCE_CUTOFF,
+                    self.config.G_CLIMB_GRADE_CUTOFF,
+                    self.config.G_CLIMB_CATEGORY,
+                )
+            ).encode()
+        )
+        return h.hexdigest()
+
+    def load_cache(self, key):
+        cache_file = os.path.join(self.config.G_COURSE_CACHE_DIR, f"{key}.npz")
+        if not os.path.exists(cache_file):
+            return False
+
+        try:
+            with np.load(cache_file, allow_pickle=False) as data:
+                for k in COURSE_CACHE_ARRAYS:
+                    setattr(self, k, data[k])
+                for k in COURSE_POINTS_CACHE_ARRAYS:
+                    setattr(self.course_points, k, data[f"course_points_{k}"])
+                self.info = json.loads(str(data["info"]))
+                self.climb_segment = json.loads(str(data["climb_segment"]))
+                search_range = float(data["search_range"])
+        except (OSError, KeyError, ValueError) as e:
+            app_logger.warning(f"Could not load course cache: {e}")
+            self.reset()
+            return False
+
+        if search_range > self.config.G_GPS_SEARCH_RANGE:
+            self.config.G_GPS_SEARCH_RANGE = search_range
+        # update mtime to keep recently used caches
+        os.utime(cache_file)
+        return True
+
+    def save_cache(self, key):
+        cache_dir = self.config.G_COURSE_CACHE_DIR
+        arrays = {k: getattr(self, k) for k in COURSE_CACHE_ARRAYS}
+        for k in COURSE_POINTS_CACHE_ARRAYS:
+            arrays[f"course_points_{k}"] = getattr(self.course_points, k)
+
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            np.savez(
+                os.path.join(cache_dir, f"{key}.npz"),
+                info=np.array(json.dumps(self.info)),
+                climb_segment=np.array(
+                    json.dumps(self.climb_segment, default=lambda v: v.item())
+                ),
+                search_range=np.array(self.config.G_GPS_SEARCH_RANGE),
+                **arrays,
+            )
+            caches = sorted(
+                (os.path.join(cache_dir, f) for f in os.listdir(cache_dir)),
+                key=os.path.getmtime,
+                reverse=True,
+            )
+            for f in caches[COURSE_CACHE_NUM:]:
+                os.remove(f)
+        except (OSError, TypeError, ValueError) as e:
+            app_logger.warning(f"Could not save course cache: {e}")
     
     def reset(self, delete_course_file=False, replace=False):
         # for course
@@ -205,9 +311,11 @@ class Course:
         self.altitude = np.array([])
         self.latitude = np.array([])
         self.longitude = np.array([])
+        self.dem_altitude = np.array([])
         # processed variables
         self.points_diff = np.array([])
         self.azimuth = np.array([])
+        self.segment_index = None
         self.slope = np.array([])
         self.slope_smoothing = np.array([])
         self.colored_altitude = np.array([])
@@ -248,6 +356,16 @@ class Course:
             Timer(auto_start=False, text="  modify_course_points: {0:.3f} sec"),
         ]
 
+        cache_key = None
+        if os.path.exists(self.config.G_COURSE_FILE_PATH):
+            cache_key = self._get_cache_key(self.config.G_COURSE_FILE_PATH)
+            if self.load_cache(cache_key):
+                self.build_course_index()
+                app_logger.info("[logger] Loading course: from cache")
+                asyncio.create_task(self.get_course_wind())
+                self.config.api.send_livetrack_course_load()
+                return
+
         with timers[0]:
             # get loader based on the extension
             if os.path.exists(self.config.G_COURSE_FILE_PATH):
@@ -285,6 +403,7 @@ class Course:
         if self.is_set:
             app_logger.info("[logger] Loading course:")
             log_timers(timers, text_total="  total               : {0:.3f} sec")
+            self.save_cache(cache_key)
 
         asyncio.create_task(self.get_course_wind())
         self.config.api.send_livetrack_course_load()
@@ -478,21 +597,9 @@ class Course:
             return
 
         try:
-            cond = np.array(
-                rdp(
-                    np.column_stack([self.longitude, self.latitude]),
-                    epsilon=0.0001,
-                    return_mask=True,
-                )
-            )
+            cond = rdp_mask(self.longitude, self.latitude, epsilon=0.0001)
             if len_alt and len_dist:
-                cond = cond | np.array(
-                    rdp(
-                        np.column_stack([self.distance, self.altitude]),
-                        epsilon=10,
-                        return_mask=True,
-                    )
-                )
+                cond |= rdp_mask(self.distance, self.altitude, epsilon=10)
             self.latitude = self.latitude[cond]
             self.longitude = self.longitude[cond]
             if len_alt:
@@ -527,11 +634,8 @@ class Course:
             # np.savetxt('log/course_altitude.csv', self.altitude, fmt='%.3f')
             # np.savetxt('log/course_distance.csv', self.distance, fmt='%.3f')
 
-            # output dem altitude
-            # alt_dem = np.zeros(len(self.altitude))
-            # for i in range(len(self.altitude)):
-            #  alt_dem[i] = self.config.api.get_altitude([self.longitude[i], self.latitude[i]])
-            # np.savetxt('log/course_altitude_dem.csv', alt_dem, fmt='%.3f')
+            # output dem altitude (see get_dem_altitude)
+            # np.savetxt('log/course_altitude_dem.csv', self.dem_altitude, fmt='%.3f')
 
         diff_dist_max = int(np.max(dist_diff)) * 2 / 1000  # [m->km]
         if diff_dist_max > self.config.G_GPS_SEARCH_RANGE:  # [km]
@@ -542,6 +646,35 @@ class Course:
 
         app_logger.info(f"downsampling:{len_lat} -> {len(self.latitude)}")
 
+    async def get_dem_altitude(self):
+        """Return the DEM altitudes [m] of the course points.
+
+        They are read from the downloaded DEM tiles on the first call after
+        the course is loaded, in a worker thread.
+        """
+        if len(self.dem_altitude) != len(self.latitude):
+            await self.load_dem_altitude()
+        return self.dem_altitude
+
+    async def load_dem_altitude(self):
+        if not self.config.G_USE_DEM_TILE or not len(self.latitude):
+            return
+        api = self.config.api
+        if api is None:
+            return
+        latitude = self.latitude
+        dem_altitude = await asyncio.to_thread(
+            api.get_altitudes, self.longitude, latitude
+        )
+        # the course was reloaded meanwhile
+        if latitude is not self.latitude:
+            return
+        self.dem_altitude = dem_altitude
+        app_logger.info(
+            f"DEM altitude: {np.count_nonzero(~np.isnan(self.dem_altitude))}/"
+            f"{len(self.dem_altitude)} points"
+        )
+
     # make route colors by slope for MapWidget, CourseProfileWidget
     def calc_slope_smoothing(self):
         # parameters
@@ -698,7 +831,7 @@ class Course:
         # app_logger.debug(self.climb_segment)
         self.colored_altitude = np.array(self.config.G_SLOPE_COLOR)[slope_smoothing_cat]
 
-    def modify_course_points(self):
+    def build_course_index(self):
         if not self.config.G_COURSE_INDEXING:
             return
 
@@ -708,6 +841,17 @@ class Course:
             self.points_diff[0] ** 2 + self.points_diff[1] ** 2
         )
         self.points_diff_dist = np.sqrt(self.points_diff_sum_of_squares)
+        self.segment_index = SegmentGridIndex(
+            self.longitude,
+            self.latitude,
+            cell_size=max(100.0, 2 * self.config.G_GPS_ON_ROUTE_CUTOFF),
+        )
+
+    def modify_course_points(self):
+        if not self.config.G_COURSE_INDEXING:
+            return
+
+        self.build_course_index()
 
         course_points = self.course_points
 
@@ -726,94 +870,13 @@ class Course:
             if not len_pnt_alt and len_alt:
                 course_points.altitude = np.zeros(len_pnt_lat)
 
-            min_index = 0
-
-            for i in range(len_pnt_lat):
-                b_a_x = self.points_diff[0][min_index:]
-                b_a_y = self.points_diff[1][min_index:]
-                lon_diff = course_points.longitude[i] - self.longitude[min_index:]
-                lat_diff = course_points.latitude[i] - self.latitude[min_index:]
-                p_a_x = lon_diff[:-1]
-                p_a_y = lat_diff[:-1]
-                inner_p = (
-                    b_a_x * p_a_x + b_a_y * p_a_y
-                ) / self.points_diff_sum_of_squares[min_index:]
-                inner_p_check = np.where(
-                    (0.0 <= inner_p) & (inner_p <= 1.0), True, False
-                )
-
-                min_j = None
-                min_dist_diff_h = np.inf
-                min_dist_delta = 0
-                min_alt_delta = 0
-
-                for j in list(*np.where(inner_p_check)):
-                    h_lon = (
-                        self.longitude[min_index + j]
-                        + (
-                            self.longitude[min_index + j + 1]
-                            - self.longitude[min_index + j]
-                        )
-                        * inner_p[j]
-                    )
-                    h_lat = (
-                        self.latitude[min_index + j]
-                        + (
-                            self.latitude[min_index + j + 1]
-                            - self.latitude[min_index + j]
-                        )
-                        * inner_p[j]
-                    )
-                    dist_diff_h = get_dist_on_earth(
-                        h_lon,
-                        h_lat,
-                        course_points.longitude[i],
-                        course_points.latitude[i],
-                    )
-
-                    if (
-                        dist_diff_h < self.config.G_GPS_ON_ROUTE_CUTOFF
-                        and dist_diff_h < min_dist_diff_h
-                    ):
-                        if min_j is not None and j - min_j > 2:
-                            continue
-
-                        min_j = j
-                        min_dist_diff_h = dist_diff_h
-                        min_dist_delta = (
-                            get_dist_on_earth(
-                                self.longitude[min_index + j],
-                                self.latitude[min_index + j],
-                                h_lon,
-                                h_lat,
-                            )
-                            / 1000
-                        )
-
-                        if len_alt:
-                            min_alt_delta = (
-                                (
-                                    self.altitude[min_index + j + 1]
-                                    - self.altitude[min_index + j]
-                                )
-                                / (
-                                    self.distance[min_index + j + 1]
-                                    - self.distance[min_index + j]
-                                )
-                                * min_dist_delta
-                            )
-
-                if min_j is None:
-                    min_j = 0
-
-                min_index = min_index + min_j
-
-                if not len_pnt_dist and len_dist:
-                    course_points.distance[i] = (
-                        self.distance[min_index] + min_dist_delta
-                    )
-                if not len_pnt_alt and len_alt:
-                    course_points.altitude[i] = self.altitude[min_index] + min_alt_delta
+            _, _, point_distance, point_altitude = self.project_points(
+                course_points.longitude, course_points.latitude
+            )
+            if not len_pnt_dist and len_dist:
+                course_points.distance = point_distance
+            if not len_pnt_alt and len_alt:
+                course_points.altitude = point_altitude
 
         # add climb tops
         # if len(self.climb_segment):
@@ -916,12 +979,12 @@ class Course:
         self.wind_timeline.append(current_time)
 
         dist = int(self.index.distance/1000) + self.config.G_GROSS_AVE_SPEED  # [m] -> [km]
-        while dist < self.distance[-1]:
-            index += np.argmin(np.abs(self.distance[index:] - dist))
-            self.wind_coordinates.append([self.longitude[index], self.latitude[index]])
+        ####### [km], need pace model
+        dists = np.arange(dist, self.distance[-1], self.config.G_GROSS_AVE_SPEED)
+        for i in self.get_index_by_distance(dists, index):
+            self.wind_coordinates.append([self.longitude[i], self.latitude[i]])
             current_time += timedelta(hours=1) ####### need pace model
             self.wind_timeline.append(current_time)
-            dist += self.config.G_GROSS_AVE_SPEED ####### [km], need pace model
         
         rest_dist = int(self.distance[-1] % self.config.G_GROSS_AVE_SPEED)
         if rest_dist > 0 and rest_dist / self.config.G_GROSS_AVE_SPEED > 0.5: ####### need pace model
@@ -956,16 +1019,105 @@ class Course:
 
         self.load_weather_status = 2
 
+    def project_points(self, lon, lat):
+        """Map points (in route order, e.g. course points) onto the course.
+
+        Candidates come from segment_index in one batch. A point is matched
+        at or after the segment of the previous point, to the nearest
+        projection within G_GPS_ON_ROUTE_CUTOFF of the first part of the
+        course passing by (the way out of an out-and-back course).
+        Unmatched points take the segment of the previous one.
+
+        Returns arrays of segment index, fraction on the segment,
+        distance [km] and altitude [m] (empty without altitude).
+        """
+        n = len(lon)
+        segment = np.zeros(n, dtype=np.int64)
+        fraction = np.zeros(n)
+        if not n or len(self.longitude) < 2:
+            return segment, fraction, np.zeros(n), np.zeros(n)
+
+        points, segments, fractions, dists = self.segment_index.project_points(
+            lon, lat, self.config.G_GPS_ON_ROUTE_CUTOFF
+        )
+        bounds = np.searchsorted(points, np.arange(n + 1))
+
+        min_index = 0
+        for i in range(n):
+            min_k = None
+            min_dist = np.inf
+            for k in range(bounds[i], bounds[i + 1]):
+                j = segments[k]
+                if j < min_index or dists[k] >= min_dist:
+                    continue
+                if min_k is not None and j - segments[min_k] > 2:
+                    continue
+                min_k = k
+                min_dist = dists[k]
+            if min_k is not None:
+                min_index = segments[min_k]
+                fraction[i] = fractions[min_k]
+            segment[i] = min_index
+
+        h_lon = self.longitude[segment] + self.points_diff[0][segment] * fraction
+        h_lat = self.latitude[segment] + self.points_diff[1][segment] * fraction
+        delta = (
+            np.nan_to_num(
+                get_dist_on_earth_array(
+                    self.longitude[segment], self.latitude[segment], h_lon, h_lat
+                )
+            )
+            / 1000
+        )
+        distance = np.zeros(n)
+        if len(self.distance):
+            distance = self.distance[segment] + delta
+        altitude = np.zeros(n)
+        if len(self.altitude) and len(self.distance):
+            with np.errstate(divide="ignore", invalid="ignore"):
+                slope = np.diff(self.altitude)[segment] / np.diff(self.distance)[segment]
+            altitude = self.altitude[segment] + np.where(fraction > 0, slope * delta, 0)
+        return segment, fraction, distance, altitude
+
+    def get_index_by_distance(self, distance, start=0):
+        """Return the indexes of the course points nearest to each distance [km].
+
+        distance is in ascending order; the indexes are never before start.
+        """
+        distance = np.asarray(distance, dtype=np.float64)
+        course_distance = self.distance[start:]
+        right = np.clip(
+            np.searchsorted(course_distance, distance), 0, len(course_distance) - 1
+        )
+        left = np.maximum(right - 1, 0)
+        index = np.where(
+            np.abs(course_distance[left] - distance)
+            <= np.abs(course_distance[right] - distance),
+            left,
+            right,
+        )
+        # the first of equal distances, as argmin
+        index = np.searchsorted(course_distance, course_distance[index])
+        return start + np.maximum.accumulate(index) if len(index) else index + start
+
     def reset_load_weather_status(self):
         self.load_weather_status = 0
 
-    def _project_point_to_segment(self, segment_index, inner_p):
+    def _get_inner_p(self, segment_index, lon, lat):
+        return (
+            self.points_diff[0][segment_index]
+            * (lon - self.longitude[segment_index])
+            + self.points_diff[1][segment_index]
+            * (lat - self.latitude[segment_index])
+        ) / self.points_diff_sum_of_squares[segment_index]
+
+    def _project_point_to_segment(self, segment_index, lon, lat):
         max_segment_index = len(self.longitude) - 2
         if max_segment_index < 0:
             return None
 
         segment_index = int(max(0, min(segment_index, max_segment_index)))
-        inner = float(inner_p[segment_index])
+        inner = float(self._get_inner_p(segment_index, lon, lat))
         inner = max(0.0, min(inner, 1.0))
 
         h_lon = (
@@ -978,7 +1130,7 @@ class Course:
         )
         return float(h_lon), float(h_lat)
 
-    def _get_projection_centroid(self, center_segment_index, inner_p, window_size):
+    def _get_projection_centroid(self, center_segment_index, lon, lat, window_size):
         max_segment_index = len(self.longitude) - 2
         if max_segment_index < 0:
             return None
@@ -991,7 +1143,7 @@ class Course:
         weight_sum = 0.0
 
         for segment_index in range(start_index, end_index + 1):
-            projected = self._project_point_to_segment(segment_index, inner_p)
+            projected = self._project_point_to_segment(segment_index, lon, lat)
             if projected is None:
                 continue
 
@@ -1041,22 +1193,30 @@ class Course:
             start, -search_range
         )
 
-        b_a_x = self.points_diff[0]
-        b_a_y = self.points_diff[1]
-        lon_diff = lon - self.longitude
-        lat_diff = lat - self.latitude
-        p_a_x = lon_diff[0:-1]
-        p_a_y = lat_diff[0:-1]
-        p_b_x = lon_diff[1:]
-        p_b_y = lat_diff[1:]
+        # segments near the current position, or all segments when nothing is near
+        segments = None
+        if self.segment_index is not None:
+            segments = self.segment_index.query(
+                lon, lat, float(on_route_cutoff) * self.on_route_search_ratio
+            )
+        if segments is None or not len(segments):
+            segments = np.arange(course_n - 1)
+        segment_n = course_n - 1
+
+        b_a_x = self.points_diff[0][segments]
+        b_a_y = self.points_diff[1][segments]
+        p_a_x = lon - self.longitude[segments]
+        p_a_y = lat - self.latitude[segments]
+        p_b_x = lon - self.longitude[segments + 1]
+        p_b_y = lat - self.latitude[segments + 1]
         inner_p = (
             b_a_x * p_a_x + b_a_y * p_a_y
-        ) / self.points_diff_sum_of_squares
+        ) / self.points_diff_sum_of_squares[segments]
 
-        azimuth_diff = np.full(len(self.azimuth), np.nan)
+        azimuth_diff = np.full(len(segments), np.nan)
 
         if not np.isnan(track) and track is not None:
-            azimuth_diff = (track - self.azimuth) % 360
+            azimuth_diff = (track - self.azimuth[segments]) % 360
 
         dist_diff = np.where(
             inner_p <= 0.0,
@@ -1064,9 +1224,15 @@ class Course:
             np.where(
                 inner_p >= 1.0,
                 np.sqrt(p_b_x**2 + p_b_y**2),
-                np.abs(b_a_x * p_a_y - b_a_y * p_a_x) / self.points_diff_dist,
+                np.abs(b_a_x * p_a_y - b_a_y * p_a_x) / self.points_diff_dist[segments],
             ),
         )
+        dist_diff_mod = np.where(
+            ((0 <= azimuth_diff) & (azimuth_diff <= azimuth_cutoff[0]))
+            | ((azimuth_cutoff[1] <= azimuth_diff) & (azimuth_diff <= 360)),
+            dist_diff,
+            np.inf,
+        )
 
         # search with no penalty
         # 1st start -> forward_search_index
@@ -1091,34 +1257,32 @@ class Course:
             elif s[0] == s[1]:
                 continue
 
-            m = s[0]
-
-            dist_diff_mod = np.where(
-                ((0 <= azimuth_diff) & (azimuth_diff <= azimuth_cutoff[0]))
-                | ((azimuth_cutoff[1] <= azimuth_diff) & (azimuth_diff <= 360)),
-                dist_diff,
-                np.inf,
-            )
-            # app_logger.debug(f"azimuth_diff: {azimuth_diff[s[0]:s[1]]}")
-            # app_logger.debug(f"dist_diff_mod: {dist_diff_mod[s[0]:s[1]]}")
-            # app_logger.debug(f"inner_p: {inner_p[s[0]:s[1]]}")
-
+            # position of the window in segments
+            w_start = np.searchsorted(segments, s[0])
             if s[1] >= course_n - 1:
-                m += dist_diff_mod[s[0] :].argmin()
+                w_end = len(segments)
             else:
-                m += dist_diff_mod[s[0] : s[1]].argmin()
+                w_end = np.searchsorted(segments, s[1])
+            if w_start == w_end:
+                continue
+            # app_logger.debug(f"azimuth_diff: {azimuth_diff[w_start:w_end]}")
+            # app_logger.debug(f"dist_diff_mod: {dist_diff_mod[w_start:w_end]}")
+            # app_logger.debug(f"inner_p: {inner_p[w_start:w_end]}")
+
+            k = w_start + dist_diff_mod[w_start:w_end].argmin()
+            m = int(segments[k])
 
             # check azimuth
             # app_logger.debug(f"i:{i}, s:{s}, m:{m}, azimuth_diff:{azimuth_diff[m]}, {len(azimuth_diff)}")
             # app_logger.debug(f"track:{track}, m:{m}")
             # app_logger.debug(f"self.azimuth:{self.azimuth}, {len(self.azimuth)}")
             # app_logger.debug(f"azimuth_diff:{azimuth_diff}")
-            if np.isnan(azimuth_diff[m]):
+            if np.isnan(azimuth_diff[k]):
                 # GPS is lost(return start finally)
                 continue
             if (
-                0 <= azimuth_diff[m] <= azimuth_cutoff[0]
-                or azimuth_cutoff[1] <= azimuth_diff[m] <= 360
+                0 <= azimuth_diff[k] <= azimuth_cutoff[0]
+                or azimuth_cutoff[1] <= azimuth_diff[k] <= 360
             ):
                 # go forward
                 pass
@@ -1147,9 +1311,9 @@ class Course:
             ):
                 continue
 
-            if m == 0 and inner_p[0] <= 0.0:
+            if m == 0 and inner_p[k] <= 0.0:
                 continue
-            elif m == len(dist_diff) - 1 and inner_p[-1] >= 1.0:
+            elif m == segment_n - 1 and inner_p[k] >= 1.0:
                 app_logger.info(f"after end of course {start} -> {m}")
                 app_logger.info(
                     f"\t {lat} {lon} / {self.latitude[m]} {self.longitude[m]}",
@@ -1161,7 +1325,7 @@ class Course:
                 self.index.value = m
                 return
 
-            projected = self._project_point_to_segment(m, inner_p)
+            projected = self._project_point_to_segment(m, lon, lat)
             if projected is None:
                 continue
             h_lon, h_lat = projected
@@ -1170,7 +1334,8 @@ class Course:
 
             centroid = self._get_projection_centroid(
                 m,
-                inner_p,
+                lon,
+                lat,
                 self.on_route_centroid_window,
             )
             if centroid is not None:
@@ -1233,13 +1398,13 @@ class Course:
                 app_logger.info(
                     f"\t {lat} {lon} / {self.latitude[m]} {self.longitude[m]}"
                 )
-                app_logger.info(f"\t azimuth_diff: {azimuth_diff[m]}")
+                app_logger.info(f"\t azimuth_diff: {azimuth_diff[k]}")
 
             return
 
         if was_on_course and len(dist_diff):
-            rescue_segment = int(np.argmin(dist_diff))
-            projected = self._project_point_to_segment(rescue_segment, inner_p)
+            rescue_segment = int(segments[np.argmin(dist_diff)])
+            projected = self._project_point_to_segment(rescue_segment, lon, lat)
             if projected is not None:
                 h_lon, h_lat = projected
                 rescue_distance = get_dist_on_earth(h_lon, h_lat, lon, lat)
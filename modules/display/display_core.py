@@ -83,6 +83,10 @@ class Display:
     def update(self, buf, direct_update):
         pass
 
+    # rows: (start, end) of buf which changed since the last update
+    def update_rows(self, buf, direct_update, rows):
+        self.update(buf, direct_update)
+
     def screen_flash_long(self):
         status_bar = self._get_status_bar()
         if status_bar is None:
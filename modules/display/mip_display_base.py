@@ -3,8 +3,15 @@ import time
 import asyncio
 import numpy as np
 
+from modules.utils import perf
 from .display_core import Display
 
+PERF_FRAME = {
+    stage: perf.histogram(f"display.{stage}")
+    for stage in ("conv", "diff", "pack", "spi")
+}
+PERF_FRAME_LINES = perf.counter("display.lines")
+
 
 class MipDisplayBase(Display):
     # https://qiita.com/hishi/items/669ce474fcd76bdce1f1
@@ -47,6 +54,8 @@ class MipDisplayBase(Display):
 
     quit_status = False
     use_cpp = False
+    # rows of img_buff_rgb8 being converted by conv_color
+    conv_rows = slice(None)
 
     def __init__(self, config, size=None, color=None):
         super().__init__(config)
@@ -114,8 +123,18 @@ class MipDisplayBase(Display):
             self.buff_width += 2
         self.spi_max_rows = int((self.spi_max_buf_size - 2) / self.buff_width)
 
-        self.img_buff_rgb8 = np.zeros((self.size[1], self.buff_width), dtype="uint8")
-        self.pre_img = np.zeros((self.size[1], self.buff_width), dtype="uint8")
+        # rows are padded to 8 bytes to compare them as uint64 words
+        stride = -(-self.buff_width // 8) * 8
+        img_words = np.zeros((self.size[1], stride), dtype="uint8")
+        pre_words = np.zeros((self.size[1], stride), dtype="uint8")
+        self.img_buff_rgb8 = img_words[:, : self.buff_width]
+        self.pre_img = pre_words[:, : self.buff_width]
+        self._img_words = img_words.view(np.uint64)
+        self._pre_words = pre_words.view(np.uint64)
+        self._diff_words = np.empty(self._img_words.shape, dtype=bool)
+        self._diff_rows = np.empty(self.size[1], dtype=bool)
+        # SPI command buffer: lines (address + data) and 2 dummy bytes
+        self.spi_buf = np.zeros(self.size[1] * self.buff_width + 2, dtype="uint8")
         self.img_buff_rgb8[:, 0] = self.UPDATE_MODE+ (np.arange(self.size[1]) >> 8)
         self.img_buff_rgb8[:, 1] = np.arange(self.size[1]) & 0xFF
 
@@ -172,10 +191,8 @@ class MipDisplayBase(Display):
         self.no_update()
 
     def inversion_draw(self, inv_buf):
-        buf = self.split_buffer(inv_buf, np.arange(0, inv_buf.shape[0]), False)
-        for b in buf:
-            if b is not None:
-                self.spi_write(b)
+        for b in self.split_buffer(inv_buf, np.arange(0, inv_buf.shape[0])):
+            self.spi_write(b)
 
     def inversion(self, sec):
         s = sec
@@ -210,75 +227,102 @@ class MipDisplayBase(Display):
 
     async def draw_worker(self):
         while True:
-            img_bytes = await self.draw_queue.get()
-            if img_bytes is None:
+            item = await self.draw_queue.get()
+            if item is None:
                 break
-            # self.config.check_time("mip_draw_worker start")
-            # t = datetime.now()
-            self.spi_write(img_bytes)
-            # self.config.check_time("mip_draw_worker end")
-            # print("####### draw(Py)", (datetime.now()-t).total_seconds())
+            buf, timings = item
+            self.write_frame(buf, timings)
             self.draw_queue.task_done()
 
+    def write_frame(self, buf, timings):
+        t = time.perf_counter()
+        for b in buf:
+            self.spi_write(b)
+        if perf.registry.enabled:
+            conv_ms, diff_ms, pack_ms, lines = timings
+            PERF_FRAME["conv"].observe(conv_ms)
+            PERF_FRAME["diff"].observe(diff_ms)
+            PERF_FRAME["pack"].observe(pack_ms)
+            PERF_FRAME["spi"].observe((time.perf_counter() - t) * 1000.0)
+            PERF_FRAME_LINES.inc(lines)
+
     def update(self, im_array, direct_update):
+        self.update_lines(im_array, direct_update, 0, self.size[1])
+
+    def update_rows(self, im_array, direct_update, rows):
+        if self.use_cpp:
+            # converts and compares the whole frame by itself
+            self.update(im_array, direct_update)
+            return
+        start, end = rows
+        # from an even row, the dithering pattern of conv_color stays the same
+        start = max(start - (start & 1), 0)
+        end = min(end, self.size[1])
+        if start < end:
+            self.update_lines(im_array, direct_update, start, end)
+
+    def update_lines(self, im_array, direct_update, start, end):
         if self.quit_status:
             return
 
-        # self.config.check_time("mip_update start")
-        self.img_buff_rgb8[:, 2:] = self.conv_color(im_array)
-        # self.config.check_time("packbits")
+        t0 = time.perf_counter()
+        self.conv_rows = slice(start, end)
+        self.img_buff_rgb8[start:end, 2:] = self.conv_color(im_array[start:end])
+        t1 = time.perf_counter()
 
         # differential update
-        diff_lines = np.where(
-            np.sum((self.img_buff_rgb8 == self.pre_img), axis=1) != self.buff_width
-        )[0]
-        # print(f"diff {int(len(diff_lines)/self.size[1]*100)}%")
-
+        diff_lines = self.get_diff_lines(start, end)
         if not len(diff_lines):
             return
         self.pre_img[diff_lines] = self.img_buff_rgb8[diff_lines]
-        # self.config.check_time("diff_lines")
-
-        buf = self.split_buffer(self.img_buff_rgb8, diff_lines, direct_update)
+        t2 = time.perf_counter()
+
+        buf = self.split_buffer(self.img_buff_rgb8, diff_lines)
+        timings = (
+            (t1 - t0) * 1000.0,
+            (t2 - t1) * 1000.0,
+            (time.perf_counter() - t2) * 1000.0,
+            len(diff_lines),
+        )
         if direct_update:
-            for b in buf:
-                if b is not None:
-                    self.spi_write(b)
+            self.write_frame(buf, timings)
         # put queue
         else:
-            for b in buf:
-                if b is not None:
-                    asyncio.create_task(self.draw_queue.put((b)))
-
-    def split_buffer(self, img_buff, diff_lines, direct_update):
-        if len(diff_lines) < self.spi_max_rows:
-            buf = self.conv_bytes(img_buff[diff_lines])
-            return [buf.tobytes(), None]            
-        else:
-            # for MIP 640x480, MIP_Azumo_color_272x451
-            l = int(len(diff_lines) / 2)
-            b1_orig = img_buff[diff_lines[:l]]
-            end = -2 if direct_update else b1_orig.size
-            b1 = self.conv_bytes(b1_orig)
-            b2 = self.conv_bytes(img_buff[diff_lines[l:]])
-            buf = [
-                b1[:end].tobytes(),
-                b2.tobytes()
-            ]
-            return buf
+            self.draw_queue.put_nowait((buf, timings))
 
-    def conv_bytes(self, buf):
-        bytes_data = np.empty(buf.size + 2, dtype=np.uint8)
-        bytes_data[:-2] = buf.ravel()
-        bytes_data[-2:] = 0
-        return bytes_data
+    def get_diff_lines(self, start=0, end=None):
+        diff_words = self._diff_words[start:end]
+        diff_rows = self._diff_rows[start:end]
+        np.not_equal(
+            self._img_words[start:end], self._pre_words[start:end], out=diff_words
+        )
+        np.any(diff_words, axis=1, out=diff_rows)
+        return np.flatnonzero(diff_rows) + start
+
+    def split_buffer(self, img_buff, diff_lines):
+        # gather the lines into the SPI command buffer
+        n = len(diff_lines)
+        size = n * self.buff_width
+        np.take(
+            img_buff,
+            diff_lines,
+            axis=0,
+            out=self.spi_buf[:size].reshape(n, self.buff_width),
+            mode="clip",
+        )
+        self.spi_buf[size : size + 2] = 0
+        if n < self.spi_max_rows:
+            return [self.spi_buf[: size + 2].tobytes()]
+        # for MIP 640x480, MIP_Azumo_color_272x451
+        half = (n // 2) * self.buff_width
+        return [self.spi_buf[:half].tobytes(), self.spi_buf[half : size + 2].tobytes()]
 
     def conv_1bit_2colors_py(self, im_array):
         return ~im_array.reshape(im_array.shape[:2])
 
     def conv_3bit_8colors_py(self, im_array):
         return np.packbits(
-            (im_array >> 7).astype("bool").reshape(self.size[1], self.size[0] * 3),
+            (im_array >> 7).astype("bool").reshape(im_array.shape[0], self.size[0] * 3),
             axis=1,
         )
 
@@ -292,7 +336,9 @@ class MipDisplayBase(Display):
         # 3. set odd pixel (2n+1, 2n+1) to 0
         im_array_bin[1::2, 1::2, :][im_array[1::2, 1::2, :] <= th] = False
 
-        return np.packbits(im_array_bin.reshape(self.size[1], self.size[0] * 3), axis=1)
+        return np.packbits(
+            im_array_bin.reshape(im_array.shape[0], self.size[0] * 3), axis=1
+        )
 
 # The following code is adapted from an Apache License 2.0 project.
 # Copyright (c) 2024 Azumo
@@ -307,14 +353,14 @@ class MipDisplayBase(Display):
 # See the License for the specific language governing permissions and
 # limitations under the License.
     def conv_4bit_64colors_py(self, im_array):
-        im_array_u8 = np.zeros((self.size[1], self.buff_width)).astype("uint8")
+        im_array_u8 = np.zeros((im_array.shape[0], self.buff_width)).astype("uint8")
         im_array_u8[:,2:2+102] = np.packbits(
             ((im_array >> 6)&0b01).reshape(
                 im_array.shape[0], im_array.shape[1] * im_array.shape[2]
             ),
             axis=1
         )
-        im_array_u8[:, 2+102:2+102+2] = self.img_buff_rgb8[:, 2+102:2+102+2]
+        im_array_u8[:, 2+102:2+102+2] = self.img_buff_rgb8[self.conv_rows, 2+102:2+102+2]
         im_array_u8[:,106:106+102] = np.packbits(
             (im_array >> 7).reshape(
                 im_array.shape[0], im_array.shape[1] * im_array.shape[2]
@@ -26,6 +26,9 @@ class GUI_Config:
         "String": ("s", ""),
         "Percent": (".0f", "%"),
         "Int": (".0f", ""),
+        # raw values of ANT+ power meters, formatted by get_formatter
+        "Balance": ("lr_balance", ""),
+        "PedalPair": ("pedal_pair", ""),
     }
 
     # Per-item font scale for value text in PyQt item widgets.
@@ -150,7 +153,7 @@ class GUI_Config:
             "self.sensor.values['ANT+'][self.config.G_ANT['ID_TYPE']['PWR']][0x10]['power_l']",
         ),
         "Balance(ANT+)": (
-            G_UNIT["String"],
+            G_UNIT["Balance"],
             "self.sensor.values['ANT+'][self.config.G_ANT['ID_TYPE']['PWR']][0x10]['lr_balance']",
         ),
         "Power17(ANT+)": (
@@ -190,11 +193,11 @@ class GUI_Config:
             "self.sensor.values['integrated']['normalized_power']",
         ),
         "Torque Ef.(ANT+)": (
-            G_UNIT["String"],
+            G_UNIT["PedalPair"],
             "self.sensor.values['ANT+'][self.config.G_ANT['ID_TYPE']['PWR']][0x13]['torque_eff']",
         ),
         "Pedal Sm.(ANT+)": (
-            G_UNIT["String"],
+            G_UNIT["PedalPair"],
             "self.sensor.values['ANT+'][self.config.G_ANT['ID_TYPE']['PWR']][0x13]['pedal_sm']",
         ),
         "Light(ANT+)": (
@@ -389,34 +392,71 @@ class GUI_Config:
                 self.layout = yaml.safe_load(text)
         except FileNotFoundError:
             pass
-    
-    def format_text(self, name, value, G_STOPWATCH_STATUS, itemformat):
-        text = "-"
-        if value is None:
-            pass
-        elif isinstance(value, str):
-            text = value
-        elif np.isnan(value):
-            pass
-        elif name.startswith("Speed") or "SPD" in name:
-            text = f"{(value * 3.6):{itemformat}}"  # m/s to km/h
-        elif "Dist" in name or "DIST" in name:
-            text = f"{(value / 1000):{itemformat}}"  # m to km
-        elif "Work" in name or "WRK" in name:
-            text = f"{(value / 1000):{itemformat}}"  # j to kj
-        elif (
-            "Grade" in name or "Glide" in name
-        ) and G_STOPWATCH_STATUS != "START":
-            text = "-"
+
+    @staticmethod
+    def get_formatter(name, itemformat):
+        """Return format(value, G_STOPWATCH_STATUS) of the item.
+
+        The conversion is chosen once by the item name and format, so that
+        refreshing a screen does no string matching.
+        """
+        if name.startswith("Speed") or "SPD" in name:
+            scale = 3.6  # m/s to km/h
+        elif "Dist" in name or "DIST" in name or "Work" in name or "WRK" in name:
+            scale = 0.001  # m to km, j to kj
+        else:
+            scale = None
+        # grade and glide ratio are shown only while recording
+        hide_stopped = scale is None and ("Grade" in name or "Glide" in name)
+
+        if scale is not None:
+
+            def format_number(value):
+                return f"{(value * scale):{itemformat}}"
+
+        elif itemformat == "lr_balance":
+
+            def format_number(value):
+                # right balance [%]
+                return f"{100 - value}:{value}"
+
+        elif itemformat == "pedal_pair":
+            # (left, right) in 1/2 %, 0xFF is invalid
+
+            def format_pedal(v):
+                return "--%" if v == 0xFF else f"{v // 2:02d}%"
+
+            def format_pair(value, G_STOPWATCH_STATUS):
+                if not isinstance(value, tuple):
+                    return "-"
+                return f"{format_pedal(value[0])}/{format_pedal(value[1])}"
+
+            return format_pair
+
         elif itemformat == "timer":
-            # fmt = '%H:%M:%S' #default (too long)
-            fmt = "%H:%M"
-            if value < 3600:
-                fmt = "%M:%S"
-            text = time.strftime(fmt, time.gmtime(value))
+
+            def format_number(value):
+                # fmt = '%H:%M:%S' #default (too long)
+                fmt = "%H:%M" if value >= 3600 else "%M:%S"
+                return time.strftime(fmt, time.gmtime(value))
+
         elif itemformat == "time":
-            text = time.strftime("%H:%M")
+
+            def format_number(value):
+                return time.strftime("%H:%M")
+
         else:
-            text = f"{value:{itemformat}}"
 
-        return text
+            def format_number(value):
+                return f"{value:{itemformat}}"
+
+        def format_value(value, G_STOPWATCH_STATUS):
+            if value is None:
+                return "-"
+            elif isinstance(value, str):
+                return value
+            elif np.isnan(value) or (hide_stopped and G_STOPWATCH_STATUS != "START"):
+                return "-"
+            return format_number(value)
+
+        return format_value
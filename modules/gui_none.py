@@ -48,6 +48,12 @@ class GUI_None():
     def clear_external_instruction(self):
         pass
 
+    def change_start_stop_button(self, status):
+        pass
+
+    def show_popup(self, title, timeout=None, buzzer_sound="beep"):
+        pass
+
     def show_dialog(self, fn, title):
         print(title)
         if fn is not None:
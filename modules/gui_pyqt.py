@@ -3,6 +3,8 @@ import os
 
 from datetime import datetime
 import asyncio
+import importlib
+from functools import partial
 
 from modules.app_logger import app_logger
 import modules._qt_ver as _qt_ver
@@ -27,6 +29,7 @@ from modules.gui_qt_base import GUI_Qt_Base
 from modules.utils.timer import Timer, log_timers
 from modules.pyqt.pyqt_status_bar import StatusBarWidget
 from modules.pyqt.pyqt_dialog import CachedDialog
+from modules.pyqt.pyqt_lazy_widget import LazyWidget, is_built
 
 
 class SplashScreen(QtWidgets.QWidget):
@@ -136,6 +139,9 @@ class GUI_PyQt(GUI_Qt_Base):
     cuesheet_widget = None
     multi_scan_widget = None
     dual_mode = False
+    # set while the map page is not built, applied by _on_map_built
+    _map_use_i2c_heading = None
+    _map_external_instruction = None
 
     # signal
     signal_next_button = Signal(int)
@@ -215,7 +221,10 @@ class GUI_PyQt(GUI_Qt_Base):
         # for draw_display
         self.init_buffer(self.config.display)
         if self.display_active:
-            self.main_window.set_paint_delegate(lambda event: self.draw_display())
+            self.main_window.set_paint_delegate(
+                lambda event: self.schedule_draw_display()
+            )
+            self.watch_paint_events()
 
         self.stack_widget.currentChanged.connect(self.on_change_stack_widget)
 
@@ -286,65 +295,9 @@ class GUI_PyQt(GUI_Qt_Base):
             )
 
         with timers[1]:
-            import modules.pyqt.graph.pyqt_map as pyqt_map
-            import modules.pyqt.graph.pyqt_course_profile as pyqt_course_profile
-            import modules.pyqt.graph.pyqt_value_graph as pyqt_value_graph
+            # menus and graphs are imported by _build_menu and the page factories
             from modules.pyqt.pyqt_values_widget import ValuesWidget
 
-            from modules.pyqt.menu.pyqt_menu_widget import (
-                TopMenuWidget,
-                RideInfoMenuWidget,
-                QzssDcrViewerWidget,
-                ConnectivityMenuWidget,
-                UploadActivityMenuWidget,
-            )
-            from modules.pyqt.menu.pyqt_system_menu_widget import (
-                SystemMenuWidget,
-                NetworkMenuWidget,
-                BluetoothPairingListWidget,
-                BluetoothPairedDeviceListWidget,
-                BluetoothTetheringListWidget,
-                DebugMenuWidget,
-                DebugLogViewerWidget,
-            )
-            from modules.pyqt.menu.pyqt_profile_widget import ProfileWidget
-            from modules.pyqt.menu.pyqt_sensor_menu_widget import (
-                SensorMenuWidget,
-                I2CMenuWidget,
-                SpeedMenuWidget,
-                ANTMenuWidget,
-                ANTListWidget,
-                BLEMenuWidget,
-                GPSMenuWidget,
-            )
-            from modules.pyqt.menu.pyqt_course_menu_widget import (
-                CoursesMenuWidget,
-                CourseListWidget,
-                CourseDetailWidget,
-                #GoogleDirectionsAPISettingMenuWidget
-            ) 
-            from modules.pyqt.menu.pyqt_map_menu_widget import (
-                MapMenuWidget,
-                MapListWidget,
-                MapOverlayMenuWidget,
-                HeatmapListWidget,
-                RainmapListWidget,
-                WindmapListWidget,
-                ExternalDataSourceMenuWidget,
-                WindSourceListWidget,
-                DEMTileListWidget,
-            )
-            from modules.pyqt.menu.pyqt_adjust_widget import (
-                AdjustAltitudeWidget,
-                AdjustWheelCircumferenceWidget,
-                AdjustAutoStopCutoffWidget,
-                AdjustGrossAverageSpeedWidget,
-                AdjustCPWidget,
-                AdjustWPrimeBalanceWidget,
-            )
-            from modules.pyqt.pyqt_cuesheet_widget import CueSheetWidget
-            from modules.pyqt.pyqt_multiscan_widget import MultiScanWidget
-
         with timers[2]:
             # self.main_window
             #  stack_widget
@@ -366,53 +319,58 @@ class GUI_PyQt(GUI_Qt_Base):
             self.stack_widget.addWidget(main_widget)
 
             # reverse order (make children widget first, then make parent widget)
+            # built on first use by change_menu_page (see _build_menu)
             menus = [
-                ("BLE Sensors", BLEMenuWidget),
-                ("ANT+ Detail", ANTListWidget),
-                ("ANT+ Sensors", ANTMenuWidget),
-                ("Wheel Size", AdjustWheelCircumferenceWidget),
-                ("Auto Stop Cutoff", AdjustAutoStopCutoffWidget),
-                ("Gross Ave Speed", AdjustGrossAverageSpeedWidget),
-                ("Speed", SpeedMenuWidget),
-                ("Adjust Altitude", AdjustAltitudeWidget),
-                ("I2C Sensors", I2CMenuWidget),
-                ("GPS", GPSMenuWidget),
-                ("Sensors", SensorMenuWidget),
-                ("BT Pairing", BluetoothPairingListWidget),
-                ("BT Paired Devices", BluetoothPairedDeviceListWidget),
-                ("BT Tethering", BluetoothTetheringListWidget),
-                ("Network", NetworkMenuWidget),
-                ("Debug Log", DebugLogViewerWidget),
-                ("Debug", DebugMenuWidget),
-                ("System", SystemMenuWidget),
-                ("CP", AdjustCPWidget),
-                ("W Prime Balance", AdjustWPrimeBalanceWidget),
-                ("Profile", ProfileWidget),
-                ("QZSS DC Report", QzssDcrViewerWidget),
-                ("Ride Info", RideInfoMenuWidget),
-                ("Connectivity", ConnectivityMenuWidget),
-                ("Upload Activity", UploadActivityMenuWidget),
-                ("DEM Tile source", DEMTileListWidget),
-                ("Wind Source", WindSourceListWidget),
-                ("External Data Sources", ExternalDataSourceMenuWidget),
-                ("Wind map List", WindmapListWidget),
-                ("Rain map List", RainmapListWidget),
-                ("Heatmap List", HeatmapListWidget),
-                ("Map Overlay", MapOverlayMenuWidget),
-                ("Select Map", MapListWidget),
-                ("Map and Data", MapMenuWidget),
-                # ("Google Directions API mode", GoogleDirectionsAPISettingMenuWidget),
-                ("Course Detail", CourseDetailWidget),
-                ("Courses List", CourseListWidget),
-                ("Courses", CoursesMenuWidget),
-                ("Menu", TopMenuWidget),
+                ("BLE Sensors", "pyqt_sensor_menu_widget", "BLEMenuWidget"),
+                ("ANT+ Detail", "pyqt_sensor_menu_widget", "ANTListWidget"),
+                ("ANT+ Sensors", "pyqt_sensor_menu_widget", "ANTMenuWidget"),
+                ("Wheel Size", "pyqt_adjust_widget", "AdjustWheelCircumferenceWidget"),
+                ("Auto Stop Cutoff", "pyqt_adjust_widget", "AdjustAutoStopCutoffWidget"),
+                ("Gross Ave Speed", "pyqt_adjust_widget", "AdjustGrossAverageSpeedWidget"),
+                ("Speed", "pyqt_sensor_menu_widget", "SpeedMenuWidget"),
+                ("Adjust Altitude", "pyqt_adjust_widget", "AdjustAltitudeWidget"),
+                ("I2C Sensors", "pyqt_sensor_menu_widget", "I2CMenuWidget"),
+                ("GPS", "pyqt_sensor_menu_widget", "GPSMenuWidget"),
+                ("Sensors", "pyqt_sensor_menu_widget", "SensorMenuWidget"),
+                ("BT Pairing", "pyqt_system_menu_widget", "BluetoothPairingListWidget"),
+                ("BT Paired Devices", "pyqt_system_menu_widget", "BluetoothPairedDeviceListWidget"),
+                ("BT Tethering", "pyqt_system_menu_widget", "BluetoothTetheringListWidget"),
+                ("Network", "pyqt_system_menu_widget", "NetworkMenuWidget"),
+                ("Debug Log", "pyqt_system_menu_widget", "DebugLogViewerWidget"),
+                ("Debug", "pyqt_system_menu_widget", "DebugMenuWidget"),
+                ("System", "pyqt_system_menu_widget", "SystemMenuWidget"),
+                ("CP", "pyqt_adjust_widget", "AdjustCPWidget"),
+                ("W Prime Balance", "pyqt_adjust_widget", "AdjustWPrimeBalanceWidget"),
+                ("Profile", "pyqt_profile_widget", "ProfileWidget"),
+                ("QZSS DC Report", "pyqt_menu_widget", "QzssDcrViewerWidget"),
+                ("Ride Info", "pyqt_menu_widget", "RideInfoMenuWidget"),
+                ("Connectivity", "pyqt_menu_widget", "ConnectivityMenuWidget"),
+                ("Upload Activity", "pyqt_menu_widget", "UploadActivityMenuWidget"),
+                ("DEM Tile source", "pyqt_map_menu_widget", "DEMTileListWidget"),
+                ("Wind Source", "pyqt_map_menu_widget", "WindSourceListWidget"),
+                ("External Data Sources", "pyqt_map_menu_widget", "ExternalDataSourceMenuWidget"),
+                ("Wind map List", "pyqt_map_menu_widget", "WindmapListWidget"),
+                ("Rain map List", "pyqt_map_menu_widget", "RainmapListWidget"),
+                ("Heatmap List", "pyqt_map_menu_widget", "HeatmapListWidget"),
+                ("Map Overlay", "pyqt_map_menu_widget", "MapOverlayMenuWidget"),
+                ("Select Map", "pyqt_map_menu_widget", "MapListWidget"),
+                ("Map and Data", "pyqt_map_menu_widget", "MapMenuWidget"),
+                # ("Google Directions API mode", "pyqt_course_menu_widget", "GoogleDirectionsAPISettingMenuWidget"),
+                ("Course Detail", "pyqt_course_menu_widget", "CourseDetailWidget"),
+                ("Courses List", "pyqt_course_menu_widget", "CourseListWidget"),
+                ("Courses", "pyqt_course_menu_widget", "CoursesMenuWidget"),
+                ("Menu", "pyqt_menu_widget", "TopMenuWidget"),
             ]
             menu_count = max(self.gui_config.G_GUI_INDEX.values()) + 1
-            for m in menus:
-                m_widget = m[1](self.stack_widget, m[0], self.config)
-                m_widget.setContentsMargins(0, 0, 0, 0)
-                self.stack_widget.addWidget(m_widget)
-                self.gui_config.G_GUI_INDEX[m[0]] = menu_count
+            for name, module_name, class_name in menus:
+                self.stack_widget.addWidget(
+                    LazyWidget(
+                        self.stack_widget,
+                        name,
+                        partial(self._build_menu, name, module_name, class_name),
+                    )
+                )
+                self.gui_config.G_GUI_INDEX[name] = menu_count
                 menu_count += 1
 
             self.stack_widget.setCurrentIndex(1)
@@ -432,7 +390,10 @@ class GUI_PyQt(GUI_Qt_Base):
                     self.root_layout.removeWidget(self.status_bar)
                     self.status_bar.setParent(None)
 
-                self.map_widget = pyqt_map.MapWidget(main_widget, self.config)
+                # the map is always shown in dual mode
+                from modules.pyqt.graph.pyqt_map import MapWidget
+
+                self.map_widget = MapWidget(main_widget, self.config)
                 self.main_page = QtWidgets.QStackedWidget(main_widget)
                 self.main_page.setContentsMargins(0, 0, 0, 0)
 
@@ -470,58 +431,34 @@ class GUI_PyQt(GUI_Qt_Base):
                         )
                     )
                 else:
+                    page = None
                     if (
                         k == "ALTITUDE_GRAPH"
                         and "i2c_baro_temp"
                         in self.sensor.sensor_i2c.sensor
                     ):
-                        self.altitude_graph_widget = (
-                            pyqt_value_graph.AltitudeGraphWidget(
-                                self.main_page, self.config
-                            )
-                        )
-                        self.main_page.addWidget(self.altitude_graph_widget)
+                        page = ("altitude_graph_widget", "AltitudeGraphWidget")
                     elif (
                         k == "ACC_GRAPH"
                         and self.sensor.sensor_i2c.motion_sensor["ACC"]
                     ):
-                        self.acc_graph_widget = (
-                            pyqt_value_graph.AccelerationGraphWidget(
-                                self.main_page, self.config
-                            )
-                        )
-                        self.main_page.addWidget(self.acc_graph_widget)
+                        page = ("acc_graph_widget", "AccelerationGraphWidget")
                     elif k == "PERFORMANCE_GRAPH" and self.config.G_ANT["STATUS"]:
-                        self.performance_graph_widget = (
-                            pyqt_value_graph.PerformanceGraphWidget(
-                                self.main_page, self.config
-                            )
-                        )
-                        self.main_page.addWidget(self.performance_graph_widget)
+                        page = ("performance_graph_widget", "PerformanceGraphWidget")
                     elif k == "COURSE_PROFILE_GRAPH":
-                        self.course_profile_graph_widget = (
-                            pyqt_course_profile.CourseProfileGraphWidget(
-                                self.main_page, self.config
-                            )
-                        )
-                        self.main_page.addWidget(self.course_profile_graph_widget)
+                        page = ("course_profile_graph_widget", "CourseProfileGraphWidget")
                     elif k == "SIMPLE_MAP":
                         if not self.dual_mode:
-                            self.map_widget = pyqt_map.MapWidget(
-                                self.main_page, self.config
-                            )
-                            self.main_page.addWidget(self.map_widget)
+                            page = ("map_widget", "MapWidget")
                     elif (
                         k == "CUESHEET"
                     ):
-                        self.cuesheet_widget = CueSheetWidget(
-                            self.main_page, self.config
-                        )
-                        self.main_page.addWidget(self.cuesheet_widget)
-                    
+                        page = ("cuesheet_widget", "CueSheetWidget")
+                    if page is not None:
+                        self.add_main_page(*page)
+
             if self.config.G_ANT["STATUS"]:
-                self.multi_scan_widget = MultiScanWidget(self.main_page, self.config)
-                self.main_page.addWidget(self.multi_scan_widget)
+                self.add_main_page("multi_scan_widget", "MultiScanWidget")
                 self.multiscan_index = self.main_page.count() - 1
                 self.multiscan_back_index = self.multiscan_index
 
@@ -547,7 +484,80 @@ class GUI_PyQt(GUI_Qt_Base):
             self._start_qzss_dcr_popup_monitor()
 
         app_logger.info("Drawing components:")
-        log_timers(timers, text_total="  total : {0:.3f} sec")
+        log_timers(timers, text_total="  total : {0:.3f} sec", section="gui")
+
+    # module of the graph pages, imported when the page is shown first
+    MAIN_PAGE_MODULES = {
+        "AltitudeGraphWidget": "modules.pyqt.graph.pyqt_value_graph",
+        "AccelerationGraphWidget": "modules.pyqt.graph.pyqt_value_graph",
+        "PerformanceGraphWidget": "modules.pyqt.graph.pyqt_value_graph",
+        "CourseProfileGraphWidget": "modules.pyqt.graph.pyqt_course_profile",
+        "MapWidget": "modules.pyqt.graph.pyqt_map",
+        "CueSheetWidget": "modules.pyqt.pyqt_cuesheet_widget",
+        "MultiScanWidget": "modules.pyqt.pyqt_multiscan_widget",
+    }
+
+    # imported after boot (config.preload_modules) to make the first show faster
+    preload_modules = (
+        *dict.fromkeys(MAIN_PAGE_MODULES.values()),
+        "modules.pyqt.menu.pyqt_menu_widget",
+        "modules.pyqt.menu.pyqt_sensor_menu_widget",
+        "modules.pyqt.menu.pyqt_system_menu_widget",
+        "modules.pyqt.menu.pyqt_map_menu_widget",
+        "modules.pyqt.menu.pyqt_course_menu_widget",
+        "modules.pyqt.menu.pyqt_adjust_widget",
+        "modules.pyqt.menu.pyqt_profile_widget",
+    )
+
+    def add_main_page(self, attr, class_name):
+        # the placeholder stands for the page (also in self.<attr>) until start()
+        def factory(parent):
+            module = importlib.import_module(self.MAIN_PAGE_MODULES[class_name])
+            return getattr(module, class_name)(parent, self.config)
+
+        if attr == "map_widget":
+            on_build = self._on_map_built
+        else:
+            on_build = partial(setattr, self, attr)
+        widget = LazyWidget(self.main_page, class_name, factory, on_build=on_build)
+        setattr(self, attr, widget)
+        self.main_page.addWidget(widget)
+
+    def _build_menu(self, name, module_name, class_name, parent):
+        module = importlib.import_module(f"modules.pyqt.menu.{module_name}")
+        widget = getattr(module, class_name)(parent, name, self.config)
+        widget.setContentsMargins(0, 0, 0, 0)
+        return widget
+
+    def _on_map_built(self, widget):
+        self.map_widget = widget
+        if self._map_use_i2c_heading is not None:
+            widget.set_map_track_source(self._map_use_i2c_heading)
+        if self._map_external_instruction is not None:
+            widget.set_external_instruction(*self._map_external_instruction)
+
+    def is_map_built(self):
+        return is_built(self.map_widget)
+
+    def get_map_use_i2c_heading(self):
+        if is_built(self.map_widget):
+            return self.map_widget.use_i2c_heading_for_map_track
+        if self._map_use_i2c_heading is not None:
+            return self._map_use_i2c_heading
+        # default of the map (see MapWidget)
+        return bool(self.config.G_DEBUG)
+
+    def set_map_use_i2c_heading(self, use_i2c_heading):
+        if is_built(self.map_widget):
+            self.map_widget.set_map_track_source(use_i2c_heading)
+        else:
+            self._map_use_i2c_heading = bool(use_i2c_heading)
+
+    def get_stack_widget(self, index):
+        widget = self.stack_widget.widget(index)
+        if isinstance(widget, LazyWidget):
+            widget = widget.build()
+        return widget
 
     # for main_page page transition
     def on_change_main_page(self, index):
@@ -606,7 +616,7 @@ class GUI_PyQt(GUI_Qt_Base):
 
     def reset_count_internal(self):
         res = self.logger.reset_count()
-        if res and self.map_widget is not None:
+        if res and is_built(self.map_widget):
             self.map_widget.reset_track()
         if (
             res
@@ -696,29 +706,30 @@ class GUI_PyQt(GUI_Qt_Base):
             return
         self.config.button_config.change_mode()
 
+    # the overlay and tile operations apply to a shown map only
     def change_map_overlays(self):
-        if self.map_widget is not None:
+        if is_built(self.map_widget):
             self.signal_change_overlay.emit()
 
     def change_map_overlays_internal(self):
         self.map_widget.change_map_overlays()
 
     def modify_map_tile(self):
-        if self.map_widget is not None:
+        if is_built(self.map_widget):
             self.signal_modify_map_tile.emit()
 
     def modify_map_tile_internal(self):
         self.map_widget.modify_map_tile()
 
     def map_overlay_prev_time(self):
-        if self.map_widget is not None:
+        if is_built(self.map_widget):
             self.signal_overlay_prev_time.emit()
 
     def map_overlay_prev_time_internal(self):
         self.map_widget.update_overlay_time(False)
 
     def map_overlay_next_time(self):
-        if self.map_widget is not None:
+        if is_built(self.map_widget):
             self.signal_overlay_next_time.emit()
 
     def map_overlay_next_time_internal(self):
@@ -773,24 +784,30 @@ class GUI_PyQt(GUI_Qt_Base):
         if signal:
             signal.emit()
 
+    # pages which are not built yet load the course when built
     def reset_course(self):
-        self.map_widget.reset_course()
-        if self.course_profile_graph_widget is not None:
+        if is_built(self.map_widget):
+            self.map_widget.reset_course()
+        if is_built(self.course_profile_graph_widget):
             self.course_profile_graph_widget.reset_course()
 
     def init_course(self):
-        self.map_widget.init_course()
-        if self.course_profile_graph_widget is not None:
+        if is_built(self.map_widget):
+            self.map_widget.init_course()
+        if is_built(self.course_profile_graph_widget):
             self.course_profile_graph_widget.init_course()
 
     def set_external_instruction(self, instruction_name, instruction_distance):
-        if self.map_widget is not None:
+        if is_built(self.map_widget):
             self.map_widget.set_external_instruction(
                 instruction_name, instruction_distance
             )
+        else:
+            self._map_external_instruction = (instruction_name, instruction_distance)
 
     def clear_external_instruction(self):
-        if self.map_widget is not None:
+        self._map_external_instruction = None
+        if is_built(self.map_widget):
             self.map_widget.clear_external_instruction()
 
     def scroll(self, delta):
@@ -911,9 +928,10 @@ class GUI_PyQt(GUI_Qt_Base):
         self.sensor.sensor_ant.set_light_mode("ON_OFF_FLASH_LOW")
 
     def change_menu_page(self, page, focus_reset=True):
+        widget = self.get_stack_widget(page)
         self.stack_widget.setCurrentIndex(page)
         # Default focus is required for keyboard-driven navigation, including headless mode.
-        focus_widget = getattr(self.stack_widget.widget(page), "focus_widget", None)
+        focus_widget = getattr(widget, "focus_widget", None)
         if focus_widget:
             if focus_reset:
                 focus_widget.setFocus()
@@ -18,6 +18,8 @@ QT_ALIGN_LEFT = _qt_import.QT_ALIGN_LEFT
 QT_FORMAT_MONO = _qt_import.QT_FORMAT_MONO
 QT_FORMAT_RGB888 = _qt_import.QT_FORMAT_RGB888
 QT_COLOR_BLACK = _qt_import.QT_COLOR_BLACK
+QT_EVENT_PAINT = _qt_import.QT_EVENT_PAINT
+QT_EVENT_CHILD_ADDED = _qt_import.QT_EVENT_CHILD_ADDED
 QtCore = _qt_import.QtCore
 QtGui = _qt_import.QtGui
 qasync = _qt_import.qasync
@@ -41,6 +43,11 @@ class GUI_Qt_Base(QtCore.QObject):
     display_active = False
     _render_widget = None
     _display_has_color = True
+    # damaged area of _render_widget since the last draw (see eventFilter)
+    _dirty_rect = None
+    _dirty_full = True
+    _draw_scheduled = False
+    _rendering = False
 
     horizontal = True
 
@@ -63,6 +70,47 @@ class GUI_Qt_Base(QtCore.QObject):
 
     def set_render_widget(self, widget):
         self._render_widget = widget
+        self._dirty_rect = QtCore.QRect()
+        self._dirty_full = True
+
+    def watch_paint_events(self, widget=None):
+        # install eventFilter on _render_widget and its descendant widgets only,
+        # widgets added later are watched from their ChildAdded event
+        if widget is None:
+            widget = self._render_widget
+        widget.installEventFilter(self)
+        for child in widget.findChildren(QtCore.QObject):
+            if child.isWidgetType():
+                child.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        # collect the areas which Qt repaints, so that draw_display renders
+        # and sends only them (installed by watch_paint_events)
+        event_type = event.type()
+        if event_type == QT_EVENT_CHILD_ADDED:
+            child = event.child()
+            if child is not None and child.isWidgetType():
+                self.watch_paint_events(child)
+        elif event_type == QT_EVENT_PAINT and not self._rendering:
+            widget = self._render_widget
+            if widget is not None and (obj is widget or widget.isAncestorOf(obj)):
+                rect = event.rect()
+                if obj is not widget:
+                    rect.moveTopLeft(obj.mapTo(widget, rect.topLeft()))
+                self._dirty_rect = self._dirty_rect.united(rect)
+                self.schedule_draw_display()
+        return False
+
+    def schedule_draw_display(self):
+        # coalesce the paint events of one repaint of the window into one draw
+        if self._draw_scheduled:
+            return
+        self._draw_scheduled = True
+        QtCore.QTimer.singleShot(0, self._scheduled_draw_display)
+
+    def _scheduled_draw_display(self):
+        self._draw_scheduled = False
+        self.draw_display()
 
     def __init__(self, config):
         super().__init__()
@@ -123,11 +171,11 @@ class GUI_Qt_Base(QtCore.QObject):
         asyncio.run(self.config.start_coroutine(), loop_factory=qasync.QEventLoop)
 
 
-    def _grab_in_target_format(self):
+    def _grab_in_target_format(self, rows=None):
         """Grab current frame and convert only if format differs."""
         image = None
         if self._render_widget is not None and self.image_format is not None:
-            image = self._render_widget_to_image()
+            image = self._render_widget_to_image(rows)
         if image is None:
             image = self.grab_func
         if image is None:
@@ -138,7 +186,8 @@ class GUI_Qt_Base(QtCore.QObject):
             return image.convertToFormat(self.image_format)
         return image
 
-    def _render_widget_to_image(self):
+    def _render_widget_to_image(self, rows=None):
+        # rows: (start, end) to render into the kept QImage, None for the whole widget
         widget = self._render_widget
         if widget is None:
             return None
@@ -149,15 +198,27 @@ class GUI_Qt_Base(QtCore.QObject):
         resized = self._ensure_screen_image_capacity(width, height)
         if self.screen_image is None:
             return None
-        # clear previous frame to avoid blending old content when reusing QImage buffer
-        self.screen_image.fill(QT_COLOR_BLACK)
         painter = QtGui.QPainter()
         if not painter.begin(self.screen_image):
             painter.end()
             return None
-        widget.render(painter, QtCore.QPoint())
-        painter.end()
+        # clear previous frame to avoid blending old content when reusing QImage buffer
+        self._rendering = True
+        try:
+            if rows is None or resized:
+                painter.fillRect(self.screen_image.rect(), QT_COLOR_BLACK)
+                widget.render(painter, QtCore.QPoint())
+            else:
+                rect = QtCore.QRect(0, rows[0], width, rows[1] - rows[0])
+                painter.fillRect(rect, QT_COLOR_BLACK)
+                widget.render(
+                    painter, rect.topLeft(), QtGui.QRegion(rect)
+                )
+        finally:
+            self._rendering = False
+            painter.end()
         if resized:
+            self._dirty_full = True
             self._update_buffer_geometry(self.screen_image)
         return self.screen_image
 
@@ -237,9 +298,20 @@ class GUI_Qt_Base(QtCore.QObject):
             return
 
         # self.config.check_time("draw_display start")
-        p = self._grab_in_target_format()
+        rows = self._take_dirty_rows()
+        if direct_update:
+            # called right after a change, before Qt repaints it
+            rows = None
+        if rows is not None and rows[0] >= rows[1]:
+            # nothing was repainted
+            return
+        p = self._grab_in_target_format(rows)
         if p is None:
             return
+        if self._dirty_full:
+            # resized in _render_widget_to_image
+            self._dirty_full = False
+            rows = None
 
         # self.config.check_time("grab")
         ptr = p.constBits()
@@ -258,9 +330,29 @@ class GUI_Qt_Base(QtCore.QObject):
             strides=self._view_strides,
         )
 
-        self.config.display.update(buf, direct_update)
+        if rows is None:
+            self.config.display.update(buf, direct_update)
+        else:
+            self.config.display.update_rows(buf, direct_update, rows)
         # self.config.check_time("draw_display end")
 
+    def _take_dirty_rows(self):
+        """Return (start, end) rows repainted since the last draw, None for all.
+
+        The damaged rectangle is widened to full rows: the display is updated
+        by lines anyway.
+        """
+        if self._render_widget is None:
+            return None
+        rect = self._dirty_rect
+        self._dirty_rect = QtCore.QRect()
+        if self._dirty_full:
+            return None
+        if rect.isEmpty():
+            return (0, 0)
+        height = self._render_widget.height()
+        return (max(rect.top(), 0), min(rect.bottom() + 1, height))
+
     def show_popup(self, title, timeout=None, buzzer_sound="beep"):
         self._enqueue_msg(
             {
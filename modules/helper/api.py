@@ -20,28 +20,7 @@ from modules.helper.maptile import MapTileWithValues, get_headwind
 from modules.utils.geo import get_track_str
 from modules.app_logger import app_logger
 
-_IMPORT_GARMINCONNECT = False
-try:
-    from garth.exc import GarthHTTPError
-    import requests
-    from garminconnect import (
-        Garmin,
-        GarminConnectAuthenticationError,
-        GarminConnectConnectionError,
-        GarminConnectTooManyRequestsError,
-    )
-
-    _IMPORT_GARMINCONNECT = True
-except ImportError:
-    pass
-
-_IMPORT_STRAVA_COOKIE = False
-try:
-    from stravacookies import StravaCookieFetcher
-
-    _IMPORT_STRAVA_COOKIE = True
-except ImportError:
-    pass
+# garminconnect and stravacookies are imported on upload (slow to import at boot)
 
 _IMPORT_THINGSBOARD = False
 try:
@@ -649,7 +628,16 @@ class api:
             return False
 
         # import check
-        if not _IMPORT_GARMINCONNECT:
+        try:
+            from garth.exc import GarthHTTPError
+            import requests
+            from garminconnect import (
+                Garmin,
+                GarminConnectAuthenticationError,
+                GarminConnectConnectionError,
+                GarminConnectTooManyRequestsError,
+            )
+        except ImportError:
             app_logger.warning("Install garminconnect")
             return False
 
@@ -747,7 +735,9 @@ class api:
             return False
 
         # import check
-        if not _IMPORT_STRAVA_COOKIE:
+        try:
+            from stravacookies import StravaCookieFetcher
+        except ImportError:
             app_logger.warning("Install stravacookies")
             return
 
@@ -1131,3 +1121,7 @@ class api:
 
     async def get_altitude(self, pos):
         return await self.maptile_with_values.get_altitude_from_tile(pos)
+
+    # batch of points, from downloaded tiles only
+    def get_altitudes(self, lon, lat):
+        return self.maptile_with_values.get_altitudes(lon, lat)
@@ -0,0 +1,186 @@
+import asyncio
+import gc
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+
+from modules.app_logger import app_logger
+from modules.utils import perf
+
+REPORT_VERSION = 2
+PERCENTILES = (50, 90, 95, 99)
+
+
+def setup_benchmark(config):
+    """Switch config to the headless replay mode of --benchmark.
+
+    The GUI is gui_none, positions come from Dummy_GPS (the course, or the
+    BIKECOMPUTER_LOG of a copied log.db), loop intervals are divided by the
+    speed factor (an ANT+ capture of --ant_replay is replayed at that
+    speed) and network features are disabled so that runs compare.
+    """
+    settings = config.G_BENCHMARK
+    speed = max(float(settings["SPEED"]), 1.0)
+
+    config.G_GUI_MODE = "None"
+    config.G_DISPLAY = "None"
+    config.G_DUMMY_OUTPUT = True
+    config.G_HEADLESS = False
+    config.G_SENSOR_INTERVAL /= speed
+    config.G_GPS_INTERVAL /= speed
+    config.G_I2C_INTERVAL /= speed
+    config.G_I2C_GROUP_INTERVAL = {
+        k: v if v is None else v / speed for k, v in config.G_I2C_GROUP_INTERVAL.items()
+    }
+    config.G_LOGGING_INTERVAL /= speed
+    config.G_ANT_REPLAY["SPEED"] = speed
+    config.G_USE_WIND_DATA_SOURCE = False
+    config.G_THINGSBOARD_API["STATUS"] = False
+    config.G_MAP_PREFETCH["STATUS"] = False
+
+    # never write to the log of the rides
+    work_dir = tempfile.mkdtemp(prefix="bikecomputer_benchmark_")
+    log_db = os.path.join(work_dir, "log.db")
+    if settings["LOG_DB"]:
+        shutil.copy(settings["LOG_DB"], log_db)
+    config.G_LOG_DB = log_db
+    settings["WORK_DIR"] = work_dir
+
+
+def summarize(values):
+    if not len(values):
+        return {"count": 0}
+    values = np.asarray(values, dtype=np.float64)
+    summary = {
+        "count": int(len(values)),
+        "mean_ms": float(np.mean(values)),
+        "max_ms": float(np.max(values)),
+    }
+    for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f"p{p}_ms"] = float(v)
+    return summary
+
+
+class Benchmark:
+    """Drive the 1 Hz loop headless and write a JSON report.
+
+    Every observation of the perf registry (sensor.loop, logger.record,
+    sql.exec, ...) is kept as a sample of its stage; update_track is called
+    and timed here, as the map widget does in the GUI.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.settings = config.G_BENCHMARK
+        self.samples = defaultdict(list)
+
+    def record(self, stage, elapsed_ms):
+        self.samples[stage].append(elapsed_ms)
+
+    async def run(self):
+        try:
+            await self._run()
+        except Exception:
+            app_logger.exception("[benchmark] failed")
+        finally:
+            perf.registry.remove_listener(self.record)
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            await self.config.quit()
+
+    async def _run(self):
+        logger = self.config.logger
+        perf.registry.add_listener(self.record)
+
+        use_tracemalloc = self.settings["TRACEMALLOC"]
+        if use_tracemalloc:
+            tracemalloc.start()
+        gc_start = [s["collections"] for s in gc.get_stats()]
+        blocks_start = sys.getallocatedblocks()
+        rusage_start = resource.getrusage(resource.RUSAGE_SELF)
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+
+        if self.config.G_MANUAL_STATUS != "START":
+            logger.start_and_stop_manual()
+
+        duration = self.settings["DURATION"] / self.settings["SPEED"]
+        cursor = None
+        while time.perf_counter() - wall_start < duration:
+            await asyncio.sleep(self.config.G_LOGGING_INTERVAL)
+            with perf.timer("benchmark.update_track"):
+                cursor = logger.update_track(cursor)[0]
+        # write the pending rows by sql_worker, so that short runs have sql stages
+        await logger.flush_sql_queue()
+
+        wall_sec = time.perf_counter() - wall_start
+        cpu_sec = time.process_time() - cpu_start
+        rusage_end = resource.getrusage(resource.RUSAGE_SELF)
+        report = {
+            "version": REPORT_VERSION,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "replay": {
+                "source": "log" if len(logger.position_log) else "course",
+                "duration_sec": self.settings["DURATION"],
+                "speed": self.settings["SPEED"],
+                "wall_sec": wall_sec,
+            },
+            "cpu": {
+                "process_sec": cpu_sec,
+                "user_sec": rusage_end.ru_utime - rusage_start.ru_utime,
+                "system_sec": rusage_end.ru_stime - rusage_start.ru_stime,
+                "percent": 100.0 * cpu_sec / wall_sec if wall_sec else 0.0,
+            },
+            "memory": {
+                # [KB] on linux
+                "max_rss_kb": rusage_end.ru_maxrss,
+                "allocated_blocks_delta": sys.getallocatedblocks() - blocks_start,
+                "gc_collections": [
+                    s["collections"] - c for s, c in zip(gc.get_stats(), gc_start)
+                ],
+            },
+            "stages": {k: summarize(v) for k, v in sorted(self.samples.items())},
+        }
+        if use_tracemalloc:
+            current, peak = tracemalloc.get_traced_memory()
+            report["memory"]["traced_current_kb"] = current // 1024
+            report["memory"]["traced_peak_kb"] = peak // 1024
+            report["memory"]["top_allocations"] = [
+                {"where": str(s.traceback), "size_kb": s.size // 1024, "count": s.count}
+                for s in tracemalloc.take_snapshot().statistics("lineno")[:10]
+            ]
+            tracemalloc.stop()
+
+        self.write_report(report)
+
+    def write_report(self, report):
+        path = self.settings["REPORT"]
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+        app_logger.info(f"[benchmark] report: {path}")
+        for stage, s in report["stages"].items():
+            if not s["count"]:
+                continue
+            app_logger.info(
+                f"[benchmark] {stage:<24} n={s['count']} "
+                f"p50={s['p50_ms']:.2f} p95={s['p95_ms']:.2f} max={s['max_ms']:.2f} [ms]"
+            )
+        app_logger.info(
+            f"[benchmark] cpu={report['cpu']['percent']:.1f}% "
+            f"max_rss={report['memory']['max_rss_kb']}KB"
+        )
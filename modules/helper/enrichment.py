@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+import numpy as np
+
+from modules.app_logger import app_logger
+from modules.helper.maptile import get_headwind
+from modules.utils import perf
+
+# [s] a DEM altitude older than this is dropped (the position has moved on)
+DEM_MAX_AGE = 30.0
+# [s] the wind is kept for 2 intervals of the data source
+WIND_MAX_AGE_FACTOR = 2
+
+
+class Enrichment:
+    """DEM altitude and wind of the current position, looked up in background tasks.
+
+    The sensor loop calls update() with the position and reads the latest
+    results with their age (stale-while-revalidate): a lookup is started
+    when the previous one has finished, and is never awaited by the loop,
+    so a tile download, a PNG decode or an Open-Meteo request only delays
+    its own result.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._alt_task = None
+        self._wind_task = None
+        self._perf_api_alt = perf.histogram("sensor.api_alt")
+        self._perf_api_wind = perf.histogram("sensor.api_wind")
+        self.reset()
+
+    def reset(self):
+        self.dem_altitude = np.nan
+        self.dem_altitude_time = None
+        # wind speed [m/s], direction [deg] and its string
+        self.wind = (np.nan, np.nan, None)
+        self.wind_time = None
+
+    def quit(self):
+        for task in (self._alt_task, self._wind_task):
+            if task is not None and not task.done():
+                task.cancel()
+
+    def update(self, lon, lat):
+        if np.isnan(lon) or np.isnan(lat):
+            return
+        pos = [lon, lat]
+        if self.config.G_USE_DEM_TILE and (
+            self._alt_task is None or self._alt_task.done()
+        ):
+            self._alt_task = asyncio.create_task(self._update_altitude(pos))
+        if self.config.G_USE_WIND_DATA_SOURCE and (
+            self._wind_task is None or self._wind_task.done()
+        ):
+            self._wind_task = asyncio.create_task(self._update_wind(pos))
+
+    async def _update_altitude(self, pos):
+        try:
+            with perf.PerfTimer(self._perf_api_alt):
+                altitude = await self.config.api.get_altitude(pos)
+        except Exception as exc:
+            app_logger.error(f"[Enrichment] altitude: {exc}")
+            return
+        if not np.isnan(altitude):
+            self.dem_altitude = altitude
+            self.dem_altitude_time = time.monotonic()
+
+    async def _update_wind(self, pos):
+        try:
+            with perf.PerfTimer(self._perf_api_wind):
+                w_spd, w_dir, w_dir_str, _ = await self.config.api.get_wind(pos)
+        except Exception as exc:
+            app_logger.error(f"[Enrichment] wind: {exc}")
+            return
+        if not np.isnan(w_spd) and not np.isnan(w_dir):
+            self.wind = (w_spd, w_dir, w_dir_str)
+            self.wind_time = time.monotonic()
+
+    @staticmethod
+    def _age(t, now):
+        return np.nan if t is None else now - t
+
+    def get_altitude(self, now):
+        """Return (dem_altitude, age [s]), nan if there is none or it is too old."""
+        age = self._age(self.dem_altitude_time, now)
+        if not age <= DEM_MAX_AGE:
+            return np.nan, age
+        return self.dem_altitude, age
+
+    def get_wind(self, track, now):
+        """Return (wind_speed, wind_direction, wind_direction_str, headwind, age [s])."""
+        age = self._age(self.wind_time, now)
+        max_age = WIND_MAX_AGE_FACTOR * self.config.G_OPENMETEO_API["INTERVAL_SEC"]
+        if not age <= max_age:
+            return np.nan, np.nan, None, np.nan, age
+        w_spd, w_dir, w_dir_str = self.wind
+        return w_spd, w_dir, w_dir_str, get_headwind(w_spd, w_dir, track), age
@@ -17,6 +17,7 @@ from modules.utils.map import (
     get_tilexy_and_xy_in_tile,
 )
 from modules.app_logger import app_logger
+from modules.utils.tile_cache import TileBitmapCache
 
 SCW_WIND_SPEED_ARROW = np.array([
     [190,   0, 180], #   0~1[m/s]
@@ -537,6 +538,32 @@ def get_wind_with_tile_xy(img_files, x_in_tile, y_in_tile, tilesize, tiles_cond,
     return wind_speed, wind_direction, image, im_array
 
 
+def decode_dem_array(rgb, map_name):
+    """Decode the RGB (h, w, 3) of a DEM tile to altitude [m], nan for no data."""
+    rgb = rgb[..., :3].astype(np.int64)
+    value = (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+
+    if map_name.startswith("jpn_kokudo_chiri_in_DEM"):
+        altitude = np.where(value < (1 << 23), value, value - (1 << 24)) * 0.01
+        altitude[value == (1 << 23)] = np.nan
+    elif map_name.startswith("mapbox_terrain"):
+        altitude = -10000 + (value * 0.1)
+    elif map_name.startswith("mapterhorn"):
+        altitude = (value / 256.0) - 32768.0
+    else:
+        altitude = np.full(value.shape, np.nan)
+    return altitude.astype(np.float32)
+
+
+def get_pixel_xy_array(z, lon, lat, tile_size):
+    """Vectorized get_tilexy_and_xy_in_tile: global pixel coordinates (float)."""
+    n = 2.0**z * tile_size
+    lat_r = np.radians(lat)
+    x = (np.asarray(lon) + 180.0) / 360.0 * n
+    y = (1.0 - np.log(np.tan(lat_r) + (1.0 / np.cos(lat_r))) / np.pi) / 2.0 * n
+    return x, y
+
+
 class MapTileWithValues():
     config = None
 
@@ -554,15 +581,16 @@ class MapTileWithValues():
     
     # for jpn_kokudo_chiri_in_DEM~
     pre_alt_map_name = None
-    pre_alt_tile_xy = (np.nan, np.nan, np.nan)
-    pre_alt_xy_in_tile = (np.nan, np.nan, np.nan)
-    pre_altitude = np.nan
-    dem_array = None
+    # decoded altitude [m] of DEM tiles, (map_name, z, tile_x, tile_y): array
+    dem_cache = None
+    # 16 tiles of 256px (a few km around at z15)
+    DEM_CACHE_BYTES = 16 * 256 * 256 * 4
 
     get_scw_lock = False
 
     def __init__(self, config):
         self.config = config
+        self.dem_cache = TileBitmapCache(self.DEM_CACHE_BYTES)
 
     @property
     def network(self):
@@ -592,23 +620,6 @@ class MapTileWithValues():
                 tiles.append([tile_x + x_delta - 1, tile_y + y_delta - 1])
         return tiles
 
-    @staticmethod
-    def _decode_dem_altitude(rgb_pos, map_name):
-        r, g, b = int(rgb_pos[0]), int(rgb_pos[1]), int(rgb_pos[2])
-        value = (r << 16) | (g << 8) | b
-
-        if map_name.startswith("jpn_kokudo_chiri_in_DEM"):
-            if value < (1 << 23):
-                return round(value * 0.01, 1)
-            if value == (1 << 23):
-                return np.nan
-            return round((value - (1 << 24)) * 0.01, 1)
-        if map_name.startswith("mapbox_terrain"):
-            return round(-10000 + (value * 0.1), 1)
-        if map_name.startswith("mapterhorn"):
-            return round((value / 256.0) - 32768.0, 1)
-        return np.nan
-
     def check_existing_tiles(self, filename):
         return self.existing_tiles.get(filename, False)
 
@@ -1017,37 +1028,7 @@ class MapTileWithValues():
         if self.pre_alt_map_name != map_name:
             # Reset altitude cache when DEM source changes.
             self.pre_alt_map_name = map_name
-            self.pre_alt_tile_xy = (np.nan, np.nan, np.nan)
-            self.pre_alt_xy_in_tile = (np.nan, np.nan, np.nan)
-            self.pre_altitude = np.nan
-            self.dem_array = None
-
-        pre_zoom = self.pre_alt_tile_xy[2]
-        if not np.isnan(pre_zoom):
-            cached_zoom = int(pre_zoom)
-            tile_x, tile_y, x_in_tile, y_in_tile = get_tilexy_and_xy_in_tile(
-                cached_zoom, *pos, map_settings["tile_size"]
-            )
-            if (
-                self.pre_alt_tile_xy == (tile_x, tile_y, cached_zoom)
-                and self.pre_alt_xy_in_tile == (x_in_tile, y_in_tile, cached_zoom)
-            ):
-                return self.pre_altitude
-            if (
-                self.pre_alt_tile_xy == (tile_x, tile_y, cached_zoom)
-                and self.dem_array is not None
-                and y_in_tile >= 0
-                and x_in_tile >= 0
-                and y_in_tile < self.dem_array.shape[0]
-                and x_in_tile < self.dem_array.shape[1]
-            ):
-                altitude = self._decode_dem_altitude(
-                    self.dem_array[y_in_tile, x_in_tile],
-                    map_name,
-                )
-                self.pre_alt_xy_in_tile = (x_in_tile, y_in_tile, cached_zoom)
-                self.pre_altitude = altitude
-                return altitude
+            self.dem_cache.clear()
 
         zoom_candidates = [z, z - 1, z - 2]
         zoom_candidates = [zoom for zoom in zoom_candidates if zoom >= 0]
@@ -1059,29 +1040,101 @@ class MapTileWithValues():
                 map_config_for_zoom[map_name] = map_settings.copy()
                 map_config_for_zoom[map_name]["url"] = map_settings["retry_url"]
 
-            tile_x, tile_y, x_in_tile, y_in_tile = get_tilexy_and_xy_in_tile(
+            tile_x, tile_y, _, _ = get_tilexy_and_xy_in_tile(
                 zoom, *pos, map_settings["tile_size"]
             )
-            tiles = [(tile_x, tile_y), ]
-            await self.download_maptiles(tiles, map_config_for_zoom, map_name, zoom)
+            if self.dem_cache.get((map_name, zoom, tile_x, tile_y)) is None:
+                tiles = [(tile_x, tile_y), ]
+                await self.download_maptiles(tiles, map_config_for_zoom, map_name, zoom)
+
+                filename = get_maptile_filename(map_name, zoom, tile_x, tile_y, map_config_for_zoom[map_name])
+                if not self.check_existing_tiles(filename):
+                    if self.network.get_file_download_status(filename) == 404:
+                        continue
+                    return np.nan
+
+            # get altitude (neighbor tiles are used if they are already downloaded)
+            altitude = self.get_altitudes(
+                [pos[0]], [pos[1]], map_config=map_config_for_zoom, zoom=zoom
+            )[0]
+            # app_logger.info(f"{altitude}m, {tile_x}, {tile_y}, {pos}")
+            return altitude
 
-            filename = get_maptile_filename(map_name, zoom, tile_x, tile_y, map_config_for_zoom[map_name])
-            if not self.check_existing_tiles(filename):
-                if self.network.get_file_download_status(filename) == 404:
-                    continue
-                return np.nan
+        return np.nan
 
-            # get altitude
-            self.dem_array = np.asarray(Image.open(filename))
-            altitude = self._decode_dem_altitude(
-                self.dem_array[y_in_tile, x_in_tile],
-                map_name,
-            )
+    def get_dem_array(self, map_name, zoom, tile_x, tile_y, map_settings):
+        key = (map_name, zoom, tile_x, tile_y)
+        dem_array = self.dem_cache.get(key)
+        if dem_array is not None:
+            return dem_array
+        filename = get_maptile_filename(map_name, zoom, tile_x, tile_y, map_settings)
+        if not os.path.exists(filename):
+            return None
+        try:
+            with Image.open(filename) as image:
+                dem_array = decode_dem_array(
+                    np.asarray(image.convert("RGB")), map_name
+                )
+        except (OSError, ValueError) as e:
+            app_logger.warning(f"Could not read DEM tile {filename}: {e}")
+            return None
+        self.dem_cache.put(key, dem_array)
+        return dem_array
 
-            # app_logger.info(f"{altitude}m, {filename}, {x_in_tile}, {x_in_tile}, {pos}")
-            self.pre_alt_tile_xy = (tile_x, tile_y, zoom)
-            self.pre_alt_xy_in_tile = (x_in_tile, y_in_tile, zoom)
-            self.pre_altitude = altitude
-            return altitude
+    def get_altitudes(self, lon, lat, map_config=None, zoom=None):
+        """Return the altitudes [m] of points from downloaded DEM tiles.
 
-        return np.nan
+        Altitudes are bilinear interpolated between the 4 nearest pixel
+        centers (also across tiles); pixels of missing tiles are left out
+        and points without any are nan. Nothing is downloaded.
+        """
+        if map_config is None:
+            map_config = self.config.G_DEM_MAP_CONFIG
+        map_name = self.config.G_DEM_MAP
+        map_settings = map_config[map_name]
+        tile_size = map_settings["tile_size"]
+        if zoom is None:
+            zoom = map_settings["fix_zoomlevel"]
+
+        x, y = get_pixel_xy_array(zoom, lon, lat, tile_size)
+        x = np.nan_to_num(x, nan=-1.0) - 0.5
+        y = np.nan_to_num(y, nan=-1.0) - 0.5
+        x0 = np.floor(x)
+        y0 = np.floor(y)
+        fx = x - x0
+        fy = y - y0
+
+        # 4 corners: (dx, dy, weight)
+        px = (np.stack([x0, x0 + 1, x0, x0 + 1])).astype(np.int64)
+        py = (np.stack([y0, y0, y0 + 1, y0 + 1])).astype(np.int64)
+        weight = np.stack(
+            [(1 - fx) * (1 - fy), fx * (1 - fy), (1 - fx) * fy, fx * fy]
+        )
+        value = np.full(px.shape, np.nan)
+
+        tile_x, x_in_tile = np.divmod(px, tile_size)
+        tile_y, y_in_tile = np.divmod(py, tile_size)
+        tiles, inverse = np.unique(
+            np.stack([tile_x.ravel(), tile_y.ravel()]), axis=1, return_inverse=True
+        )
+        inverse = inverse.reshape(px.shape)
+        for i, (t_x, t_y) in enumerate(tiles.T):
+            dem_array = self.get_dem_array(
+                map_name, zoom, int(t_x), int(t_y), map_settings
+            )
+            if dem_array is None:
+                continue
+            m = (
+                (inverse == i)
+                & (y_in_tile < dem_array.shape[0])
+                & (x_in_tile < dem_array.shape[1])
+            )
+            value[m] = dem_array[y_in_tile[m], x_in_tile[m]]
+
+        valid = ~np.isnan(value)
+        weight = np.where(valid, weight, 0.0)
+        weight_sum = weight.sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            altitude = (np.where(valid, value, 0.0) * weight).sum(axis=0) / weight_sum
+        altitude[weight_sum <= 0] = np.nan
+        return np.round(altitude, 1)
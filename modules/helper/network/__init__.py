@@ -1,6 +1,7 @@
 from ..bluetooth.bluetooth_manager import BluetoothManager, BtOpenResult
 from .download_manager import DownloadManager
 from .http_client import get_bytes, get_json, post
+from .tile_prefetcher import TilePrefetcher
 from .wifi_manager import WifiManager
 from modules.utils.network import detect_network
 
@@ -18,6 +19,7 @@ class Network:
             self.bt_open_block_duration_sec,
         )
         self.wifi = WifiManager(config)
+        self.tile_prefetcher = TilePrefetcher(config, self._downloads)
 
     def set_bt_open_block_duration(self, seconds):
         self.bt_open_block_duration_sec = seconds
@@ -29,6 +31,7 @@ class Network:
         return await self._downloads.put(queue_item)
 
     async def quit(self):
+        await self.tile_prefetcher.shutdown()
         await self._downloads.shutdown()
         await self.bluetooth.shutdown()
 
@@ -56,6 +59,9 @@ class Network:
     def get_file_download_status(self, filename):
         return self._downloads.get_file_download_status(filename)
 
+    def add_download_listener(self, listener):
+        self._downloads.add_download_listener(listener)
+
     async def download_maptiles(self, *args, **kwargs):
         return await self._downloads.download_maptiles(*args, **kwargs)
 
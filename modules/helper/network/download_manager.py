@@ -14,12 +14,15 @@ class DownloadManager:
         self.config = config
         self.bluetooth = bluetooth_manager
         self.file_download_status = {}
+        # called with the save paths of each block of finished downloads
+        self._download_listeners = []
         self._download_queue = asyncio.Queue()
         self._download_queue_block_until = 0.0
         self._queue_block_duration_sec = queue_block_duration_sec
         self._dns_retry_base_delay_sec = 15
         self._dns_retry_max_delay_sec = 120
         self._dns_retry_max_attempts = 3
+        self._worker_busy = False
         self._worker_task = asyncio.create_task(self._download_worker())
 
     async def shutdown(self):
@@ -30,6 +33,9 @@ class DownloadManager:
     def get_file_download_status(self, filename):
         return self.file_download_status.get(filename)
 
+    def add_download_listener(self, listener):
+        self._download_listeners.append(listener)
+
     async def download_maptiles(self, map_config, map_name, z, tiles, additional_download=False):
         # Skip queueing if there is no connectivity path available.
         if not self.config.network.check_network_with_bt_tethering():
@@ -155,20 +161,28 @@ class DownloadManager:
             return None
 
         results = await download_files(**queue_item, limit=self.bluetooth.get_bt_limit())
+        downloaded = []
         for status, save_path in zip(results, queue_item["save_paths"]):
             self.file_download_status[save_path] = status
+            if status == 200:
+                downloaded.append(save_path)
+        if downloaded:
+            for listener in self._download_listeners:
+                listener(downloaded)
         return results
 
     async def _download_worker(self):
         caller_name = self._download_worker.__name__
 
         while True:
+            self._worker_busy = False
             if self._download_queue.qsize() == 0:
                 await self.bluetooth.close_bt_tethering(caller_name)
             queue_item = await self._download_queue.get()
             if queue_item is None:
                 self._download_queue.task_done()
                 break
+            self._worker_busy = True
 
             retry_count = queue_item.get("retry_count", 0)
 
@@ -227,6 +241,14 @@ class DownloadManager:
         await self._download_queue.put(queue_item)
         return True
 
+    def is_idle(self):
+        """True if nothing is queued or downloading and the queue is not blocked."""
+        return (
+            not self._worker_busy
+            and self._download_queue.empty()
+            and not self._is_download_queue_blocked()
+        )
+
     def _start_download_queue_block(self, duration=None):
         loop = asyncio.get_running_loop()
         duration = duration or self._queue_block_duration_sec
@@ -0,0 +1,208 @@
+import asyncio
+import math
+import os
+import time
+
+import numpy as np
+
+from modules.app_logger import app_logger
+from modules.utils.geo import G_DISTANCE_BY_LAT1S
+from modules.utils.map import get_maptile_filename, get_tilexy_and_xy_in_tile
+
+# [m] per degree of latitude
+METER_PER_DEG_LAT = G_DISTANCE_BY_LAT1S * 3600
+# [m] equatorial length of the web mercator world
+EARTH_CIRCUMFERENCE = 40075016.686
+
+
+class TilePrefetcher:
+    """Download map tiles ahead of the rider while the network is idle.
+
+    Look-ahead points are taken from the course ahead of CourseIndex.value, or
+    projected along the GPS track when no course is followed. Tiles around
+    them are queued for the maps and zoom levels recently drawn, only when
+    the download queue is empty, within a byte budget per boot.
+    """
+
+    # [sec] views not drawn for this long are not prefetched
+    VIEW_EXPIRE_SEC = 120
+    # [byte] tile size assumed until prefetched tiles are measured
+    DEFAULT_TILE_BYTES = 20 * 1024
+    # [m/s] slower than this, the GPS track is not projected
+    MIN_SPEED = 1.5
+    # max tiles per queue item
+    BATCH_SIZE = 8
+
+    def __init__(self, config, download_manager):
+        self.config = config
+        self.downloads = download_manager
+        # map_name: (map_config, z, last drawn time)
+        self.views = {}
+        # prefetched file path: measured size (None if not downloaded yet)
+        self.prefetched = {}
+        self.measured_bytes = 0
+        self.measured_n = 0
+        self._task = None
+        if self.config.G_MAP_PREFETCH["STATUS"]:
+            self._task = asyncio.create_task(self._prefetch_worker())
+
+    async def shutdown(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def set_view(self, map_config, map_name, z):
+        map_settings = map_config.get(map_name, {})
+        if map_settings.get("use_mbtiles") or "basetime" in map_settings:
+            # offline maps and time-varying overlays are not prefetched
+            return
+        self.views[map_name] = (map_config, z, time.monotonic())
+
+    def get_used_bytes(self):
+        pending_n = 0
+        file_download_status = self.downloads.file_download_status
+        for path, size in list(self.prefetched.items()):
+            if size is not None:
+                continue
+            if os.path.exists(path):
+                size = os.path.getsize(path)
+                self.prefetched[path] = size
+                self.measured_bytes += size
+                self.measured_n += 1
+            elif path in file_download_status:
+                # the download has finished without a file (404, offline, ...)
+                del self.prefetched[path]
+            else:
+                pending_n += 1
+        if self.measured_n:
+            tile_bytes = self.measured_bytes / self.measured_n
+        else:
+            tile_bytes = self.DEFAULT_TILE_BYTES
+        return self.measured_bytes + pending_n * tile_bytes
+
+    def is_budget_exceeded(self):
+        budget = self.config.G_MAP_PREFETCH["BYTE_BUDGET_MB"] * 1024 * 1024
+        return self.get_used_bytes() >= budget
+
+    async def _prefetch_worker(self):
+        interval = self.config.G_MAP_PREFETCH["INTERVAL_SEC"]
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.prefetch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # keep the loop alive on unexpected errors
+                app_logger.warning(f"tile prefetch failed: {e}")
+
+    async def prefetch(self):
+        now = time.monotonic()
+        for map_name in [
+            k for k, v in self.views.items() if now - v[2] > self.VIEW_EXPIRE_SEC
+        ]:
+            del self.views[map_name]
+        if not self.views or not self.downloads.is_idle():
+            return False
+        if self.is_budget_exceeded():
+            return False
+        if not self.config.network.check_network_with_bt_tethering():
+            return False
+
+        lon, lat = self.get_lookahead_points()
+        if not len(lon):
+            return False
+
+        maptile_with_values = self.config.api.maptile_with_values
+        queued = False
+        for map_name, (map_config, z, _) in list(self.views.items()):
+            tiles = self.get_missing_tiles(map_config, map_name, z, lon, lat)
+            for i in range(0, len(tiles), self.BATCH_SIZE):
+                # low priority: stop as soon as regular downloads are queued
+                if not self.downloads.is_idle() and queued:
+                    return True
+                if self.is_budget_exceeded():
+                    return queued
+                batch = tiles[i : i + self.BATCH_SIZE]
+                await maptile_with_values.download_maptiles(
+                    batch, map_config, map_name, z
+                )
+                map_settings = map_config[map_name]
+                for tile in batch:
+                    filename = get_maptile_filename(map_name, z, *tile, map_settings)
+                    if filename not in maptile_with_values.existing_tiles:
+                        # failed to queue (network is blocked)
+                        return queued
+                    self.prefetched.setdefault(filename, None)
+                queued = True
+        return queued
+
+    def get_missing_tiles(self, map_config, map_name, z, lon, lat):
+        map_settings = map_config[map_name]
+        tile_size = map_settings["tile_size"]
+        existing_tiles = self.config.api.maptile_with_values.existing_tiles
+        max_tile = 2**z - 1
+        tiles = {}
+        for x, y in zip(lon, lat):
+            tile_x, tile_y, _, _ = get_tilexy_and_xy_in_tile(z, x, y, tile_size)
+            # the screen around the point, nearest tiles first
+            for dx, dy in ((0, 0), (-1, 0), (1, 0), (0, -1), (0, 1),
+                           (-1, -1), (1, -1), (-1, 1), (1, 1)):
+                tile = (tile_x + dx, tile_y + dy)
+                if tile in tiles or not (
+                    0 <= tile[0] <= max_tile and 0 <= tile[1] <= max_tile
+                ):
+                    continue
+                filename = get_maptile_filename(map_name, z, *tile, map_settings)
+                tiles[tile] = not (
+                    filename in existing_tiles or os.path.exists(filename)
+                )
+        return [tile for tile, missing in tiles.items() if missing]
+
+    def get_lookahead_points(self):
+        distance = self.config.G_MAP_PREFETCH["DISTANCE"] * 1000  # [m]
+        course = self.config.logger.course
+        if course.is_set and course.index.on_course_status:
+            return self.get_course_points(course, distance)
+
+        gps = self.config.logger.sensor.values["GPS"]
+        speed = gps["speed"]
+        if np.isnan(speed) or speed < self.MIN_SPEED:
+            return np.array([]), np.array([])
+        distance = min(distance, speed * self.config.G_MAP_PREFETCH["HORIZON_SEC"])
+        return self.get_track_points(gps["lon"], gps["lat"], gps["track"], distance)
+
+    def get_step(self, lat):
+        # [m] half the smallest tile of the views, so that no tile is skipped
+        z = max(v[1] for v in self.views.values())
+        tile_m = EARTH_CIRCUMFERENCE * math.cos(math.radians(lat)) / 2**z
+        return max(tile_m / 2, 10.0)
+
+    def get_course_points(self, course, distance):
+        start = max(course.index.value, 0)
+        dist = course.distance[start:] * 1000  # [km] -> [m]
+        if len(dist) < 2:
+            return np.array([]), np.array([])
+        step = self.get_step(course.latitude[start])
+        d = np.arange(dist[0], min(dist[-1], dist[0] + distance), step)
+        lon = np.interp(d, dist, course.longitude[start:])
+        lat = np.interp(d, dist, course.latitude[start:])
+        return lon, lat
+
+    def get_track_points(self, lon, lat, track, distance):
+        if np.any(np.isnan([lon, lat, track])):
+            return np.array([]), np.array([])
+        d = np.arange(0, distance, self.get_step(lat))
+        rad = np.radians(track)
+        lat_ahead = lat + d * np.cos(rad) / METER_PER_DEG_LAT
+        lon_ahead = lon + d * np.sin(rad) / (
+            METER_PER_DEG_LAT * max(math.cos(math.radians(lat)), 0.01)
+        )
+        return lon_ahead, lat_ahead
+
+
+__all__ = ["TilePrefetcher"]
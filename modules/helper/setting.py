@@ -99,6 +99,16 @@ class Setting:
                 self.config.G_USE_DEM_TILE = c.getboolean("USE_DEM_TILE")
             if "DEM_MAP" in c:
                 self.config.G_DEM_MAP = c["DEM_MAP"]
+            if "MAP_PREFETCH" in c:
+                self.config.G_MAP_PREFETCH["STATUS"] = c.getboolean("MAP_PREFETCH")
+            if "MAP_PREFETCH_DISTANCE" in c:
+                self.config.G_MAP_PREFETCH["DISTANCE"] = c.getfloat(
+                    "MAP_PREFETCH_DISTANCE"
+                )
+            if "MAP_PREFETCH_BYTE_BUDGET_MB" in c:
+                self.config.G_MAP_PREFETCH["BYTE_BUDGET_MB"] = c.getint(
+                    "MAP_PREFETCH_BYTE_BUDGET_MB"
+                )
 
         if "POWER" in self.config_parser:
             if "CP" in self.config_parser["POWER"]:
@@ -221,6 +231,10 @@ class Setting:
                 self.config.G_GPS_UBLOX["POWER_SAVE"] = c.getboolean("USE_POWER_SAVE")
             if "USE_QZSS_DCR" in c:
                 self.config.G_GPS_UBLOX["QZSS_DCR"] = c.getboolean("USE_QZSS_DCR")
+            if "NAV_RATE" in c:
+                self.config.G_GPS_UBLOX["NAV_RATE"] = c.getint("NAV_RATE")
+            if "USE_FIX_FILTER" in c:
+                self.config.G_GPS_UBLOX["FIX_FILTER"] = c.getboolean("USE_FIX_FILTER")
             tx_ready = self.config.G_GPS_UBLOX["TX_READY"]
             if "USE_TX_READY" in c:
                 tx_ready["STATUS"] = c.getboolean("USE_TX_READY")
@@ -307,12 +321,18 @@ class Setting:
         c["WIND_DATA_SOURCE"] = self.config.G_WIND_DATA_SOURCE
         c["USE_DEM_TILE"] = str(self.config.G_USE_DEM_TILE)
         c["DEM_MAP"] = self.config.G_DEM_MAP
+        c["MAP_PREFETCH"] = str(self.config.G_MAP_PREFETCH["STATUS"])
+        c["MAP_PREFETCH_DISTANCE"] = str(self.config.G_MAP_PREFETCH["DISTANCE"])
+        c["MAP_PREFETCH_BYTE_BUDGET_MB"] = str(
+            self.config.G_MAP_PREFETCH["BYTE_BUDGET_MB"]
+        )
 
         self.config_parser["POWER"] = {}
         self.config_parser["POWER"]["CP"] = str(int(self.config.G_POWER_CP))
         self.config_parser["POWER"]["W_PRIME"] = str(int(self.config.G_POWER_W_PRIME))
 
-        if not self.config.G_DUMMY_OUTPUT:
+        # the pairing of a replay is not saved
+        if not self.config.G_DUMMY_OUTPUT and not self.config.G_ANT_REPLAY["FILE"]:
             self.config_parser["ANT"] = {}
             c = self.config_parser["ANT"]
             c["STATUS"] = str(self.config.G_ANT["STATUS"])
@@ -361,6 +381,8 @@ class Setting:
         c["assistnow_ztp_token"] = self.config.G_GPS_UBLOX["ASSISTNOW"]["ZTP_TOKEN"]
         c["use_power_save"] = str(self.config.G_GPS_UBLOX["POWER_SAVE"])
         c["use_qzss_dcr"] = str(self.config.G_GPS_UBLOX["QZSS_DCR"])
+        c["nav_rate"] = str(self.config.G_GPS_UBLOX["NAV_RATE"])
+        c["use_fix_filter"] = str(self.config.G_GPS_UBLOX["FIX_FILTER"])
         tx_ready = self.config.G_GPS_UBLOX["TX_READY"]
         c["use_tx_ready"] = str(tx_ready["STATUS"])
         c["tx_ready_gpio"] = "" if tx_ready["GPIO"] is None else str(tx_ready["GPIO"])
@@ -1,2 +1,4 @@
+from .fit import FitLoader  # noqa
+from .gpx import GpxLoader  # noqa
 from .json import JsonLoader  # noqa
 from .tcx import TcxLoader  # noqa
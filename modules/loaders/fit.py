@@ -0,0 +1,268 @@
+import os
+import struct
+
+import numpy as np
+
+from modules.app_logger import app_logger
+from .base import LoaderBase
+
+# base type: (struct format, invalid value)
+BASE_TYPES = {
+    0x00: ("B", 0xFF),  # enum
+    0x01: ("b", 0x7F),  # sint8
+    0x02: ("B", 0xFF),  # uint8
+    0x83: ("h", 0x7FFF),  # sint16
+    0x84: ("H", 0xFFFF),  # uint16
+    0x85: ("i", 0x7FFFFFFF),  # sint32
+    0x86: ("I", 0xFFFFFFFF),  # uint32
+    0x07: ("s", None),  # string
+    0x8B: ("H", 0),  # uint16z
+    0x8C: ("I", 0),  # uint32z
+}
+
+# global message number: {field number: name}
+MESSAGES = {
+    # course
+    31: {5: "name"},
+    # record
+    20: {
+        0: "position_lat",
+        1: "position_long",
+        2: "altitude",
+        5: "distance",
+        78: "enhanced_altitude",
+    },
+    # course_point
+    32: {
+        2: "position_lat",
+        3: "position_long",
+        4: "distance",
+        5: "type",
+        6: "name",
+    },
+}
+
+# https://developer.garmin.com/fit/file-types/course/
+COURSE_POINT_TYPES = [
+    "Generic",
+    "Summit",
+    "Valley",
+    "Water",
+    "Food",
+    "Danger",
+    "Left",
+    "Right",
+    "Straight",
+    "First Aid",
+    "4th Category",
+    "3rd Category",
+    "2nd Category",
+    "1st Category",
+    "Hors Category",
+    "Sprint",
+    "Left Fork",
+    "Right Fork",
+    "Middle Fork",
+    "Slight Left",
+    "Sharp Left",
+    "Slight Right",
+    "Sharp Right",
+    "U-Turn",
+    "Segment Start",
+    "Segment End",
+]
+
+SEMICIRCLE_TO_DEGREE = 180 / 2**31
+
+
+class FitDefinition:
+    """Decoder of the data messages of a local message type.
+
+    The fields of MESSAGES are unpacked with one precompiled struct, the
+    other fields are skipped as padding.
+    """
+
+    __slots__ = ("global_num", "struct", "names", "invalid")
+
+    def __init__(self, global_num, endian, fields, dev_size):
+        self.global_num = global_num
+        wanted = MESSAGES.get(global_num, {})
+        fmt = [endian]
+        self.names = []
+        self.invalid = []
+        for num, size, base_type in fields:
+            code, invalid = BASE_TYPES.get(base_type, (None, None))
+            if num not in wanted or code is None:
+                fmt.append(f"{size}x")
+            elif code == "s":
+                fmt.append(f"{size}s")
+            elif struct.calcsize(code) == size:
+                fmt.append(code)
+            else:
+                # arrays are not used
+                fmt.append(f"{size}x")
+                continue
+            if num in wanted and code is not None:
+                self.names.append(wanted[num])
+                self.invalid.append(invalid)
+        if dev_size:
+            fmt.append(f"{dev_size}x")
+        self.struct = struct.Struct("".join(fmt))
+
+    def unpack(self, data, offset):
+        values = {}
+        for name, invalid, value in zip(
+            self.names, self.invalid, self.struct.unpack_from(data, offset)
+        ):
+            if isinstance(value, bytes):
+                value = value.split(b"\0", 1)[0].decode("utf-8", "replace")
+            elif value == invalid:
+                continue
+            values[name] = value
+        return values
+
+
+class FitLoader(LoaderBase):
+    @classmethod
+    def load_file(cls, file):
+        if not os.path.exists(file):
+            return None, None
+        app_logger.info(f"[{cls.__name__}]: loading {file}")
+
+        course = cls.create_course()
+        course_points = cls.create_course_points()
+
+        try:
+            records, points = cls.parse(file, course["info"])
+        except (ValueError, struct.error) as e:
+            app_logger.error(f"Could not parse course: {e}")
+            return cls.reset_invalid_course_data()
+
+        records = [r for r in records if "position_lat" in r and "position_long" in r]
+        course["latitude"] = (
+            np.array([r["position_lat"] for r in records], dtype=np.float64)
+            * SEMICIRCLE_TO_DEGREE
+        )
+        course["longitude"] = (
+            np.array([r["position_long"] for r in records], dtype=np.float64)
+            * SEMICIRCLE_TO_DEGREE
+        )
+        altitude = np.array(
+            [r.get("enhanced_altitude", r.get("altitude", np.nan)) for r in records],
+            dtype=np.float64,
+        )
+        if len(altitude) and not np.any(np.isnan(altitude)):
+            course["altitude"] = altitude / 5 - 500
+        distance = np.array(
+            [r.get("distance", np.nan) for r in records], dtype=np.float64
+        )
+        if len(distance) and not np.any(np.isnan(distance)):
+            course["distance"] = distance / 100
+            course["info"]["DistanceMeters"] = round(float(distance[-1]) / 100 / 1000, 1)
+
+        points = [p for p in points if "position_lat" in p and "position_long" in p]
+        course_points["name"] = np.array([p.get("name", "") for p in points])
+        course_points["latitude"] = (
+            np.array([p["position_lat"] for p in points], dtype=np.float64)
+            * SEMICIRCLE_TO_DEGREE
+        )
+        course_points["longitude"] = (
+            np.array([p["position_long"] for p in points], dtype=np.float64)
+            * SEMICIRCLE_TO_DEGREE
+        )
+        course_points["type"] = np.array(
+            [
+                COURSE_POINT_TYPES[p["type"]]
+                if 0 <= p.get("type", -1) < len(COURSE_POINT_TYPES)
+                else ""
+                for p in points
+            ]
+        )
+        course_points["notes"] = course_points["name"].copy()
+        if len(points) and all("distance" in p for p in points):
+            # course_point distance is set in [km]
+            course_points["distance"] = (
+                np.array([p["distance"] for p in points], dtype=np.float64) / 100 / 1000
+            )
+
+        cls.normalize_course_point_types(course_points)
+        valid_course = cls.validate_course_data(course, course_points)
+
+        if not valid_course:
+            course, course_points = cls.reset_invalid_course_data()
+        else:
+            cls.filter_straight_course_points(
+                course_points,
+                ["name", "latitude", "longitude", "notes", "type", "distance"],
+            )
+
+        return course, course_points
+
+    @staticmethod
+    def parse(file, info):
+        """Decode record and course_point messages of a FIT course file.
+
+        Returns two lists of dict (raw values, invalid fields are omitted).
+        The CRC is not checked.
+        """
+        with open(file, "rb") as f:
+            data = f.read()
+
+        if len(data) < 12 or data[8:12] != b".FIT":
+            raise ValueError("not a FIT file")
+        header_size = data[0]
+        end = header_size + struct.unpack_from("<I", data, 4)[0]
+        if end > len(data):
+            raise ValueError("truncated FIT file")
+
+        definitions = {}
+        records = []
+        points = []
+        pos = header_size
+
+        while pos < end:
+            header = data[pos]
+            pos += 1
+
+            if header & 0x80:
+                # compressed timestamp header
+                local_num = (header >> 5) & 0x03
+            elif header & 0x40:
+                # definition message
+                local_num = header & 0x0F
+                endian = ">" if data[pos + 1] else "<"
+                global_num = struct.unpack_from(endian + "H", data, pos + 2)[0]
+                field_num = data[pos + 4]
+                pos += 5
+                fields = [
+                    tuple(data[pos + 3 * i : pos + 3 * i + 3]) for i in range(field_num)
+                ]
+                pos += 3 * field_num
+                dev_size = 0
+                if header & 0x20:
+                    dev_num = data[pos]
+                    pos += 1
+                    dev_size = sum(data[pos + 3 * i + 1] for i in range(dev_num))
+                    pos += 3 * dev_num
+                definitions[local_num] = FitDefinition(
+                    global_num, endian, fields, dev_size
+                )
+                continue
+            else:
+                local_num = header & 0x0F
+
+            definition = definitions.get(local_num)
+            if definition is None:
+                raise ValueError(f"undefined local message type {local_num}")
+
+            if definition.names:
+                values = definition.unpack(data, pos)
+                if definition.global_num == 20:
+                    records.append(values)
+                elif definition.global_num == 32:
+                    points.append(values)
+                elif definition.global_num == 31 and values.get("name"):
+                    info.setdefault("Name", values["name"])
+            pos += definition.struct.size
+
+        return records, points
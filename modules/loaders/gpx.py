@@ -0,0 +1,153 @@
+import os
+from array import array
+from xml.parsers import expat
+
+import numpy as np
+
+from modules.app_logger import app_logger
+from modules.utils.geo import get_dist_on_earth_array
+from .base import LoaderBase
+from .tcx import local_name
+
+# waypoint fields stored as text
+WAYPOINT_FIELDS = {
+    "name": "name",
+    "desc": "notes",
+    "cmt": "cmt",
+    "type": "type",
+    "sym": "sym",
+}
+
+
+class GpxLoader(LoaderBase):
+    @classmethod
+    def load_file(cls, file):
+        if not os.path.exists(file):
+            return None, None
+        app_logger.info(f"[{cls.__name__}]: loading {file}")
+
+        course = cls.create_course()
+        course_points = cls.create_course_points()
+
+        try:
+            track, route, points = cls.parse(file, course["info"])
+        except (expat.ExpatError, ValueError, KeyError) as e:
+            app_logger.error(f"Could not parse course: {e}")
+            return cls.reset_invalid_course_data()
+
+        # prefer the track, routes are usually a sparse copy of it
+        if not len(track["latitude"]):
+            track = route
+
+        course["latitude"] = np.frombuffer(track["latitude"], dtype=np.float64)
+        course["longitude"] = np.frombuffer(track["longitude"], dtype=np.float64)
+        altitude = np.frombuffer(track["altitude"], dtype=np.float64)
+        valid_altitude = ~np.isnan(altitude)
+        if np.all(valid_altitude):
+            course["altitude"] = altitude
+        elif np.any(valid_altitude):
+            # fill gaps of <ele> by the neighbouring points
+            index = np.arange(len(altitude))
+            course["altitude"] = np.interp(
+                index, index[valid_altitude], altitude[valid_altitude]
+            )
+
+        # gpx has no distance: only for info, the course distance is calculated in downsample
+        if "DistanceMeters" not in course["info"] and len(course["latitude"]) > 1:
+            dist = get_dist_on_earth_array(
+                course["longitude"][:-1],
+                course["latitude"][:-1],
+                course["longitude"][1:],
+                course["latitude"][1:],
+            )
+            course["info"]["DistanceMeters"] = round(float(np.sum(dist)) / 1000, 1)
+
+        course_points["name"] = np.array([p.get("name", "") for p in points])
+        course_points["latitude"] = np.array([p["latitude"] for p in points])
+        course_points["longitude"] = np.array([p["longitude"] for p in points])
+        course_points["type"] = np.array(
+            [p.get("type") or p.get("sym", "") for p in points]
+        )
+        course_points["notes"] = np.array(
+            [p.get("notes") or p.get("cmt") or p.get("name", "") for p in points]
+        )
+
+        cls.normalize_course_point_types(course_points)
+        valid_course = cls.validate_course_data(course, course_points)
+
+        if not valid_course:
+            course, course_points = cls.reset_invalid_course_data()
+        else:
+            cls.filter_straight_course_points(
+                course_points, ["name", "latitude", "longitude", "notes", "type"]
+            )
+
+        return course, course_points
+
+    @staticmethod
+    def parse(file, info):
+        """Read the file in a single pass with expat.
+
+        Returns float arrays (latitude, longitude, altitude) of all track
+        segments and of all routes, and a list of waypoints (dict). A missing
+        <ele> is stored as nan.
+        """
+        track = {k: array("d") for k in ("latitude", "longitude", "altitude")}
+        route = {k: array("d") for k in ("latitude", "longitude", "altitude")}
+        points = []
+        current = None
+        ele = np.nan
+        point = None
+        depth = 0
+        text = []
+        # expat name -> local name
+        tags = {}
+
+        def start_element(name, attrs):
+            nonlocal current, ele, point, depth
+            tag = tags.get(name) or tags.setdefault(name, local_name(name))
+            depth += 1
+            if tag in ("trkpt", "rtept"):
+                current = track if tag == "trkpt" else route
+                current["latitude"].append(float(attrs["lat"]))
+                current["longitude"].append(float(attrs["lon"]))
+                ele = np.nan
+            elif tag == "wpt":
+                point = {
+                    "latitude": float(attrs["lat"]),
+                    "longitude": float(attrs["lon"]),
+                }
+            text.clear()
+
+        def end_element(name):
+            nonlocal current, ele, point, depth
+            tag = tags.get(name) or tags.setdefault(name, local_name(name))
+            depth -= 1
+            value = "".join(text).strip()
+            text.clear()
+
+            if current is not None:
+                if tag == "ele":
+                    ele = float(value)
+                elif tag in ("trkpt", "rtept"):
+                    current["altitude"].append(ele)
+                    current = None
+            elif point is not None:
+                if tag == "wpt":
+                    points.append(point)
+                    point = None
+                elif tag in WAYPOINT_FIELDS:
+                    point[WAYPOINT_FIELDS[tag]] = value
+            elif tag == "name" and "Name" not in info and depth == 2:
+                # <metadata><name>, <trk><name> or <rte><name>
+                info["Name"] = value
+
+        parser = expat.ParserCreate(namespace_separator="}")
+        parser.buffer_text = True
+        parser.StartElementHandler = start_element
+        parser.EndElementHandler = end_element
+        parser.CharacterDataHandler = text.append
+        with open(file, "rb") as f:
+            parser.ParseFile(f)
+
+        return track, route, points
@@ -1,28 +1,31 @@
 import os
-import re
+from array import array
+from xml.parsers import expat
 
 import numpy as np
 
 from modules.app_logger import app_logger
 from .base import LoaderBase
 
-patterns = {
-    "name": re.compile(r"<Name>(?P<text>[\s\S]*?)</Name>"),
-    "distance_meters": re.compile(
-        r"<DistanceMeters>(?P<text>[\s\S]*?)</DistanceMeters>"
-    ),
-    "track": re.compile(r"<Track>(?P<text>[\s\S]*?)</Track>"),
-    "latitude": re.compile(r"<LatitudeDegrees>(?P<text>[^<]*)</LatitudeDegrees>"),
-    "longitude": re.compile(r"<LongitudeDegrees>(?P<text>[^<]*)</LongitudeDegrees>"),
-    "altitude": re.compile(r"<AltitudeMeters>(?P<text>[^<]*)</AltitudeMeters>"),
-    "distance": re.compile(r"<DistanceMeters>(?P<text>[^<]*)</DistanceMeters>"),
-    "time": re.compile(r"<Time>(?P<text>[^<]*)</Time>"),
-    "course_point": re.compile(r"<CoursePoint>(?P<text>[\s\S]+)</CoursePoint>"),
-    "course_name": re.compile(r"<Name>(?P<text>[^<]*)</Name>"),
-    "course_point_type": re.compile(r"<PointType>(?P<text>[^<]*)</PointType>"),
-    "course_notes": re.compile(r"<Notes>(?P<text>[^<]*)</Notes>"),
-    "course_time": re.compile(r"<Time>(?P<text>[^<]*)</Time>"),
+# Trackpoint fields stored as float arrays
+TRACK_FIELDS = {
+    "LatitudeDegrees": "latitude",
+    "LongitudeDegrees": "longitude",
+    "AltitudeMeters": "altitude",
+    "DistanceMeters": "distance",
 }
+# CoursePoint fields stored as text
+COURSE_POINT_FIELDS = {
+    "Name": "name",
+    "PointType": "type",
+    "Notes": "notes",
+    "Time": "time",
+}
+
+
+def local_name(tag):
+    # strip "namespace}" of expat
+    return tag.rpartition("}")[2]
 
 
 class TcxLoader(LoaderBase):
@@ -37,90 +40,20 @@ class TcxLoader(LoaderBase):
         course = cls.create_course(with_time=True)
         course_points = cls.create_course_points()
 
-        with open(file, "r", encoding="utf-8_sig") as f:
-            tcx = f.read()
-
-            match_name = patterns["name"].search(tcx)
-            if match_name:
-                course["info"]["Name"] = match_name.group("text").strip()
-
-            match_distance_meter = patterns["distance_meters"].search(tcx)
-            if match_distance_meter:
-                course["info"]["DistanceMeters"] = round(
-                    float(match_distance_meter.group("text").strip()) / 1000, 1
-                )
-
-            match_track = patterns["track"].search(tcx)
-            if match_track:
-                track = match_track.group("text")
-                course["latitude"] = np.array(
-                    [
-                        float(m.group("text").strip())
-                        for m in patterns["latitude"].finditer(track)
-                    ]
-                )
-                course["longitude"] = np.array(
-                    [
-                        float(m.group("text").strip())
-                        for m in patterns["longitude"].finditer(track)
-                    ]
-                )
-                course["altitude"] = np.array(
-                    [
-                        float(m.group("text").strip())
-                        for m in patterns["altitude"].finditer(track)
-                    ]
-                )
-                course["distance"] = np.array(
-                    [
-                        float(m.group("text").strip())
-                        for m in patterns["distance"].finditer(track)
-                    ]
-                )
-                course["time"] = np.array(
-                    [m.group("text").strip() for m in patterns["time"].finditer(track)]
-                )
-
-            match_course_point = patterns["course_point"].search(tcx)
-
-            if match_course_point:
-                course_point = match_course_point.group("text")
-                course_points["name"] = np.array(
-                    [
-                        m.group("text").strip()
-                        for m in patterns["course_name"].finditer(course_point)
-                    ]
-                )
-                course_points["latitude"] = np.array(
-                    [
-                        float(m.group("text").strip())
-                        for m in patterns["latitude"].finditer(course_point)
-                    ]
-                )
-                course_points["longitude"] = np.array(
-                    [
-                        float(m.group("text").strip())
-                        for m in patterns["longitude"].finditer(course_point)
-                    ]
-                )
-                course_points["type"] = np.array(
-                    [
-                        m.group("text").strip()
-                        for m in patterns["course_point_type"].finditer(course_point)
-                    ]
-                )
-                course_points["notes"] = np.array(
-                    [
-                        m.group("text").strip()
-                        for m in patterns["course_notes"].finditer(course_point)
-                    ]
-                )
-                course_points["time"] = np.array(
-                    [
-                        m.group("text").strip()
-                        for m in patterns["course_time"].finditer(course_point)
-                    ]
-                )
+        try:
+            track, track_time, points = cls.parse(file, course["info"])
+        except (expat.ExpatError, ValueError) as e:
+            app_logger.error(f"Could not parse course: {e}")
+            return cls.reset_invalid_course_data()
+
+        for key, values in track.items():
+            course[key] = np.frombuffer(values, dtype=np.float64)
+        course["time"] = np.array(track_time)
+
+        for key in ("name", "type", "notes", "time"):
+            course_points[key] = np.array([p.get(key, "") for p in points])
+        course_points["latitude"] = np.array([p["latitude"] for p in points])
+        course_points["longitude"] = np.array([p["longitude"] for p in points])
 
         cls.normalize_course_point_types(course_points)
         valid_course = cls.validate_course_data(course, course_points)
@@ -136,44 +69,92 @@ class TcxLoader(LoaderBase):
         # if time is given in the field, try to set the course point distance/altitude directly from there
         # if a point can not be found, let's fail and modify_course_point will try to compute it instead
         if (
-            course["time"] is not None
+            course.get("time") is not None
             and len(course["time"])
             and len(course_points["time"])
         ):
-            distance_error = False
-            altitude_error = False
-
-            for point_time in course_points["time"]:
-                try:
-                    index = np.where(course["time"] == point_time)[0][0]
-                except Exception:  # noqa
-                    # Point time not found in trackpoint reset and break
-                    course_points.distance = np.array([])
-                    course_points.altitude = np.array([])
-                    break
-                if not distance_error:
-                    try:
-                        # course_point distance is set in [km]
-                        course_points["distance"] = np.append(
-                            course_points["distance"], course["distance"][index] / 1000
-                        )
-                    except IndexError:
-                        distance_error = True
-                        course_points.distance = np.array([])
-                if not altitude_error:
-                    try:
-                        # course_point altitude is set in [m]
-                        course_points["altitude"] = np.append(
-                            course_points["altitude"], course["altitude"][index]
-                        )
-                    except IndexError:
-                        altitude_error = True
-                        course_points.altitude = np.array([])
+            time_index = {}
+            for i, t in enumerate(course["time"]):
+                time_index.setdefault(t, i)
+            index = [time_index.get(t) for t in course_points["time"]]
+
+            if None not in index:
+                index = np.array(index)
+                # course_point distance is set in [km]
+                if np.all(index < len(course["distance"])):
+                    course_points["distance"] = course["distance"][index] / 1000
+                # course_point altitude is set in [m]
+                if np.all(index < len(course["altitude"])):
+                    course_points["altitude"] = course["altitude"][index]
 
         # do not keep these in memory
-        del course["time"]
-
-        if "time" in course_points:
-            del course_points["time"]
+        course.pop("time", None)
+        course_points.pop("time", None)
 
         return course, course_points
+
+    @staticmethod
+    def parse(file, info):
+        """Read the file in a single pass with expat.
+
+        Returns float arrays of the first Track, its Time texts and a list of
+        course points (dict). No element tree and no copy of the whole file
+        is kept in memory.
+        """
+        track = {v: array("d") for v in TRACK_FIELDS.values()}
+        track_time = []
+        points = []
+        in_track = False
+        track_done = False
+        point = None
+        text = []
+        # expat name -> local name
+        tags = {}
+
+        def start_element(name, attrs):
+            nonlocal in_track, point
+            tag = tags.get(name) or tags.setdefault(name, local_name(name))
+            if tag == "Track" and not track_done:
+                in_track = True
+            elif tag == "CoursePoint":
+                point = {}
+            text.clear()
+
+        def end_element(name):
+            nonlocal in_track, track_done, point
+            tag = tags.get(name) or tags.setdefault(name, local_name(name))
+            value = "".join(text).strip()
+            text.clear()
+
+            if tag == "DistanceMeters" and "DistanceMeters" not in info:
+                info["DistanceMeters"] = round(float(value) / 1000, 1)
+
+            if point is not None:
+                if tag == "CoursePoint":
+                    if "latitude" in point and "longitude" in point:
+                        points.append(point)
+                    point = None
+                elif tag in COURSE_POINT_FIELDS:
+                    point[COURSE_POINT_FIELDS[tag]] = value
+                elif tag in ("LatitudeDegrees", "LongitudeDegrees"):
+                    point[TRACK_FIELDS[tag]] = float(value)
+            elif in_track:
+                if tag in TRACK_FIELDS:
+                    track[TRACK_FIELDS[tag]].append(float(value))
+                elif tag == "Time":
+                    track_time.append(value)
+                elif tag == "Track":
+                    in_track = False
+                    track_done = True
+            elif tag == "Name" and "Name" not in info:
+                info["Name"] = value
+
+        parser = expat.ParserCreate(namespace_separator="}")
+        parser.buffer_text = True
+        parser.StartElementHandler = start_element
+        parser.EndElementHandler = end_element
+        parser.CharacterDataHandler = text.append
+        with open(file, "rb") as f:
+            parser.ParseFile(f)
+
+        return track, track_time, points
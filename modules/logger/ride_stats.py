@@ -0,0 +1,178 @@
+import json
+
+import numpy as np
+
+
+class RideStats:
+    """Running lap/entire statistics of the ride.
+
+    Sum, count, max and min of the averaged items are kept per scope in small
+    arrays and updated in O(1) per record. The state can be checkpointed to a
+    one-row side table so that resume does not scan BIKECOMPUTER_LOG.
+    """
+
+    TABLE = "BIKECOMPUTER_STATS"
+    CREATE_TABLE_SQL = (
+        f"CREATE TABLE IF NOT EXISTS {TABLE}("
+        "id INTEGER PRIMARY KEY, lap INTEGER, total_timer_time INTEGER, stats TEXT)"
+    )
+
+    # items averaged with sum / count (speed uses distance / time instead)
+    AVERAGE_KEYS = ("heart_rate", "cadence", "speed", "power")
+    # items of the average (including/excluding zero) columns of the log
+    ZERO_OPTION_KEYS = ("cadence", "power")
+    # items with lap values taken from the accumulated value
+    ACCUMULATED_KEYS = ("distance", "accumulated_power")
+    I2C_ACCUMULATED_KEYS = ("total_ascent", "total_descent")
+    SCOPES = ("lap", "entire")
+    LAP = 0
+    ENTIRE = 1
+
+    def __init__(self, record_stats, lap_keys, average_including_zero):
+        # record_stats is shared with the GUI, update it in place
+        self.record_stats = record_stats
+        self.lap_keys = lap_keys
+        shape = (len(self.SCOPES), len(self.AVERAGE_KEYS))
+        self.sum = np.zeros(shape)
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.max = np.zeros(shape)
+        self.min = np.full(shape, np.inf)
+        self._values = np.empty(len(self.AVERAGE_KEYS))
+        # zero is a valid sample except for items excluded by config
+        self._zero_valid = np.array(
+            [average_including_zero.get(k, True) for k in self.AVERAGE_KEYS]
+        )
+        self._key_index = {k: i for i, k in enumerate(self.AVERAGE_KEYS)}
+        self.reset()
+
+    def reset(self):
+        for stats in self.record_stats.values():
+            for k in self.lap_keys:
+                stats[k] = 0
+        self.sum[:] = 0
+        self.count[:] = 0
+        self.max[:] = 0
+        self.min[:] = np.inf
+
+    def new_lap(self):
+        rs = self.record_stats
+        for k in self.lap_keys:
+            rs["pre_lap_avg"][k] = rs["lap_avg"][k]
+            rs["pre_lap_max"][k] = rs["lap_max"][k]
+            rs["lap_max"][k] = 0
+            rs["lap_avg"][k] = 0
+        self.sum[self.LAP] = 0
+        self.count[self.LAP] = 0
+        self.max[self.LAP] = 0
+        self.min[self.LAP] = np.inf
+
+    def update(self, integrated, i2c, count_lap, count):
+        rs = self.record_stats
+        v = self._values
+        for i, k in enumerate(self.AVERAGE_KEYS):
+            v[i] = integrated[k]
+        valid = ~np.isnan(v) & (self._zero_valid | (v != 0))
+        if valid.any():
+            self.sum[:, valid] += v[valid]
+            self.count[:, valid] += 1
+            np.maximum(self.max, np.where(valid, v, 0), out=self.max)
+            np.minimum(self.min, np.where(valid, v, np.inf), out=self.min)
+
+            lap_avg, entire_avg = rs["lap_avg"], rs["entire_avg"]
+            lap_max, entire_max = rs["lap_max"], rs["entire_max"]
+            for i, k in enumerate(self.AVERAGE_KEYS):
+                if not valid[i]:
+                    continue
+                lap_max[k] = float(self.max[self.LAP, i])
+                entire_max[k] = float(self.max[self.ENTIRE, i])
+                if k == "speed":
+                    continue
+                lap_avg[k] = float(self.sum[self.LAP, i] / self.count[self.LAP, i])
+                entire_avg[k] = float(
+                    self.sum[self.ENTIRE, i] / self.count[self.ENTIRE, i]
+                )
+
+        # lap distance and accumulated_power
+        for k in self.ACCUMULATED_KEYS:
+            x = integrated[k]
+            if np.isnan(x):
+                continue
+            x1 = rs["pre_lap_max"][k]
+            if np.isnan(x1):
+                x1 = 0
+            rs["lap_avg"][k] = x - x1
+            rs["lap_max"][k] = x
+
+        # speed : distance / t
+        if not np.isnan(integrated["speed"]):
+            if count_lap > 0:
+                rs["lap_avg"]["speed"] = rs["lap_avg"]["distance"] / count_lap
+            if count > 0:
+                rs["entire_avg"]["speed"] = integrated["distance"] / count
+
+        # lap total_ascent, total_descent
+        for k in self.I2C_ACCUMULATED_KEYS:
+            x = i2c[k]
+            rs["lap_avg"][k] = x - rs["pre_lap_max"][k]
+            rs["lap_max"][k] = x
+
+    def average_columns(self):
+        # lap_cad_count, lap_cad_sum, avg_cad_count, avg_cad_sum,
+        # lap_power_count, lap_power_sum, avg_power_count, avg_power_sum
+        values = []
+        for k in self.ZERO_OPTION_KEYS:
+            i = self._key_index[k]
+            for scope in (self.LAP, self.ENTIRE):
+                values.append(int(self.count[scope, i]))
+                values.append(float(self.sum[scope, i]))
+        return values
+
+    def set_sum_count(self, scope, key, count, total):
+        s = self.SCOPES.index(scope)
+        i = self._key_index[key]
+        self.count[s, i] = 0 if count is None else count
+        self.sum[s, i] = 0 if total is None else total
+
+    def set_max(self, scope, key, value):
+        if value is None:
+            return
+        self.max[self.SCOPES.index(scope), self._key_index[key]] = value
+
+    def write_checkpoint(self, cur, lap, total_timer_time, extra=None):
+        state = {
+            "record_stats": self.record_stats,
+            "sum": self.sum.tolist(),
+            "count": self.count.tolist(),
+            "max": self.max.tolist(),
+            "min": self.min.tolist(),
+            "extra": extra,
+        }
+        cur.execute(
+            f"INSERT OR REPLACE INTO {self.TABLE} VALUES(0, ?, ?, ?)",
+            (lap, total_timer_time, json.dumps(state, default=float)),
+        )
+
+    def restore_checkpoint(self, cur, lap, total_timer_time):
+        """Restore the checkpoint written with the given last log row.
+
+        Returns the extra state of the checkpoint, or None if the checkpoint
+        does not match the last row of BIKECOMPUTER_LOG.
+        """
+        cur.execute(
+            f"SELECT lap, total_timer_time, stats FROM {self.TABLE} WHERE id = 0"
+        )
+        row = cur.fetchone()
+        if row is None or row[0] != lap or row[1] != total_timer_time:
+            return None
+        try:
+            state = json.loads(row[2])
+            for name, stats in state["record_stats"].items():
+                self.record_stats[name].update(stats)
+            self.sum[:] = state["sum"]
+            self.count[:] = state["count"]
+            self.max[:] = state["max"]
+            self.min[:] = state["min"]
+        except (KeyError, TypeError, ValueError):
+            self.reset()
+            return None
+        return state["extra"] or {}
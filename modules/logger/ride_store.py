@@ -0,0 +1,52 @@
+class RideStore:
+    """Buffer of BIKECOMPUTER_LOG rows waiting to be written.
+
+    The row tuples built by record_log are kept as they are and written to
+    SQLite in blocks with executemany, so a row is neither copied nor
+    converted before the write. All the calls are made in the event loop.
+    """
+
+    def __init__(self, table, columns, capacity=3600):
+        self.columns = tuple(columns)
+        self.capacity = max(1, int(capacity))
+        self._index = {name: i for i, name in enumerate(self.columns)}
+        self.insert_sql = (
+            f"INSERT INTO {table} VALUES({','.join(['?'] * len(self.columns))})"
+        )
+        self.rows = []
+        self.last_row = None
+
+    @classmethod
+    def from_table(cls, cur, table, capacity=3600):
+        columns = [row[1] for row in cur.execute(f"PRAGMA table_info({table})")]
+        return cls(table, columns, capacity=capacity)
+
+    def clear(self):
+        self.rows = []
+        self.last_row = None
+
+    @property
+    def pending(self):
+        return len(self.rows)
+
+    def is_full(self):
+        return self.pending >= self.capacity
+
+    def append(self, values):
+        if self.is_full():
+            raise OverflowError("RideStore is full of unflushed rows")
+        self.rows.append(values)
+        self.last_row = values
+
+    def flush(self, cur):
+        rows = self.rows
+        if not rows:
+            return 0
+        cur.executemany(self.insert_sql, rows)
+        self.rows = []
+        return len(rows)
+
+    def last_value(self, name):
+        if self.last_row is None:
+            return None
+        return self.last_row[self._index[name]]
@@ -0,0 +1,127 @@
+import threading
+
+import numpy as np
+
+from modules.utils.crdp import rdp_mask
+
+
+class TrackHistory:
+    """Append-only track of the ride, simplified incrementally.
+
+    Raw positions are collected in a short tail. When the tail is long
+    enough, it is simplified with RDP from the last kept point and the kept
+    points are committed. Readers keep a cursor (generation, raw count,
+    committed count) and get only the points committed after it, plus the
+    current tail; a new generation means the track was cleared and has to
+    be read again from the beginning.
+    """
+
+    def __init__(self, epsilon=0.0001, tail_limit=120, capacity=4096):
+        self.epsilon = epsilon
+        self.tail_limit = tail_limit
+        self.lock = threading.Lock()
+        self.generation = 0
+        self._capacity = capacity
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            # number of appended raw points
+            self.count = 0
+            # committed (simplified) points and their raw indexes
+            self.lon = np.empty(self._capacity, dtype=np.float32)
+            self.lat = np.empty(self._capacity, dtype=np.float32)
+            self.index = np.empty(self._capacity, dtype=np.int64)
+            self.committed = 0
+            # raw points after the last committed point
+            self.tail_lon = []
+            self.tail_lat = []
+            self.pre_dist = None
+
+    @property
+    def cursor(self):
+        return self.generation, self.count, self.committed
+
+    def append(self, dist, lon, lat):
+        if np.isnan(lon) or np.isnan(lat):
+            return
+        with self.lock:
+            # skip when stopping
+            if self.pre_dist is not None and self.pre_dist == dist:
+                return
+            if self.tail_lon and self.tail_lon[-1] == lon and self.tail_lat[-1] == lat:
+                return
+            self.pre_dist = dist
+            self.tail_lon.append(lon)
+            self.tail_lat.append(lat)
+            self.count += 1
+            if len(self.tail_lon) >= self.tail_limit:
+                self._simplify_tail()
+
+    def extend(self, dist, lon, lat):
+        """Append raw points in bulk (e.g. from the log of a resumed ride)."""
+        for d, x, y in zip(dist, lon, lat):
+            self.append(d, x, y)
+
+    def _simplify_tail(self):
+        start = self.count - len(self.tail_lon)
+        seg_lon = np.array(self.tail_lon, dtype=np.float64)
+        seg_lat = np.array(self.tail_lat, dtype=np.float64)
+        seg_index = np.arange(start, self.count)
+        anchor = 0
+        if self.committed:
+            # simplify from the last kept point
+            last = self.committed - 1
+            seg_lon = np.insert(seg_lon, 0, self.lon[last])
+            seg_lat = np.insert(seg_lat, 0, self.lat[last])
+            seg_index = np.insert(seg_index, 0, self.index[last])
+            anchor = 1
+        try:
+            cond = rdp_mask(seg_lon, seg_lat, epsilon=self.epsilon)
+        except Exception:
+            cond = np.ones(len(seg_lon), dtype=bool)
+        self._commit(
+            seg_lon[anchor:][cond[anchor:]],
+            seg_lat[anchor:][cond[anchor:]],
+            seg_index[anchor:][cond[anchor:]],
+        )
+        self.tail_lon = []
+        self.tail_lat = []
+
+    def _commit(self, lon, lat, index):
+        n = self.committed + len(lon)
+        if n > len(self.lon):
+            capacity = max(n, 2 * len(self.lon))
+            for name in ("lon", "lat", "index"):
+                array = getattr(self, name)
+                grown = np.empty(capacity, dtype=array.dtype)
+                grown[: self.committed] = array[: self.committed]
+                setattr(self, name, grown)
+        self.lon[self.committed : n] = lon
+        self.lat[self.committed : n] = lat
+        self.index[self.committed : n] = index
+        self.committed = n
+
+    def get_since(self, cursor):
+        """Return (cursor, lon, lat, tail_lon, tail_lat) of the track.
+
+        lon and lat are the points committed after cursor, which do not
+        change any more, and tail_lon and tail_lat the whole raw tail after
+        the last committed point. cursor=None or a cursor of another
+        generation returns all the committed points.
+        """
+        with self.lock:
+            start = 0
+            if cursor is not None and cursor[0] == self.generation:
+                start = cursor[2]
+            return (
+                self.cursor,
+                self.lon[start : self.committed].copy(),
+                self.lat[start : self.committed].copy(),
+                np.array(self.tail_lon, dtype=np.float32),
+                np.array(self.tail_lat, dtype=np.float32),
+            )
+
+    def has_new_points(self, cursor):
+        return cursor != self.cursor
@@ -10,9 +10,13 @@ from datetime import datetime, timedelta, timezone
 import numpy as np
 
 from modules.app_logger import app_logger
-from modules.utils.crdp import rdp
+from modules.logger.ride_stats import RideStats
+from modules.logger.ride_store import RideStore
+from modules.logger.track_history import TrackHistory
 from modules.utils.cmd import exec_cmd
+from modules.utils import perf
 from modules.utils.date import datetime_myparser
+from modules.utils.ring_buffer import RingBuffer
 from modules.utils.timer import Timer
 
 
@@ -25,6 +29,7 @@ class LoggerCore:
     cur = None
     lock = None
     event = None
+    ride_store = None
 
     # for timer
     values = {
@@ -54,24 +59,11 @@ class LoggerCore:
         "total_ascent",
         "total_descent",
     ]
-    # for power and cadence (including / not including zero)
-    average = {
-        "lap": {"cadence": {"count": 0, "sum": 0}, "power": {"count": 0, "sum": 0}},
-        "entire": {"cadence": {"count": 0, "sum": 0}, "power": {"count": 0, "sum": 0}},
-    }
+    # running sum/count/max/min of record_stats (power and cadence including / not including zero)
+    stats = None
 
     # for update_track
-    pre_lat = None
-    pre_lon = None
-
-    # for store_short_log_for_update_track
-    short_log_dist = []
-    short_log_lat = []
-    short_log_lon = []
-    short_log_timestamp = []
-    short_log_limit = 120
-    short_log_available = True
-    short_log_lock = False
+    track_history = None
 
     # for debug
     position_log = np.array([])
@@ -80,6 +72,10 @@ class LoggerCore:
     last_timestamp = None
     _PERF_LOGGER_LOG_INTERVAL_SEC = 30.0
     _SQL_COMMIT_INTERVAL_SEC = 5.0
+    # rows kept in memory by ride_store (1 hour at 1s logging interval)
+    _RIDE_STORE_CAPACITY = 3600
+    # queued to sql_worker to write pending ride_store rows
+    _SQL_FLUSH_RIDE_STORE = "FLUSH_RIDE_STORE"
 
     def __init__(self, config):
         super().__init__()
@@ -87,6 +83,21 @@ class LoggerCore:
         self.sql_queue = None
         self._sql_worker_task = None
         self._reset_sql_batch_state()
+        self._ride_store_flush_queued = False
+        self.stats = RideStats(
+            self.record_stats, self.lap_keys, self.config.G_AVERAGE_INCLUDING_ZERO
+        )
+        self.track_history = TrackHistory()
+        # write ride_store rows in blocks of the commit interval
+        self._ride_store_flush_rows = max(
+            1,
+            int(
+                round(
+                    self._SQL_COMMIT_INTERVAL_SEC
+                    / max(self.config.G_LOGGING_INTERVAL, 0.001)
+                )
+            ),
+        )
         # Emit debug metrics at a fixed cadence to reduce log volume.
         self._perf_logger_window = max(
             1,
@@ -133,8 +144,9 @@ class LoggerCore:
         powers = powers[~np.isnan(powers)]
         powers = np.maximum(powers, 0.0)
 
-        restored_window = powers[-window_size:].tolist()
-        np_window_sum = float(np.sum(restored_window))
+        restored_window = RingBuffer(window_size)
+        for power in powers[-window_size:]:
+            restored_window.push(power)
         np_sum_ma4 = 0.0
         np_count_ma4 = 0
 
@@ -145,7 +157,6 @@ class LoggerCore:
             np_count_ma4 = int(ma30.size)
 
         sensor.np_window_30s = restored_window
-        sensor.np_window_sum = float(np_window_sum)
         sensor.np_sum_ma4 = float(np_sum_ma4)
         sensor.np_count_ma4 = np_count_ma4
 
@@ -155,34 +166,68 @@ class LoggerCore:
         else:
             integrated["normalized_power"] = np.nan
 
-    @staticmethod
-    def _safe_stat(values, func, *args):
-        if not values:
-            return float("nan")
-        return float(func(values, *args))
-
     def _init_perf_logger_metrics(self):
-        self._perf_logger_calls = 0
-        self._perf_logger_total_ms = []
-        self._perf_logger_stats_ms_sum = 0.0
-        self._perf_logger_sql_queue_ms_sum = 0.0
-        self._perf_logger_short_log_ms_sum = 0.0
-        self._perf_logger_send_online_ms_sum = 0.0
-        self._perf_logger_send_online_calls = 0
+        self._perf_logger_total = perf.histogram("logger.record")
+        self._perf_logger_stages = {
+            stage: perf.histogram(f"logger.{stage}")
+            for stage in ("stats", "sql_queue", "track", "send_online")
+        }
 
     def _init_perf_sql_worker_metrics(self):
-        self._perf_sql_worker_calls = 0
-        self._perf_sql_worker_wait_ms = []
-        self._perf_sql_worker_exec_ms = []
+        self._perf_sql_worker_wait = perf.histogram("sql.wait")
+        self._perf_sql_worker_exec = perf.histogram("sql.exec")
 
     def _reset_sql_batch_state(self):
         self._sql_transaction_dirty = False
         self._sql_last_commit_monotonic = time.monotonic()
 
     def _execute_sql(self, sql):
+        if sql is self._SQL_FLUSH_RIDE_STORE:
+            self._flush_ride_store()
+            return
         self.cur.execute(*sql)
         self._sql_transaction_dirty = True
 
+    def _flush_ride_store(self):
+        self._ride_store_flush_queued = False
+        if self.ride_store.flush(self.cur):
+            # checkpoint stats in the same transaction as the last row
+            self.stats.write_checkpoint(
+                self.cur,
+                int(self.ride_store.last_value("lap")),
+                int(self.ride_store.last_value("total_timer_time")),
+                extra=self._get_np_state(),
+            )
+            self._sql_transaction_dirty = True
+
+    def _get_np_state(self):
+        sensor = self.sensor
+        if sensor is None or not self.config.G_ANT["USE"]["PWR"]:
+            return None
+        window = sensor.np_window_30s.view()
+        return {
+            "np": {
+                "np_window_30s": window[~np.isnan(window)].tolist(),
+                "np_window_sum": sensor.np_window_30s.sum(),
+                "np_sum_ma4": sensor.np_sum_ma4,
+                "np_count_ma4": sensor.np_count_ma4,
+            }
+        }
+
+    def _set_np_state(self, state):
+        sensor = self.sensor
+        sensor.np_window_30s = RingBuffer(sensor.np_window_size)
+        for p in state["np_window_30s"][-sensor.np_window_size :]:
+            sensor.np_window_30s.push(p)
+        sensor.np_sum_ma4 = float(state["np_sum_ma4"])
+        sensor.np_count_ma4 = int(state["np_count_ma4"])
+        if sensor.np_count_ma4 > 0:
+            sensor.values["integrated"]["normalized_power"] = (
+                sensor.np_sum_ma4 / sensor.np_count_ma4
+            ) ** 0.25
+        else:
+            sensor.values["integrated"]["normalized_power"] = np.nan
+
     def _commit_sql_if_dirty(self):
         if not self._sql_transaction_dirty:
             return False
@@ -205,66 +250,58 @@ class LoggerCore:
         if self.sql_queue is None:
             return
         self._drain_sql_queue_nowait()
+        self._flush_ride_store()
         self._commit_sql_if_dirty()
 
     def _maybe_log_perf_logger_window(self):
-        if self._perf_logger_calls < self._perf_logger_window:
+        total = self._perf_logger_total
+        if total.count < self._perf_logger_window:
             return
 
-        total_avg_ms = self._safe_stat(self._perf_logger_total_ms, np.mean)
-        total_p95_ms = self._safe_stat(self._perf_logger_total_ms, np.percentile, 95)
-        total_max_ms = self._safe_stat(self._perf_logger_total_ms, np.max)
-        stats_avg_ms = self._perf_logger_stats_ms_sum / self._perf_logger_calls
-        sql_queue_avg_ms = self._perf_logger_sql_queue_ms_sum / self._perf_logger_calls
-        short_log_avg_ms = self._perf_logger_short_log_ms_sum / self._perf_logger_calls
-        send_online_avg_ms = (
-            self._perf_logger_send_online_ms_sum / self._perf_logger_calls
+        # stages are averaged over all calls like the total
+        stage_avg = " ".join(
+            f"{stage}_avg_ms={h.sum / total.count:.3f}"
+            for stage, h in self._perf_logger_stages.items()
         )
         queue_size = self.sql_queue.qsize() if self.sql_queue is not None else -1
 
         app_logger.debug(
             "[PERF_LOGGER] "
             f"win={self._perf_logger_window} "
-            f"calls={self._perf_logger_calls} "
-            f"total_avg_ms={total_avg_ms:.3f} "
-            f"total_p95_ms={total_p95_ms:.3f} "
-            f"total_max_ms={total_max_ms:.3f} "
-            f"stats_avg_ms={stats_avg_ms:.3f} "
-            f"sql_queue_avg_ms={sql_queue_avg_ms:.3f} "
-            f"short_log_avg_ms={short_log_avg_ms:.3f} "
-            f"send_online_avg_ms={send_online_avg_ms:.3f} "
-            f"send_online_calls={self._perf_logger_send_online_calls} "
+            f"calls={total.count} "
+            f"total_avg_ms={total.mean:.3f} "
+            f"total_p95_ms={total.percentile(95):.3f} "
+            f"total_max_ms={total.max:.3f} "
+            f"{stage_avg} "
+            f"send_online_calls={self._perf_logger_stages['send_online'].count} "
             f"queue_size={queue_size} "
             f"count={self.values['count']} "
             f"lap={self.values['lap']}"
         )
 
-        self._init_perf_logger_metrics()
+        perf.registry.reset("logger.")
 
     def _maybe_log_perf_sql_worker_window(self):
-        if self._perf_sql_worker_calls < self._perf_logger_window:
+        wait = self._perf_sql_worker_wait
+        exec_ = self._perf_sql_worker_exec
+        if exec_.count < self._perf_logger_window:
             return
 
-        wait_avg_ms = self._safe_stat(self._perf_sql_worker_wait_ms, np.mean)
-        wait_p95_ms = self._safe_stat(self._perf_sql_worker_wait_ms, np.percentile, 95)
-        exec_avg_ms = self._safe_stat(self._perf_sql_worker_exec_ms, np.mean)
-        exec_p95_ms = self._safe_stat(self._perf_sql_worker_exec_ms, np.percentile, 95)
-        exec_max_ms = self._safe_stat(self._perf_sql_worker_exec_ms, np.max)
         queue_size = self.sql_queue.qsize() if self.sql_queue is not None else -1
 
         app_logger.debug(
             "[PERF_LOGGER_SQL] "
             f"win={self._perf_logger_window} "
-            f"calls={self._perf_sql_worker_calls} "
-            f"wait_avg_ms={wait_avg_ms:.3f} "
-            f"wait_p95_ms={wait_p95_ms:.3f} "
-            f"exec_avg_ms={exec_avg_ms:.3f} "
-            f"exec_p95_ms={exec_p95_ms:.3f} "
-            f"exec_max_ms={exec_max_ms:.3f} "
+            f"calls={exec_.count} "
+            f"wait_avg_ms={wait.mean:.3f} "
+            f"wait_p95_ms={wait.percentile(95):.3f} "
+            f"exec_avg_ms={exec_.mean:.3f} "
+            f"exec_p95_ms={exec_.percentile(95):.3f} "
+            f"exec_max_ms={exec_.max:.3f} "
             f"queue_size={queue_size}"
         )
 
-        self._init_perf_sql_worker_metrics()
+        perf.registry.reset("sql.")
 
     def start_coroutine(self):
         self.sql_queue = asyncio.Queue()
@@ -296,19 +333,16 @@ class LoggerCore:
 
         self.course.load()
 
-        for k in self.lap_keys:
-            self.record_stats["pre_lap_avg"][k] = 0
-            self.record_stats["lap_avg"][k] = 0
-            self.record_stats["entire_avg"][k] = 0
-            self.record_stats["pre_lap_max"][k] = 0
-            self.record_stats["lap_max"][k] = 0
-            self.record_stats["entire_max"][k] = 0
+        self.stats.reset()
 
         # sqlite3
         # usage of sqlite3 is "insert" only, so check_same_thread=False
         self.con = sqlite3.connect(self.config.G_LOG_DB, check_same_thread=False)
         self.cur = self.con.cursor()
         self.init_db()
+        self.ride_store = RideStore.from_table(
+            self.cur, "BIKECOMPUTER_LOG", capacity=self._RIDE_STORE_CAPACITY
+        )
         self.cur.execute("SELECT timestamp FROM BIKECOMPUTER_LOG LIMIT 1")
         first_row = self.cur.fetchone()
         if first_row is None:
@@ -316,6 +350,7 @@ class LoggerCore:
         else:
             self.resume()
             self.resume_status = True
+            self.load_track_history()
 
     async def resume_start_stop(self):
         if not self.resume_status:
@@ -378,24 +413,23 @@ class LoggerCore:
                 self._commit_sql_if_dirty()
                 exec_elapsed_ms = (time.perf_counter() - exec_start) * 1000.0
                 self.sql_queue.task_done()
-                self._perf_sql_worker_calls += 1
-                self._perf_sql_worker_wait_ms.append(wait_elapsed_ms)
-                self._perf_sql_worker_exec_ms.append(exec_elapsed_ms)
+                self._perf_sql_worker_wait.observe(wait_elapsed_ms)
+                self._perf_sql_worker_exec.observe(exec_elapsed_ms)
                 self._maybe_log_perf_sql_worker_window()
                 break
             exec_start = time.perf_counter()
             self._execute_sql(sql)
             if (
-                time.monotonic() - self._sql_last_commit_monotonic
+                sql is self._SQL_FLUSH_RIDE_STORE
+                or time.monotonic() - self._sql_last_commit_monotonic
                 >= self._SQL_COMMIT_INTERVAL_SEC
             ):
                 self._commit_sql_if_dirty()
             exec_elapsed_ms = (time.perf_counter() - exec_start) * 1000.0
             self.sql_queue.task_done()
 
-            self._perf_sql_worker_calls += 1
-            self._perf_sql_worker_wait_ms.append(wait_elapsed_ms)
-            self._perf_sql_worker_exec_ms.append(exec_elapsed_ms)
+            self._perf_sql_worker_wait.observe(wait_elapsed_ms)
+            self._perf_sql_worker_exec.observe(exec_elapsed_ms)
             self._maybe_log_perf_sql_worker_window()
 
     def init_db(self):
@@ -505,7 +539,8 @@ class LoggerCore:
             self.cur.execute(
                 "CREATE INDEX timestamp_index ON BIKECOMPUTER_LOG(timestamp)"
             )
-            self.con.commit()
+        self.cur.execute(RideStats.CREATE_TABLE_SQL)
+        self.con.commit()
 
     def count_up(self):
         self.calc_gross()
@@ -610,6 +645,14 @@ class LoggerCore:
         )
         self.config.G_STOPWATCH_STATUS = manual_status
 
+    async def flush_sql_queue(self):
+        # write the pending rows by sql_worker and wait for it
+        if self.sql_queue is None:
+            return
+        self._ride_store_flush_queued = True
+        await self.sql_queue.put(self._SQL_FLUSH_RIDE_STORE)
+        await self.sql_queue.join()
+
     async def _record_log_and_flush(self):
         await self.record_log()
         self._flush_sql_queue_sync()
@@ -618,16 +661,12 @@ class LoggerCore:
         if self.values["count"] == 0 or self.values["count_lap"] == 0:
             return
         lap_time = self.values["count_lap"]
+        # write the rows and the checkpoint of the finished lap first, the next
+        # checkpoint is taken after the first row of the new lap
+        self._flush_sql_queue_sync()
         self.values["lap"] += 1
         self.values["count_lap"] = 0
-        for k in self.lap_keys:
-            self.record_stats["pre_lap_avg"][k] = self.record_stats["lap_avg"][k]
-            self.record_stats["pre_lap_max"][k] = self.record_stats["lap_max"][k]
-            self.record_stats["lap_max"][k] = 0
-            self.record_stats["lap_avg"][k] = 0
-        for k2 in ["cadence", "power"]:
-            self.average["lap"][k2]["count"] = 0
-            self.average["lap"][k2]["sum"] = 0
+        self.stats.new_lap()
         asyncio.create_task(self._record_log_and_flush())
         app_logger.info(f"->LAP:{self.values['lap']}")
 
@@ -759,6 +798,8 @@ class LoggerCore:
             self.cur = self.con.cursor()
             self._reset_sql_batch_state()
             self.init_db()
+            self.ride_store.clear()
+            self.track_history.clear()
 
         # reset temporary values
         self.config.state.reset()
@@ -780,17 +821,7 @@ class LoggerCore:
         self.values["gross_ave_spd"] = 0
         self.values["gross_diff_time"] = "00:00"
 
-        for k in self.lap_keys:
-            self.record_stats["pre_lap_avg"][k] = 0
-            self.record_stats["lap_avg"][k] = 0
-            self.record_stats["entire_avg"][k] = 0
-            self.record_stats["pre_lap_max"][k] = 0
-            self.record_stats["lap_max"][k] = 0
-            self.record_stats["entire_max"][k] = 0
-        for k1 in self.average.keys():
-            for k2 in ["cadence", "power"]:
-                self.average[k1][k2]["count"] = 0
-                self.average[k1][k2]["sum"] = 0
+        self.stats.reset()
 
     def reset_course(self, delete_course_file=False, replace=False):
         self.config.gui.reset_course()
@@ -809,83 +840,12 @@ class LoggerCore:
 
         stats_start = time.perf_counter()
         # update lap stats if value is not Null
-        for k, v in value.items():
-            # skip when null value(np.nan)
-            if k not in [
-                "heart_rate",
-                "cadence",
-                "speed",
-                "power",
-                "distance",
-                "accumulated_power",
-            ]:
-                continue
-            if np.isnan(v):
-                continue
-            # get average
-            if k in ["heart_rate", "cadence", "speed", "power"]:
-                x1 = t1 = 0  # for lap_avg = x1 / t1
-                x2 = t2 = 0  # for entire_ave = x2 / t2
-
-                # heart_rate : hr_sum / t
-                # speed : distance / t
-                # power : power_sum / t (exclude/include zero)
-                # cadence : cad_sum / t (exclude/include zero)
-                if k in ["heart_rate"]:
-                    x1 = (
-                        self.record_stats["lap_avg"][k] * (self.values["count_lap"] - 1)
-                        + v
-                    )
-                    t1 = self.values["count_lap"]
-                    x2 = (
-                        self.record_stats["entire_avg"][k] * (self.values["count"] - 1)
-                        + v
-                    )
-                    t2 = self.values["count"]
-                elif k in ["speed"]:
-                    x1 = self.record_stats["lap_avg"]["distance"]  # [m]
-                    t1 = self.values["count_lap"]  # [s]
-                    x2 = value["distance"]  # [m]
-                    t2 = self.values["count"]  # [s]
-                # average including/excluding zero (cadence, power)
-                elif k in ["cadence", "power"]:
-                    if v == 0 and not self.config.G_AVERAGE_INCLUDING_ZERO[k]:
-                        continue
-                    for l_e in ["lap", "entire"]:
-                        self.average[l_e][k]["sum"] += v
-                        self.average[l_e][k]["count"] += 1
-                    x1 = self.average["lap"][k]["sum"]
-                    t1 = self.average["lap"][k]["count"]
-                    x2 = self.average["entire"][k]["sum"]
-                    t2 = self.average["entire"][k]["count"]
-                # update lap average
-                if t1 > 0:
-                    self.record_stats["lap_avg"][k] = x1 / t1
-                if t2 > 0:
-                    self.record_stats["entire_avg"][k] = x2 / t2
-            # get lap distance, accumulated_power
-            elif k in ["distance", "accumulated_power"]:
-                # v is valid value
-                x1 = self.record_stats["pre_lap_max"][k]
-                if np.isnan(x1):
-                    x1 = 0
-                self.record_stats["lap_avg"][k] = v - x1
-
-            # update max
-            if k in ["heart_rate", "cadence", "speed", "power"]:
-                if self.record_stats["lap_max"][k] < v:
-                    self.record_stats["lap_max"][k] = v
-                if self.record_stats["entire_max"][k] < v:
-                    self.record_stats["entire_max"][k] = v
-            elif k in ["distance", "accumulated_power"]:
-                self.record_stats["lap_max"][k] = v
-
-        # get lap total_ascent, total_descent
-        for k in ["total_ascent", "total_descent"]:
-            x1 = self.record_stats["pre_lap_max"][k]
-            x2 = self.sensor.values["I2C"][k]
-            self.record_stats["lap_avg"][k] = x2 - x1
-            self.record_stats["lap_max"][k] = x2
+        self.stats.update(
+            value,
+            self.sensor.values["I2C"],
+            self.values["count_lap"],
+            self.values["count"],
+        )
 
         stats_elapsed_ms = (time.perf_counter() - stats_start) * 1000.0
 
@@ -967,29 +927,27 @@ class LoggerCore:
                 self.record_stats["entire_avg"]["speed"],
                 self.record_stats["entire_avg"]["power"],
                 ###
-                self.average["lap"]["cadence"]["count"],
-                self.average["lap"]["cadence"]["sum"],
-                self.average["entire"]["cadence"]["count"],
-                self.average["entire"]["cadence"]["sum"],
-                self.average["lap"]["power"]["count"],
-                self.average["lap"]["power"]["sum"],
-                self.average["entire"]["power"]["count"],
-                self.average["entire"]["power"]["sum"],
+                *self.stats.average_columns(),
         )
-        placeholders = ",".join(["?"] * len(sql_values))
-        sql = (f"INSERT INTO BIKECOMPUTER_LOG VALUES({placeholders})", sql_values)
-        # self.con.commit()
-        await self.sql_queue.put((sql))
+        if self.ride_store.is_full():
+            # sql_worker is stalled, write synchronously to keep the row
+            self._flush_ride_store()
+        self.ride_store.append(sql_values)
+        if (
+            not self._ride_store_flush_queued
+            and self.ride_store.pending >= self._ride_store_flush_rows
+        ):
+            self._ride_store_flush_queued = True
+            await self.sql_queue.put(self._SQL_FLUSH_RIDE_STORE)
         sql_queue_elapsed_ms = (time.perf_counter() - sql_queue_start) * 1000.0
 
-        short_log_start = time.perf_counter()
-        self.store_short_log_for_update_track(
+        track_start = time.perf_counter()
+        self.track_history.append(
             value["distance"],
-            self.sensor.values["GPS"]["lat"],
             self.sensor.values["GPS"]["lon"],
-            now_time,
+            self.sensor.values["GPS"]["lat"],
         )
-        short_log_elapsed_ms = (time.perf_counter() - short_log_start) * 1000.0
+        track_elapsed_ms = (time.perf_counter() - track_start) * 1000.0
 
         # send online
         send_online_elapsed_ms = 0.0
@@ -1001,14 +959,13 @@ class LoggerCore:
             ) * 1000.0
 
         record_elapsed_ms = (time.perf_counter() - record_start) * 1000.0
-        self._perf_logger_calls += 1
-        self._perf_logger_total_ms.append(record_elapsed_ms)
-        self._perf_logger_stats_ms_sum += stats_elapsed_ms
-        self._perf_logger_sql_queue_ms_sum += sql_queue_elapsed_ms
-        self._perf_logger_short_log_ms_sum += short_log_elapsed_ms
-        self._perf_logger_send_online_ms_sum += send_online_elapsed_ms
+        stages = self._perf_logger_stages
+        stages["stats"].observe(stats_elapsed_ms)
+        stages["sql_queue"].observe(sql_queue_elapsed_ms)
+        stages["track"].observe(track_elapsed_ms)
         if self.config.G_THINGSBOARD_API["STATUS"]:
-            self._perf_logger_send_online_calls += 1
+            stages["send_online"].observe(send_online_elapsed_ms)
+        self._perf_logger_total.observe(record_elapsed_ms)
         self._maybe_log_perf_logger_window()
 
     def calc_gross(self):
@@ -1054,9 +1011,8 @@ class LoggerCore:
         # print(self.values['elapsed_time'], self.values['gross_ave_spd'], self.values['gross_diff_time'], round(diff_time,1))
 
     def resume(self):
-        self.cur.execute("SELECT count(*) FROM BIKECOMPUTER_LOG")
-        res = self.cur.fetchone()
-        if res[0] == 0:
+        self.cur.execute("SELECT timestamp FROM BIKECOMPUTER_LOG LIMIT 1")
+        if self.cur.fetchone() is None:
             return
 
         app_logger.info("resume existing rides...")
@@ -1095,6 +1051,38 @@ class LoggerCore:
         gps["pre_lat"] = self._to_float_or_nan(value[9])
         gps["pre_lon"] = self._to_float_or_nan(value[10])
 
+        # restore stats from the checkpoint of the last row, or scan the log
+        extra = self.stats.restore_checkpoint(
+            self.cur, self.values["lap"], self.values["count"]
+        )
+        if extra is None:
+            app_logger.info("no stats checkpoint, scan the log")
+            self._resume_stats_from_log_db(value, row_all)
+
+        if self.config.G_ANT["USE"]["PWR"]:
+            if extra is not None and "np" in extra:
+                self._set_np_state(extra["np"])
+            else:
+                self._restore_np_state_from_log_db(
+                    window_size=self.sensor.np_window_size
+                )
+
+        # start_time
+        self.cur.execute("SELECT MIN(timestamp) FROM BIKECOMPUTER_LOG")
+        first_row = self.cur.fetchone()
+        if first_row[0] is not None:
+            self.values["start_time"] = int(
+                datetime_myparser(first_row[0]).timestamp() - 1
+            )
+
+        # if not self.config.G_IS_RASPI and self.config.G_DUMMY_OUTPUT:
+        if self.config.G_DUMMY_OUTPUT:
+            self.cur.execute(
+                "SELECT position_lat,position_long,distance,gps_track FROM BIKECOMPUTER_LOG"
+            )
+            self.position_log = np.array(self.cur.fetchall())
+
+    def _resume_stats_from_log_db(self, value, row_all):
         index = 11
         for k in self.lap_keys:
             self.record_stats["lap_avg"][k] = value[index]
@@ -1104,15 +1092,25 @@ class LoggerCore:
             index += 1
         for k1 in ["lap", "entire"]:
             for k2 in ["cadence", "power"]:
-                for k3 in ["count", "sum"]:
-                    self.average[k1][k2][k3] = value[index]
-                    index += 1
-        # print(self.average)
+                self.stats.set_sum_count(k1, k2, value[index], value[index + 1])
+                index += 2
 
         # get lap
         self.cur.execute("SELECT MAX(LAP) FROM BIKECOMPUTER_LOG")
         max_lap = (self.cur.fetchone())[0]
 
+        # sum and count of the valid samples of heart_rate and speed
+        for k in ["heart_rate", "speed"]:
+            valid = f"{k} IS NOT NULL"
+            if not self.config.G_AVERAGE_INCLUDING_ZERO.get(k, True):
+                valid += f" AND {k} != 0"
+            for k1, where in [("lap", f" AND LAP = {max_lap}"), ("entire", "")]:
+                self.cur.execute(
+                    f"SELECT COUNT({k}), SUM({k}) FROM BIKECOMPUTER_LOG WHERE {valid}{where}"
+                )
+                count, total = self.cur.fetchone()
+                self.stats.set_sum_count(k1, k, count, total)
+
         # get max
         max_row = "MAX(heart_rate), MAX(cadence), MAX(speed), MAX(power)"
         main_item = ["heart_rate", "cadence", "speed", "power"]
@@ -1122,6 +1120,7 @@ class LoggerCore:
             self.record_stats["entire_max"][k] = 0
             if max_value[i] is not None:
                 self.record_stats["entire_max"][k] = max_value[i]
+                self.stats.set_max("entire", k, max_value[i])
 
         # get lap max
         self.cur.execute(
@@ -1132,6 +1131,7 @@ class LoggerCore:
             self.record_stats["lap_max"][k] = 0
             if max_value[i] is not None:
                 self.record_stats["lap_max"][k] = max_value[i]
+                self.stats.set_max("lap", k, max_value[i])
 
         # get pre lap
         if max_lap >= 1:
@@ -1162,140 +1162,18 @@ class LoggerCore:
             for i, k in enumerate(main_item):
                 self.record_stats["pre_lap_max"][k] = max_value[i]
         # print(self.record_stats)
-        # print(self.average)
 
-        if self.config.G_ANT["USE"]["PWR"]:
-            self._restore_np_state_from_log_db(window_size=self.sensor.np_window_size)
-
-        # start_time
-        self.cur.execute("SELECT MIN(timestamp) FROM BIKECOMPUTER_LOG")
-        first_row = self.cur.fetchone()
-        if first_row[0] is not None:
-            self.values["start_time"] = int(
-                datetime_myparser(first_row[0]).timestamp() - 1
-            )
-
-        # if not self.config.G_IS_RASPI and self.config.G_DUMMY_OUTPUT:
-        if self.config.G_DUMMY_OUTPUT:
-            self.cur.execute(
-                "SELECT position_lat,position_long,distance,gps_track FROM BIKECOMPUTER_LOG"
-            )
-            self.position_log = np.array(self.cur.fetchall())
-
-    def store_short_log_for_update_track(self, dist, lat, lon, timestamp):
-        if not self.short_log_available:
-            return
-        if np.isnan(lat) or np.isnan(lon):
-            return
-        if len(self.short_log_dist) and self.short_log_dist[-1] == dist:
-            return
-        if (len(self.short_log_lat) and self.short_log_lat[-1] == lat) and (
-            len(self.short_log_lon) and self.short_log_lon[-1] == lon
-        ):
-            return
-        if len(self.short_log_lat) > self.short_log_limit:
-            self.clear_short_log()
-            self.short_log_available = False
-            return
-
-        self.short_log_lock = True
-        self.short_log_dist.append(dist)
-        self.short_log_lat.append(lat)
-        self.short_log_lon.append(lon)
-        self.short_log_timestamp.append(timestamp)
-        self.short_log_lock = False
-        self.short_log_available = True
-        # print("append", len(self.short_log_dist), len(self.short_log_lat), len(self.short_log_lon))
-
-    def clear_short_log(self):
-        while self.short_log_lock:
-            app_logger.info("locked: clear_short_log")
-            time.sleep(0.02)
-        self.short_log_dist = []
-        self.short_log_lat = []
-        self.short_log_lon = []
-        self.short_log_timestamp = []
-
-    def update_track(self, timestamp):
-        lon = np.array([])
-        lat = np.array([])
-        timestamp_new = timestamp
-        # t = datetime.now(timezone.utc)
-
-        timestamp_delta = None
-        if timestamp is not None:
-            timestamp_delta = (datetime.now(timezone.utc) - timestamp).total_seconds()
-
-        # make_tmp_db = False
-        lat_raw = np.array([])
-        lon_raw = np.array([])
-        dist_raw = np.array([])
-
-        # get values from short_log to db in logging
-        if timestamp_delta is not None and self.short_log_available:
-            while self.short_log_lock:
-                app_logger.info("locked: get values")
-                time.sleep(0.02)
-            lat_raw = np.array(self.short_log_lat)
-            lon_raw = np.array(self.short_log_lon)
-            dist_raw = np.array(self.short_log_dist)
-            if len(self.short_log_lon):
-                timestamp_new = self.short_log_timestamp[-1]
-            self.clear_short_log()
-            self.short_log_available = True
-        # get values from copied db when initial execution or migration from short_log to db in logging
-        else:
-            db_file = self.config.G_LOG_DB + ".tmp"
-            shutil.copy(self.config.G_LOG_DB, db_file)
-
-            query = (
-                "SELECT distance,position_lat,position_long FROM BIKECOMPUTER_LOG "
-                + "WHERE position_lat is not null AND position_long is not null "
-                + 'and typeof(position_lat) = "real" and typeof(position_long) = "real"'
-            )
-            if timestamp is not None:
-                query = query + "AND timestamp > '%s'" % timestamp
-
-            con = sqlite3.connect(db_file)
-            cur = con.cursor()
-            cur.execute(query)
-            res_array = np.array(cur.fetchall())
-            if len(res_array.shape) and res_array.shape[0] > 0:
-                dist_raw = res_array[:, 0].astype("float32")  # [m]
-                lat_raw = res_array[:, 1].astype("float32")
-                lon_raw = res_array[:, 2].astype("float32")
-
-            # timestamp
-            cur.execute("SELECT MAX(timestamp) FROM BIKECOMPUTER_LOG")
-            first_row = cur.fetchone()
-            if first_row[0] is not None:
-                timestamp_new = datetime_myparser(first_row[0])
-
-            cur.close()
-            con.close()
-            os.remove(db_file)
-            self.short_log_available = True
-
-        # print("lat_raw", len(lat_raw))
-        if len(lat_raw) and (len(lat_raw) == len(lon_raw) == len(dist_raw)):
-            # downsampling
-            try:
-                cond = np.array(
-                    rdp(
-                        np.column_stack([lon_raw, lat_raw]),
-                        epsilon=0.0001,
-                        return_mask=True,
-                    )
-                )
-                lat = lat_raw[cond]
-                lon = lon_raw[cond]
-            except:
-                lat = lat_raw
-                lon = lon_raw
-
-        if timestamp is None:
-            timestamp_new = datetime.now(timezone.utc)
-
-        # print("\tlogger_core : update_track(new) ", (datetime.now(timezone.utc)-t).total_seconds(), "sec")
+    def load_track_history(self):
+        # positions of the resumed ride are only in the database
+        self.cur.execute(
+            "SELECT distance,position_lat,position_long FROM BIKECOMPUTER_LOG "
+            + "WHERE position_lat is not null AND position_long is not null "
+            + 'and typeof(position_lat) = "real" and typeof(position_long) = "real"'
+        )
+        res_array = np.array(self.cur.fetchall())
+        if len(res_array.shape) and res_array.shape[0] > 0:
+            self.track_history.extend(res_array[:, 0], res_array[:, 2], res_array[:, 1])
 
-        return timestamp_new, lon, lat
+    def update_track(self, cursor):
+        # return (cursor, lon, lat, tail_lon, tail_lat) of the track after cursor
+        return self.track_history.get_since(cursor)
@@ -1,4 +1,3 @@
-from collections import Counter
 from datetime import datetime, timezone
 import time
 
@@ -6,6 +5,7 @@ import numpy as np
 
 from modules.app_logger import app_logger
 from modules._qt_qtwidgets import QtCore, Signal, pg, qasync
+from modules.utils import perf
 from modules.utils.geo import get_mod_lat_np
 from .pyqt_base_map import BaseMapWidget
 from .pyqt_map_course import MapCourseMixin
@@ -62,35 +62,43 @@ class MapWidget(
         self._setup_course_widgets()
         self._setup_layout_grid()
         self._setup_tile_dither_palette()
+        self.config.network.add_download_listener(self._drop_downloaded_tile_bitmaps)
         self._init_perf_map_metrics()
         self._init_update_display_runtime()
 
     def _init_perf_map_metrics(self):
-        self._perf_map_calls = 0
-        self._perf_map_exec = 0
-        self._perf_map_skip = 0
-        self._perf_map_update_ms = []
-        self._perf_map_draw_ms_sum = 0.0
-        self._perf_map_track_ms_sum = 0.0
-        self._perf_map_track_fetch_ms_sum = 0.0
-        self._perf_map_track_render_ms_sum = 0.0
-        self._perf_map_prepare_ms_sum = 0.0
-        self._perf_map_instruction_ms_sum = 0.0
-        self._perf_map_hud_ms_sum = 0.0
-        self._perf_map_load_course_ms_sum = 0.0
-        self._perf_map_tile_download_ms_sum = 0.0
-        self._perf_map_tile_download_calls = 0
-        self._perf_map_tile_check_ms_sum = 0.0
-        self._perf_map_tile_io_ms_sum = 0.0
-        self._perf_map_tile_conv_ms_sum = 0.0
-        self._perf_map_tile_imgitem_ms_sum = 0.0
-        self._perf_map_tile_plot_ms_sum = 0.0
-        self._perf_map_tile_drawn_count = 0
-        self._perf_map_tile_reused_count = 0
-        self._perf_map_tile_retry_count = 0
-        self._perf_map_exec_reason_counts = Counter()
-        self._perf_map_skip_reason_counts = Counter()
-        self._perf_map_redraw_reason_counts = Counter()
+        self._perf_map_calls = perf.counter("map.calls")
+        self._perf_map_skip = perf.counter("map.skip")
+        self._perf_map_update = perf.histogram("map.update")
+        self._perf_map_stages = {
+            stage: perf.histogram(f"map.{stage}")
+            for stage in (
+                "draw",
+                "track",
+                "track_fetch",
+                "track_render",
+                "prepare",
+                "instruction",
+                "hud",
+                "load_course",
+            )
+        }
+        self._perf_map_tile_stages = {
+            stage: perf.histogram(f"map.tile.{stage}")
+            for stage in ("download", "check", "io", "conv", "imgitem", "plot")
+        }
+        self._perf_map_tile_counts = {
+            key: perf.counter(f"map.tile.{key}")
+            for key in (
+                "download_calls",
+                "drawn",
+                "reused",
+                "retry",
+                "cache_hit",
+                "cache_miss",
+                "cache_bytes",
+            )
+        }
 
     def _init_update_display_runtime(self):
         self._update_display_running = False
@@ -112,16 +120,17 @@ class MapWidget(
         )
 
     @staticmethod
-    def _safe_stat(values, func, *args):
-        if not values:
-            return float("nan")
-        return float(func(values, *args))
-
-    @staticmethod
-    def _format_perf_counter(counter):
-        if not counter:
+    def _format_perf_reasons(prefix):
+        counts = perf.registry.snapshot(prefix)
+        if not any(counts.values()):
             return "-"
-        return ",".join(f"{key}:{counter[key]}" for key in sorted(counter))
+        return ",".join(
+            f"{key[len(prefix):]}:{value}" for key, value in counts.items() if value
+        )
+
+    def _count_perf_map_reasons(self, kind, reasons):
+        for reason in reasons:
+            perf.counter(f"map.{kind}_reason.{reason}").inc()
 
     def _record_perf_map_tile_breakdown(
         self,
@@ -136,17 +145,25 @@ class MapWidget(
         drawn_count=0,
         reused_count=0,
         retry_count=0,
+        cache_hit_count=0,
+        cache_miss_count=0,
+        cache_bytes=0,
     ):
-        self._perf_map_tile_download_ms_sum += float(download_ms)
-        self._perf_map_tile_download_calls += int(download_calls)
-        self._perf_map_tile_check_ms_sum += float(check_ms)
-        self._perf_map_tile_io_ms_sum += float(io_ms)
-        self._perf_map_tile_conv_ms_sum += float(conv_ms)
-        self._perf_map_tile_imgitem_ms_sum += float(imgitem_ms)
-        self._perf_map_tile_plot_ms_sum += float(plot_ms)
-        self._perf_map_tile_drawn_count += int(drawn_count)
-        self._perf_map_tile_reused_count += int(reused_count)
-        self._perf_map_tile_retry_count += int(retry_count)
+        stages = self._perf_map_tile_stages
+        stages["download"].observe(float(download_ms))
+        stages["check"].observe(float(check_ms))
+        stages["io"].observe(float(io_ms))
+        stages["conv"].observe(float(conv_ms))
+        stages["imgitem"].observe(float(imgitem_ms))
+        stages["plot"].observe(float(plot_ms))
+        counts = self._perf_map_tile_counts
+        counts["download_calls"].inc(int(download_calls))
+        counts["drawn"].inc(int(drawn_count))
+        counts["reused"].inc(int(reused_count))
+        counts["retry"].inc(int(retry_count))
+        counts["cache_hit"].inc(int(cache_hit_count))
+        counts["cache_miss"].inc(int(cache_miss_count))
+        counts["cache_bytes"].set(int(cache_bytes))
 
     def _get_perf_map_cpu_percent(self):
         try:
@@ -156,119 +173,68 @@ class MapWidget(
             return float("nan")
 
     def _maybe_log_perf_map_window(self):
-        if self._perf_map_calls < self._PERF_MAP_WINDOW:
+        calls = self._perf_map_calls.value
+        if calls < self._PERF_MAP_WINDOW:
             return
 
-        update_avg_ms = self._safe_stat(self._perf_map_update_ms, np.mean)
-        update_p95_ms = self._safe_stat(self._perf_map_update_ms, np.percentile, 95)
-        update_max_ms = self._safe_stat(self._perf_map_update_ms, np.max)
-
-        if self._perf_map_exec > 0:
-            draw_avg_ms = self._perf_map_draw_ms_sum / self._perf_map_exec
-            track_avg_ms = self._perf_map_track_ms_sum / self._perf_map_exec
-            track_fetch_avg_ms = (
-                self._perf_map_track_fetch_ms_sum / self._perf_map_exec
-            )
-            track_render_avg_ms = (
-                self._perf_map_track_render_ms_sum / self._perf_map_exec
-            )
+        nan = float("nan")
+        update = self._perf_map_update
+        exec_count = update.count
+        update_max_ms = update.max if exec_count else nan
+        # averaged over the executed updates
+        stage_avg = {
+            stage: h.sum / exec_count if exec_count else nan
+            for stage, h in self._perf_map_stages.items()
+        }
+        tile_avg = {
+            stage: h.sum / exec_count if exec_count else nan
+            for stage, h in self._perf_map_tile_stages.items()
+        }
+        tile_counts = {k: c.value for k, c in self._perf_map_tile_counts.items()}
+        drawn = tile_counts["drawn"]
+        tile_sums = {k: h.sum for k, h in self._perf_map_tile_stages.items()}
+
+        track_sum = self._perf_map_stages["track"].sum
+        if track_sum > 0:
+            draw_track_ratio = self._perf_map_stages["draw"].sum / track_sum
         else:
-            draw_avg_ms = float("nan")
-            track_avg_ms = float("nan")
-            track_fetch_avg_ms = float("nan")
-            track_render_avg_ms = float("nan")
+            draw_track_ratio = nan
 
-        if self._perf_map_track_ms_sum > 0:
-            draw_track_ratio = self._perf_map_draw_ms_sum / self._perf_map_track_ms_sum
-        else:
-            draw_track_ratio = float("nan")
+        def per_exec(value):
+            return value / exec_count if exec_count else nan
 
-        if self._perf_map_exec > 0:
-            prepare_avg_ms = self._perf_map_prepare_ms_sum / self._perf_map_exec
-            instruction_avg_ms = (
-                self._perf_map_instruction_ms_sum / self._perf_map_exec
-            )
-            hud_avg_ms = self._perf_map_hud_ms_sum / self._perf_map_exec
-            load_course_avg_ms = self._perf_map_load_course_ms_sum / self._perf_map_exec
-            tile_download_avg_ms = (
-                self._perf_map_tile_download_ms_sum / self._perf_map_exec
-            )
-            tile_check_avg_ms = self._perf_map_tile_check_ms_sum / self._perf_map_exec
-            tile_io_avg_ms = self._perf_map_tile_io_ms_sum / self._perf_map_exec
-            tile_conv_avg_ms = self._perf_map_tile_conv_ms_sum / self._perf_map_exec
-            tile_imgitem_avg_ms = (
-                self._perf_map_tile_imgitem_ms_sum / self._perf_map_exec
-            )
-            tile_plot_avg_ms = self._perf_map_tile_plot_ms_sum / self._perf_map_exec
-            tile_drawn_per_exec = self._perf_map_tile_drawn_count / self._perf_map_exec
-            tile_reused_per_exec = (
-                self._perf_map_tile_reused_count / self._perf_map_exec
-            )
-            tile_retry_per_exec = self._perf_map_tile_retry_count / self._perf_map_exec
-        else:
-            prepare_avg_ms = float("nan")
-            instruction_avg_ms = float("nan")
-            hud_avg_ms = float("nan")
-            load_course_avg_ms = float("nan")
-            tile_download_avg_ms = float("nan")
-            tile_check_avg_ms = float("nan")
-            tile_io_avg_ms = float("nan")
-            tile_conv_avg_ms = float("nan")
-            tile_imgitem_avg_ms = float("nan")
-            tile_plot_avg_ms = float("nan")
-            tile_drawn_per_exec = float("nan")
-            tile_reused_per_exec = float("nan")
-            tile_retry_per_exec = float("nan")
-
-        if self._perf_map_tile_drawn_count > 0:
-            tile_io_per_tile_ms = (
-                self._perf_map_tile_io_ms_sum / self._perf_map_tile_drawn_count
-            )
-            tile_conv_per_tile_ms = (
-                self._perf_map_tile_conv_ms_sum / self._perf_map_tile_drawn_count
-            )
-            tile_imgitem_per_tile_ms = (
-                self._perf_map_tile_imgitem_ms_sum / self._perf_map_tile_drawn_count
-            )
-            tile_plot_per_tile_ms = (
-                self._perf_map_tile_plot_ms_sum / self._perf_map_tile_drawn_count
-            )
-            tile_pipeline_per_tile_ms = (
-                tile_io_per_tile_ms
-                + tile_conv_per_tile_ms
-                + tile_imgitem_per_tile_ms
-                + tile_plot_per_tile_ms
-            )
-        else:
-            tile_io_per_tile_ms = float("nan")
-            tile_conv_per_tile_ms = float("nan")
-            tile_imgitem_per_tile_ms = float("nan")
-            tile_plot_per_tile_ms = float("nan")
-            tile_pipeline_per_tile_ms = float("nan")
+        def per_tile(stage):
+            return tile_sums[stage] / drawn if drawn else nan
+
+        pipeline_per_tile_ms = sum(
+            per_tile(stage) for stage in ("io", "conv", "imgitem", "plot")
+        )
 
         cpu_percent = self._get_perf_map_cpu_percent()
 
-        other_avg_ms = (
-            update_avg_ms
-            - draw_avg_ms
-            - track_avg_ms
-            - prepare_avg_ms
-            - instruction_avg_ms
-            - hud_avg_ms
-            - load_course_avg_ms
+        other_avg_ms = update.mean - sum(
+            stage_avg[stage]
+            for stage in (
+                "draw",
+                "track",
+                "prepare",
+                "instruction",
+                "hud",
+                "load_course",
+            )
         )
 
         app_logger.debug(
             "[PERF_MAP] "
             f"win={self._PERF_MAP_WINDOW} "
-            f"calls={self._perf_map_calls} "
-            f"exec={self._perf_map_exec} "
-            f"skip={self._perf_map_skip} "
-            f"upd_avg_ms={update_avg_ms:.3f} "
-            f"upd_p95_ms={update_p95_ms:.3f} "
+            f"calls={calls} "
+            f"exec={exec_count} "
+            f"skip={self._perf_map_skip.value} "
+            f"upd_avg_ms={update.mean:.3f} "
+            f"upd_p95_ms={update.percentile(95):.3f} "
             f"upd_max_ms={update_max_ms:.3f} "
-            f"draw_avg_ms={draw_avg_ms:.3f} "
-            f"track_avg_ms={track_avg_ms:.3f} "
+            f"draw_avg_ms={stage_avg['draw']:.3f} "
+            f"track_avg_ms={stage_avg['track']:.3f} "
             f"draw_track_ratio={draw_track_ratio:.3f} "
             f"cpu={cpu_percent} "
             f"lock={int(bool(self.lock_status))} "
@@ -278,41 +244,44 @@ class MapWidget(
         app_logger.debug(
             "[PERF_MAP_DETAIL] "
             f"win={self._PERF_MAP_WINDOW} "
-            f"prepare_avg_ms={prepare_avg_ms:.3f} "
-            f"instruction_avg_ms={instruction_avg_ms:.3f} "
-            f"track_fetch_avg_ms={track_fetch_avg_ms:.3f} "
-            f"track_render_avg_ms={track_render_avg_ms:.3f} "
-            f"hud_avg_ms={hud_avg_ms:.3f} "
-            f"load_course_avg_ms={load_course_avg_ms:.3f} "
+            f"prepare_avg_ms={stage_avg['prepare']:.3f} "
+            f"instruction_avg_ms={stage_avg['instruction']:.3f} "
+            f"track_fetch_avg_ms={stage_avg['track_fetch']:.3f} "
+            f"track_render_avg_ms={stage_avg['track_render']:.3f} "
+            f"hud_avg_ms={stage_avg['hud']:.3f} "
+            f"load_course_avg_ms={stage_avg['load_course']:.3f} "
             f"other_avg_ms={other_avg_ms:.3f} "
-            f"exec_reasons={self._format_perf_counter(self._perf_map_exec_reason_counts)} "
-            f"skip_reasons={self._format_perf_counter(self._perf_map_skip_reason_counts)} "
-            f"redraw_reasons={self._format_perf_counter(self._perf_map_redraw_reason_counts)}"
+            f"exec_reasons={self._format_perf_reasons('map.exec_reason.')} "
+            f"skip_reasons={self._format_perf_reasons('map.skip_reason.')} "
+            f"redraw_reasons={self._format_perf_reasons('map.redraw_reason.')}"
         )
         app_logger.debug(
             "[PERF_MAP_TILE] "
             f"win={self._PERF_MAP_WINDOW} "
-            f"dl_avg_ms={tile_download_avg_ms:.3f} "
-            f"dl_calls={self._perf_map_tile_download_calls} "
-            f"check_avg_ms={tile_check_avg_ms:.3f} "
-            f"io_avg_ms={tile_io_avg_ms:.3f} "
-            f"conv_avg_ms={tile_conv_avg_ms:.3f} "
-            f"imgitem_avg_ms={tile_imgitem_avg_ms:.3f} "
-            f"plot_avg_ms={tile_plot_avg_ms:.3f} "
-            f"drawn={self._perf_map_tile_drawn_count} "
-            f"reused={self._perf_map_tile_reused_count} "
-            f"retry={self._perf_map_tile_retry_count} "
-            f"drawn_per_exec={tile_drawn_per_exec:.3f} "
-            f"reused_per_exec={tile_reused_per_exec:.3f} "
-            f"retry_per_exec={tile_retry_per_exec:.3f} "
-            f"io_per_tile_ms={tile_io_per_tile_ms:.3f} "
-            f"conv_per_tile_ms={tile_conv_per_tile_ms:.3f} "
-            f"imgitem_per_tile_ms={tile_imgitem_per_tile_ms:.3f} "
-            f"plot_per_tile_ms={tile_plot_per_tile_ms:.3f} "
-            f"pipeline_per_tile_ms={tile_pipeline_per_tile_ms:.3f}"
+            f"dl_avg_ms={tile_avg['download']:.3f} "
+            f"dl_calls={tile_counts['download_calls']} "
+            f"check_avg_ms={tile_avg['check']:.3f} "
+            f"io_avg_ms={tile_avg['io']:.3f} "
+            f"conv_avg_ms={tile_avg['conv']:.3f} "
+            f"imgitem_avg_ms={tile_avg['imgitem']:.3f} "
+            f"plot_avg_ms={tile_avg['plot']:.3f} "
+            f"drawn={drawn} "
+            f"reused={tile_counts['reused']} "
+            f"retry={tile_counts['retry']} "
+            f"cache_hit={tile_counts['cache_hit']} "
+            f"cache_miss={tile_counts['cache_miss']} "
+            f"cache_kb={tile_counts['cache_bytes'] // 1024} "
+            f"drawn_per_exec={per_exec(drawn):.3f} "
+            f"reused_per_exec={per_exec(tile_counts['reused']):.3f} "
+            f"retry_per_exec={per_exec(tile_counts['retry']):.3f} "
+            f"io_per_tile_ms={per_tile('io'):.3f} "
+            f"conv_per_tile_ms={per_tile('conv'):.3f} "
+            f"imgitem_per_tile_ms={per_tile('imgitem'):.3f} "
+            f"plot_per_tile_ms={per_tile('plot'):.3f} "
+            f"pipeline_per_tile_ms={pipeline_per_tile_ms:.3f}"
         )
 
-        self._init_perf_map_metrics()
+        perf.registry.reset("map.")
 
     def _setup_layout_grid(self):
         self.layout.setColumnMinimumWidth(0, 40)
@@ -360,7 +329,7 @@ class MapWidget(
 
         self._update_display_running = True
         try:
-            self._perf_map_calls += 1
+            self._perf_map_calls.inc()
             display_key, overlay_map = self._build_display_key()
             prev_display_key = self._last_display_key
             redraw_reasons = []
@@ -372,14 +341,13 @@ class MapWidget(
             else:
                 redraw_reasons = self._get_redraw_reasons(overlay_map)
                 if not redraw_reasons:
-                    self._perf_map_skip_reason_counts.update(["display_stable"])
-                    self._perf_map_skip += 1
+                    self._count_perf_map_reasons("skip", ["display_stable"])
+                    self._perf_map_skip.inc()
                     self._maybe_log_perf_map_window()
                     return
 
-            self._perf_map_exec_reason_counts.update([exec_reason])
-            if redraw_reasons:
-                self._perf_map_redraw_reason_counts.update(redraw_reasons)
+            self._count_perf_map_reasons("exec", [exec_reason])
+            self._count_perf_map_reasons("redraw", redraw_reasons)
 
             update_start = time.perf_counter()
             draw_elapsed_ms = 0.0
@@ -466,16 +434,16 @@ class MapWidget(
             self._last_display_key = display_key
 
             update_elapsed_ms = (time.perf_counter() - update_start) * 1000.0
-            self._perf_map_exec += 1
-            self._perf_map_update_ms.append(update_elapsed_ms)
-            self._perf_map_draw_ms_sum += draw_elapsed_ms
-            self._perf_map_track_ms_sum += track_elapsed_ms
-            self._perf_map_track_fetch_ms_sum += track_fetch_elapsed_ms
-            self._perf_map_track_render_ms_sum += track_render_elapsed_ms
-            self._perf_map_prepare_ms_sum += prepare_elapsed_ms
-            self._perf_map_instruction_ms_sum += instruction_elapsed_ms
-            self._perf_map_hud_ms_sum += hud_elapsed_ms
-            self._perf_map_load_course_ms_sum += load_course_elapsed_ms
+            stages = self._perf_map_stages
+            stages["draw"].observe(draw_elapsed_ms)
+            stages["track"].observe(track_elapsed_ms)
+            stages["track_fetch"].observe(track_fetch_elapsed_ms)
+            stages["track_render"].observe(track_render_elapsed_ms)
+            stages["prepare"].observe(prepare_elapsed_ms)
+            stages["instruction"].observe(instruction_elapsed_ms)
+            stages["hud"].observe(hud_elapsed_ms)
+            stages["load_course"].observe(load_course_elapsed_ms)
+            self._perf_map_update.observe(update_elapsed_ms)
             self._maybe_log_perf_map_window()
         finally:
             self._update_display_running = False
@@ -1,5 +1,3 @@
-import asyncio
-
 import numpy as np
 
 from modules.app_logger import app_logger
@@ -7,7 +5,6 @@ from modules._qt_qtwidgets import QtCore, QtGui, QtWidgets, pg, qasync
 from modules.helper.maptile import get_wind_color
 from modules.pyqt.graph.pyqtgraph.CoursePlotItem import CoursePlotItem
 from modules.pyqt.graph.pyqtgraph.WindVaneItem import WindVaneItem
-from modules.utils.crdp import rdp
 from modules.utils.geo import get_mod_lat, get_mod_lat_np
 from modules.utils.timer import Timer, log_timers
 
@@ -38,23 +35,17 @@ class MapCourseMixin:
     course_point_marker_border_color = (0, 0, 0, 220)
     course_point_marker_border_width = 1
 
-    # tracks
+    # tracks: the committed (simplified) points and the raw tail of the logger
     track_history_lon = []
     track_history_lat = []
-    track_history_raw_lon = []
-    track_history_raw_lat = []
     track_tail_lon = []
     track_tail_lat = []
     track_last_lon_pos = None
     track_last_lat_pos = None
-    track_timestamp = None
+    # (generation, count, committed) of the logger track already read
+    track_cursor = None
     track_history_needs_redraw = True
     track_tail_needs_redraw = True
-    track_tail_limit = 320
-    track_history_rdp_interval = 900
-    track_history_rdp_last_source_len = 0
-    track_history_rdp_running = False
-    track_history_rdp_task = None
 
     course_plot = None
     plot_verification = None
@@ -388,136 +379,47 @@ class MapCourseMixin:
             self.plot.addItem(vane)
 
     def get_track(self):
-        track_updated = False
-        (self.track_timestamp, lon, lat) = self.logger.update_track(
-            self.track_timestamp
+        cursor = self.track_cursor
+        if not self.logger.track_history.has_new_points(cursor):
+            return False
+        (self.track_cursor, lon, lat, tail_lon, tail_lat) = self.logger.update_track(
+            cursor
         )
-        if len(lon) and len(lat):
-            lon_new = np.asarray(lon, dtype=np.float32)
-            lat_new = np.asarray(lat, dtype=np.float32)
-            self.track_last_lon_pos = float(lon_new[-1])
-            self.track_last_lat_pos = float(lat_new[-1])
-            self.track_tail_lon.extend(lon_new.tolist())
-            self.track_tail_lat.extend(lat_new.tolist())
-            track_updated = True
-            self.track_tail_needs_redraw = True
-            self._compact_track_tail()
-            self._queue_track_history_rdp()
-
-        return track_updated
-
-    def _compact_track_tail(self):
-        if len(self.track_tail_lon) <= self.track_tail_limit:
-            return
-
-        # Keep half of the tail window and move the older half into history.
-        tail_keep = max(1, self.track_tail_limit // 2)
-        move_count = len(self.track_tail_lon) - tail_keep
-        if move_count <= 0:
-            return
-
-        moved_lon = self.track_tail_lon[:move_count]
-        moved_lat = self.track_tail_lat[:move_count]
-        del self.track_tail_lon[:move_count]
-        del self.track_tail_lat[:move_count]
-
-        self.track_history_raw_lon.extend(moved_lon)
-        self.track_history_raw_lat.extend(moved_lat)
-        # Reflect newly moved points immediately; background RDP will compact later.
-        self.track_history_lon.extend(moved_lon)
-        self.track_history_lat.extend(moved_lat)
-        self.track_history_needs_redraw = True
+        if cursor is None or cursor[0] != self.track_cursor[0]:
+            # the first read, or the logger track was cleared: the whole
+            # track is read from the beginning
+            track_cursor = self.track_cursor
+            self.reset_track()
+            self.track_cursor = track_cursor
+        if len(lon):
+            self.track_history_lon.extend(lon.tolist())
+            self.track_history_lat.extend(lat.tolist())
+            self.track_history_needs_redraw = True
+        self.track_tail_lon = tail_lon.tolist()
+        self.track_tail_lat = tail_lat.tolist()
         self.track_tail_needs_redraw = True
+        if len(self.track_tail_lon):
+            self.track_last_lon_pos = self.track_tail_lon[-1]
+            self.track_last_lat_pos = self.track_tail_lat[-1]
+        elif len(self.track_history_lon):
+            self.track_last_lon_pos = self.track_history_lon[-1]
+            self.track_last_lat_pos = self.track_history_lat[-1]
 
-    def _queue_track_history_rdp(self):
-        raw_len = len(self.track_history_raw_lon)
-        # Start RDP after raw history reaches half of the interval threshold.
-        rdp_min_points = max(3, self.track_history_rdp_interval // 2)
-        if raw_len < rdp_min_points:
-            return
-        if self.track_history_rdp_running:
-            return
-        if (
-            raw_len - self.track_history_rdp_last_source_len
-            < self.track_history_rdp_interval
-        ):
-            return
-
-        try:
-            loop = asyncio.get_running_loop()
-        except RuntimeError:
-            return
-
-        source_len = raw_len
-        raw_lon = np.asarray(self.track_history_raw_lon, dtype=np.float32)
-        raw_lat = np.asarray(self.track_history_raw_lat, dtype=np.float32)
-        self.track_history_rdp_last_source_len = source_len
-        self.track_history_rdp_running = True
-        self.track_history_rdp_task = loop.create_task(
-            self._run_track_history_rdp(raw_lon, raw_lat, source_len)
-        )
-
-    async def _run_track_history_rdp(self, raw_lon, raw_lat, source_len):
-        def simplify_track(lon_values, lat_values):
-            if len(lon_values) < 3:
-                return lon_values.tolist(), lat_values.tolist()
-            try:
-                cond = np.array(
-                    rdp(
-                        np.column_stack([lon_values, lat_values]),
-                        epsilon=0.0001,
-                        return_mask=True,
-                    )
-                )
-                return lon_values[cond].tolist(), lat_values[cond].tolist()
-            except Exception:
-                return lon_values.tolist(), lat_values.tolist()
-
-        try:
-            simplified_lon, simplified_lat = await asyncio.to_thread(
-                simplify_track,
-                raw_lon,
-                raw_lat,
-            )
-            if source_len < len(self.track_history_raw_lon):
-                simplified_lon.extend(self.track_history_raw_lon[source_len:])
-                simplified_lat.extend(self.track_history_raw_lat[source_len:])
-            # Keep history source compact for subsequent async RDP passes.
-            self.track_history_raw_lon = simplified_lon.copy()
-            self.track_history_raw_lat = simplified_lat.copy()
-            self.track_history_lon = simplified_lon
-            self.track_history_lat = simplified_lat
-            self.track_history_needs_redraw = True
-            self.track_history_rdp_last_source_len = len(self.track_history_raw_lon)
-        except asyncio.CancelledError:
-            raise
-        finally:
-            self.track_history_rdp_running = False
-            self.track_history_rdp_task = None
+        return True
 
     def reset_track(self):
-        if (
-            self.track_history_rdp_task is not None
-            and not self.track_history_rdp_task.done()
-        ):
-            self.track_history_rdp_task.cancel()
-
         for attr_name, value in (
             ("track_history_lon", []),
             ("track_history_lat", []),
-            ("track_history_raw_lon", []),
-            ("track_history_raw_lat", []),
             ("track_tail_lon", []),
             ("track_tail_lat", []),
             ("track_last_lon_pos", None),
             ("track_last_lat_pos", None),
+            ("track_cursor", None),
         ):
             setattr(self, attr_name, value)
         self.track_history_needs_redraw = True
         self.track_tail_needs_redraw = True
-        self.track_history_rdp_running = False
-        self.track_history_rdp_task = None
-        self.track_history_rdp_last_source_len = 0
 
         if getattr(self, "track_history_plot", None) is not None:
             self.track_history_plot.setData([], [])
@@ -475,12 +475,10 @@ class MapStateMixin:
             reasons.append("move_x")
         if self.move_pos["y"] != 0:
             reasons.append("move_y")
-        if self.track_timestamp is None:
+        if self.track_cursor is None:
             reasons.append("track_init")
-        if not self.logger.short_log_available:
-            reasons.append("short_log_unavailable")
-        if len(self.logger.short_log_lat):
-            reasons.append("short_log_pending")
+        if self.logger.track_history.has_new_points(self.track_cursor):
+            reasons.append("track_pending")
         if self.pre_zoomlevel.get(self.config.G_MAP) != self.zoomlevel:
             reasons.append("zoom_changed")
         if not main_drawn:
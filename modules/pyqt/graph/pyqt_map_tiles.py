@@ -1,8 +1,5 @@
 import io
 from collections import OrderedDict
-import shutil
-import sqlite3
-import tempfile
 import time
 
 import numpy as np
@@ -10,13 +7,15 @@ from PIL import Image, ImageEnhance
 
 from modules._qt_qtwidgets import QT_COMPOSITION_MODE_DARKEN, pg
 from modules.helper.maptile import conv_image
-from modules.utils.cmd import exec_cmd
+from modules.utils.dither import Palette, dither
 from modules.utils.geo import get_mod_lat
 from modules.utils.map import (
     get_lon_lat_from_tile_xy,
     get_maptile_filename,
     get_tilexy_and_xy_in_tile,
 )
+from modules.utils.mbtiles import get_mbtiles_reader
+from modules.utils.tile_cache import TileBitmapCache
 
 
 class MapTileMixin:
@@ -28,9 +27,14 @@ class MapTileMixin:
     _tile_draw_pending = {}
     _tile_item_lru = OrderedDict()
     tile_item_lru_max = 384
+    # decoded tiles shared across redraws, zoom changes and overlay toggles
+    _tile_bitmap_cache = TileBitmapCache(24 * 1024 * 1024)
     tile_batch_size_main = 3
     tile_batch_size_overlay = 2
     tile_modify_mode = 0
+    # edm (Floyd-Steinberg error diffusion) or ordered (Bayer, faster)
+    tile_dither_method = "edm"
+    _tile_dither_palette = {}
     tile_didder_pallete = {
         2: "000000 FFFFFF",
         8: None,
@@ -76,15 +80,17 @@ class MapTileMixin:
         return " ".join(colors)
 
     def _setup_tile_dither_palette(self):
-        if not shutil.which("didder"):
-            return
-
         palette8 = self._palette_rgb_multilevel(2)
         palette64 = self._palette_rgb_multilevel(4)
         if palette8:
             self.tile_didder_pallete[8] = palette8
         if palette64:
             self.tile_didder_pallete[64] = palette64
+        self._tile_dither_palette = {
+            color: Palette(palette)
+            for color, palette in self.tile_didder_pallete.items()
+            if palette
+        }
 
     def _init_tile_runtime_state(self):
         if not isinstance(self._tile_view_signature, dict):
@@ -318,8 +324,11 @@ class MapTileMixin:
         tile_drawn_count = 0
         tile_reused_count = 0
         tile_retry_count = 0
+        tile_cache_hit_count = 0
+        tile_cache_miss_count = 0
 
-        tile_size = map_config[map_name]["tile_size"]
+        map_settings = map_config[map_name]
+        tile_size = map_settings["tile_size"]
 
         # Always resolve the current viewport first.
         z_draw, z_conv_factor, tile_x, tile_y = self.init_draw_map(
@@ -390,12 +399,7 @@ class MapTileMixin:
             )
             tile_download_elapsed_ms += (time.perf_counter() - download_start) * 1000.0
             tile_download_calls += 1
-
-        if use_mbtiles:
-            self.con = sqlite3.connect(
-                f"file:./maptile/{map_name}.mbtiles?mode=ro", uri=True
-            )
-            self.cur = self.con.cursor()
+            self.config.network.tile_prefetcher.set_view(map_config, map_name, z_draw)
 
         try:
             check_start = time.perf_counter()
@@ -436,6 +440,55 @@ class MapTileMixin:
             map_items = self._get_map_tile_items(map_name)
             w_h = int(tile_size / z_conv_factor) if expand else 0
             drawn_any = False
+
+            # decode the cache misses together so that enhancement runs as a batch
+            prepared = {}
+            decode_keys = []
+            for keys in draw_keys:
+                if (z, keys[0], keys[1]) in map_items:
+                    continue
+                imgarray = self._tile_bitmap_cache.get(
+                    self._tile_bitmap_cache_key(
+                        map_name, map_settings, z, keys, tile_modify_mode
+                    )
+                )
+                if imgarray is not None:
+                    prepared[keys] = imgarray
+                    tile_cache_hit_count += 1
+                else:
+                    decode_keys.append(keys)
+            if decode_keys:
+                decoded, io_ms, conv_ms = self.decode_tile_images(
+                    use_mbtiles,
+                    map_config,
+                    map_name,
+                    z_draw,
+                    expand,
+                    pending_state["expand_keys"],
+                    w_h,
+                    decode_keys,
+                )
+                tile_io_elapsed_ms += io_ms
+                tile_conv_elapsed_ms += conv_ms
+                tile_cache_miss_count += len(decoded)
+                for keys, imgarray in decoded.items():
+                    source = None
+                    if not use_mbtiles:
+                        x, y = keys
+                        if expand:
+                            x, y = pending_state["expand_keys"].get(keys, keys)[0:2]
+                        source = get_maptile_filename(
+                            map_name, z_draw, x, y, map_settings
+                        )
+                    self._tile_bitmap_cache.put(
+                        self._tile_bitmap_cache_key(
+                            map_name, map_settings, z, keys, tile_modify_mode
+                        ),
+                        imgarray,
+                        source=source,
+                    )
+                    prepared[keys] = imgarray
+
             for keys in draw_keys:
                 if (z, keys[0], keys[1]) in map_items:
                     self._mark_tile_drawn(map_name, z, keys[0], keys[1])
@@ -443,51 +496,16 @@ class MapTileMixin:
                     tile_reused_count += 1
                     continue
 
-                x, y = (
-                    keys[0:2]
-                    if not expand
-                    else pending_state["expand_keys"].get(keys, keys)[0:2]
-                )
+                imgarray = prepared.get(keys)
+                if imgarray is None:
+                    # not downloaded or not decodable yet
+                    pending_state["queue"].append(keys)
+                    pending_state["key_set"].add(keys)
+                    tile_retry_count += 1
+                    continue
 
                 try:
-                    img_file = self.get_image_file(
-                        use_mbtiles, map_config, map_name, z_draw, x, y
-                    )
-
-                    io_start = time.perf_counter()
-                    if not expand:
-                        img_pil = Image.open(img_file).convert("RGBA")
-                    else:
-                        expand_val = pending_state["expand_keys"].get(keys)
-                        if expand_val is None:
-                            pending_state["queue"].append(keys)
-                            pending_state["key_set"].add(keys)
-                            continue
-                        x_start, y_start = int(w_h * expand_val[2]), int(
-                            w_h * expand_val[3]
-                        )
-                        img_pil = (
-                            Image.open(img_file)
-                            .crop((x_start, y_start, x_start + w_h, y_start + w_h))
-                            .convert("RGBA")
-                        )
-                    tile_io_elapsed_ms += (time.perf_counter() - io_start) * 1000.0
-
-                    if (
-                        map_config == self.config.G_MAP_CONFIG
-                        and self.tile_modify_mode != 0
-                    ):
-                        img_pil = self.enhance_image(img_pil)
-
-                    conv_start = time.perf_counter()
-                    if map_name.startswith(("jpn_scw", "jpn_jma_bousai")):
-                        imgarray = conv_image(img_pil, map_name)
-                    else:
-                        imgarray = np.asarray(img_pil)
-                    tile_conv_elapsed_ms += (time.perf_counter() - conv_start) * 1000.0
-
                     imgitem_start = time.perf_counter()
-                    imgarray = np.rot90(imgarray, -1)
                     imgitem = pg.ImageItem(imgarray, levels=(0, 255))
                     if overlay:
                         imgitem.setCompositionMode(QT_COMPOSITION_MODE_DARKEN)
@@ -546,10 +564,82 @@ class MapTileMixin:
                     drawn_count=tile_drawn_count,
                     reused_count=tile_reused_count,
                     retry_count=tile_retry_count,
+                    cache_hit_count=tile_cache_hit_count,
+                    cache_miss_count=tile_cache_miss_count,
+                    cache_bytes=self._tile_bitmap_cache.bytes,
+                )
+
+    @staticmethod
+    def _tile_bitmap_cache_key(map_name, map_settings, z, keys, tile_modify_mode):
+        # weather overlays change their tiles with basetime and validtime,
+        # as the tile filenames of get_maptile_filename do
+        return (
+            map_name,
+            map_settings.get("basetime"),
+            map_settings.get("validtime"),
+            z,
+            keys[0],
+            keys[1],
+            tile_modify_mode,
+        )
+
+    def _drop_downloaded_tile_bitmaps(self, save_paths):
+        # a tile file downloaded again (e.g. a refreshed heatmap) is decoded again
+        for save_path in save_paths:
+            self._tile_bitmap_cache.pop_source(save_path)
+
+    def decode_tile_images(
+        self,
+        use_mbtiles,
+        map_config,
+        map_name,
+        z_draw,
+        expand,
+        expand_keys,
+        w_h,
+        keys_list,
+    ):
+        # return ({keys: rotated RGBA array}, io_ms, conv_ms)
+        # tiles which can not be read yet are left out to be retried
+        io_start = time.perf_counter()
+        img_pils = {}
+        for keys in keys_list:
+            x, y = keys if not expand else expand_keys.get(keys, keys)[0:2]
+            try:
+                img_file = self.get_image_file(
+                    use_mbtiles, map_config, map_name, z_draw, x, y
                 )
-            if use_mbtiles:
-                self.cur.close()
-                self.con.close()
+                if not expand:
+                    img_pils[keys] = Image.open(img_file).convert("RGBA")
+                    continue
+                expand_val = expand_keys.get(keys)
+                if expand_val is None:
+                    continue
+                x_start, y_start = int(w_h * expand_val[2]), int(w_h * expand_val[3])
+                img_pils[keys] = (
+                    Image.open(img_file)
+                    .crop((x_start, y_start, x_start + w_h, y_start + w_h))
+                    .convert("RGBA")
+                )
+            except Exception:
+                continue
+        io_ms = (time.perf_counter() - io_start) * 1000.0
+
+        conv_start = time.perf_counter()
+        if map_config == self.config.G_MAP_CONFIG and self.tile_modify_mode != 0:
+            img_pils = dict(
+                zip(img_pils.keys(), self.enhance_images(list(img_pils.values())))
+            )
+
+        decoded = {}
+        for keys, img_pil in img_pils.items():
+            if map_name.startswith(("jpn_scw", "jpn_jma_bousai")):
+                imgarray = conv_image(img_pil, map_name)
+            else:
+                imgarray = np.asarray(img_pil)
+            decoded[keys] = np.rot90(imgarray, -1)
+        conv_ms = (time.perf_counter() - conv_start) * 1000.0
+        return decoded, io_ms, conv_ms
 
     @staticmethod
     def init_draw_map(map_config, map_name, z, p0, p1, expand, tile_size):
@@ -599,6 +689,16 @@ class MapTileMixin:
         map_settings = map_config[map_name]
         drawn_tiles = self.drawn_tile.get(map_name, {}).get(z, {})
 
+        mbtiles_keys = None
+        if use_mbtiles:
+            # one range query instead of a lookup per tile
+            x0, x1, y0, y1 = tile_x[0], tile_x[1], tile_y[0], tile_y[1]
+            if expand:
+                x0, x1, y0, y1 = (v // z_conv_factor for v in (x0, x1, y0, y1))
+            mbtiles_keys = self.get_mbtiles_reader(
+                map_name, map_settings
+            ).get_existing_tiles(z_draw, x0, x1, y0, y1)
+
         for i, j in self._iter_visible_tile_coords(tile_x, tile_y):
             drawn_tile_key = self._drawn_tile_key(i, j)
             if drawn_tile_key in drawn_tiles:
@@ -613,7 +713,10 @@ class MapTileMixin:
                 pixel_y, y_start = divmod(j, z_conv_factor)
                 exist_tile_key = (pixel_x, pixel_y)
 
-            if not self.check_tile(
+            if mbtiles_keys is not None:
+                if exist_tile_key not in mbtiles_keys:
+                    continue
+            elif not self.check_tile(
                 use_mbtiles,
                 map_name,
                 z_draw,
@@ -632,57 +735,52 @@ class MapTileMixin:
         if not use_mbtiles:
             filename = get_maptile_filename(map_name, z_draw, *key, map_settings)
             return self.maptile_with_values.check_existing_tiles(filename)
-        sql = (
-            "select count(*) from tiles where "
-            f"zoom_level={z_draw} and tile_column={key[0]} "
-            f"and tile_row={2**z_draw - 1 - key[1]}"
+        return self.get_mbtiles_reader(map_name, map_settings).has_tile(
+            z_draw, *key
         )
-        return (self.cur.execute(sql).fetchone())[0] == 1
 
     def get_image_file(self, use_mbtiles, map_config, map_name, z_draw, x, y):
         if not use_mbtiles:
             map_settings = map_config[map_name]
             return get_maptile_filename(map_name, z_draw, x, y, map_settings)
-        sql = (
-            "select tile_data from tiles where "
-            f"zoom_level={z_draw} and tile_column={x} and tile_row={2**z_draw - 1 - y}"
-        )
-        return io.BytesIO((self.cur.execute(sql).fetchone())[0])
+        reader = self.get_mbtiles_reader(map_name, map_config[map_name])
+        return io.BytesIO(reader.get_tile(z_draw, x, y))
+
+    @staticmethod
+    def get_mbtiles_reader(map_name, map_settings):
+        # mmap_size [byte] can be set per map in map.yaml
+        return get_mbtiles_reader(map_name, map_settings.get("mmap_size", 0))
 
-    def enhance_image(self, img_pil):
+    def enhance_images(self, img_pils):
         # 0: None
         # 1: pil
-        # 2: didder
-        # 3: pil + didder
+        # 2: dither
+        # 3: pil + dither
 
         if self.tile_modify_mode in [1, 3]:
-            img_pil = ImageEnhance.Contrast(img_pil).enhance(2.0)
-
-        with tempfile.NamedTemporaryFile(suffix=".png") as tmp_file:
-            filename = tmp_file.name
-
-            if self.tile_modify_mode in [2, 3] and shutil.which("didder"):
-                img_pil.save(filename)
-                exec_cmd(
-                    [
-                        "didder",
-                        "-i",
-                        filename,
-                        "-o",
-                        filename,
-                        "--strength",
-                        "0.8",
-                        "--palette",
-                        self.tile_didder_pallete[self.config.display.color],
-                        "edm",
-                        "--serpentine",
-                        "FloydSteinberg",
-                    ],
-                    cmd_print=False,
-                )
-                img_pil = Image.open(filename).convert("RGBA")
-
-        return img_pil
+            img_pils = [
+                ImageEnhance.Contrast(img_pil).enhance(2.0) for img_pil in img_pils
+            ]
+
+        palette = self._tile_dither_palette.get(self.config.display.color)
+        if self.tile_modify_mode not in [2, 3] or palette is None:
+            return img_pils
+
+        # dither tiles of the same size in one batch
+        arrays = [np.asarray(img_pil) for img_pil in img_pils]
+        results = list(img_pils)
+        for shape in {a.shape for a in arrays}:
+            index = [i for i, a in enumerate(arrays) if a.shape == shape]
+            batch = np.stack([arrays[i] for i in index])
+            batch[..., :3] = dither(
+                batch[..., :3],
+                palette,
+                method=self.tile_dither_method,
+                strength=0.8,
+            )
+            for i, rgba in zip(index, batch):
+                results[i] = Image.fromarray(rgba)
+        return results
 
     def modify_map_tile(self):
         if self.tile_modify_mode == 3:
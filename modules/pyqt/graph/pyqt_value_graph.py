@@ -185,7 +185,9 @@ class PerformanceGraphWidget(ScreenWidget):
 
         secondary_key = self.item[self.display_item[1]]["graph_key"]
         if not all_nan[secondary_key]:
-            self.secondary_curve.setData(self.sensor.values["integrated"][secondary_key])
+            self.secondary_curve.setData(
+                self.sensor.values["integrated"][secondary_key].view()
+            )
         else:
             self.secondary_curve.setData([])
 
@@ -267,7 +269,7 @@ class AccelerationGraphWidget(ScreenWidget):
         Y = 1
         Z = 2
 
-        v = self.sensor.sensor_i2c.graph_values["g_acc"]
+        v = self.sensor.sensor_i2c.graph_values["g_acc"].view()
         all_nan = {X: True, Y: True, Z: True}
         for key in all_nan.keys():
             chk = np.isnan(v[key])
@@ -360,7 +362,10 @@ class AltitudeGraphWidget(ScreenWidget):
     async def update_display(self):
         super().update_display()
 
-        v = self.sensor.values["integrated"]
+        v = {
+            key: self.sensor.values["integrated"][key].view()
+            for key in ("altitude_graph", "altitude_gps_graph")
+        }
         all_nan = {"altitude_graph": True, "altitude_gps_graph": True}
         for key in all_nan.keys():
             chk = np.isnan(v[key])
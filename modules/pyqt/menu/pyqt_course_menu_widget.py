@@ -263,13 +263,13 @@ class CourseListWidget(ListWidget):
             self.config.gui.show_dialog(self.set_new_course, "Set this course?")
 
     def cancel_and_set_new_course(self):
-        self.parentWidget().widget(
+        self.config.gui.get_stack_widget(
             self.config.gui.gui_config.G_GUI_INDEX[self.back_index_key]
         ).cancel_course(replace=True)
         self.set_new_course()
 
     def set_new_course(self):
-        self.parentWidget().widget(
+        self.config.gui.get_stack_widget(
             self.config.gui.gui_config.G_GUI_INDEX[self.back_index_key]
         ).set_new_course(self.course_file)
         self.back()
@@ -679,7 +679,7 @@ class CourseDetailWidget(MenuWidget):
 
     def set_course(self):
         index = self.config.gui.gui_config.G_GUI_INDEX["Courses List"]
-        self.parentWidget().widget(index).set_course(
+        self.config.gui.get_stack_widget(index).set_course(
             (
                 self.config.G_RIDEWITHGPS_API["URL_ROUTE_DOWNLOAD_DIR"]
                 + "course-{route_id}.tcx"
@@ -1,5 +1,6 @@
 import asyncio
 
+from modules.utils import mbtiles
 from .pyqt_menu_widget import MenuWidget, ListWidget
 
 
@@ -36,7 +37,10 @@ class MapListWidget(ListWidget):
         self.config.G_MAP = self.selected_item.title
         # reset map
         self.config.check_map_dir()
-        self.config.gui.map_widget.reset_map()
+        mbtiles.close_all()
+        # a map which is not built yet starts with the new settings
+        if self.config.gui.is_map_built():
+            self.config.gui.map_widget.reset_map()
 
 
 class MapOverlayMenuWidget(MenuWidget):
@@ -76,7 +80,7 @@ class MapOverlayMenuWidget(MenuWidget):
             elif overlay_type == "Wind map":
                 self.config.G_USE_WIND_OVERLAY_MAP = not status
             status = not status
-            if self.config.display.has_touch:
+            if self.config.display.has_touch and self.config.gui.is_map_built():
                 self.config.gui.map_widget.enable_overlay_button()
 
         self.buttons[overlay_type].change_toggle(status)
@@ -88,7 +92,7 @@ class MapOverlayMenuWidget(MenuWidget):
             not self.config.G_USE_HEATMAP_OVERLAY_MAP
             and not self.config.G_USE_RAIN_OVERLAY_MAP
             and not self.config.G_USE_WIND_OVERLAY_MAP
-            and self.config.gui.map_widget is not None
+            and self.config.gui.is_map_built()
         ):
             self.config.gui.map_widget.remove_overlay()
 
@@ -115,7 +119,9 @@ class HeatmapListWidget(ListWidget):
         self.config.G_HEATMAP_OVERLAY_MAP = self.selected_item.title
         # reset map
         self.config.check_map_dir()
-        self.config.gui.map_widget.reset_map()
+        # a map which is not built yet starts with the new settings
+        if self.config.gui.is_map_built():
+            self.config.gui.map_widget.reset_map()
         # update strava cookie
         if "strava_heatmap" in self.config.G_HEATMAP_OVERLAY_MAP:
             asyncio.get_running_loop().run_in_executor(
@@ -136,7 +142,9 @@ class RainmapListWidget(ListWidget):
         self.config.G_RAIN_OVERLAY_MAP = self.selected_item.title
         # reset map
         self.config.check_map_dir()
-        self.config.gui.map_widget.reset_map()
+        # a map which is not built yet starts with the new settings
+        if self.config.gui.is_map_built():
+            self.config.gui.map_widget.reset_map()
 
 
 class WindmapListWidget(ListWidget):
@@ -152,7 +160,9 @@ class WindmapListWidget(ListWidget):
         self.config.G_WIND_OVERLAY_MAP = self.selected_item.title
         # reset map
         self.config.check_map_dir()
-        self.config.gui.map_widget.reset_map()
+        # a map which is not built yet starts with the new settings
+        if self.config.gui.is_map_built():
+            self.config.gui.map_widget.reset_map()
 
 
 class ExternalDataSourceMenuWidget(MenuWidget):
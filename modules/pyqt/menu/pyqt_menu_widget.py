@@ -190,7 +190,7 @@ class MenuWidget(QtWidgets.QWidget):
     def change_page(self, page, preprocess=False, **kwargs):
         # always set back index
         index = self.config.gui.gui_config.G_GUI_INDEX[page]
-        widget = self.parentWidget().widget(index)
+        widget = self.config.gui.get_stack_widget(index)
         widget.back_index_key = self.page_name
 
         if preprocess:
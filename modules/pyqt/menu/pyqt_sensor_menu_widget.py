@@ -74,17 +74,15 @@ class I2CMenuWidget(MenuWidget):
         self.buttons["Auto Light"].change_toggle(self.config.G_ANT["USE_AUTO_LIGHT"])
 
     def onoff_map_heading(self, change=True):
-        map_widget = self.config.gui.map_widget
-        if map_widget is None:
+        gui = self.config.gui
+        if gui.map_widget is None:
             self.buttons[self.MAP_HEADING_BUTTON].change_toggle(False)
             return
 
         if change:
-            map_widget.set_map_track_source(
-                not map_widget.use_i2c_heading_for_map_track
-            )
+            gui.set_map_use_i2c_heading(not gui.get_map_use_i2c_heading())
         self.buttons[self.MAP_HEADING_BUTTON].change_toggle(
-            map_widget.use_i2c_heading_for_map_track
+            gui.get_map_use_i2c_heading()
         )
 
     def calib_mag(self):
@@ -369,7 +367,7 @@ class ANTListWidget(ListWidget):
         gui_index = self.config.gui.gui_config.G_GUI_INDEX
         if back_index_key in gui_index:
             index = gui_index[back_index_key]
-            self.parentWidget().widget(index).update_button_label()
+            self.config.gui.get_stack_widget(index).update_button_label()
         else:
             app_logger.warning(
                 f"on_back_menu skipped update: back_index_key {back_index_key} missing in G_GUI_INDEX"
@@ -72,6 +72,9 @@ class Item(QtWidgets.QVBoxLayout):
         self.value = ItemValue(right_flag, bottom_flag)
         self.itemformat = self.config.gui.gui_config.G_ITEM_DEF[name][0][0]
         self.unittext = self.config.gui.gui_config.G_ITEM_DEF[name][0][1]
+        self.format_value = self.config.gui.gui_config.get_formatter(
+            name, self.itemformat
+        )
         value_font_scale_map = self.config.gui.gui_config.G_ITEM_VALUE_FONT_SCALE
         self.value_font_scale = value_font_scale_map.get(self.name, 1.0)
         self._unit_suffix = ""
@@ -84,15 +87,11 @@ class Item(QtWidgets.QVBoxLayout):
         self.update_value(np.nan)
 
     def update_value(self, value):
-        base_text = self.config.gui.gui_config.format_text(
-            self.name,
-            value,
-            self.config.G_STOPWATCH_STATUS,
-            self.itemformat,
+        new_text = (
+            self.format_value(value, self.config.G_STOPWATCH_STATUS)
+            + self._unit_suffix
         )
 
-        new_text = base_text + self._unit_suffix
-
         # Skip updates when text is unchanged to avoid needless repaints
         if new_text == self._last_value_text:
             return
@@ -0,0 +1,63 @@
+import time
+
+from modules.app_logger import app_logger
+from modules._qt_qtwidgets import QtWidgets
+
+
+class LazyWidget(QtWidgets.QWidget):
+    """Placeholder of a page of a QStackedWidget, built on first use.
+
+    factory(parent) makes the real widget, which takes the place of the
+    placeholder in the stack; on_build(widget) is called after that (e.g. to
+    set an attribute of the gui). Until then the placeholder stands for the
+    widget in the stack only: start() builds it, and the callers check
+    is_built() before calling methods of the page.
+    """
+
+    def __init__(self, stack, name, factory, on_build=None):
+        super().__init__(stack)
+        self._stack = stack
+        self._name = name
+        self._factory = factory
+        self._on_build = on_build
+        self._widget = None
+
+    def build(self):
+        if self._widget is not None:
+            return self._widget
+
+        t = time.perf_counter()
+        stack = self._stack
+        index = stack.indexOf(self)
+        is_current = stack.currentWidget() is self
+        widget = self._factory(stack)
+        # the swap must not emit currentChanged: on_change_main_page would
+        # stop and start pages again while this one is being built
+        blocked = stack.blockSignals(True)
+        try:
+            stack.insertWidget(index, widget)
+            if is_current:
+                stack.setCurrentWidget(widget)
+            stack.removeWidget(self)
+        finally:
+            stack.blockSignals(blocked)
+        self._widget = widget
+        if self._on_build is not None:
+            self._on_build(widget)
+        self.deleteLater()
+        app_logger.info(
+            f"[LazyWidget] {self._name}: {time.perf_counter() - t:.3f} sec"
+        )
+        return widget
+
+    # call from on_change_main_page in gui_pyqt.py
+    def start(self):
+        self.build().start()
+
+    # not shown yet, nothing to stop
+    def stop(self):
+        pass
+
+
+def is_built(widget):
+    return widget is not None and not isinstance(widget, LazyWidget)
@@ -1,10 +1,18 @@
+import ast
 from functools import partial
+from operator import attrgetter
 
 from modules.app_logger import app_logger
 from modules._qt_qtwidgets import QT_EXPANDING, QtCore, QtWidgets
 
 from .pyqt_item import Item
 
+# dicts kept for the whole run: number of keys from the root to the dict of the value
+VALUE_ROOTS = {
+    "self.sensor.values": 1,
+    "self.logger.values": 0,
+}
+
 
 class ScreenWidget(QtWidgets.QWidget):
     config = None
@@ -16,7 +24,8 @@ class ScreenWidget(QtWidgets.QWidget):
         self.item_layout = {}
         self.max_width = self.max_height = 0
         self.font_size = 20
-        self._value_getters = {}
+        # (item, dict, key, getter) resolved once in add_items
+        self._item_table = []
 
         if item_layout:
             self.item_layout = item_layout
@@ -102,6 +111,35 @@ class ScreenWidget(QtWidgets.QWidget):
         for i in range(self.max_width + 1):
             self.layout.setColumnMinimumWidth(i, w)
 
+    def _resolve_value_ref(self, expr):
+        """Return (dict, key) of expr like "self.sensor.values['GPS']['speed']".
+
+        Only constant keys under VALUE_ROOTS are resolved, otherwise None.
+        """
+        try:
+            node = ast.parse(expr, mode="eval").body
+        except SyntaxError:
+            return None
+        keys = []
+        while isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Constant):
+            keys.append(node.slice.value)
+            node = node.value
+        keys.reverse()
+
+        root = ast.unparse(node)
+        depth = VALUE_ROOTS.get(root)
+        if depth is None or len(keys) != depth + 1:
+            return None
+        try:
+            container = attrgetter(root.removeprefix("self."))(self)
+            for key in keys[:-1]:
+                container = container[key]
+        except (AttributeError, KeyError):
+            return None
+        if not isinstance(container, dict):
+            return None
+        return container, keys[-1]
+
     def _build_value_getter(self, expr):
         """Create a plain callable without per-frame eval/exec."""
         local_ns = {}
@@ -144,7 +182,11 @@ class ScreenWidget(QtWidgets.QWidget):
                     continue
 
                 expr = self.config.gui.gui_config.G_ITEM_DEF[key][1]
-                self._value_getters[key] = self._build_value_getter(expr)
+                value_ref = self._resolve_value_ref(expr)
+                if value_ref is not None:
+                    value_source = (*value_ref, None)
+                else:
+                    value_source = (None, None, self._build_value_getter(expr))
 
                 item = Item(
                     config=self.config,
@@ -154,23 +196,28 @@ class ScreenWidget(QtWidgets.QWidget):
                     right_flag=right_flag,
                 )
                 item.value_expr = expr
-                item.value_getter = self._value_getters[key]
+                item.value_source = value_source
 
                 self.items.append(item)
+                self._item_table.append((item, *value_source))
 
                 if len(pos) == 4:
                     self.layout.addLayout(item, pos[0], pos[1], pos[2], pos[3])
                 else:
                     self.layout.addLayout(item, pos[0], pos[1])
 
+    @staticmethod
+    def get_item_value(item):
+        container, key, getter = item.value_source
+        if getter is None:
+            return container[key]
+        return getter()
+
     # This handles by default items displays, but each screen can implement its own logic
     def update_display(self):
-        for item in self.items:
-            getter = getattr(item, "value_getter", None)
-            if getter is None:
-                continue
+        for item, container, key, getter in self._item_table:
             try:
-                value = getter()
+                value = container[key] if getter is None else getter()
             except KeyError:
                 continue
             except ValueError:
@@ -179,9 +226,6 @@ class ScreenWidget(QtWidgets.QWidget):
             except Exception:  # noqa
                 value = None
                 app_logger.exception(f"not found in items: {item.name}")
-                try:
-                    app_logger.exception(f"    {item.value_expr}")
-                except Exception:
-                    pass
+                app_logger.exception(f"    {item.value_expr}")
 
             item.update_value(value)
@@ -0,0 +1,225 @@
+"""Capture of raw ANT+ pages and their replay without a dongle.
+
+A capture file is MAGIC followed by fixed-size records of little endian
+(time [s since epoch]: f8, device number: u2, device type: u1, page: 8 bytes),
+one record for each broadcast page received by a paired sensor.
+
+ANT_ReplayNode stands for ant.easy.node.Node: the channels made by the
+ANT_Device classes get the pages of their device number and type, and
+ANT_Device.now() is the time of the page (shifted to the start of the
+replay), so the page handlers decode the same events, rollovers and
+dropouts as in the ride at any replay speed.
+"""
+
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from modules.app_logger import app_logger
+
+MAGIC = b"ANTCAP01"
+RECORD = struct.Struct("<dHB8s")
+RECORD_DTYPE = np.dtype(
+    [("t", "<f8"), ("id", "<u2"), ("type", "u1"), ("data", "u1", (8,))]
+)
+PAGE_SIZE = 8
+
+
+def read_capture(path):
+    """Return the records of a capture file as a structured array of RECORD_DTYPE."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an ANT+ capture file")
+        return np.fromfile(f, dtype=RECORD_DTYPE)
+
+
+class ANT_Capture:
+    """Append the pages of the paired sensors to a capture file."""
+
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        app_logger.info(f"ANT+ capture: {path}")
+
+    def wrap(self, ant_id, ant_type, on_data):
+        """Return on_data which writes each page before handling it."""
+
+        def on_data_captured(data):
+            self.write(ant_id, ant_type, data)
+            on_data(data)
+
+        return on_data_captured
+
+    def write(self, ant_id, ant_type, data, t=None):
+        # extended messages have the channel id after the page
+        if len(data) < PAGE_SIZE:
+            return
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(
+                RECORD.pack(
+                    time.time() if t is None else t,
+                    ant_id,
+                    ant_type,
+                    bytes(data[:PAGE_SIZE]),
+                )
+            )
+
+    def close(self):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.close()
+            self._file = None
+
+
+class ANT_ReplayChannel:
+    """Channel of ANT_ReplayNode, the configuration calls are accepted and ignored."""
+
+    def __init__(self, node, number):
+        self.node = node
+        self.number = number
+        self.is_open = False
+        self.on_broadcast_data = None
+        self.on_burst_data = None
+        self.on_acknowledge_data = None
+        self.on_broadcast_tx_data = None
+
+    def set_id(self, device_num, device_type, transmission_type):
+        self.node.register_channel(self, (device_num, device_type))
+
+    def open(self):
+        self.is_open = True
+
+    def open_rx_scan_mode(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+    def get_channel_status(self):
+        # Channel State: Assigned = 1, Tracking = 3
+        return (self.number, 0x52, bytes([3 if self.is_open else 1]))
+
+    def wait_for_event(self, ok_codes):
+        pass
+
+    def set_period(self, period):
+        pass
+
+    def set_search_timeout(self, timeout):
+        pass
+
+    def set_low_priority_search_timeout(self, timeout):
+        pass
+
+    def set_rf_freq(self, rf_freq):
+        pass
+
+    def enable_extended_messages(self, enable):
+        pass
+
+    def send_broadcast_data(self, data):
+        pass
+
+    def send_acknowledged_data_with_retry(self, data, *args, **kwargs):
+        pass
+
+
+class ANT_ReplayNode:
+    """Feed the pages of a capture file to the channels at speed times real time.
+
+    speed <= 0 replays as fast as possible with the times of the capture, for
+    offline decoding and regression checks.
+    """
+
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+        self.records = read_capture(path)
+        self.channels = {}
+        self._channel_number = 0
+        self._stop_event = threading.Event()
+        self._now = None
+        # ANT_Device.set_wait() calls node.ant.set_wait()
+        self.ant = self
+        app_logger.info(
+            f"ANT+ replay: {path}, {len(self.records)} pages, speed: {speed}"
+        )
+
+    @property
+    def devices(self):
+        """(device number, device type) of the sensors in the capture."""
+        records = self.records
+        return sorted(set(zip(records["id"].tolist(), records["type"].tolist())))
+
+    def now(self):
+        if self._now is None:
+            return datetime.now()
+        return self._now
+
+    def set_network_key(self, network, key):
+        pass
+
+    def set_lib_config(self, lib_config):
+        pass
+
+    def set_wait(self, interval):
+        pass
+
+    def new_channel(self, c_type, network_number=0x00, ext_assign=None):
+        channel = ANT_ReplayChannel(self, self._channel_number)
+        self._channel_number += 1
+        return channel
+
+    def register_channel(self, channel, key):
+        for k, c in list(self.channels.items()):
+            if c is channel:
+                del self.channels[k]
+        # wildcard channels (search and scan) get no pages
+        if key[0] and key[1]:
+            self.channels[key] = channel
+
+    def delete_channel(self, channel):
+        self.register_channel(channel, (0, 0))
+
+    def start(self):
+        records = self.records
+        if not len(records):
+            return
+        speed = self.speed
+        times = records["t"].tolist()
+        ids = records["id"].tolist()
+        types = records["type"].tolist()
+        pages = records["data"]
+        t0 = times[0]
+        start = time.monotonic()
+        offset = time.time() - t0 if speed > 0 else 0.0
+
+        for i, t in enumerate(times):
+            if speed > 0:
+                wait = (t - t0) / speed - (time.monotonic() - start)
+                if wait > 0 and self._stop_event.wait(wait):
+                    break
+            elif self._stop_event.is_set():
+                break
+            channel = self.channels.get((ids[i], types[i]))
+            if channel is None or not channel.is_open:
+                continue
+            self._now = datetime.fromtimestamp(t + offset)
+            channel.on_broadcast_data(pages[i].tobytes())
+        self._now = None
+        app_logger.info("ANT+ replay: end of the capture")
+
+    def stop(self):
+        self._stop_event.set()
@@ -75,6 +75,10 @@ class ANT_Device:
     def on_data(self):
         pass
 
+    # time of the page in the handlers, the time of the capture in a replay
+    def now(self):
+        return datetime.now()
+
     def add_struct_pattern(self):
         pass
 
@@ -146,9 +150,19 @@ class ANT_Device:
         if self.config.G_ANT["STATUS"] and self.channel is None:
             self.channel = self.node.new_channel(c_type, ext_assign=ext_assign)
             app_logger.info(f"  {self.name}")
-            self.channel.on_broadcast_data = self.on_data
-            self.channel.on_burst_data = self.on_data
-            self.channel.on_acknowledge_data = self.on_data
+            on_data = self.on_data
+            # ANT_ReplayNode
+            if hasattr(self.node, "now"):
+                self.now = self.node.now
+            # ANT_Capture of the paired sensors
+            capture = getattr(self.node, "capture", None)
+            if capture is not None and self.name in self.config.G_ANT["ID"]:
+                on_data = capture.wrap(
+                    self.config.G_ANT["ID"][self.name], self.ant_config["type"], on_data
+                )
+            self.channel.on_broadcast_data = on_data
+            self.channel.on_burst_data = on_data
+            self.channel.on_acknowledge_data = on_data
 
     def channel_set_id(self):  # for slave
         self.channel.set_id(
@@ -247,13 +261,13 @@ class ANT_Device:
     def setCommonPage80(self, data, values):
         (values["hw_ver"], values["manu_id"], values["model_num"]) = self.structPattern[
             0x50
-        ].unpack(data[0:8])
+        ].unpack_from(data)
         if values["manu_id"] in ant_code.AntCode.MANUFACTURER:
             values["manu_name"] = ant_code.AntCode.MANUFACTURER[values["manu_id"]]
         values["stored_page"][0x50] = True
 
     def setCommonPage81(self, data, values):
-        (sw1, sw2, values["serial_num"]) = self.structPattern[0x51].unpack(data[0:8])
+        (sw1, sw2, values["serial_num"]) = self.structPattern[0x51].unpack_from(data)
         if sw1 != 0xFF:
             values["sw_ver"] = float((sw2 * 100 + sw1) / 1000)
         else:
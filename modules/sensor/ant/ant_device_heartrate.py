@@ -1,5 +1,3 @@
-from datetime import datetime
-
 from . import ant_device
 
 
@@ -16,7 +14,7 @@ class ANT_Device_HeartRate(ant_device.ANT_Device):
     def on_data(self, data):
         page = data[0] & 0x7F  # Bit7 is toggle, bits 0-6 are page number
         self.values["heart_rate"] = data[7]
-        self.values["timestamp"] = datetime.now()
+        self.values["timestamp"] = self.now()
 
         # if data[0] & 0b1111 == 0b000: # 0x00 or 0x80
         #  print("0x00 : ", format_list(data))
@@ -1,3 +1,4 @@
+import math
 import struct
 from datetime import datetime
 
@@ -142,7 +143,7 @@ class ANT_Device_MultiScan(ant_device.ANT_Device):
                 self.power_meter_value[antIDType][t] = [-1] * value_length
             self.power_values[antIDType][0x10]["power_l"] = 0
             self.power_values[antIDType][0x10]["power_r"] = 0
-            self.power_values[antIDType][0x10]["lr_balance"] = ":"
+            self.power_values[antIDType][0x10]["lr_balance"] = math.nan
             self.power_values[antIDType][0x10]["power_16_simple"] = 0
             self.power_values[antIDType][0x10]["cadence"] = 0
             self.power_values[antIDType][0x11]["speed"] = 0
@@ -1,10 +1,24 @@
 import struct
-from datetime import datetime
 import math
 
 from modules.app_logger import app_logger
 from . import ant_device
 
+# unpackers of the data pages, precompiled once for all the power meters
+PAGE_STRUCTS = {
+    # page, event count, balance, cadence, accumulated and instant power.
+    0x10: struct.Struct("<xBBBHH"),
+    # page, event count, wheel ticks, cadence, period and torque.
+    0x11: struct.Struct("<xBBBHH"),
+    # page, event count, crank ticks, cadence, period and torque.
+    0x12: struct.Struct("<xBBBHH"),
+    # page, x, torque effectiveness, pedal smoothness, x, x.
+    0x13: struct.Struct("<xxBBBBxx"),
+}
+_PAGE_16 = PAGE_STRUCTS[0x10]
+_PAGE_17 = PAGE_STRUCTS[0x11]
+_PAGE_18 = PAGE_STRUCTS[0x12]
+
 
 class ANT_Device_Power(ant_device.ANT_Device):
     ant_config = {
@@ -36,15 +50,23 @@ class ANT_Device_Power(ant_device.ANT_Device):
     pickle_key = "ant+_pwr_values"
 
     def add_struct_pattern(self):
-        self.structPattern[self.name] = {
-            # page, event count, balance, cadence, accumulated and instant power.
-            0x10: struct.Struct("<xBBBHH"),
-            # page, event count, wheel ticks, cadence, period and torque.
-            0x11: struct.Struct("<xBBBHH"),
-            # page, event count, crank ticks, cadence, period and torque.
-            0x12: struct.Struct("<xBBBHH"),
-            # page, x, torque effectiveness, pedal smoothness, x, x.
-            0x13: struct.Struct("<xxBBBBxx"),
+        self.structPattern[self.name] = PAGE_STRUCTS
+        # page number -> handler, instead of comparing data[0] with each page
+        # main data pages: handler(data, power_values, pre_values, pre_delta, values)
+        self.main_page_handlers = {
+            # standard power-only main data page (0x10)
+            0x10: self.on_data_power_0x10,
+            # Standard Wheel Torque Main Data Page (0x11) #not verified (not own)
+            0x11: self.on_data_power_0x11,
+            # standard crank power torque main data page (0x12)
+            0x12: self.on_data_power_0x12,
+        }
+        # other pages: handler(data)
+        self.page_handlers = {
+            0x13: self.on_data_power_0x13,
+            0x50: self.on_data_common_0x50,
+            0x51: self.on_data_common_0x51,
+            0x52: self.on_data_common_0x52,
         }
 
     def set_null_value(self):
@@ -83,7 +105,7 @@ class ANT_Device_Power(ant_device.ANT_Device):
         values["cadence"] = 0
         values["power_r"] = 0
         values["power_l"] = 0
-        values["lr_balance"] = ":"
+        values["lr_balance"] = math.nan
         values["timestamp"] = t
 
     @staticmethod
@@ -96,58 +118,41 @@ class ANT_Device_Power(ant_device.ANT_Device):
         values["timestamp"] = t
 
     def on_data(self, data):
-        # standard power-only main data page (0x10)
-        if data[0] == 0x10:
-            self.on_data_power_0x10(
-                data,
-                self.power_values[0x10],
-                self.pre_values[0x10],
-                self.pre_delta[0x10],
-                self.values[0x10],
-            )
-        # Standard Wheel Torque Main Data Page (0x11) #not verified (not own)
-        elif data[0] == 0x11:
-            self.on_data_power_0x11(
-                data,
-                self.power_values[0x11],
-                self.pre_values[0x11],
-                self.pre_delta[0x11],
-                self.values[0x11],
-            )
-        # standard crank power torque main data page (0x12)
-        elif data[0] == 0x12:
-            self.on_data_power_0x12(
+        page = data[0]
+        handler = self.main_page_handlers.get(page)
+        if handler is not None:
+            handler(
                 data,
-                self.power_values[0x12],
-                self.pre_values[0x12],
-                self.pre_delta[0x12],
-                self.values[0x12],
+                self.power_values[page],
+                self.pre_values[page],
+                self.pre_delta[page],
+                self.values[page],
             )
-        # Torque Effectiveness and Pedal Smoothness Main Data Page (0x13)
-        elif data[0] == 0x13:
-
-            def setValue(data, key, i):
-                self.values[0x13][key] = ""
-                if data[i] == 0xFF:
-                    self.values[0x13][key] += "--%/"
-                else:
-                    self.values[0x13][key] += "{0:02d}%/".format(int(data[i] / 2))
-                if data[i + 1] == 0xFF:
-                    self.values[0x13][key] += "--%"
-                else:
-                    self.values[0x13][key] += "{0:02d}%".format(int(data[i + 1] / 2))
-
-            setValue(data, "torque_eff", 2)
-            setValue(data, "pedal_sm", 4)
-        # Common Data Page 80 (0x50): Manufacturer’s Information
-        elif data[0] == 0x50 and not self.values["stored_page"][0x50]:
+            return
+        handler = self.page_handlers.get(page)
+        if handler is not None:
+            handler(data)
+
+    # Torque Effectiveness and Pedal Smoothness Main Data Page (0x13)
+    def on_data_power_0x13(self, data):
+        # raw (left, right) in 1/2 %, 0xFF: invalid, formatted by the GUI
+        values = self.values[0x13]
+        values["torque_eff"] = (data[2], data[3])
+        values["pedal_sm"] = (data[4], data[5])
+
+    # Common Data Page 80 (0x50): Manufacturer's Information
+    def on_data_common_0x50(self, data):
+        if not self.values["stored_page"][0x50]:
             self.setCommonPage80(data, self.values)
-        # Common Data Page 81 (0x51): Product Information
-        elif data[0] == 0x51 and not self.values["stored_page"][0x51]:
+
+    # Common Data Page 81 (0x51): Product Information
+    def on_data_common_0x51(self, data):
+        if not self.values["stored_page"][0x51]:
             self.setCommonPage81(data, self.values)
-        # Common Data Page 82 (0x52): Battery Status
-        elif data[0] == 0x52:
-            self.setCommonPage82(data[6:8], self.values)
+
+    # Common Data Page 82 (0x52): Battery Status
+    def on_data_common_0x52(self, data):
+        self.setCommonPage82(data[6:8], self.values)
 
     def on_data_power_0x10(self, data, power_values, pre_values, pre_delta, values):
         self.prepare_page_state(0x10, power_values, pre_values, pre_delta, values)
@@ -158,8 +163,8 @@ class ANT_Device_Power(ant_device.ANT_Device):
             cadence,
             power_values[1],
             power_16_simple,
-        ) = self.structPattern[self.name][0x10].unpack(data[0:8])
-        t = datetime.now()
+        ) = _PAGE_16.unpack_from(data)
+        t = self.now()
 
         if pre_values[0] == -1:
             pre_values[0:2] = power_values[0:2]
@@ -190,14 +195,12 @@ class ANT_Device_Power(ant_device.ANT_Device):
                 ):
                     # unit: J
                     values["accumulated_power"] += pwr * delta_t
-                # lr_balance
+                # lr_balance: right [%], formatted as "L:R" by the GUI
                 if lr_balance < 0xFF and lr_balance >> 7 == 1:
                     right_balance = lr_balance & 0b01111111
                     values["power_r"] = pwr * right_balance / 100
                     values["power_l"] = pwr - values["power_r"]
-                    values["lr_balance"] = "{}:{}".format(
-                        (100 - right_balance), right_balance
-                    )
+                    values["lr_balance"] = right_balance
                 # refresh timestamp called from sensor_core
                 values["timestamp"] = t
             else:
@@ -229,7 +232,7 @@ class ANT_Device_Power(ant_device.ANT_Device):
             cadence,
             wheel_period,
             accumulated_torque,
-        ) = self.structPattern[self.name][0x11].unpack(data[0:8])
+        ) = _PAGE_17.unpack_from(data)
         power_values[0:5] = [
             wheel_period,
             accumulated_torque,
@@ -237,7 +240,7 @@ class ANT_Device_Power(ant_device.ANT_Device):
             wheel_ticks,
             cadence,
         ]
-        t = datetime.now()
+        t = self.now()
 
         if pre_values[0] == -1:
             pre_values[0:5] = power_values[0:5]
@@ -340,7 +343,7 @@ class ANT_Device_Power(ant_device.ANT_Device):
             cadence,
             crank_period,
             accumulated_torque,
-        ) = self.structPattern[self.name][0x12].unpack(data[0:8])
+        ) = _PAGE_18.unpack_from(data)
         power_values[0:5] = [
             crank_period,
             accumulated_torque,
@@ -348,7 +351,7 @@ class ANT_Device_Power(ant_device.ANT_Device):
             crank_ticks,
             cadence,
         ]
-        t = datetime.now()
+        t = self.now()
 
         if pre_values[0] == -1:
             pre_values[0:5] = power_values[0:5]
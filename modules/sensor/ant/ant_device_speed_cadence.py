@@ -1,5 +1,4 @@
 import struct
-from datetime import datetime
 
 from modules.app_logger import app_logger
 from . import ant_device
@@ -38,8 +37,8 @@ class ANT_Device_Speed_Cadence(ant_device.ANT_Device):
         self.values["last_event_interval_cdc"] = None
 
     def on_data(self, data):
-        self.sc_values = self.structPattern[self.name].unpack(data[0:8])
-        t = datetime.now()
+        self.sc_values = self.structPattern[self.name].unpack_from(data)
+        t = self.now()
 
         if self.pre_values[0] == -1:
             self.pre_values = list(self.sc_values)
@@ -173,8 +172,8 @@ class ANT_Device_Cadence(ant_device.ANT_Device):
         pass
 
     def on_data(self, data):
-        self.sc_values = self.structPattern[self.name].unpack(data[0:8])
-        t = datetime.now()
+        self.sc_values = self.structPattern[self.name].unpack_from(data)
+        t = self.now()
         page = data[0] & 0b01111111  # Bit7 is toggle, bits 0-6 are page number
 
         if self.pre_values[0] == -1:
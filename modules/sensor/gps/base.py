@@ -1,5 +1,6 @@
 import abc
 import asyncio
+import math
 import time as time_module
 from datetime import datetime, time
 
@@ -20,6 +21,46 @@ NMEA_MODE_2D = 2
 NMEA_MODE_3D = 3
 
 
+class GPSFix:
+    """One fix as read by a parser, with None as the null value.
+
+    error is (epx, epy, epv) or None, dop is (pdop, hdop, vdop),
+    satellites is (used, total) and time is a datetime, a time or an ISO
+    string. seq is numbered by AbstractSensorGPS.update_fix.
+    """
+
+    __slots__ = (
+        "lat",
+        "lon",
+        "alt",
+        "speed",
+        "track",
+        "mode",
+        "status",
+        "error",
+        "dop",
+        "satellites",
+        "time",
+        "seq",
+    )
+
+    def __init__(
+        self, lat, lon, alt, speed, track, mode, status, error, dop, satellites, time
+    ):
+        self.lat = lat
+        self.lon = lon
+        self.alt = alt
+        self.speed = speed
+        self.track = track
+        self.mode = mode
+        self.status = status
+        self.error = error
+        self.dop = dop
+        self.satellites = satellites
+        self.time = time
+        self.seq = 0
+
+
 class AbstractSensorGPS(Sensor, metaclass=abc.ABCMeta):
     elements = [
         "lat",
@@ -49,6 +90,16 @@ class AbstractSensorGPS(Sensor, metaclass=abc.ABCMeta):
         "mode",
         "status",
     ]
+    # elements which a fix does not always set, reset to nan before each one
+    reset_elements = (
+        "speed",
+        "track_str",
+        "epx",
+        "epy",
+        "epv",
+        "time",
+        "utctime",
+    )
     # status: 
     #    0=Unknown,
     #    1=Normal,
@@ -72,6 +123,12 @@ class AbstractSensorGPS(Sensor, metaclass=abc.ABCMeta):
 
     valid_cutoff_dof = (99.0, 99.0, 99.0)
 
+    # latest GPSFix and its sequence number
+    fix = None
+    fix_seq = 0
+    _state_pos = None
+    _pre_satellites = None
+
     quit_status = False
     _TIME_SYNC_RETRY_SEC = 10.0
 
@@ -120,16 +177,15 @@ class AbstractSensorGPS(Sensor, metaclass=abc.ABCMeta):
 
     def init_values(self):
         # backup values
-        if not np.isnan(self.values["lat"]) and not np.isnan(self.values["lon"]):
-            self.values["pre_lat"] = self.values["lat"]
-            self.values["pre_lon"] = self.values["lon"]
-            self.values["pre_alt"] = self.values["alt"]
-            self.values["pre_track"] = self.values["track"]
-        # initialize
-        for element in self.elements:
-            if element in ["pre_lat", "pre_lon", "pre_alt", "pre_track"]:
-                continue
-            self.values[element] = np.nan
+        values = self.values
+        if not math.isnan(values["lat"]) and not math.isnan(values["lon"]):
+            values["pre_lat"] = values["lat"]
+            values["pre_lon"] = values["lon"]
+            values["pre_alt"] = values["alt"]
+            values["pre_track"] = values["track"]
+        # initialize the elements which are not always set by update_fix
+        for element in self.reset_elements:
+            values[element] = np.nan
 
     def is_position_valid(self, lat, lon, mode, status, dop, satellites, error=None):
         valid = True
@@ -143,8 +199,8 @@ class AbstractSensorGPS(Sensor, metaclass=abc.ABCMeta):
             or mode is None
             or mode < NMEA_MODE_3D
             or None in dop
-            or any([self.is_null_value(x) for x in dop])
-            or any([x >= self.valid_cutoff_dof[i] for i, x in enumerate(dop)])
+            or any(self.is_null_value(x) for x in dop)
+            or any(x >= c for x, c in zip(dop, self.valid_cutoff_dof))
             or (not self.check_3DGPS_FIX_status(status) and satellites[0] <= USED_SAT_CUTOFF)
         ):
             valid = False
@@ -164,129 +220,128 @@ class AbstractSensorGPS(Sensor, metaclass=abc.ABCMeta):
             else:
                 return False
 
+    def none_if_null(self, value):
+        if isinstance(value, tuple):
+            return tuple(None if self.is_null_value(x) else x for x in value)
+        return None if self.is_null_value(value) else value
+
     async def get_basic_values(
         self, lat, lon, alt, speed, track, mode, status, error, dop, satellites, gps_time
     ):
-        # TODO, this probably has to go in the long term
-        self.init_values()
-
         # our first task is to align the format for each null value, we do it only for GPS
         # that do not use None as NULL_VALUE already, else the values are already correct.
         # (Maybe it could be done on the sensor implementation itself)
         if self.NULL_VALUE is not None:
-
-            def id_or_none(value):
-                if isinstance(value, tuple):
-                    return [id_or_none(x) for x in value]
-                else:
-                    return value if not self.is_null_value(value) else None
-
-            lat = id_or_none(lat)
-            lon = id_or_none(lon)
-            alt = id_or_none(alt)
-            speed = id_or_none(speed)
-            track = id_or_none(track)
-            mode = id_or_none(mode)
-            status = id_or_none(status)
-            error = id_or_none(error)
-            dop = id_or_none(dop)
+            none_if_null = self.none_if_null
+            lat = none_if_null(lat)
+            lon = none_if_null(lon)
+            alt = none_if_null(alt)
+            speed = none_if_null(speed)
+            track = none_if_null(track)
+            mode = none_if_null(mode)
+            status = none_if_null(status)
+            error = none_if_null(error)
+            dop = none_if_null(dop)
             # no need to check for satellites, manually computed
 
-        valid_pos = self.is_position_valid(lat, lon, mode, status, dop, satellites, error)
+        await self.update_fix(
+            GPSFix(
+                lat, lon, alt, speed, track, mode, status, error, dop, satellites, gps_time
+            )
+        )
+
+    def snapshot(self):
+        """Return the latest GPSFix (None before the first one).
+
+        A new record is made for each fix and never modified, so it can be
+        kept without copying; compare fix.seq to skip an unchanged one.
+        """
+        return self.fix
+
+    async def update_fix(self, fix):
+        # fast path of the parsers: fix is a GPSFix with None as null values
+        self.fix_seq += 1
+        fix.seq = self.fix_seq
+        self.fix = fix
+
+        lat = fix.lat
+        lon = fix.lon
+        alt = fix.alt
+        speed = fix.speed
+        track = fix.track
+        mode = fix.mode
+        dop = fix.dop
+        satellites = fix.satellites
+
+        values = self.values
+        self.init_values()
+        valid_pos = self.is_position_valid(
+            lat, lon, mode, fix.status, dop, satellites, fix.error
+        )
 
         # coordinate
         if valid_pos:
-            self.values["lat"] = lat
-            self.values["lon"] = lon
-        else:  # copy from pre value
-            self.values["lat"] = self.values["pre_lat"]
-            self.values["lon"] = self.values["pre_lon"]
-        for l in ["lat", "lon"]:
-            if np.isnan(self.values[l]) and type(self.values[l]) != float:
-                self.values[l] = np.nan
+            values["lat"] = lat
+            values["lon"] = lon
+        else:  # copy from pre value (nan before the first fix)
+            values["lat"] = values["pre_lat"]
+            values["lon"] = values["pre_lon"]
         # raw coordinates
-        self.values["raw_lat"] = lat
-        self.values["raw_lon"] = lon
-        # record coordinates in state
-        if not np.any(np.isnan([self.values["lat"], self.values["lon"]])):
-            self.config.state.set_value("pos_lat", self.values["lat"])
-            self.config.state.set_value("pos_lon", self.values["lon"])
+        values["raw_lat"] = lat
+        values["raw_lon"] = lon
+        pre_lat = values["pre_lat"]
+        pre_lon = values["pre_lon"]
+        has_pos = not math.isnan(values["lat"]) and not math.isnan(values["lon"])
+        has_pre_pos = not math.isnan(pre_lat) and not math.isnan(pre_lon)
+
+        # record coordinates in state, only when they have changed
+        if has_pos and (values["lat"], values["lon"]) != self._state_pos:
+            self._state_pos = (values["lat"], values["lon"])
+            self.config.state.set_value("pos_lat", values["lat"])
+            self.config.state.set_value("pos_lon", values["lon"])
 
         # GPS distance
-        if self.config.G_STOPWATCH_STATUS == "START" and not np.any(
-            np.isnan(
-                [
-                    self.values["pre_lon"],
-                    self.values["pre_lat"],
-                    self.values["lon"],
-                    self.values["lat"],
-                ]
-            )
-        ):
+        if self.config.G_STOPWATCH_STATUS == "START" and has_pos and has_pre_pos:
             # 2D distance : (x1, y1), (x2, y2)
-            dist = get_dist_on_earth(
-                self.values["pre_lon"],
-                self.values["pre_lat"],
-                self.values["lon"],
-                self.values["lat"],
-            )
             # need 3D distance? : (x1, y1, z1), (x2, y2, z2)
-
             # unit: m
-            self.values["distance"] += dist
-        
+            values["distance"] += get_dist_on_earth(
+                pre_lon, pre_lat, values["lon"], values["lat"]
+            )
+
         # altitude
         if valid_pos and alt is not None:
             # floor
-            if alt < -500:
-                self.values["alt"] = -500
-            else:
-                self.values["alt"] = alt
+            values["alt"] = -500 if alt < -500 else alt
         else:  # copy from pre value
-            self.values["alt"] = self.values["pre_alt"]
-        self.values["raw_alt"] = alt
+            values["alt"] = values["pre_alt"]
+        values["raw_alt"] = alt
 
         # speed
+        speed_cutoff = self.config.G_GPS_SPEED_CUTOFF
+        moving = valid_pos and speed is not None and speed > speed_cutoff
         if valid_pos and speed is not None:
             # unit m/s
-            if speed <= self.config.G_GPS_SPEED_CUTOFF:
-                self.values["speed"] = 0.0
-            else:
-                self.values["speed"] = speed
+            values["speed"] = speed if moving else 0.0
 
         # track
-        if (
-            valid_pos
-            and track is not None
-            and speed is not None
-            and speed > self.config.G_GPS_SPEED_CUTOFF
-        ):
-            self.values["track"] = int(track)
-            self.values["track_str"] = get_track_str(self.values["track"])
+        if moving and track is not None:
+            values["track"] = int(track)
+            values["track_str"] = get_track_str(values["track"])
         # for GPS unable to get track
-        elif (
-            valid_pos
-            and track is None
-            and speed is not None
-            and speed > self.config.G_GPS_SPEED_CUTOFF
-        ):
-            self.values["track"] = int(
-                (
-                    calc_azimuth(
-                        [self.values["pre_lat"], self.values["lat"]],
-                        [self.values["pre_lon"], self.values["lon"]],
-                    )
-                )[0]
+        elif moving:
+            values["track"] = int(
+                calc_azimuth([pre_lat, values["lat"]], [pre_lon, values["lon"]])[0]
             )
-            self.values["track_str"] = get_track_str(self.values["track"])
+            values["track_str"] = get_track_str(values["track"])
         else:
-            self.values["track"] = self.values["pre_track"]
+            values["track"] = values["pre_track"]
 
         # distance in the course
         self.course.get_index(
-            self.values["lat"],
-            self.values["lon"],
-            self.values["track"],
+            values["lat"],
+            values["lon"],
+            values["track"],
             self.config.G_GPS_SEARCH_RANGE,
             self.config.G_GPS_ON_ROUTE_CUTOFF,
             self.azimuth_cutoff,
@@ -297,8 +352,8 @@ class AbstractSensorGPS(Sensor, metaclass=abc.ABCMeta):
             asyncio.create_task(set_timezone(lat, lon))
             self.is_fixed = True
 
-        # gps time
-        self.get_utc_time(gps_time, mode)
+        # gps time, formatted in the worker thread
+        self.get_utc_time(fix.time, mode)
 
         # modify altitude with course
         if (
@@ -312,27 +367,28 @@ class AbstractSensorGPS(Sensor, metaclass=abc.ABCMeta):
             self.is_altitude_modified = True
 
         # mode
-        self.values["mode"] = mode
+        values["mode"] = mode
 
         # satellites
-        self.values["used_sats"] = satellites[0]
-        self.values["total_sats"] = satellites[1]
-        if satellites[1] is not None:
-            self.values["used_sats_str"] = f"{satellites[0]} / {satellites[1]}"
-        else:
-            self.values["used_sats_str"] = f"{satellites[0]}"
+        used_sats, total_sats = satellites
+        if (used_sats, total_sats) != self._pre_satellites:
+            self._pre_satellites = (used_sats, total_sats)
+            values["used_sats"] = used_sats
+            values["total_sats"] = total_sats
+            if total_sats is not None:
+                values["used_sats_str"] = f"{used_sats} / {total_sats}"
+            else:
+                values["used_sats_str"] = f"{used_sats}"
 
         # DOP
-        for i, key in enumerate(["pdop", "hdop", "vdop"]):
-            self.values[key] = dop[i]
+        values["pdop"], values["hdop"], values["vdop"] = dop
 
         # TODO, save error for gpsd, could be improved, not very resilient
-        if error:
-            for i, key in enumerate(["epx", "epy", "epv"]):
-                self.values[key] = error[i]
-        
+        if fix.error:
+            values["epx"], values["epy"], values["epv"] = fix.error
+
         # timestamp
-        self.values["timestamp"] = datetime.now()
+        values["timestamp"] = datetime.now()
 
     async def _utc_time_worker(self):
         # Run UTC time parsing and system time sync in a thread to keep the main asyncio loop responsive.
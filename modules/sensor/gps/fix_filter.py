@@ -0,0 +1,152 @@
+import math
+
+# [m/s^2] white acceleration of the constant velocity model
+ACCEL_STD = 1.5
+# [m/s] error of the GNSS velocity (NAV-PVT sAcc is about 0.3-0.5 m/s)
+VELOCITY_STD = 0.5
+# [m] floor of the position error, hAcc is optimistic in open sky
+POSITION_STD_MIN = 2.0
+POSITION_STD_DEFAULT = 5.0
+# [s] gap of the fixes (or a jump backwards) which restarts the filter
+RESET_GAP = 5.0
+# [m] innovation which restarts the filter (e.g. after a tunnel)
+RESET_JUMP = 200.0
+# weight of the I2C heading at standstill, fading out until MAG_FADE_SPEED [m/s]
+MAG_WEIGHT = 0.5
+MAG_FADE_SPEED = 3.0
+
+_DEG_TO_M = math.pi * 6371008.8 / 180
+
+
+class _Axis:
+    """Kalman filter of (position, velocity) on one axis of the local plane."""
+
+    __slots__ = ("p", "v", "pp", "pv", "vv")
+
+    def __init__(self, p, v, p_var, v_var):
+        self.p = p
+        self.v = v
+        self.pp = p_var
+        self.pv = 0.0
+        self.vv = v_var
+
+    def predict(self, dt, q):
+        self.p += self.v * dt
+        dt2 = dt * dt
+        # P = F P F' + Q, Q of a white acceleration q
+        self.pp += dt * (2 * self.pv + dt * self.vv) + q * dt2 * dt2 / 4
+        self.pv += dt * self.vv + q * dt2 * dt / 2
+        self.vv += q * dt2
+
+    def update_position(self, z, r):
+        s = self.pp + r
+        k_p = self.pp / s
+        k_v = self.pv / s
+        y = z - self.p
+        self.p += k_p * y
+        self.v += k_v * y
+        self.vv -= k_v * self.pv
+        self.pv -= k_v * self.pp
+        self.pp -= k_p * self.pp
+
+    def update_velocity(self, z, r):
+        s = self.vv + r
+        k_p = self.pv / s
+        k_v = self.vv / s
+        y = z - self.v
+        self.p += k_p * y
+        self.v += k_v * y
+        self.pp -= k_p * self.pv
+        self.pv -= k_p * self.vv
+        self.vv -= k_v * self.vv
+
+
+class FixFilter:
+    """Smooth the position, speed and track of high-rate GNSS fixes.
+
+    A constant velocity Kalman filter in a local east/north plane [m] fuses
+    the position (weighted by the horizontal accuracy) with the velocity
+    from the speed and the track. The track of the filtered velocity is
+    blended with the I2C heading at low speed, where the GNSS track is
+    mostly noise. Each axis is filtered separately with plain floats, so an
+    update costs a few microseconds.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.t = None
+        self.lat0 = self.lon0 = self.kx = None
+        self.x = self.y = None
+
+    def _start(self, t, e, n, ve, vn, p_var):
+        self.t = t
+        self.x = _Axis(e, ve, p_var, VELOCITY_STD**2)
+        self.y = _Axis(n, vn, p_var, VELOCITY_STD**2)
+
+    def update(self, fix, t, speed_cutoff, heading=None):
+        """Filter fix in place.
+
+        t is the time of the fix [s], speed_cutoff [m/s] the speed under
+        which the bike is standing and heading the I2C heading [deg] or None.
+        """
+        if fix.lat is None or fix.lon is None or not fix.mode or fix.mode < 2:
+            return fix
+
+        if self.lat0 is None:
+            self.lat0 = fix.lat
+            self.lon0 = fix.lon
+            self.kx = _DEG_TO_M * math.cos(math.radians(fix.lat))
+        e = (fix.lon - self.lon0) * self.kx
+        n = (fix.lat - self.lat0) * _DEG_TO_M
+
+        h_std = fix.error[0] if fix.error and fix.error[0] is not None else None
+        p_var = max(h_std or POSITION_STD_DEFAULT, POSITION_STD_MIN) ** 2
+
+        speed = fix.speed
+        ve = vn = None
+        if speed is not None:
+            if speed <= speed_cutoff or fix.track is None:
+                # standing (or no track): hold the position
+                ve = vn = 0.0
+            else:
+                track = math.radians(fix.track)
+                ve = speed * math.sin(track)
+                vn = speed * math.cos(track)
+
+        dt = None if self.t is None else t - self.t
+        if dt is None or dt <= 0 or dt > RESET_GAP:
+            self._start(t, e, n, ve or 0.0, vn or 0.0, p_var)
+        else:
+            self.t = t
+            q = ACCEL_STD**2
+            x, y = self.x, self.y
+            x.predict(dt, q)
+            y.predict(dt, q)
+            if math.hypot(e - x.p, n - y.p) > RESET_JUMP:
+                self._start(t, e, n, ve or 0.0, vn or 0.0, p_var)
+            else:
+                x.update_position(e, p_var)
+                y.update_position(n, p_var)
+                if ve is not None:
+                    v_var = VELOCITY_STD**2
+                    x.update_velocity(ve, v_var)
+                    y.update_velocity(vn, v_var)
+
+        x, y = self.x, self.y
+        fix.lon = self.lon0 + x.p / self.kx
+        fix.lat = self.lat0 + y.p / _DEG_TO_M
+        filtered_speed = math.hypot(x.v, y.v)
+        if speed is not None:
+            fix.speed = filtered_speed
+
+        # track: the filtered velocity, drawn to the I2C heading at low speed
+        if filtered_speed > speed_cutoff:
+            track = math.degrees(math.atan2(x.v, y.v)) % 360
+            if heading is not None and not math.isnan(heading):
+                w = MAG_WEIGHT * max(0.0, 1.0 - filtered_speed / MAG_FADE_SPEED)
+                diff = (heading - track + 180) % 360 - 180
+                track = (track + w * diff) % 360
+            fix.track = track
+        return fix
@@ -79,7 +79,7 @@ class CXD5610_GPS(AbstractSensorGPS):
             ts = self.dev.timestamp
             gps_time = None
             if ts is not None:
-                gps_time = datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+                gps_time = datetime.fromtimestamp(ts, tz=timezone.utc)
 
             dop = tuple(
                 val if val is not None else self.NULL_VALUE
@@ -6,6 +6,7 @@ from collections import deque
 from datetime import datetime, timezone
 
 from modules.app_logger import app_logger
+from modules.utils import perf
 
 from .base import (
     NMEA_MODE_2D,
@@ -13,7 +14,9 @@ from .base import (
     NMEA_MODE_NO_FIX,
     NMEA_MODE_UNKNOWN,
     AbstractSensorGPS,
+    GPSFix,
 )
+from .fix_filter import FixFilter
 
 _OPTIONAL_DEPENDENCIES = {"serial", "pyubx2", "pynmeagps"}
 _UBLOX_IMPORT_ERROR = None
@@ -73,6 +76,14 @@ _WRITE_QUEUE_WAIT_TIMEOUT = 10.0
 _ASSISTNOW_CACHE_FALLBACK_DELAY = 30.0
 _I2C_CONFIG_MESSAGE_MAX_LENGTH = 32
 _I2C_CONFIG_CHUNK_DELAY = 0.02
+# parsed frames waiting for the event loop, the oldest ones are dropped
+_FRAME_BUFFER_SIZE = 64
+_READER_JOIN_TIMEOUT = 1.0
+# [Hz] of NAV-PVT, 9600 bps UART cannot carry NAV-PVT at 10 Hz with NAV-SAT
+_NAV_RATES = (1, 5, 10)
+_UART_NAV_RATE_MAX = 5
+
+PERF_DROPPED_FRAMES = perf.counter("gps.ubx_dropped")
 
 
 if _UBLOX_IMPORT_ERROR is None:
@@ -97,6 +108,16 @@ class UBlox(AbstractSensorGPS):
         self._reader = None
         self._write_queue = queue.Queue()
         self._read_loop_active = False
+        # parsed (raw, parsed) frames from the reader thread
+        self._frames = deque(maxlen=_FRAME_BUFFER_SIZE)
+        self._frames_event = None
+        self._frames_signaled = False
+        self._reader_thread = None
+        self._reader_error = None
+        self._fix_filter = (
+            FixFilter() if self.config.G_GPS_UBLOX["FIX_FILTER"] else None
+        )
+        self._last_fix_itow = None
         self._transport_open_time = None
         self._dop = (99.0, 99.0, 99.0)
         self._used_sats = 0
@@ -249,7 +270,12 @@ class UBlox(AbstractSensorGPS):
     def _write_transport(self, data, delay=0.0, wait=False, direct=False):
         if self.transport is None:
             raise RuntimeError("receiver transport is closed")
-        if direct or not self._read_loop_active:
+        # while the reader thread owns the transport, writes of the other
+        # threads go through the write queue (direct ones included)
+        if (
+            not self._read_loop_active
+            or threading.current_thread() is self._reader_thread
+        ):
             self._write_transport_now(data)
             if delay:
                 time.sleep(delay)
@@ -316,16 +342,17 @@ class UBlox(AbstractSensorGPS):
             self._complete_write_item(item, error)
             self._write_queue.task_done()
 
-    async def _drain_write_queue(self):
+    def _drain_write_queue(self):
+        # NOTE: executed in the reader thread
         while True:
             try:
                 item = self._write_queue.get_nowait()
             except queue.Empty:
                 return
             try:
-                await asyncio.to_thread(self._write_transport_now, item["data"])
+                self._write_transport_now(item["data"])
                 if item["delay"]:
-                    await asyncio.sleep(item["delay"])
+                    time.sleep(item["delay"])
                 self._complete_write_item(item)
             except Exception as exc:
                 self._complete_write_item(item, exc)
@@ -356,22 +383,24 @@ class UBlox(AbstractSensorGPS):
             chunks.append(current)
         return chunks
 
-    def _write_config(self, cfg_data, wait=False, direct=False):
+    def _write_config(self, cfg_data, wait=False, direct=False, delay=0.0):
+        # delay [s] after the last chunk, the writer sleeps it (the reader
+        # thread for queued writes)
         chunks = self._config_chunks_for_transport(cfg_data)
         for i, chunk in enumerate(chunks):
-            delay = _I2C_CONFIG_CHUNK_DELAY if i + 1 < len(chunks) else 0.0
             self._write_transport(
                 self._config_set_message(chunk),
-                delay=delay,
+                delay=_I2C_CONFIG_CHUNK_DELAY if i + 1 < len(chunks) else delay,
                 wait=wait,
                 direct=direct,
             )
 
     def _write_config_sequence(self, cfg_data, direct=False):
+        # each item is queued with its delay, so that queued items are not
+        # written back-to-back
+        delay = _I2C_CONFIG_CHUNK_DELAY if self.transport_type == "i2c" else 0.0
         for cfg_item in cfg_data:
-            self._write_config([cfg_item], direct=direct)
-            if self.transport_type == "i2c":
-                time.sleep(_I2C_CONFIG_CHUNK_DELAY)
+            self._write_config([cfg_item], direct=direct, delay=delay)
 
     def _clear_pending_input(self):
         if self.transport_type != "uart":
@@ -679,10 +708,14 @@ class UBlox(AbstractSensorGPS):
 
         port = "I2C" if self.transport_type == "i2c" else "UART1"
         qzss_dcr_enabled = int(self._qzss_dcr_enabled())
+        nav_rate = self._nav_rate()
+        # NAV-DOP and NAV-SAT stay at 1 Hz (once per nav_rate solutions)
         cfg_data = [
+            ("CFG_RATE_MEAS", 1000 // nav_rate),
+            ("CFG_RATE_NAV", 1),
             (f"CFG_MSGOUT_UBX_NAV_PVT_{port}", 1),
-            (f"CFG_MSGOUT_UBX_NAV_DOP_{port}", 1),
-            (f"CFG_MSGOUT_UBX_NAV_SAT_{port}", 1),
+            (f"CFG_MSGOUT_UBX_NAV_DOP_{port}", nav_rate),
+            (f"CFG_MSGOUT_UBX_NAV_SAT_{port}", nav_rate),
         ]
         cfg_data.extend(self._qzss_dcr_cfg_data(qzss_dcr_enabled))
         self._write_config(cfg_data, direct=direct)
@@ -693,6 +726,14 @@ class UBlox(AbstractSensorGPS):
         )
         self.qzss_dcr_status["status"] = self._qzss_dcr_output_status(qzss_dcr_enabled)
 
+    def _nav_rate(self):
+        rate = self.config.G_GPS_UBLOX["NAV_RATE"]
+        if rate not in _NAV_RATES:
+            rate = 1
+        if self.transport_type == "uart" and rate > _UART_NAV_RATE_MAX:
+            rate = _UART_NAV_RATE_MAX
+        return rate
+
     def _normalized_receiver_model(self):
         return normalized_receiver_model(self._receiver_model)
 
@@ -828,10 +869,12 @@ class UBlox(AbstractSensorGPS):
         self._power_save_applying = False
         return False
 
-    async def _read_loop(self):
-        self._read_loop_active = True
+    def _reader_thread_main(self, loop):
+        # Read and parse frames in a dedicated thread, which owns the transport
+        # (queued writes included), and wake the event loop once per batch.
+        frames = self._frames
         try:
-            while not self.quit_status:
+            while self._read_loop_active and not self.quit_status:
                 if (
                     self._receiver_model is None
                     and time.monotonic() - self._last_mon_ver_poll >= 2.0
@@ -840,15 +883,58 @@ class UBlox(AbstractSensorGPS):
                         self._quiet_uart_output(direct=True)
                         self._clear_pending_input()
                     self._poll_mon_ver(force=True, direct=True)
+                self._drain_write_queue()
+                raw, parsed = self._read_transport()
+                if parsed is None:
+                    time.sleep(_POLL_INTERVAL)
+                    continue
+                if len(frames) == frames.maxlen:
+                    PERF_DROPPED_FRAMES.inc()
+                frames.append((raw, parsed))
+                if not self._frames_signaled:
+                    self._frames_signaled = True
+                    loop.call_soon_threadsafe(self._frames_event.set)
+        except Exception as exc:
+            if self._read_loop_active:
+                self._reader_error = exc
+        finally:
+            loop.call_soon_threadsafe(self._frames_event.set)
+
+    async def _read_loop(self):
+        self._frames.clear()
+        self._frames_event = asyncio.Event()
+        self._frames_signaled = False
+        self._reader_error = None
+        self._read_loop_active = True
+        self._reader_thread = threading.Thread(
+            target=self._reader_thread_main,
+            args=(asyncio.get_running_loop(),),
+            name="ublox-reader",
+            daemon=True,
+        )
+        self._reader_thread.start()
+        try:
+            while not self.quit_status:
                 self._maybe_start_assistnow()
-                await self._drain_write_queue()
-                raw, parsed = await asyncio.to_thread(self._read_transport)
-                if parsed is not None:
+                try:
+                    await asyncio.wait_for(self._frames_event.wait(), 1.0)
+                except asyncio.TimeoutError:
+                    pass
+                self._frames_event.clear()
+                self._frames_signaled = False
+                # consume the batch, handlers may await
+                frames = self._frames
+                while frames:
+                    raw, parsed = frames.popleft()
                     await self._handle_reader_message(raw, parsed)
-                else:
-                    await asyncio.sleep(_POLL_INTERVAL)
+                if self._reader_error is not None:
+                    raise self._reader_error
+                if not self._reader_thread.is_alive():
+                    break
         finally:
             self._read_loop_active = False
+            await asyncio.to_thread(self._reader_thread.join, _READER_JOIN_TIMEOUT)
+            self._reader_thread = None
 
     async def _handle_reader_message(self, raw, parsed):
         identity = getattr(parsed, "identity", "")
@@ -879,6 +965,7 @@ class UBlox(AbstractSensorGPS):
         else:
             mode = NMEA_MODE_UNKNOWN
 
+        # formatted in the UTC time worker thread
         gps_time = None
         if getattr(parsed, "validDate", 0) and getattr(parsed, "validTime", 0):
             gps_time = datetime(
@@ -889,7 +976,7 @@ class UBlox(AbstractSensorGPS):
                 parsed.min,
                 parsed.second,
                 tzinfo=timezone.utc,
-            ).isoformat()
+            )
 
         pdop = parsed.pDOP
         hdop, vdop = self._dop[1], self._dop[2]
@@ -899,7 +986,8 @@ class UBlox(AbstractSensorGPS):
             vdop = pdop
         self._dop = (pdop, hdop, vdop)
 
-        await self.get_basic_values(
+        h_acc = parsed.hAcc / 1000.0
+        fix = GPSFix(
             parsed.lat,
             parsed.lon,
             parsed.hMSL / 1000.0,
@@ -907,11 +995,7 @@ class UBlox(AbstractSensorGPS):
             parsed.headMot % 360,
             mode,
             2 if getattr(parsed, "diffSoln", 0) else 1,
-            (
-                parsed.hAcc / 1000.0,
-                parsed.hAcc / 1000.0,
-                parsed.vAcc / 1000.0,
-            ),
+            (h_acc, h_acc, parsed.vAcc / 1000.0),
             self._dop,
             (
                 self._used_sats or parsed.numSV,
@@ -919,10 +1003,32 @@ class UBlox(AbstractSensorGPS):
             ),
             gps_time,
         )
+
+        # iTOW [ms]: GPS time of week of the solution
+        fix_time = parsed.iTOW / 1000.0
+        if self._fix_filter is not None:
+            self._fix_filter.update(
+                fix, fix_time, self.config.G_GPS_SPEED_CUTOFF, self._i2c_heading()
+            )
+
+        # every fix is filtered, values are updated at G_GPS_INTERVAL
+        interval = self.config.G_GPS_INTERVAL - 0.5 / self._nav_rate()
+        if (
+            self._last_fix_itow is None
+            or not 0 <= fix_time - self._last_fix_itow < interval
+        ):
+            self._last_fix_itow = fix_time
+            await self.update_fix(fix)
         if parsed.fixType >= 3:
             self._has_fix = True
             self._maybe_apply_power_save("first fix", direct=True)
 
+    def _i2c_heading(self):
+        sensor = self.config.logger.sensor
+        if sensor is None or "I2C" not in sensor.values:
+            return None
+        return sensor.values["I2C"].get("heading")
+
     def _handle_nav_dop(self, parsed):
         self._dop = (parsed.pDOP, parsed.hDOP, parsed.vDOP)
 
@@ -1,5 +1,7 @@
 import numpy as np
 
+from modules.utils.ring_buffer import RingBuffer
+
 
 NP_WINDOW_SIZE_DEFAULT = 30
 
@@ -17,8 +19,7 @@ def reset_performance_metrics_state(sensor):
     integrated["tss"] = 0.0
 
     sensor.np_window_size = sensor.NP_WINDOW_SIZE
-    sensor.np_window_30s = []
-    sensor.np_window_sum = 0.0
+    sensor.np_window_30s = RingBuffer(sensor.np_window_size)
     sensor.np_sum_ma4 = 0.0
     sensor.np_count_ma4 = 0
 
@@ -29,17 +30,11 @@ def update_normalized_power(sensor, pwr):
     if np.isnan(pwr):
         return
 
-    window_size = sensor.np_window_size
-    np_power = max(float(pwr), 0.0)
-    if len(sensor.np_window_30s) < window_size:
-        sensor.np_window_30s.append(np_power)
-        sensor.np_window_sum += np_power
-    else:
-        sensor.np_window_sum += np_power - sensor.np_window_30s[0]
-        sensor._shift_window_and_append(sensor.np_window_30s, np_power)
-
-    if len(sensor.np_window_30s) >= window_size:
-        np_ma30 = sensor.np_window_sum / window_size
+    window = sensor.np_window_30s
+    window.push(max(float(pwr), 0.0))
+
+    if window.count >= window.capacity:
+        np_ma30 = window.sum() / window.capacity
         sensor.np_sum_ma4 += np_ma30**4
         sensor.np_count_ma4 += 1
         sensor.values["integrated"]["normalized_power"] = (
@@ -15,6 +15,7 @@ from .ant import ant_device_ctrl
 from .ant import ant_device_temperature
 from .ant import ant_device_multiscan
 from .ant import ant_device_search
+from .ant.ant_capture import ANT_Capture, ANT_ReplayNode
 
 # ANT+
 _SENSOR_ANT = False
@@ -44,6 +45,8 @@ class SensorANT(Sensor):
     NETWORK_NUM = 0x00
     scanner = None
     device = {}
+    # sensors paired with the devices of a replayed capture
+    replay_sensors = ("HR", "SPD", "CDC", "PWR", "TEMP")
 
     def _init_runtime_state(self):
         self._start_task = None
@@ -87,7 +90,7 @@ class SensorANT(Sensor):
                     "cadence": 0,
                     "power_r": 0,
                     "power_l": 0,
-                    "lr_balance": ":",
+                    "lr_balance": np.nan,
                 }
             )
         elif page == 0x11:
@@ -111,19 +114,24 @@ class SensorANT(Sensor):
         self._init_runtime_state()
         self._init_transport_disconnect_state()
 
-        if self.config.G_ANT["STATUS"] and not _SENSOR_ANT:
+        replay = bool(self.config.G_ANT_REPLAY["FILE"])
+        if replay:
+            # the capture stands for the dongle
+            self.config.G_ANT["STATUS"] = True
+        elif self.config.G_ANT["STATUS"] and not _SENSOR_ANT:
             self.config.G_ANT["STATUS"] = False
 
         if self.config.G_ANT["STATUS"]:
-            self._create_node()
+            if self._create_node() and replay:
+                self._pair_replay_sensors()
 
         # initialize scan channel (reserve ch0)
         if _SENSOR_ANT:
             app_logger.info("detected ANT+ sensors:")
         self._create_scan_search_devices()
 
-        # auto connect ANT+ sensor from setting.conf
-        if self.config.G_ANT["STATUS"] and not self.config.G_DUMMY_OUTPUT:
+        # auto connect ANT+ sensor from setting.conf (or the replayed capture)
+        if self.config.G_ANT["STATUS"] and (replay or not self.config.G_DUMMY_OUTPUT):
             for key in self.config.G_ANT["ID"].keys():
                 if self.config.G_ANT["USE"][key]:
                     antID = self.config.G_ANT["ID"][key]
@@ -224,7 +232,14 @@ class SensorANT(Sensor):
 
     def _create_node(self):
         try:
-            self.node = Node()
+            if self.config.G_ANT_REPLAY["FILE"]:
+                self.node = ANT_ReplayNode(
+                    self.config.G_ANT_REPLAY["FILE"], self.config.G_ANT_REPLAY["SPEED"]
+                )
+            else:
+                self.node = Node()
+                if self.config.G_ANT_CAPTURE:
+                    self.node.capture = ANT_Capture(self.config.G_ANT_CAPTURE)
             self._register_transport_disconnect_callback()
             self.node.set_network_key(self.NETWORK_NUM, self.NETWORK_KEY)
             return True
@@ -239,6 +254,28 @@ class SensorANT(Sensor):
             self.config.G_ANT["STATUS"] = False
             return False
 
+    def _pair_replay_sensors(self):
+        ant = self.config.G_ANT
+        devices = self.node.devices
+        for key in ant["ID"]:
+            ant["USE"][key] = False
+            ant["ID"][key] = ant["TYPE"][key] = ant["ID_TYPE"][key] = 0
+            if key not in self.replay_sensors:
+                continue
+            for ant_type in ant["TYPES"][key]:
+                ant_ids = [i for i, t in devices if t == ant_type]
+                if ant_ids:
+                    ant["USE"][key] = True
+                    ant["ID"][key] = ant_ids[0]
+                    ant["TYPE"][key] = ant_type
+                    ant["ID_TYPE"][key] = struct.pack("<HB", ant_ids[0], ant_type)
+                    break
+
+    def _close_capture(self):
+        capture = getattr(self.node, "capture", None)
+        if capture is not None:
+            capture.close()
+
     def _create_scan_search_devices(self):
         self.scanner = ant_device_multiscan.ANT_Device_MultiScan(self.node, self.config)
         self.searcher = ant_device_search.ANT_Device_Search(
@@ -370,6 +407,12 @@ class SensorANT(Sensor):
     def quit(self):
         if self.node is None:
             return
+        try:
+            self._quit_node()
+        finally:
+            self._close_capture()
+
+    def _quit_node(self):
         self._sync_transport_disconnect_from_node()
         if self.transport_disconnected:
             app_logger.info("Skip ANT+ quit after transport disconnect")
@@ -3,13 +3,16 @@ import math
 import asyncio
 import os
 from pathlib import Path
+import threading
 import time
 
 import numpy as np
 
 from modules.app_logger import app_logger
 from modules.helper.network.http_client import get_json
+from modules.utils import perf
 from modules.utils.geo import get_dist_on_earth, get_track_str
+from modules.utils.ring_buffer import RingBuffer
 from .sensor import Sensor
 from .i2c_utils import i2c_addr_present as _i2c_addr_present
 
@@ -231,17 +234,42 @@ class SensorI2C(Sensor):
     total_ascent_threshold = 2  # [m]
 
     # for vertical speed
-    vspeed_array = []
+    vspeed_array = None
     vspeed_window_duration = 2  # [s]
     vspeed_window_size = vspeed_window_duration
-    timestamp_array = []
+    timestamp_array = None
     timestamp_duration = vspeed_window_duration  # [s]
     timestamp_size = timestamp_duration
 
     quit_status = False
 
+    # sensor groups read by the I2C thread, each at its own interval
+    # (MOTION at G_I2C_INTERVAL, the others at G_I2C_GROUP_INTERVAL)
+    read_groups = {
+        "MOTION": (
+            "read_bhi3_s",
+            "read_acc",
+            "read_gyro",
+            "read_mag",
+            "read_quaternion",
+            "calc_motion",
+        ),
+        "PRESSURE": ("update_timestamp_array", "read_baro_temp", "calc_altitude"),
+        "LIGHT": ("read_light",),
+        "GAS": ("read_gas",),
+        "BATTERY": ("read_battery",),
+    }
+
     def sensor_init(self):
         self.bhi3_s_target = ""
+        # held by the I2C thread while a group is read
+        self.lock = threading.RLock()
+        self._thread = None
+        self._thread_wakeup = threading.Event()
+        self._loop = None
+        self._perf_groups = {
+            group: perf.histogram(f"i2c.{group.lower()}") for group in self.read_groups
+        }
         self.reset()
         self.is_mag_declination_modified = False
         self._mag_declination_task = None
@@ -512,6 +540,10 @@ class SensorI2C(Sensor):
             self.sensor["i2c_baro_temp"] = self.sensor_bhi3_s
 
     def reset(self):
+        with self.lock:
+            self.reset_values()
+
+    def reset_values(self):
         for key in self.elements:
             self.values[key] = np.nan
         for key in self.elements_vec:
@@ -527,10 +559,12 @@ class SensorI2C(Sensor):
             self.pre_value[key] = np.full(3, np.nan)
         # for median filter
         for key in self.median_keys:
-            self.pre_values_array[key] = np.full(self.pre_value_window_size, np.nan)
+            self.pre_values_array[key] = RingBuffer(
+                self.pre_value_window_size, median=True
+            )
         # for average filter
         for key in self.average_keys:
-            self.average_val[key] = np.full(self.ave_window_size, np.nan)
+            self.average_val[key] = RingBuffer(self.ave_window_size)
         # for quaternions (4 elements)
         self.values["quaternion"] = np.zeros(4)
         self.pre_value["quaternion"] = np.zeros(4)
@@ -540,7 +574,9 @@ class SensorI2C(Sensor):
             self.values_mod[key] = np.zeros(3)
         for key in ("mag_min", "mag_max"):
             self.values_mod.setdefault(key, None)
-        self.gyro_average_array = np.zeros((3, int(2 / self.config.G_I2C_INTERVAL) + 1))
+        self.gyro_average_array = RingBuffer(
+            int(2 / self.config.G_I2C_INTERVAL) + 1, fill=0, width=3
+        )
 
         self.values["total_ascent"] = 0
         self.values["total_descent"] = 0
@@ -548,23 +584,21 @@ class SensorI2C(Sensor):
 
         self.graph_values = {}
         for g in self.graph_keys:
-            self.graph_values[g] = np.full(
-                (3, self.config.G_GUI_ACC_TIME_RANGE), np.nan
-            )
+            self.graph_values[g] = RingBuffer(self.config.G_GUI_ACC_TIME_RANGE, width=3)
 
         # for moving status
         self.mov_window_size = int(2 / self.config.G_I2C_INTERVAL) + 1
-        self.acc_raw_hist = np.zeros((3, self.mov_window_size))
-        self.acc_hist = np.zeros((3, self.mov_window_size))
-        self.euler_array = np.zeros((2, self.mov_window_size))
+        self.acc_raw_hist = RingBuffer(self.mov_window_size, fill=0, width=3)
+        self.acc_hist = RingBuffer(self.mov_window_size, fill=0, width=3)
+        self.euler_array = RingBuffer(self.mov_window_size, fill=0, width=2)
         self.acc_variance = np.zeros(3)
-        self.moving = np.ones(self.mov_window_size)
+        self.moving = RingBuffer(self.mov_window_size, fill=1)
 
-        samples_per_second = max(1, int(1 / self.config.G_I2C_INTERVAL))
+        samples_per_second = max(1, int(1 / self.get_group_interval("PRESSURE")))
         self.vspeed_window_size = self.vspeed_window_duration * samples_per_second
         self.timestamp_size = self.timestamp_duration * samples_per_second
-        self.timestamp_array = [None] * self.timestamp_size
-        self.vspeed_array = [np.nan] * self.vspeed_window_size
+        self.timestamp_array = RingBuffer(self.timestamp_size)
+        self.vspeed_array = RingBuffer(self.vspeed_window_size)
 
         if (
             self.values_mod["mag_min"] is not None
@@ -576,16 +610,61 @@ class SensorI2C(Sensor):
         self._mag_calibration_prev_i2c_interval = None
 
     def start_coroutine(self):
-        asyncio.create_task(self.start())
-
-    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._thread = threading.Thread(target=self.run, name="i2c", daemon=True)
+        self._thread.start()
+
+    def get_group_interval(self, group):
+        if group == "MOTION":
+            return self.config.G_I2C_INTERVAL
+        interval = self.config.G_I2C_GROUP_INTERVAL.get(group)
+        return self.config.G_I2C_INTERVAL if interval is None else interval
+
+    def read_group(self, group):
+        with self.lock, perf.PerfTimer(self._perf_groups[group]):
+            for name in self.read_groups[group]:
+                getattr(self, name)()
+
+    def run(self):
+        # NOTE: executed in the I2C thread, blocking SMBus I/O stays off the event loop
+        next_time = dict.fromkeys(self.read_groups, time.monotonic())
         while not self.quit_status:
-            await self.sleep()
-            await self.update()
-            self.get_sleep_time(self.config.G_I2C_INTERVAL)
-    
+            now = time.monotonic()
+            self.values["timestamp"] = datetime.now()
+            for group, t in next_time.items():
+                if now < t:
+                    continue
+                try:
+                    self.read_group(group)
+                except Exception:
+                    app_logger.exception(f"[I2C] failed to read {group}")
+                # skip the missed readings instead of catching up
+                interval = self.get_group_interval(group)
+                t += interval
+                next_time[group] = t if t > now else now + interval
+            wait = min(next_time.values()) - time.monotonic()
+            if wait > 0:
+                self._thread_wakeup.wait(wait)
+
+    def snapshot(self):
+        """Return a copy of values which is not being written by the I2C thread."""
+        with self.lock:
+            return self.values.copy()
+
+    def call_in_loop(self, func, *args):
+        # from the I2C thread to the event loop
+        if self._loop is None:
+            func(*args)
+        else:
+            self._loop.call_soon_threadsafe(func, *args)
+
+    def set_state_value(self, key, value, force_apply=False):
+        # config.state is written (and pickled) in the event loop only
+        self.call_in_loop(self.config.state.set_value, key, value, force_apply)
+
     def quit(self):
         self.quit_status = True
+        self._thread_wakeup.set()
         if self._mag_declination_task is not None:
             self._mag_declination_task.cancel()
         if self.available_sensors["BUTTON"].get("MCP23008", False):
@@ -782,6 +861,9 @@ class SensorI2C(Sensor):
 
         self._mag_declination_fetch_started = True
         app_logger.info("mag declination cache miss")
+        self.call_in_loop(self._start_mag_declination_task, context)
+
+    def _start_mag_declination_task(self, context):
         self._mag_declination_task = asyncio.create_task(
             self._update_mag_declination_async(
                 context["lat"], context["lon"], context["gps_time"]
@@ -843,27 +925,9 @@ class SensorI2C(Sensor):
         self._store_mag_declination_cache(declination, lat, lon, gps_time)
         app_logger.info("mag declination fetch succeeded: %.3f deg", declination)
 
-    async def update(self):
-        # timestamp
-        self.values["timestamp"] = datetime.now()
-        self.timestamp_array[0:-1] = self.timestamp_array[1:]
-        self.timestamp_array[-1] = self.values["timestamp"]
-
-        self.read_bhi3_s()
-
-        self.read_acc()
-        self.read_gyro()
-        self.read_mag()
-        self.read_quaternion()
-        self.calc_motion()
-
-        self.read_baro_temp()
-        self.calc_altitude()
-
-        self.read_light()
-        self.read_gas()
-
-        self.read_battery()
+    def update_timestamp_array(self):
+        # for vertical speed, at the interval of PRESSURE
+        self.timestamp_array.push(time.monotonic())
 
     def update_bhi3_raw_log_state(self):
         if not self.available_sensors["MOTION"].get("BHI3_S"):
@@ -1133,10 +1197,9 @@ class SensorI2C(Sensor):
             return
 
         # calibration
-        self.gyro_average_array[:, 0:-1] = self.gyro_average_array[:, 1:]
-        self.gyro_average_array[:, -1] = self.values["gyro_raw"]
+        self.gyro_average_array.push(self.values["gyro_raw"])
         #if self.do_position_calibration:
-        #    self.values_mod["gyro_ave"] = np.nanmean(self.gyro_average_array, axis=1)
+        #    self.values_mod["gyro_ave"] = self.gyro_average_array.mean()
         self.values["gyro_mod"] = self.values["gyro_raw"].copy()  # - self.values_mod["gyro_ave"]
 
         # LP filter
@@ -1241,7 +1304,7 @@ class SensorI2C(Sensor):
         for pre, k in zip((pre_min, pre_max), ("mag_min", "mag_max")):
             if pre is None or np.any(pre != self.values_mod[k]):
                 update_mag_min_max = True
-                self.config.state.set_value(
+                self.set_state_value(
                     k + "_" + self.sensor_label["MAG"], self.values_mod[k]
                 )
                 app_logger.info(f"update {k}: {self.values_mod[k]}")
@@ -1367,8 +1430,7 @@ class SensorI2C(Sensor):
         moving = 1
         if self.acc_variance[Z] < self.moving_threshold:
             moving = 0
-        self.moving[0:-1] = self.moving[1:]
-        self.moving[-1] = moving
+        self.moving.push(moving)
         # moving status (0:off=stop, 1:on=running)
         self.values["m_stat"] = self.moving[-1]
 
@@ -1376,27 +1438,20 @@ class SensorI2C(Sensor):
 
     def calibrate_pitch_roll_if_stopped(self):
         # calibrate position
-        if not self.do_pitch_roll_calibration or sum(self.moving) != 0:
+        if not self.do_pitch_roll_calibration or self.moving.sum() != 0:
             return
 
         pitch = roll = np.nan
         if self.motion_sensor["ACC"]:
-            pitch, roll = self.get_pitch_roll(
-                [
-                    np.average(self.acc_raw_hist[0]),
-                    np.average(self.acc_raw_hist[1]),
-                    np.average(self.acc_raw_hist[2]),
-                ]
-            )
+            pitch, roll = self.get_pitch_roll(list(self.acc_raw_hist.mean()))
         elif self.motion_sensor["QUATERNION"]:
-            pitch = np.average(self.euler_array[0])
-            roll = np.average(self.euler_array[1])
+            pitch, roll = self.euler_array.mean()
 
         if not np.any(np.isnan((pitch, roll))):
             self.values["fixed_pitch"] = pitch
             self.values["fixed_roll"] = roll
-            self.config.state.set_value("fixed_pitch", pitch)
-            self.config.state.set_value("fixed_roll", roll, force_apply=True)
+            self.set_state_value("fixed_pitch", pitch)
+            self.set_state_value("fixed_roll", roll, force_apply=True)
             self.values["gyro"] = np.zeros(3)
             app_logger.info(
                 f"calibrated position: pitch:{int(math.degrees(pitch))}, roll:{int(math.degrees(roll))}"
@@ -1405,15 +1460,12 @@ class SensorI2C(Sensor):
 
     def update_moving_threshold(self):
         if self.motion_sensor["ACC"]:
-            self.acc_raw_hist[:, 0:-1] = self.acc_raw_hist[:, 1:]
-            self.acc_raw_hist[:, -1] = self.values["acc_raw"]
+            self.acc_raw_hist.push(self.values["acc_raw"])
         elif self.motion_sensor["QUATERNION"]:
-            self.euler_array[:, 0:-1] = self.euler_array[:, 1:]
-            self.euler_array[:, -1] = [self.values["pitch"], self.values["roll"]]
+            self.euler_array.push((self.values["pitch"], self.values["roll"]))
 
-        self.acc_hist[:, 0:-1] = self.acc_hist[:, 1:]
-        self.acc_hist[:, -1] = self.values["acc"]
-        self.acc_variance = np.var(self.acc_hist, axis=1)
+        self.acc_hist.push(self.values["acc"])
+        self.acc_variance = self.acc_hist.var()
 
         if np.any(self.acc_variance == 0):
             return
@@ -1491,8 +1543,7 @@ class SensorI2C(Sensor):
         for g in self.graph_keys:
             if g not in self.graph_values:
                 continue
-            self.graph_values[g][:, 0:-1] = self.graph_values[g][:, 1:]
-            self.graph_values[g][:, -1] = self.values['acc_graph']
+            self.graph_values[g].push(self.values["acc_graph"])
 
     def read_baro_temp(self):
         if not self.available_sensors["PRESSURE"]:
@@ -1562,9 +1613,8 @@ class SensorI2C(Sensor):
             self.values["altitude"] = round(altitude_raw, 1)
         else:
             # average filter
-            self.average_val["altitude"][0:-1] = self.average_val["altitude"][1:]
-            self.average_val["altitude"][-1] = altitude_raw
-            self.values["altitude"] = round(np.nanmean(self.average_val["altitude"]), 1)
+            self.average_val["altitude"].push(altitude_raw)
+            self.values["altitude"] = round(self.average_val["altitude"].mean(), 1)
 
         if self.config.G_STOPWATCH_STATUS == "START":
             # total ascent/descent
@@ -1582,19 +1632,13 @@ class SensorI2C(Sensor):
                     self.values["pre_altitude"] = v
 
             # vertical speed (m/s)
-            self.vspeed_array[0:-1] = self.vspeed_array[1:]
-            # self.vspeed_array[-1] = self.values['altitude']
-            self.vspeed_array[-1] = self.values["pre_altitude"]
-            if (
-                self.timestamp_array[0] is not None
-                and self.timestamp_array[-1] is not None
-            ):
-                i = 0
-                time_delta = (
-                    self.timestamp_array[-1] - self.timestamp_array[i]
-                ).total_seconds()
+            # self.vspeed_array.push(self.values['altitude'])
+            self.vspeed_array.push(self.values["pre_altitude"])
+            timestamps = self.timestamp_array.view()
+            if not np.isnan(timestamps[0]) and not np.isnan(timestamps[-1]):
+                time_delta = timestamps[-1] - timestamps[0]
                 if time_delta > 0:
-                    altitude_delta = self.vspeed_array[-1] - self.vspeed_array[i]
+                    altitude_delta = self.vspeed_array[-1] - self.vspeed_array[0]
                     self.values["vertical_speed"] = altitude_delta / time_delta
 
     async def update_sealevel_pa(self, alt, force=False):
@@ -1644,18 +1688,18 @@ class SensorI2C(Sensor):
             except:
                 pass
 
-        self.sealevel_pa = self.values["pressure"] * pow(
-            (self.sealevel_temp - 0.0065 * alt) / self.sealevel_temp, -5.257
-        )
+        with self.lock:
+            self.sealevel_pa = self.values["pressure"] * pow(
+                (self.sealevel_temp - 0.0065 * alt) / self.sealevel_temp, -5.257
+            )
+            # reset historical altitude
+            self.average_val["altitude"].fill(np.nan)
+            self.values["pre_altitude"] = np.nan
         self.config.state.set_value("sealevel_pa", self.sealevel_pa)
         self.config.state.set_value(
             "sealevel_temp", self.sealevel_temp, force_apply=True
         )
 
-        # reset historical altitude
-        self.average_val["altitude"] = np.full(self.ave_window_size, np.nan)
-        self.values["pre_altitude"] = np.nan
-
         app_logger.info("update sealevel pressure")
         app_logger.info(f"altitude: {alt} m")
         app_logger.info(f"pressure: {round(self.values['pressure'], 3)} hPa")
@@ -1680,15 +1724,14 @@ class SensorI2C(Sensor):
     def median_filter(self, key):
         if key not in self.median_keys:
             return
-        self.pre_values_array[key][0:-1] = self.pre_values_array[key][1:]
-        self.pre_values_array[key][-1] = self.values[key]
-        self.median_val[key] = np.nanmedian(self.pre_values_array[key])
+        self.pre_values_array[key].push(self.values[key])
+        self.median_val[key] = self.pre_values_array[key].median()
 
     def hampel_filter(self, key, sigma=3, diff_min=0):
         if key not in self.median_keys:
             return
         hampel_std = 1.4826 * np.nanmedian(
-            np.abs(self.pre_values_array[key] - self.median_val[key])
+            np.abs(self.pre_values_array[key].view() - self.median_val[key])
         )
         if np.isnan(hampel_std):
             return
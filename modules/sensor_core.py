@@ -7,6 +7,7 @@ import numpy as np
 import psutil
 
 from modules.app_logger import app_logger
+from modules.helper.enrichment import Enrichment
 from modules.sensor.performance_metrics import (
     NP_WINDOW_SIZE_DEFAULT,
     calc_form_metrics as perf_calc_form_metrics,
@@ -17,6 +18,8 @@ from modules.sensor.performance_metrics import (
 
 app_logger.info("detected sensor modules:")
 
+from modules.utils import perf
+from modules.utils.ring_buffer import RingBuffer
 from modules.utils.timer import Timer, log_timers
 from .sensor.gps import SensorGPS
 from .sensor.sensor_ant import SensorANT
@@ -58,6 +61,9 @@ class SensorCore:
         "wind_direction",
         "wind_direction_str",
         "headwind",
+        # [s] since the lookup of dem_altitude / wind
+        "dem_altitude_age",
+        "wind_age",
         "temperature",
         "cpu_percent",
         "system_cpu_percent",
@@ -73,16 +79,15 @@ class SensorCore:
         "PWR": 3,
         "TEMP": 45,
     }  # valid period of sensor [sec]
-    grade_range = 9
     grade_window_size = 5
-    brakelight_spd = []
+    brakelight_spd = None
     brakelight_spd_range = 4
     brakelight_spd_cutoff = 4  # 4*3.6 = 14.4 [km/h]
-    brakelight_cad = []
+    brakelight_cad = None
     brakelight_cad_range = 2  # 2 samples at 1Hz loop
-    brakelight_power = []
+    brakelight_power = None
     brakelight_power_range = 2  # 2 samples at 1Hz loop
-    auto_backlight_brightness = []
+    auto_backlight_brightness = None
     auto_backlight_brightness_range = 3
     graph_keys = [
         "hr_graph",
@@ -120,21 +125,20 @@ class SensorCore:
         self.reset_internal()
 
         for g in self.graph_keys:
-            self.values["integrated"][g] = [
-                np.nan
-            ] * self.config.G_GUI_PERFORMANCE_GRAPH_DISPLAY_RANGE
+            self.values["integrated"][g] = RingBuffer(
+                self.config.G_GUI_PERFORMANCE_GRAPH_DISPLAY_RANGE
+            )
         for d in self.diff_keys:
-            self.values["integrated"][d] = [np.nan] * self.grade_range
-        self.brakelight_spd = [0] * self.brakelight_spd_range
-        self.brakelight_cad = [np.nan] * self.brakelight_cad_range
-        self.brakelight_power = [np.nan] * self.brakelight_power_range
-        self.auto_backlight_brightness = \
-            [self.config.G_AUTO_BACKLIGHT_CUTOFF+1] * self.auto_backlight_brightness_range
+            self.values["integrated"][d] = RingBuffer(self.grade_window_size)
+        self.auto_backlight_brightness = RingBuffer(
+            self.auto_backlight_brightness_range,
+            fill=self.config.G_AUTO_BACKLIGHT_CUTOFF + 1,
+        )
         self.values["integrated"]["CPU_MEM"] = ""
 
         for s in self.average_secs:
             for v in self.average_values:
-                self.average_values[v][s] = []
+                self.average_values[v][s] = RingBuffer(s)
                 self.values["integrated"][f"ave_{v}_{s}s"] = np.nan
         self.process = psutil.Process()
 
@@ -159,8 +163,10 @@ class SensorCore:
         self.sensor_gpio = SensorGPIO(config, None)
         self.sensor_gpio.update()
 
+        self.enrichment = Enrichment(config)
+
         app_logger.info("[sensor] Initialize:")
-        log_timers(timers)
+        log_timers(timers, section="sensor")
 
         # Emit debug metrics at a fixed cadence to reduce log volume.
         self._perf_sensor_window = max(
@@ -174,12 +180,6 @@ class SensorCore:
         )
         self._init_perf_sensor_metrics()
 
-    @staticmethod
-    def _safe_stat(values, func, *args):
-        if not values:
-            return float("nan")
-        return float(func(values, *args))
-
     @staticmethod
     def _elapsed_since_timestamp(now_time, sensor_values, timestamp_key="timestamp"):
         timestamp = sensor_values.get(timestamp_key)
@@ -199,64 +199,36 @@ class SensorCore:
         return delta_target
 
     def _init_perf_sensor_metrics(self):
-        self._perf_sensor_calls = 0
-        self._perf_sensor_loop_ms = []
-        self._perf_sensor_preprocess_ms_sum = 0.0
-        self._perf_sensor_ant_update_ms_sum = 0.0
-        self._perf_sensor_calc_ms_sum = 0.0
-        self._perf_sensor_post_ms_sum = 0.0
-        self._perf_sensor_adjust_ms_sum = 0.0
-        self._perf_sensor_api_alt_ms_sum = 0.0
-        self._perf_sensor_api_alt_calls = 0
-        self._perf_sensor_api_wind_ms_sum = 0.0
-        self._perf_sensor_api_wind_calls = 0
+        self._perf_sensor_loop = perf.histogram("sensor.loop")
+        self._perf_sensor_stages = {
+            stage: perf.histogram(f"sensor.{stage}")
+            for stage in ("preprocess", "ant_update", "calc", "post", "adjust")
+        }
+        # observed by the background lookups of Enrichment
+        self._perf_sensor_api_alt = perf.histogram("sensor.api_alt")
+        self._perf_sensor_api_wind = perf.histogram("sensor.api_wind")
 
     def _maybe_log_perf_sensor_window(self):
-        if self._perf_sensor_calls < self._perf_sensor_window:
+        loop = self._perf_sensor_loop
+        if loop.count < self._perf_sensor_window:
             return
 
-        loop_avg_ms = self._safe_stat(self._perf_sensor_loop_ms, np.mean)
-        loop_p95_ms = self._safe_stat(self._perf_sensor_loop_ms, np.percentile, 95)
-        loop_max_ms = self._safe_stat(self._perf_sensor_loop_ms, np.max)
-
-        preprocess_avg_ms = (
-            self._perf_sensor_preprocess_ms_sum / self._perf_sensor_calls
+        stage_avg = " ".join(
+            f"{stage}_avg_ms={h.mean:.3f}"
+            for stage, h in self._perf_sensor_stages.items()
         )
-        ant_update_avg_ms = (
-            self._perf_sensor_ant_update_ms_sum / self._perf_sensor_calls
-        )
-        calc_avg_ms = self._perf_sensor_calc_ms_sum / self._perf_sensor_calls
-        post_avg_ms = self._perf_sensor_post_ms_sum / self._perf_sensor_calls
-        adjust_avg_ms = self._perf_sensor_adjust_ms_sum / self._perf_sensor_calls
-
-        if self._perf_sensor_api_alt_calls > 0:
-            api_alt_avg_ms = (
-                self._perf_sensor_api_alt_ms_sum / self._perf_sensor_api_alt_calls
-            )
-        else:
-            api_alt_avg_ms = float("nan")
-
-        if self._perf_sensor_api_wind_calls > 0:
-            api_wind_avg_ms = (
-                self._perf_sensor_api_wind_ms_sum / self._perf_sensor_api_wind_calls
-            )
-        else:
-            api_wind_avg_ms = float("nan")
-
+        api_alt = self._perf_sensor_api_alt
+        api_wind = self._perf_sensor_api_wind
         cpu_percent = self.values["integrated"]["cpu_percent"]
         system_cpu_percent = self.values["integrated"]["system_cpu_percent"]
         app_logger.debug(
             "[PERF_SENSOR] "
             f"win={self._perf_sensor_window} "
-            f"calls={self._perf_sensor_calls} "
-            f"loop_avg_ms={loop_avg_ms:.3f} "
-            f"loop_p95_ms={loop_p95_ms:.3f} "
-            f"loop_max_ms={loop_max_ms:.3f} "
-            f"preprocess_avg_ms={preprocess_avg_ms:.3f} "
-            f"ant_update_avg_ms={ant_update_avg_ms:.3f} "
-            f"calc_avg_ms={calc_avg_ms:.3f} "
-            f"post_avg_ms={post_avg_ms:.3f} "
-            f"adjust_avg_ms={adjust_avg_ms:.3f} "
+            f"calls={loop.count} "
+            f"loop_avg_ms={loop.mean:.3f} "
+            f"loop_p95_ms={loop.percentile(95):.3f} "
+            f"loop_max_ms={loop.max:.3f} "
+            f"{stage_avg} "
             f"wait_s={self.wait_time:.3f} "
             f"interval_s={self.actual_loop_interval:.3f} "
             f"cpu_proc={cpu_percent} "
@@ -265,15 +237,15 @@ class SensorCore:
         app_logger.debug(
             "[PERF_SENSOR_DETAIL] "
             f"win={self._perf_sensor_window} "
-            f"api_alt_calls={self._perf_sensor_api_alt_calls} "
-            f"api_alt_avg_ms={api_alt_avg_ms:.3f} "
-            f"api_wind_calls={self._perf_sensor_api_wind_calls} "
-            f"api_wind_avg_ms={api_wind_avg_ms:.3f} "
+            f"api_alt_calls={api_alt.count} "
+            f"api_alt_avg_ms={api_alt.mean:.3f} "
+            f"api_wind_calls={api_wind.count} "
+            f"api_wind_avg_ms={api_wind.mean:.3f} "
             f"stopwatch={self.config.G_STOPWATCH_STATUS} "
             f"manual={self.config.G_MANUAL_STATUS}"
         )
 
-        self._init_perf_sensor_metrics()
+        perf.registry.reset("sensor.")
 
     def start_coroutine(self):
         asyncio.create_task(self.integrate())
@@ -284,6 +256,7 @@ class SensorCore:
 
     async def quit(self):
         self.status_quit = True
+        self.enrichment.quit()
         self.sensor_i2c.quit()
         self.sensor_ant.quit()
         self.sensor_ble.quit()
@@ -295,39 +268,35 @@ class SensorCore:
         self.sensor_gps.reset()
         self.sensor_ant.reset()
         self.sensor_i2c.reset()
+        self.enrichment.reset()
         self.reset_internal()
 
     def reset_internal(self):
         self.values["integrated"]["distance"] = 0
         self.values["integrated"]["accumulated_power"] = 0
         reset_performance_metrics_state(self)
-        self.brakelight_spd = [0] * self.brakelight_spd_range
-        self.brakelight_cad = [np.nan] * self.brakelight_cad_range
-        self.brakelight_power = [np.nan] * self.brakelight_power_range
+        self.brakelight_spd = RingBuffer(self.brakelight_spd_range, fill=0)
+        self.brakelight_cad = RingBuffer(self.brakelight_cad_range)
+        self.brakelight_power = RingBuffer(self.brakelight_power_range)
 
     def update_normalized_power(self, pwr):
         perf_update_normalized_power(self, pwr)
 
-    @staticmethod
-    def _shift_window_and_append(window, value):
-        window[:-1] = window[1:]
-        window[-1] = value
-
     def _update_zero_window_brake_hint(self, window, value):
         if np.isnan(value):
             return False
 
-        self._shift_window_and_append(window, value)
-        return all(v <= 0.0 for v in window)
+        window.push(value)
+        return bool(np.all(window.view() <= 0.0))
 
     def _update_speed_brake_hint(self, speed):
         if np.isnan(speed):
             return False
 
-        self._shift_window_and_append(self.brakelight_spd, speed)
+        self.brakelight_spd.push(speed)
 
         # 1: all past speeds are less than brakelight_spd_cutoff
-        cond_1 = all((s < self.brakelight_spd_cutoff for s in self.brakelight_spd))
+        cond_1 = bool(np.all(self.brakelight_spd.view() < self.brakelight_spd_cutoff))
         # 2-1: current speed exceeds brakelight_spd_cutoff
         cond_2_1 = speed > self.brakelight_spd_cutoff
         # 2-2: current speed reduced by 5% from the speed [brakelight_spd_range] seconds ago
@@ -362,8 +331,8 @@ class SensorCore:
         while not self.status_quit:
             await asyncio.sleep(self.wait_time)
             loop_start_perf = time.perf_counter()
-            api_alt_elapsed_ms = 0.0
-            api_wind_elapsed_ms = 0.0
+            # written by the I2C thread
+            v["I2C"] = self.sensor_i2c.snapshot()
             start_time = datetime.now()
             # print(start_time, self.wait_time)
 
@@ -583,30 +552,23 @@ class SensorCore:
                         alt_diff_spd["ANT+"] = alt - pre_alt_spd["ANT+"]
                     pre_alt_spd["ANT+"] = alt
 
-            # dem_altitude
+            # dem_altitude and wind: the latest lookups, the next ones run in background
+            enrichment = self.enrichment
+            enrichment.update(v["GPS"]["lon"], v["GPS"]["lat"])
+            now = time.monotonic()
             if self.config.G_USE_DEM_TILE:
-                api_alt_start = time.perf_counter()
-                self.values["integrated"][
-                    "dem_altitude"
-                ] = await self.config.api.get_altitude(
-                    [v["GPS"]["lon"], v["GPS"]["lat"]]
-                )
-                api_alt_elapsed_ms = (time.perf_counter() - api_alt_start) * 1000.0
-
-            # wind
+                (
+                    self.values["integrated"]["dem_altitude"],
+                    self.values["integrated"]["dem_altitude_age"],
+                ) = enrichment.get_altitude(now)
             if self.config.G_USE_WIND_DATA_SOURCE:
-                api_wind_start = time.perf_counter()
                 (
-                    self.values["integrated"]["wind_speed"], 
+                    self.values["integrated"]["wind_speed"],
                     self.values["integrated"]["wind_direction"],
                     self.values["integrated"]["wind_direction_str"],
-                    self.values["integrated"]["headwind"]
-                ) = await self.config.api.get_wind(
-                    [v["GPS"]["lon"], v["GPS"]["lat"]], v["GPS"]["track"]
-                )
-                api_wind_elapsed_ms = (
-                    time.perf_counter() - api_wind_start
-                ) * 1000.0
+                    self.values["integrated"]["headwind"],
+                    self.values["integrated"]["wind_age"],
+                ) = enrichment.get_wind(v["GPS"]["track"], now)
 
             # grade (distance base)
             if dst_diff["USE"] > 0:
@@ -615,13 +577,9 @@ class SensorCore:
                     "dst_diff": dst_diff,
                 }
                 for key in ["alt_diff", "dst_diff"]:
-                    self._shift_window_and_append(
-                        self.values["integrated"][key], diff_sources[key]["USE"]
-                    )
-                    # diff_sum[key] = np.mean(self.values['integrated'][key][-self.grade_window_size:])
-                    diff_sum[key] = np.nansum(
-                        self.values["integrated"][key][-self.grade_window_size :]
-                    )
+                    window = self.values["integrated"][key]
+                    window.push(diff_sources[key]["USE"])
+                    diff_sum[key] = window.sum()
                 # set grade
                 gl = self.config.G_ANT_NULLVALUE
                 gr = self.config.G_ANT_NULLVALUE
@@ -653,13 +611,12 @@ class SensorCore:
                     "dst_diff_spd": dst_diff_spd,
                 }
                 for key in ["alt_diff_spd", "dst_diff_spd"]:
-                    self._shift_window_and_append(
-                        self.values["integrated"][key], diff_sources_spd[key]["ANT+"]
+                    window = self.values["integrated"][key]
+                    window.push(diff_sources_spd[key]["ANT+"])
+                    # nan until the window is filled with valid values
+                    diff_sum[key] = (
+                        window.mean() if window.count == len(window) else np.nan
                     )
-                    diff_sum[key] = np.mean(
-                        self.values["integrated"][key][-self.grade_window_size :]
-                    )
-                    # diff_sum[key] = np.nansum(self.values['integrated'][key][-self.grade_window_size:])
                 # set grade
                 x = diff_sum["dst_diff_spd"] ** 2 - diff_sum["alt_diff_spd"] ** 2
                 y = diff_sum["alt_diff_spd"]
@@ -701,7 +658,7 @@ class SensorCore:
                 "altitude_graph": v["I2C"]["altitude"],
             }
             for key, value in graph_values.items():
-                self._shift_window_and_append(self.values["integrated"][key], value)
+                self.values["integrated"][key].push(value)
 
             # average power, heart_rate
             if ant_use["PWR"] and not np.isnan(pwr):
@@ -767,10 +724,8 @@ class SensorCore:
                 self.config.display.use_auto_backlight
                 and not np.isnan(v["I2C"]["light"])
             ):
-                self._shift_window_and_append(
-                    self.auto_backlight_brightness, v["I2C"]["light"]
-                )
-                brightness = int(np.mean(self.auto_backlight_brightness))
+                self.auto_backlight_brightness.push(v["I2C"]["light"])
+                brightness = int(self.auto_backlight_brightness.mean())
 
                 if brightness <= self.config.G_AUTO_BACKLIGHT_CUTOFF:
                     self.config.display.set_minimum_brightness()
@@ -853,20 +808,14 @@ class SensorCore:
             adjust_elapsed_ms = (time.perf_counter() - adjust_start_perf) * 1000.0
             loop_elapsed_ms = (time.perf_counter() - loop_start_perf) * 1000.0
 
-            self._perf_sensor_calls += 1
-            self._perf_sensor_loop_ms.append(loop_elapsed_ms)
-            self._perf_sensor_preprocess_ms_sum += preprocess_elapsed_ms
-            self._perf_sensor_ant_update_ms_sum += ant_update_elapsed_ms
-            self._perf_sensor_calc_ms_sum += calc_elapsed_ms
-            self._perf_sensor_post_ms_sum += post_elapsed_ms
-            self._perf_sensor_adjust_ms_sum += adjust_elapsed_ms
-
-            if self.config.G_USE_DEM_TILE:
-                self._perf_sensor_api_alt_calls += 1
-                self._perf_sensor_api_alt_ms_sum += api_alt_elapsed_ms
-            if self.config.G_USE_WIND_DATA_SOURCE:
-                self._perf_sensor_api_wind_calls += 1
-                self._perf_sensor_api_wind_ms_sum += api_wind_elapsed_ms
+            stages = self._perf_sensor_stages
+            stages["preprocess"].observe(preprocess_elapsed_ms)
+            stages["ant_update"].observe(ant_update_elapsed_ms)
+            stages["calc"].observe(calc_elapsed_ms)
+            stages["post"].observe(post_elapsed_ms)
+            stages["adjust"].observe(adjust_elapsed_ms)
+            # observed last: the window is counted by the loop histogram
+            self._perf_sensor_loop.observe(loop_elapsed_ms)
 
             self._maybe_log_perf_sensor_window()
 
@@ -910,13 +859,9 @@ class SensorCore:
 
     def get_ave_values(self, k, v):
         for sec in self.average_secs:
-            if len(self.average_values[k][sec]) < sec:
-                self.average_values[k][sec].append(v)
-            else:
-                self._shift_window_and_append(self.average_values[k][sec], v)
-            self.values["integrated"]["ave_{}_{}s".format(k, sec)] = int(
-                np.mean(self.average_values[k][sec])
-            )
+            window = self.average_values[k][sec]
+            window.push(v)
+            self.values["integrated"]["ave_{}_{}s".format(k, sec)] = int(window.mean())
 
     def calc_w_prime_balance(self, pwr):
         perf_calc_w_prime_balance(self, pwr)
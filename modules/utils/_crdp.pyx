@@ -2,63 +2,89 @@
 # 9359b0ba5a89efca4d30f306dfb250d972d301d8.
 # Original project: https://github.com/biran0079/crdp
 # License: MIT (see NOTICE and third_party/mit/LICENSE.MIT).
+#
+# Modified for pizero_bikecomputer: points are read through typed
+# memoryviews (no per-point Python indexing), the stack is a C array,
+# the mask is returned as a numpy bool array, and a start index allows
+# simplifying only the tail of a growing track.
+
+# cython: boundscheck=False, wraparound=False, cdivision=True
+
+import numpy as np
 
 from libc.stdlib cimport malloc, free
-from libc.string cimport memset
+from libc.math cimport sqrt, fabs
 
-cdef extern from "math.h":
-    double sqrt(double theta)
 
-cdef _c_rdp(double *x, double *y, int n, char* mask, double epsilon):
-    stk = [(0, n - 1)]
-    cdef int i, st, ed, index
+cdef int _c_rdp(
+    const double[:] x,
+    const double[:] y,
+    Py_ssize_t start,
+    Py_ssize_t end,
+    unsigned char[:] mask,
+    double epsilon,
+) nogil:
+    # each split pushes 2 ranges and pops 1, so the stack never exceeds n
+    cdef Py_ssize_t n = end - start + 1
+    cdef Py_ssize_t *stk = <Py_ssize_t*> malloc(2 * n * sizeof(Py_ssize_t))
+    if stk == NULL:
+        return -1
+    cdef Py_ssize_t top = 0
+    cdef Py_ssize_t i, st, ed, index
     cdef double d, dmax, p0, p1, p2, dis
-    while stk:
-        st, ed = stk.pop()
-        dis = sqrt((y[st]-y[ed])**2 + (x[st]-x[ed])**2)
+
+    stk[0] = start
+    stk[1] = end
+    top = 1
+    while top:
+        top -= 1
+        st = stk[2 * top]
+        ed = stk[2 * top + 1]
+        dis = sqrt((y[st] - y[ed]) ** 2 + (x[st] - x[ed]) ** 2)
         p0 = y[st] - y[ed]
         p1 = x[st] - x[ed]
         p2 = x[st] * y[ed] - y[st] * x[ed]
         dmax = 0.0
         index = st
-        for i from st < i < ed:
+        for i in range(st + 1, ed):
             if dis:
-                d = abs(p0 * x[i] - p1 * y[i] + p2) / dis
+                d = fabs(p0 * x[i] - p1 * y[i] + p2) / dis
             else:
-                d = sqrt((y[st]-y[i]) * (y[st]-y[i]) + (x[st]-x[i]) * (x[st]-x[i]))
+                d = sqrt((y[st] - y[i]) ** 2 + (x[st] - x[i]) ** 2)
             if d > dmax:
                 index = i
                 dmax = d
         if dmax > epsilon:
-            stk.append((st, index))
-            stk.append((index, ed))
+            stk[2 * top] = st
+            stk[2 * top + 1] = index
+            stk[2 * top + 2] = index
+            stk[2 * top + 3] = ed
+            top += 2
         else:
-            for i from st < i < ed:
-                mask[i] = 0
+            for i in range(st + 1, ed):
+                mask[i - start] = 0
+    free(stk)
+    return 0
 
-def rdp(points, double epsilon=0, return_mask=False):
-    cdef int n, i
-    n = len(points)
-    cdef double *x = <double*> malloc(n * sizeof(double))
-    cdef double *y = <double*> malloc(n * sizeof(double))
-    cdef char *mask = <char*> malloc(n)
-    memset(mask, 1, n)
-    for i from 0<=i<n:
-        x[i] = points[i][0]
-        y[i] = points[i][1]
-    _c_rdp(x, y, n, mask, epsilon)
-    res = []
-    res_mask = []
-    for i from 0<=i<n:
-        if mask[i]:
-            res.append(points[i])
-            res_mask.append(True)
-        else:
-            res_mask.append(False)
-    free(x)
-    free(y)
-    free(mask)
-    if return_mask:
-      return res_mask
-    else:
-      return res
+
+def rdp_mask(const double[:] x, const double[:] y, double epsilon=0, Py_ssize_t start=0):
+    """Return the bool mask of x[start:], y[start:] kept by RDP.
+
+    x[start] is the anchor (the last kept point of a stable prefix) and is
+    always kept, so only the newly appended points are simplified.
+    """
+    cdef Py_ssize_t n = x.shape[0]
+    if y.shape[0] != n:
+        raise ValueError("x and y must have the same length")
+    if start < 0 or (n and start >= n):
+        raise ValueError("start is out of range")
+    result = np.ones(n - start, dtype=np.bool_)
+    if n - start < 3:
+        return result
+    cdef unsigned char[:] mask = result.view(np.uint8)
+    cdef int ret
+    with nogil:
+        ret = _c_rdp(x, y, start, n - 1, mask, epsilon)
+    if ret:
+        raise MemoryError()
+    return result
@@ -11,13 +11,13 @@ Both the vendored implementation and this fallback wrapper are provided
 under the MIT License. See NOTICE and third_party/mit/LICENSE.MIT.
 """
 
-from math import sqrt
+import numpy as np
 
 MODE = "Python"
-_cython_rdp = None
+_cython_rdp_mask = None
 
 try:
-    from ._crdp import rdp as _cython_rdp
+    from ._crdp import rdp_mask as _cython_rdp_mask
 
     MODE = "Cython"
 except Exception:
@@ -25,76 +25,75 @@ except Exception:
         import pyximport
 
         pyximport.install(inplace=True, language_level=3)
-        from ._crdp import rdp as _cython_rdp
+        from ._crdp import rdp_mask as _cython_rdp_mask
 
         MODE = "Cython"
     except Exception:
-        _cython_rdp = None
+        _cython_rdp_mask = None
 
 
-def _point_xy(point):
-    return float(point[0]), float(point[1])
-
-
-def _rdp_mask_python(points, epsilon):
-    mask = [True] * len(points)
-    stack = [(0, len(points) - 1)]
+def _rdp_mask_python(x, y, epsilon, start):
+    mask = np.ones(len(x) - start, dtype=bool)
+    stack = [(start, len(x) - 1)]
 
     while stack:
-        start, end = stack.pop()
-        x_start, y_start = _point_xy(points[start])
-        x_end, y_end = _point_xy(points[end])
-        distance = sqrt((y_start - y_end) ** 2 + (x_start - x_end) ** 2)
-        p0 = y_start - y_end
-        p1 = x_start - x_end
-        p2 = x_start * y_end - y_start * x_end
-        max_distance = 0.0
-        index = start
-
-        for i in range(start + 1, end):
-            x_value, y_value = _point_xy(points[i])
-            if distance:
-                perpendicular_distance = (
-                    abs(p0 * x_value - p1 * y_value + p2) / distance
-                )
-            else:
-                perpendicular_distance = sqrt(
-                    (y_start - y_value) ** 2 + (x_start - x_value) ** 2
-                )
-
-            if perpendicular_distance > max_distance:
-                index = i
-                max_distance = perpendicular_distance
-
-        if max_distance > epsilon:
-            stack.append((start, index))
-            stack.append((index, end))
+        st, ed = stack.pop()
+        if ed - st < 2:
+            continue
+        p0 = y[st] - y[ed]
+        p1 = x[st] - x[ed]
+        p2 = x[st] * y[ed] - y[st] * x[ed]
+        distance = np.sqrt(p0**2 + p1**2)
+        x_values = x[st + 1 : ed]
+        y_values = y[st + 1 : ed]
+        if distance:
+            d = np.abs(p0 * x_values - p1 * y_values + p2) / distance
+        else:
+            d = np.sqrt((y[st] - y_values) ** 2 + (x[st] - x_values) ** 2)
+
+        index = int(np.argmax(d))
+        if d[index] > epsilon:
+            index += st + 1
+            stack.append((st, index))
+            stack.append((index, ed))
             continue
 
-        for i in range(start + 1, end):
-            mask[i] = False
+        mask[st + 1 - start : ed - start] = False
 
     return mask
 
 
-def rdp(points, epsilon=0, return_mask=False):
-    point_count = len(points)
-    if point_count == 0:
-        return []
-    if point_count == 1:
-        return [True] if return_mask else [points[0]]
-    if point_count == 2:
-        return [True, True] if return_mask else [points[0], points[1]]
+def rdp_mask(x, y, epsilon=0, start=0):
+    """Return the numpy bool mask of the points kept by RDP.
 
+    x, y are 1-D arrays; float64 arrays are used without a copy. With
+    start > 0 (online mode), only x[start:], y[start:] is simplified and
+    the mask of that tail is returned: x[start] is the last kept point of
+    the stable prefix and is always kept.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
     epsilon = float(epsilon)
 
-    if _cython_rdp is not None:
-        return _cython_rdp(points, epsilon=epsilon, return_mask=return_mask)
+    if _cython_rdp_mask is not None:
+        return _cython_rdp_mask(x, y, epsilon, start)
+
+    if len(x) != len(y):
+        raise ValueError("x and y must have the same length")
+    if start < 0 or (len(x) and start >= len(x)):
+        raise ValueError("start is out of range")
+    return _rdp_mask_python(x, y, epsilon, start)
+
+
+def rdp(points, epsilon=0, return_mask=False):
+    points = np.asarray(points, dtype=np.float64)
+    if not len(points):
+        return np.ones(0, dtype=bool) if return_mask else points
 
-    mask = _rdp_mask_python(points, epsilon)
+    mask = rdp_mask(points[:, 0], points[:, 1], epsilon)
     if return_mask:
         return mask
-    return [point for point, keep in zip(points, mask) if keep]
+    return points[mask]
 
 
-__all__ = ["MODE", "rdp"]
+__all__ = ["MODE", "rdp", "rdp_mask"]
@@ -0,0 +1,115 @@
+import numpy as np
+
+# 8x8 Bayer matrix
+BAYER_8 = np.array(
+    [
+        [0, 32, 8, 40, 2, 34, 10, 42],
+        [48, 16, 56, 24, 50, 18, 58, 26],
+        [12, 44, 4, 36, 14, 46, 6, 38],
+        [60, 28, 52, 20, 62, 30, 54, 22],
+        [3, 35, 11, 43, 1, 33, 9, 41],
+        [51, 19, 59, 27, 49, 17, 57, 25],
+        [15, 47, 7, 39, 13, 45, 5, 37],
+        [63, 31, 55, 23, 61, 29, 53, 21],
+    ],
+    dtype=np.float32,
+)
+
+_diagonal_cache = {}
+
+
+class Palette:
+    """RGB palette with a fast path for per-channel level grids.
+
+    palette is a didder style string like "000000 FFFFFF".
+    """
+
+    def __init__(self, palette):
+        self.colors = np.array(
+            [[int(c[i : i + 2], 16) for i in (0, 2, 4)] for c in palette.split()],
+            dtype=np.float32,
+        )
+        levels = [np.unique(self.colors[:, ch]) for ch in range(3)]
+        # full grid of levels in each channel (e.g. 8 or 64 colors)
+        self.levels = None
+        if len(self.colors) == np.prod([len(lv) for lv in levels]) and all(
+            np.array_equal(lv, levels[0]) for lv in levels
+        ):
+            self.levels = levels[0]
+        # [0-255] distance between levels, used as ordered dither spread
+        lv = self.levels if self.levels is not None else np.unique(self.colors)
+        self.spread = float(np.max(np.diff(lv))) if len(lv) > 1 else 255.0
+
+    def quantize(self, rgb):
+        """Return the nearest palette color of float rgb [..., 3]."""
+        if self.levels is not None:
+            idx = np.searchsorted(self.levels, rgb)
+            np.clip(idx, 1, len(self.levels) - 1, out=idx)
+            lo = self.levels[idx - 1]
+            hi = self.levels[idx]
+            return np.where(rgb - lo < hi - rgb, lo, hi)
+
+        best = np.empty(rgb.shape[:-1], dtype=np.int64)
+        best_dist = np.full(rgb.shape[:-1], np.inf, dtype=np.float32)
+        for i, color in enumerate(self.colors):
+            dist = np.sum((rgb - color) ** 2, axis=-1)
+            cond = dist < best_dist
+            best[cond] = i
+            best_dist[cond] = dist[cond]
+        return self.colors[best]
+
+
+def _get_diagonals(h, w):
+    # Floyd-Steinberg only pushes error to pixels with larger x + 2y,
+    # so each such diagonal can be processed at once.
+    key = (h, w)
+    if key not in _diagonal_cache:
+        y, x = np.mgrid[0:h, 0:w]
+        t = (x + 2 * y).ravel()
+        order = np.argsort(t, kind="stable")
+        bounds = np.searchsorted(t[order], np.arange(t.max() + 2))
+        ys = y.ravel()[order]
+        xs = x.ravel()[order]
+        _diagonal_cache[key] = [
+            (ys[s:e], xs[s:e]) for s, e in zip(bounds[:-1], bounds[1:])
+        ]
+    return _diagonal_cache[key]
+
+
+def error_diffusion(images, palette, strength=1.0):
+    """Floyd-Steinberg dithering of uint8 images [n, h, w, 3] to the palette."""
+    n, h, w, _ = images.shape
+    # pad one row below and one column on each side for the error
+    buf = np.zeros((n, h + 1, w + 2, 3), dtype=np.float32)
+    buf[:, :h, 1 : w + 1] = images
+    out = np.empty_like(images)
+    for ys, xs in _get_diagonals(h, w):
+        xp = xs + 1
+        old = buf[:, ys, xp]
+        new = palette.quantize(old)
+        out[:, ys, xs] = new
+        err = (old - new) * strength
+        buf[:, ys, xp + 1] += err * (7 / 16)
+        buf[:, ys + 1, xp - 1] += err * (3 / 16)
+        buf[:, ys + 1, xp] += err * (5 / 16)
+        buf[:, ys + 1, xp + 1] += err * (1 / 16)
+    return out
+
+
+def ordered(images, palette, strength=1.0):
+    """Bayer ordered dithering of uint8 images [n, h, w, 3] to the palette."""
+    _, h, w, _ = images.shape
+    threshold = (BAYER_8 + 0.5) / 64 - 0.5
+    threshold = np.tile(threshold, (h // 8 + 1, w // 8 + 1))[:h, :w]
+    rgb = images + (threshold * palette.spread * strength)[None, :, :, None]
+    return palette.quantize(rgb).astype(np.uint8)
+
+
+METHODS = {
+    "edm": error_diffusion,
+    "ordered": ordered,
+}
+
+
+def dither(images, palette, method="edm", strength=1.0):
+    return METHODS[method](images, palette, strength)
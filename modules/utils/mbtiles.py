@@ -0,0 +1,67 @@
+import os
+import sqlite3
+
+MBTILES_DIR = "maptile"
+
+
+class MBTilesReader:
+    """Long-lived read-only connection to an MBTiles file.
+
+    Queries use fixed parameterized SQL, so sqlite3 reuses the compiled
+    statements from its per-connection cache. x, y are XYZ tile coordinates;
+    the TMS row flip of MBTiles is done here.
+    """
+
+    SELECT_TILE_SQL = (
+        "SELECT tile_data FROM tiles "
+        "WHERE zoom_level=? AND tile_column=? AND tile_row=?"
+    )
+    SELECT_EXISTING_SQL = (
+        "SELECT tile_column, tile_row FROM tiles "
+        "WHERE zoom_level=? AND tile_column BETWEEN ? AND ? "
+        "AND tile_row BETWEEN ? AND ?"
+    )
+
+    def __init__(self, path, mmap_size=0):
+        self.path = path
+        self.con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        if mmap_size:
+            self.con.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+
+    def close(self):
+        self.con.close()
+
+    def get_tile(self, z, x, y):
+        row = self.con.execute(self.SELECT_TILE_SQL, (z, x, 2**z - 1 - y)).fetchone()
+        return None if row is None else row[0]
+
+    def has_tile(self, z, x, y):
+        return bool(self.get_existing_tiles(z, x, x, y, y))
+
+    def get_existing_tiles(self, z, x0, x1, y0, y1):
+        """Return the set of (x, y) stored in [x0, x1] x [y0, y1] at zoom z."""
+        max_row = 2**z - 1
+        rows = self.con.execute(
+            self.SELECT_EXISTING_SQL, (z, x0, x1, max_row - y1, max_row - y0)
+        )
+        return {(x, max_row - row) for x, row in rows}
+
+
+_readers = {}
+
+
+def get_mbtiles_reader(map_name, mmap_size=0):
+    reader = _readers.get(map_name)
+    if reader is None:
+        reader = MBTilesReader(
+            os.path.join(MBTILES_DIR, f"{map_name}.mbtiles"), mmap_size=mmap_size
+        )
+        _readers[map_name] = reader
+    return reader
+
+
+def close_all():
+    """Close the pooled readers, they are opened again on the next use."""
+    for reader in _readers.values():
+        reader.close()
+    _readers.clear()
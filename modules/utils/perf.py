@@ -0,0 +1,208 @@
+"""Performance metrics shared by all modules.
+
+Elapsed times are kept in fixed-size histograms and events in counters,
+registered by name in one process-wide registry:
+
+    from modules.utils import perf
+
+    PERF_LOOP = perf.histogram("sensor.loop")
+    ...
+    PERF_LOOP.observe(elapsed_ms)
+
+Nothing is recorded while registry.enabled is False (the default; it is
+turned on by --debug and --benchmark), so hot paths only pay one attribute
+check. snapshot() returns a plain dict which can be written to the log, to a
+JSON file or sent as a status message.
+"""
+
+import json
+import math
+import os
+import time
+from bisect import bisect_left
+
+# [ms] upper bounds of the histogram buckets, 0.05ms to 30s in steps of 1.5x
+# (percentiles are within a half step), the last one takes the rest
+BUCKETS_MS = tuple(0.05 * 1.5**i for i in range(34)) + (math.inf,)
+
+
+class Histogram:
+    """Count, sum, max and bucket counts of elapsed times in [ms]."""
+
+    __slots__ = ("name", "registry", "counts", "count", "sum", "max")
+
+    def __init__(self, name, registry):
+        self.name = name
+        self.registry = registry
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        registry = self.registry
+        if not registry.enabled:
+            return
+        self.counts[bisect_left(BUCKETS_MS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+        if registry.listeners:
+            for listener in registry.listeners:
+                listener(self.name, value)
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else math.nan
+
+    def percentile(self, p):
+        # interpolated inside the bucket, exact enough for p95 of a window
+        if not self.count:
+            return math.nan
+        rank = self.count * p / 100
+        cumulative = 0
+        lower = 0.0
+        for upper, n in zip(BUCKETS_MS, self.counts):
+            if n and cumulative + n >= rank:
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * (rank - cumulative) / n
+            cumulative += n
+            lower = upper
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum_ms": self.sum,
+            "mean_ms": self.mean,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "max_ms": self.max,
+        }
+
+
+class Counter:
+    """Event counter. set() overwrites the value, for gauges like a cache size."""
+
+    __slots__ = ("name", "registry", "value")
+
+    def __init__(self, name, registry):
+        self.name = name
+        self.registry = registry
+        self.value = 0
+
+    def reset(self):
+        self.value = 0
+
+    def inc(self, n=1):
+        if self.registry.enabled:
+            self.value += n
+
+    def set(self, value):
+        if self.registry.enabled:
+            self.value = value
+
+    def snapshot(self):
+        return self.value
+
+
+class PerfTimer:
+    """Context manager observing the elapsed time of the block in [ms]."""
+
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.histogram.observe((time.perf_counter() - self.start) * 1000.0)
+
+
+class PerfRegistry:
+    def __init__(self):
+        self.enabled = False
+        # called with (name, elapsed_ms) of each observation, e.g. by the benchmark
+        self.listeners = []
+        self.metrics = {}
+
+    def _get(self, name, metric_class):
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = metric_class(name, self)
+        elif not isinstance(metric, metric_class):
+            raise TypeError(f"{name} is a {type(metric).__name__}")
+        return metric
+
+    def histogram(self, name):
+        return self._get(name, Histogram)
+
+    def counter(self, name):
+        return self._get(name, Counter)
+
+    def timer(self, name):
+        return PerfTimer(self.histogram(name))
+
+    def observe(self, name, value):
+        if self.enabled:
+            self.histogram(name).observe(value)
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def _select(self, prefix):
+        return [m for k, m in sorted(self.metrics.items()) if k.startswith(prefix)]
+
+    def reset(self, prefix=""):
+        for metric in self._select(prefix):
+            metric.reset()
+
+    def snapshot(self, prefix="", reset=False):
+        """Return {name: value or histogram summary} of the metrics under prefix."""
+        metrics = self._select(prefix)
+        result = {m.name: m.snapshot() for m in metrics}
+        if reset:
+            for metric in metrics:
+                metric.reset()
+        return result
+
+    def format(self, prefix=""):
+        # one line for the log, names are shortened by the prefix
+        items = []
+        for name, value in self.snapshot(prefix).items():
+            name = name[len(prefix) :]
+            if isinstance(value, dict):
+                if not value["count"]:
+                    continue
+                items.append(
+                    f"{name}={value['mean_ms']:.3f}/{value['p95_ms']:.3f}/"
+                    f"{value['max_ms']:.3f}ms(n={value['count']})"
+                )
+            elif value:
+                items.append(f"{name}={value}")
+        return " ".join(items)
+
+    def dump(self, path, prefix=""):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.snapshot(prefix), f, indent=2, default=str)
+
+
+registry = PerfRegistry()
+
+histogram = registry.histogram
+counter = registry.counter
+timer = registry.timer
@@ -0,0 +1,161 @@
+import math
+from bisect import bisect_left, insort
+
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-capacity window of the latest samples with O(1) push.
+
+    The samples are stored twice in a buffer of 2 * capacity, so view()
+    is an ordered numpy view (oldest first) without copying, e.g. for
+    setData() of a graph. The sum and the sum of squares of the valid
+    (not nan) samples are updated on each push, so sum(), mean() and var()
+    do not scan the window; they behave like np.nansum, np.nanmean and
+    np.nanvar of the window. With median=True the valid samples are also
+    kept sorted and median() is np.nanmedian in O(log n) plus a shift of
+    the sorted list.
+
+    width=None keeps scalar samples, width=n keeps samples of n values in
+    an (n, capacity) window, with the statistics per row.
+    """
+
+    # the running sums are recomputed from the window after this many pushes
+    RESUM_INTERVAL = 4096
+
+    def __init__(self, capacity, fill=np.nan, width=None, median=False):
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+        if median and width is not None:
+            raise ValueError("median is supported for scalar samples only")
+        self.capacity = int(capacity)
+        self.width = width
+        shape = (2 * self.capacity,) if width is None else (width, 2 * self.capacity)
+        self._buf = np.empty(shape, dtype=np.float64)
+        self._sorted = [] if median else None
+        self.fill(fill)
+
+    def fill(self, value):
+        """Overwrite the whole window with value."""
+        self._buf[...] = value
+        self._head = 0
+        self._resum()
+
+    def _resum(self):
+        self._pushes = 0
+        v = self.view()
+        valid = ~np.isnan(v)
+        w = np.where(valid, v, 0.0)
+        if self.width is None:
+            self._sum = float(np.sum(w))
+            self._sumsq = float(np.sum(w * w))
+            self._count = int(np.count_nonzero(valid))
+        else:
+            self._sum = np.sum(w, axis=1)
+            self._sumsq = np.sum(w * w, axis=1)
+            self._count = np.count_nonzero(valid, axis=1)
+        if self._sorted is not None:
+            self._sorted = sorted(v[valid].tolist())
+
+    def push(self, value):
+        """Append value, dropping the oldest sample."""
+        buf = self._buf
+        head = self._head
+        cap = self.capacity
+        if self.width is None:
+            old = buf.item(head)
+            value = float(value)
+            buf[head] = buf[head + cap] = value
+            if not math.isnan(old):
+                self._sum -= old
+                self._sumsq -= old * old
+                self._count -= 1
+                if self._sorted is not None:
+                    del self._sorted[bisect_left(self._sorted, old)]
+            if not math.isnan(value):
+                self._sum += value
+                self._sumsq += value * value
+                self._count += 1
+                if self._sorted is not None:
+                    insort(self._sorted, value)
+        else:
+            old = buf[:, head].copy()
+            buf[:, head] = value
+            buf[:, head + cap] = buf[:, head]
+            new = buf[:, head]
+            old_valid = ~np.isnan(old)
+            new_valid = ~np.isnan(new)
+            old = np.where(old_valid, old, 0.0)
+            new = np.where(new_valid, new, 0.0)
+            self._sum += new - old
+            self._sumsq += new * new - old * old
+            self._count += new_valid.astype(int) - old_valid
+        self._head = head + 1 if head + 1 < cap else 0
+
+        self._pushes += 1
+        if self._pushes >= self.RESUM_INTERVAL:
+            self._resum()
+
+    def view(self):
+        """The window in order (oldest first), a view of the buffer."""
+        head = self._head
+        return self._buf[..., head : head + self.capacity]
+
+    def __array__(self, dtype=None, copy=None):
+        v = self.view()
+        if dtype is not None:
+            return v.astype(dtype)
+        return v.copy() if copy else v
+
+    def __len__(self):
+        return self.capacity
+
+    def __iter__(self):
+        return iter(self.view())
+
+    def __getitem__(self, index):
+        return self.view()[index]
+
+    @property
+    def count(self):
+        """Number of valid (not nan) samples, per row if width is set."""
+        return self._count
+
+    def sum(self):
+        return self._sum
+
+    def mean(self):
+        if self.width is None:
+            return self._sum / self._count if self._count else math.nan
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self._count > 0, self._sum / self._count, np.nan)
+
+    def var(self):
+        # population variance like np.var, the rounding error of a (nearly)
+        # constant window is cut to 0
+        if self.width is None:
+            n = self._count
+            if not n:
+                return math.nan
+            mean_sq = self._sumsq / n
+            var = mean_sq - (self._sum / n) ** 2
+            return 0.0 if var <= 1e-12 * mean_sq else var
+        n = self._count
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_sq = self._sumsq / n
+            var = mean_sq - (self._sum / n) ** 2
+        var[var <= 1e-12 * mean_sq] = 0.0
+        var[n == 0] = np.nan
+        return var
+
+    def median(self):
+        if self._sorted is None:
+            raise ValueError("RingBuffer was created without median=True")
+        s = self._sorted
+        n = len(s)
+        if not n:
+            return math.nan
+        mid = n // 2
+        if n % 2:
+            return s[mid]
+        return (s[mid - 1] + s[mid]) / 2
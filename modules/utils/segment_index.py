@@ -0,0 +1,254 @@
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+if __name__ == "__main__" and __package__ is None:
+    # Allow running as a script by adding repo root to sys.path.
+    import sys
+
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from modules.utils.geo import G_DISTANCE_BY_LAT1S, get_dist_on_earth_array
+
+# [m] per degree of latitude
+METER_PER_DEG_LAT = G_DISTANCE_BY_LAT1S * 3600
+
+
+class SegmentGridIndex:
+    """Uniform grid over the segments of a polyline.
+
+    Each segment is registered in every cell it passes through, so a query
+    returns the segments near a point without touching the whole course.
+    """
+
+    def __init__(self, lon, lat, cell_size=200.0):
+        self.cell_size = float(cell_size)  # [m]
+        self.segment_n = max(len(lon) - 1, 0)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.keys = np.array([], dtype=np.int64)
+        self.starts = np.array([], dtype=np.int64)
+        self.segments = np.array([], dtype=np.int64)
+        if not self.segment_n:
+            return
+
+        lon = self.lon
+        lat = self.lat
+        self.m_per_deg_lon = METER_PER_DEG_LAT * max(
+            np.cos(np.radians(np.mean(lat))), 0.01
+        )
+        self.cell_lon = self.cell_size / self.m_per_deg_lon
+        self.cell_lat = self.cell_size / METER_PER_DEG_LAT
+        self.origin_lon = float(np.min(lon))
+        self.origin_lat = float(np.min(lat))
+        self.grid_h = int((np.max(lat) - self.origin_lat) / self.cell_lat) + 1
+
+        # sample every segment at half a cell so that no crossed cell is skipped
+        seg_len = np.hypot(
+            np.diff(lon) / self.cell_lon, np.diff(lat) / self.cell_lat
+        )
+        sample_n = np.ceil(seg_len * 2).astype(np.int64) + 1
+        seg_ids = np.repeat(np.arange(self.segment_n), sample_n)
+        sample_starts = np.cumsum(sample_n) - sample_n
+        t = (np.arange(len(seg_ids)) - np.repeat(sample_starts, sample_n)) / np.repeat(
+            np.maximum(sample_n - 1, 1), sample_n
+        )
+        s_lon = lon[seg_ids] + (lon[seg_ids + 1] - lon[seg_ids]) * t
+        s_lat = lat[seg_ids] + (lat[seg_ids + 1] - lat[seg_ids]) * t
+
+        keys = self._cell_key(self._cell_x(s_lon), self._cell_y(s_lat))
+        cells = np.unique(np.stack([keys, seg_ids]), axis=1)
+        self.keys, self.starts = np.unique(cells[0], return_index=True)
+        self.starts = np.append(self.starts, cells.shape[1])
+        self.segments = cells[1]
+
+    def _cell_x(self, lon):
+        return np.floor((lon - self.origin_lon) / self.cell_lon).astype(np.int64)
+
+    def _cell_y(self, lat):
+        return np.floor((lat - self.origin_lat) / self.cell_lat).astype(np.int64)
+
+    def _cell_key(self, x, y):
+        return x * self.grid_h + y
+
+    def query(self, lon, lat, radius):
+        """Return sorted indexes of segments within about radius [m] of the point."""
+        if not len(self.keys):
+            return self.segments
+        r_lon = radius / self.m_per_deg_lon
+        r_lat = radius / METER_PER_DEG_LAT
+        x0, x1 = self._cell_x(np.array([lon - r_lon, lon + r_lon]))
+        y0, y1 = self._cell_y(np.array([lat - r_lat, lat + r_lat]))
+        y0 = max(y0, 0)
+        y1 = min(y1, self.grid_h - 1)
+        if x1 < 0 or y1 < y0:
+            return self.segments[:0]
+
+        x, y = np.meshgrid(np.arange(max(x0, 0), x1 + 1), np.arange(y0, y1 + 1))
+        q_keys = self._cell_key(x.ravel(), y.ravel())
+        pos = np.searchsorted(self.keys, q_keys)
+        hit = pos < len(self.keys)
+        hit[hit] = self.keys[pos[hit]] == q_keys[hit]
+        if not hit.any():
+            return self.segments[:0]
+        return np.unique(
+            np.concatenate(
+                [self.segments[self.starts[p] : self.starts[p + 1]] for p in pos[hit]]
+            )
+        )
+
+    def query_points(self, lon, lat, radius):
+        """Batch version of query for arrays of points.
+
+        Returns (point, segment) index pairs, sorted by point then segment.
+        """
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        empty = np.array([], dtype=np.int64)
+        if not len(self.keys) or not len(lon):
+            return empty, empty
+        r_lon = radius / self.m_per_deg_lon
+        r_lat = radius / METER_PER_DEG_LAT
+        x0 = self._cell_x(lon - r_lon)
+        y0 = self._cell_y(lat - r_lat)
+        span_x = int(np.max(self._cell_x(lon + r_lon) - x0)) + 1
+        span_y = int(np.max(self._cell_y(lat + r_lat) - y0)) + 1
+
+        # every point with the same span of cells, a few extra cells do not matter
+        dx, dy = np.meshgrid(np.arange(span_x), np.arange(span_y))
+        x = (x0[:, None] + dx.ravel()).ravel()
+        y = (y0[:, None] + dy.ravel()).ravel()
+        points = np.repeat(np.arange(len(lon)), dx.size)
+        valid = (x >= 0) & (y >= 0) & (y < self.grid_h)
+        q_keys = self._cell_key(x[valid], y[valid])
+        points = points[valid]
+
+        pos = np.searchsorted(self.keys, q_keys)
+        hit = pos < len(self.keys)
+        hit[hit] = self.keys[pos[hit]] == q_keys[hit]
+        pos = pos[hit]
+        points = points[hit]
+        if not len(pos):
+            return empty, empty
+
+        # expand each hit cell into its segments
+        counts = self.starts[pos + 1] - self.starts[pos]
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        segments = self.segments[np.repeat(self.starts[pos], counts) + offsets]
+        points = np.repeat(points, counts)
+
+        pairs = np.unique(points * self.segment_n + segments)
+        return pairs // self.segment_n, pairs % self.segment_n
+
+    def project_points(self, lon, lat, radius):
+        """Project points onto the segments within radius [m].
+
+        Only projections which fall on a segment and lie within radius are
+        returned, as arrays of point, segment, fraction on the segment [0-1]
+        and the distance [m] of the point from it, sorted by point then
+        segment.
+        """
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        # the grid is in degrees of the mean latitude, query a little wider
+        points, segments = self.query_points(lon, lat, radius * 1.5)
+
+        a_lon = self.lon[segments]
+        a_lat = self.lat[segments]
+        b_a_x = self.lon[segments + 1] - a_lon
+        b_a_y = self.lat[segments + 1] - a_lat
+        p_lon = lon[points]
+        p_lat = lat[points]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction = ((p_lon - a_lon) * b_a_x + (p_lat - a_lat) * b_a_y) / (
+                b_a_x**2 + b_a_y**2
+            )
+        on_segment = (0.0 <= fraction) & (fraction <= 1.0)
+
+        points = points[on_segment]
+        segments = segments[on_segment]
+        fraction = fraction[on_segment]
+        h_lon = a_lon[on_segment] + b_a_x[on_segment] * fraction
+        h_lat = a_lat[on_segment] + b_a_y[on_segment] * fraction
+        with np.errstate(invalid="ignore"):
+            dist = get_dist_on_earth_array(h_lon, h_lat, p_lon[on_segment], p_lat[on_segment])
+        # arccos of rounding errors above 1 for the same points
+        dist = np.nan_to_num(dist)
+        near = dist < radius
+        return points[near], segments[near], fraction[near], dist[near]
+
+
+def _make_course(point_n):
+    # a winding synthetic route around Tokyo, about 10m between points
+    rng = np.random.default_rng(0)
+    heading = np.cumsum(rng.normal(0, 0.05, point_n))
+    step = 10 / METER_PER_DEG_LAT
+    lat = 35.68 + np.cumsum(step * np.cos(heading))
+    lon = 139.76 + np.cumsum(step * np.sin(heading) / np.cos(np.radians(35.68)))
+    return lon, lat
+
+
+def _brute_force(lon, lat, p_lon, p_lat):
+    # the full point-to-segment distance of Course.get_index
+    b_a_x = np.diff(lon)
+    b_a_y = np.diff(lat)
+    sum_of_squares = b_a_x**2 + b_a_y**2
+    lon_diff = p_lon - lon
+    lat_diff = p_lat - lat
+    p_a_x = lon_diff[0:-1]
+    p_a_y = lat_diff[0:-1]
+    inner_p = (b_a_x * p_a_x + b_a_y * p_a_y) / sum_of_squares
+    dist_diff = np.where(
+        inner_p <= 0.0,
+        np.sqrt(p_a_x**2 + p_a_y**2),
+        np.where(
+            inner_p >= 1.0,
+            np.sqrt(lon_diff[1:] ** 2 + lat_diff[1:] ** 2),
+            np.abs(b_a_x * p_a_y - b_a_y * p_a_x) / np.sqrt(sum_of_squares),
+        ),
+    )
+    return int(np.argmin(dist_diff))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark SegmentGridIndex against the full segment search."
+    )
+    parser.add_argument("--points", type=int, default=50000)
+    parser.add_argument("--fixes", type=int, default=1000)
+    parser.add_argument("--radius", type=float, default=135.0, help="[m]")
+    args = parser.parse_args()
+
+    lon, lat = _make_course(args.points)
+    t = time.perf_counter()
+    index = SegmentGridIndex(lon, lat, cell_size=2 * args.radius)
+    build_ms = (time.perf_counter() - t) * 1000
+
+    rng = np.random.default_rng(1)
+    fix_i = rng.integers(0, args.points - 1, args.fixes)
+    noise = 20 / METER_PER_DEG_LAT
+    p_lon = lon[fix_i] + rng.normal(0, noise, args.fixes)
+    p_lat = lat[fix_i] + rng.normal(0, noise, args.fixes)
+
+    t = time.perf_counter()
+    expected = [_brute_force(lon, lat, x, y) for x, y in zip(p_lon, p_lat)]
+    full_ms = (time.perf_counter() - t) * 1000 / args.fixes
+
+    t = time.perf_counter()
+    candidates = [index.query(x, y, args.radius) for x, y in zip(p_lon, p_lat)]
+    index_ms = (time.perf_counter() - t) * 1000 / args.fixes
+    missed = sum(e not in c for e, c in zip(expected, candidates))
+
+    print(
+        f"points={args.points} build_ms={build_ms:.1f} "
+        f"full_search_ms={full_ms:.3f} index_query_ms={index_ms:.3f} "
+        f"avg_candidates={np.mean([len(c) for c in candidates]):.1f} "
+        f"missed={missed}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
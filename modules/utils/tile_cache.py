@@ -0,0 +1,71 @@
+import threading
+from collections import OrderedDict
+
+
+class TileBitmapCache:
+    """LRU cache of decoded tile arrays bounded by their total size in bytes.
+
+    An entry can be put with its source (e.g. the tile file), so that the
+    entries decoded from a source are dropped when it changes. The calls
+    are locked, the DEM tiles are also read from a worker thread.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = int(max_bytes)
+        self.bytes = 0
+        self._items = OrderedDict()
+        # source: keys of the entries decoded from it
+        self._sources = {}
+        self._key_sources = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        with self._lock:
+            array = self._items.get(key)
+            if array is not None:
+                self._items.move_to_end(key)
+            return array
+
+    def put(self, key, array, source=None):
+        if array.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._items[key] = array
+            self.bytes += array.nbytes
+            if source is not None:
+                self._sources.setdefault(source, set()).add(key)
+                self._key_sources[key] = source
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._items)))
+
+    def pop_source(self, source):
+        """Drop the entries decoded from source, return their number."""
+        with self._lock:
+            keys = self._sources.get(source, ())
+            n = len(keys)
+            for key in list(keys):
+                self._remove(key)
+            return n
+
+    def _remove(self, key):
+        array = self._items.pop(key, None)
+        if array is None:
+            return
+        self.bytes -= array.nbytes
+        source = self._key_sources.pop(key, None)
+        if source is not None:
+            keys = self._sources[source]
+            keys.discard(key)
+            if not keys:
+                del self._sources[source]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._sources.clear()
+            self._key_sources.clear()
+            self.bytes = 0
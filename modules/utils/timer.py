@@ -1,3 +1,4 @@
+import importlib
 import time
 
 from modules.app_logger import app_logger
@@ -62,10 +63,46 @@ class Timer:
             app_logger.warning("Not logger defined for timer")
 
 
-def log_timers(timers, text_total="  total: {0:.3f} sec", logger=app_logger.info):
+# elapsed time [sec] of each subsystem during boot, "section/label": sec
+boot_report = {}
+
+
+def log_timers(
+    timers, text_total="  total: {0:.3f} sec", logger=app_logger.info, section=None
+):
     total_time = 0
     for t in timers:
         t.log()
         total_time += t.elapsed_time
+        if section is not None:
+            add_boot_time(section, t.text.split(":")[0].strip(), t.elapsed_time)
     logger(text_total.format(total_time))
     return total_time
+
+
+def add_boot_time(section, label, elapsed_time):
+    key = f"{section}/{label}"
+    boot_report[key] = boot_report.get(key, 0) + elapsed_time
+
+
+def log_boot_report(logger=app_logger.info, top=10):
+    """Log the slowest subsystems of the boot (sections may be nested)."""
+    if not boot_report:
+        return
+    logger("Boot report (slowest):")
+    for key, elapsed_time in sorted(
+        boot_report.items(), key=lambda x: x[1], reverse=True
+    )[:top]:
+        logger(f"  {key:<30}: {elapsed_time:.3f} sec")
+
+
+def import_modules(names):
+    """Import modules ahead of their first use, missing ones are skipped."""
+    for name in names:
+        t = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            app_logger.debug(f"[preload] {name}: {e}")
+            continue
+        app_logger.debug(f"[preload] {name}: {time.perf_counter() - t:.3f} sec")
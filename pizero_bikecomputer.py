@@ -48,7 +48,9 @@ def main():
         logger = logger_core.LoggerCore(config)
         config.set_logger(logger)
     app_logger.info("Initialize modules:")
-    total_time = log_timers(timers, text_total="  total         : {0:.3f} sec")
+    total_time = log_timers(
+        timers, text_total="  total         : {0:.3f} sec", section="main"
+    )
     app_logger.info("########## INITIALIZE END ##########")
     config.boot_time += total_time
 
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from modules.utils import crdp
+
+requires_cython = pytest.mark.skipif(
+    crdp._cython_rdp_mask is None, reason="the Cython extension is not built"
+)
+
+
+def random_track(n, seed):
+    rng = np.random.default_rng(seed)
+    x = np.cumsum(rng.normal(size=n))
+    y = np.cumsum(rng.normal(size=n))
+    return x, y
+
+
+@requires_cython
+@pytest.mark.parametrize("n", [0, 1, 2, 3, 10, 500])
+@pytest.mark.parametrize("epsilon", [0.0, 0.5, 3.0])
+def test_rdp_mask_matches_python(n, epsilon):
+    x, y = random_track(n, seed=n)
+    expected = crdp._rdp_mask_python(x, y, epsilon, 0) if n else np.ones(0, bool)
+    np.testing.assert_array_equal(crdp.rdp_mask(x, y, epsilon), expected)
+
+
+@requires_cython
+@pytest.mark.parametrize("start", [1, 50, 250, 497, 499])
+def test_rdp_mask_with_start_matches_python(start):
+    x, y = random_track(500, seed=start)
+    mask = crdp.rdp_mask(x, y, 1.0, start)
+    assert mask.dtype == np.bool_
+    assert len(mask) == len(x) - start
+    assert mask[0] and mask[-1]
+    np.testing.assert_array_equal(mask, crdp._rdp_mask_python(x, y, 1.0, start))
+
+
+@requires_cython
+def test_rdp_mask_with_repeated_points():
+    # a closed loop and stopped points: the chord length is 0
+    x = np.array([0.0, 1.0, 1.0, 1.0, 0.0, 0.0])
+    y = np.array([0.0, 0.0, 1.0, 1.0, 1.0, 0.0])
+    for start in (0, 2):
+        np.testing.assert_array_equal(
+            crdp.rdp_mask(x, y, 0.1, start),
+            crdp._rdp_mask_python(x, y, 0.1, start),
+        )
+
+
+def test_rdp_mask_rejects_bad_arguments():
+    x, y = random_track(5, seed=0)
+    with pytest.raises(ValueError):
+        crdp.rdp_mask(x, y[:4])
+    with pytest.raises(ValueError):
+        crdp.rdp_mask(x, y, start=5)
+
+
+def test_rdp_keeps_the_end_points():
+    points = np.column_stack(random_track(100, seed=1))
+    simplified = crdp.rdp(points, 2.0)
+    np.testing.assert_array_equal(simplified[0], points[0])
+    np.testing.assert_array_equal(simplified[-1], points[-1])
+    assert len(simplified) < len(points)
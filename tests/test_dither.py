@@ -0,0 +1,124 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from modules.utils.dither import Palette, dither
+
+
+def multilevel(levels):
+    # the 8 and 64 color palettes of the map tiles
+    vals = [round(i * 255 / (levels - 1)) for i in range(levels)]
+    return " ".join(
+        f"{r:02X}{g:02X}{b:02X}" for r, g, b in itertools.product(vals, repeat=3)
+    )
+
+
+PALETTES = {
+    "mono": "000000 FFFFFF",
+    "8": multilevel(2),
+    "64": multilevel(4),
+    "free": "000000 FF0000 00FF00 0000FF 808080 FFFFFF",
+}
+
+
+def nearest(palette, rgb):
+    dist = np.sum((rgb[..., None, :] - palette.colors) ** 2, axis=-1)
+    return palette.colors[np.argmin(dist, axis=-1)]
+
+
+def floyd_steinberg(image, palette, strength=1.0):
+    # the plain scanline version
+    buf = image.astype(np.float32)
+    h, w, _ = buf.shape
+    out = np.empty_like(image)
+    for y in range(h):
+        for x in range(w):
+            old = buf[y, x].copy()
+            new = palette.quantize(old)
+            out[y, x] = new
+            err = (old - new) * strength
+            if x + 1 < w:
+                buf[y, x + 1] += err * (7 / 16)
+            if y + 1 < h:
+                if x > 0:
+                    buf[y + 1, x - 1] += err * (3 / 16)
+                buf[y + 1, x] += err * (5 / 16)
+                if x + 1 < w:
+                    buf[y + 1, x + 1] += err * (1 / 16)
+    return out
+
+
+def random_images(n, h, w, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, (n, h, w, 3), dtype=np.uint8)
+
+
+def in_palette(images, palette):
+    return np.all(
+        np.any(np.all(images[..., None, :] == palette.colors, axis=-1), axis=-1)
+    )
+
+
+@pytest.mark.parametrize("name, levels", [("mono", None), ("8", 2), ("64", 4)])
+def test_level_grid(name, levels):
+    palette = Palette(PALETTES[name])
+    if levels is None:
+        # "000000 FFFFFF" is not a grid of the 3 channels
+        assert palette.levels is None
+        assert palette.spread == 255
+    else:
+        assert len(palette.levels) == levels
+        assert palette.spread == pytest.approx(255 / (levels - 1), abs=1)
+    assert Palette(PALETTES["free"]).levels is None
+
+
+@pytest.mark.parametrize("name", PALETTES)
+def test_quantize_is_nearest(name):
+    palette = Palette(PALETTES[name])
+    rgb = np.random.default_rng(1).uniform(-40, 300, (500, 3)).astype(np.float32)
+    quantized = palette.quantize(rgb)
+    if palette.levels is None:
+        np.testing.assert_array_equal(quantized, nearest(palette, rgb))
+    else:
+        # per channel nearest (ties may go either way)
+        dist = np.sum((rgb - quantized) ** 2, axis=-1)
+        best = np.sum((rgb - nearest(palette, rgb)) ** 2, axis=-1)
+        np.testing.assert_allclose(dist, best, rtol=1e-5)
+
+
+@pytest.mark.parametrize("name", PALETTES)
+def test_error_diffusion_matches_scanline(name):
+    palette = Palette(PALETTES[name])
+    images = random_images(2, 13, 17)
+    out = dither(images, palette, "edm")
+    assert out.shape == images.shape
+    assert in_palette(out, palette)
+    for image, result in zip(images, out):
+        np.testing.assert_array_equal(result, floyd_steinberg(image, palette))
+
+
+@pytest.mark.parametrize("name", PALETTES)
+def test_ordered(name):
+    palette = Palette(PALETTES[name])
+    images = random_images(2, 20, 12)
+    out = dither(images, palette, "ordered")
+    assert out.dtype == np.uint8
+    assert out.shape == images.shape
+    assert in_palette(out, palette)
+
+
+@pytest.mark.parametrize("method", ["edm", "ordered"])
+def test_flat_gray_keeps_the_mean(method):
+    palette = Palette(PALETTES["8"])
+    images = np.full((1, 32, 32, 3), 96, dtype=np.uint8)
+    out = dither(images, palette, method)
+    assert set(np.unique(out)) == {0, 255}
+    assert np.mean(out) == pytest.approx(96, abs=8)
+
+
+def test_palette_colors_are_kept():
+    palette = Palette(PALETTES["64"])
+    images = palette.colors.astype(np.uint8).reshape(1, 8, 8, 3)
+    for method in ("edm", "ordered"):
+        np.testing.assert_array_equal(dither(images, palette, method), images)
@@ -0,0 +1,136 @@
+import math
+
+import numpy as np
+import pytest
+
+from modules.sensor.gps.base import NMEA_MODE_3D, NMEA_MODE_NO_FIX, GPSFix
+from modules.sensor.gps.fix_filter import (
+    _DEG_TO_M,
+    MAG_FADE_SPEED,
+    MAG_WEIGHT,
+    RESET_GAP,
+    FixFilter,
+)
+
+LAT0 = 35.6
+LON0 = 139.7
+KX = _DEG_TO_M * math.cos(math.radians(LAT0))
+SPEED_CUTOFF = 1.0
+
+
+def make_fix(e, n, speed=None, track=None, h_std=3.0, mode=NMEA_MODE_3D):
+    # e, n: [m] east and north of (LON0, LAT0)
+    return GPSFix(
+        LAT0 + n / _DEG_TO_M,
+        LON0 + e / KX,
+        0.0,
+        speed,
+        track,
+        mode,
+        1,
+        (h_std, h_std, 5.0),
+        (1.0, 1.0, 1.0),
+        (10, 12),
+        None,
+    )
+
+
+def local(fix):
+    return (fix.lon - LON0) * KX, (fix.lat - LAT0) * _DEG_TO_M
+
+
+def ride_east(filter_, speed, n, noise, seed=0, dt=0.2, heading=None):
+    """Feed noisy fixes of a straight ride to the east, return the errors [m]."""
+    rng = np.random.default_rng(seed)
+    errors = []
+    fix = None
+    for i in range(n):
+        e = speed * dt * i
+        fix = make_fix(
+            e + rng.normal(0, noise),
+            rng.normal(0, noise),
+            speed=max(speed + rng.normal(0, 0.3), 0.0),
+            track=(90 + rng.normal(0, 5)) % 360,
+            h_std=noise,
+        )
+        raw = local(fix)
+        filter_.update(fix, i * dt, SPEED_CUTOFF, heading)
+        filtered = local(fix)
+        errors.append(
+            (math.hypot(raw[0] - e, raw[1]), math.hypot(filtered[0] - e, filtered[1]))
+        )
+    return np.array(errors), fix
+
+
+def test_invalid_fix_is_not_changed():
+    filter_ = FixFilter()
+    for fix in (
+        make_fix(0, 0, mode=NMEA_MODE_NO_FIX),
+        GPSFix(None, None, None, None, None, NMEA_MODE_3D, 1, None, None, None, None),
+    ):
+        lat, lon = fix.lat, fix.lon
+        assert filter_.update(fix, 0.0, SPEED_CUTOFF) is fix
+        assert (fix.lat, fix.lon) == (lat, lon)
+    assert filter_.t is None
+
+
+def test_first_fix_passes_through():
+    fix = make_fix(10.0, 20.0, speed=5.0, track=45.0)
+    FixFilter().update(fix, 0.0, SPEED_CUTOFF)
+    assert local(fix) == pytest.approx((10.0, 20.0), abs=1e-6)
+    assert fix.speed == pytest.approx(5.0)
+    assert fix.track == pytest.approx(45.0)
+
+
+def test_smooths_a_noisy_ride():
+    errors, fix = ride_east(FixFilter(), 8.0, 300, noise=4.0)
+    raw, filtered = errors[50:].T
+    assert np.sqrt(np.mean(filtered**2)) < 0.6 * np.sqrt(np.mean(raw**2))
+    assert fix.speed == pytest.approx(8.0, abs=0.5)
+    assert fix.track == pytest.approx(90.0, abs=5.0)
+
+
+def test_standing_holds_the_position():
+    filter_ = FixFilter()
+    rng = np.random.default_rng(1)
+    for i in range(100):
+        fix = make_fix(*rng.normal(0, 4.0, 2), speed=0.2, track=rng.uniform(0, 360))
+        filter_.update(fix, i * 0.2, SPEED_CUTOFF)
+    assert math.hypot(*local(fix)) < 2.0
+    assert fix.speed < SPEED_CUTOFF
+
+
+@pytest.mark.parametrize(
+    "dt, e", [(RESET_GAP + 1, 50.0), (0.2, 500.0), (-1.0, 50.0)]
+)
+def test_gap_jump_or_time_backwards_restarts(dt, e):
+    filter_ = FixFilter()
+    ride_east(filter_, 8.0, 20, noise=3.0)
+    t = filter_.t
+    fix = make_fix(e, 30.0, speed=6.0, track=180.0)
+    filter_.update(fix, t + dt, SPEED_CUTOFF)
+    assert local(fix) == pytest.approx((e, 30.0), abs=1e-6)
+    assert fix.speed == pytest.approx(6.0)
+    assert fix.track == pytest.approx(180.0)
+
+
+def test_heading_is_blended_at_low_speed():
+    # the same fixes with and without the I2C heading
+    _, slow = ride_east(FixFilter(), 1.5, 50, noise=0.5, heading=60.0)
+    _, slow_gnss = ride_east(FixFilter(), 1.5, 50, noise=0.5)
+    weight = MAG_WEIGHT * (1 - slow.speed / MAG_FADE_SPEED)
+    assert slow.track == pytest.approx(
+        slow_gnss.track + weight * (60.0 - slow_gnss.track), abs=1e-6
+    )
+
+    speed = MAG_FADE_SPEED + 2
+    _, fast = ride_east(FixFilter(), speed, 50, noise=0.5, heading=60.0)
+    _, fast_gnss = ride_east(FixFilter(), speed, 50, noise=0.5)
+    assert fast.track == pytest.approx(fast_gnss.track)
+
+
+@pytest.mark.parametrize("heading", [None, math.nan])
+def test_track_without_heading(heading):
+    _, fix = ride_east(FixFilter(), 1.5, 30, noise=0.5, heading=heading)
+    _, expected = ride_east(FixFilter(), 1.5, 30, noise=0.5)
+    assert fix.track == pytest.approx(expected.track)
@@ -0,0 +1,114 @@
+import math
+import sqlite3
+
+import numpy as np
+import pytest
+
+from modules.logger.ride_stats import RideStats
+
+STATS_NAMES = (
+    "lap_avg",
+    "lap_max",
+    "pre_lap_avg",
+    "pre_lap_max",
+    "entire_avg",
+    "entire_max",
+)
+LAP_KEYS = (
+    RideStats.AVERAGE_KEYS
+    + RideStats.ACCUMULATED_KEYS
+    + RideStats.I2C_ACCUMULATED_KEYS
+)
+
+
+def make_stats():
+    record_stats = {name: {} for name in STATS_NAMES}
+    return RideStats(record_stats, LAP_KEYS, {"cadence": False, "power": True})
+
+
+def integrated(heart_rate, cadence, speed, power, distance, accumulated_power):
+    return {
+        "heart_rate": heart_rate,
+        "cadence": cadence,
+        "speed": speed,
+        "power": power,
+        "distance": distance,
+        "accumulated_power": accumulated_power,
+    }
+
+
+@pytest.fixture
+def cur():
+    con = sqlite3.connect(":memory:")
+    cur = con.cursor()
+    cur.execute(RideStats.CREATE_TABLE_SQL)
+    yield cur
+    con.close()
+
+
+def record(stats):
+    i2c = {"total_ascent": 0.0, "total_descent": 0.0}
+    samples = [
+        integrated(120, 80, 8.0, 200, 8.0, 200),
+        integrated(125, 0, 8.5, 0, 16.5, 200),
+        integrated(math.nan, 90, 9.0, 250, 25.5, 450),
+    ]
+    for count, sample in enumerate(samples, 1):
+        stats.update(sample, i2c, count, count)
+    stats.new_lap()
+    i2c = {"total_ascent": 3.0, "total_descent": 1.0}
+    stats.update(integrated(130, 85, 7.0, 180, 32.5, 630), i2c, 1, 4)
+
+
+def test_checkpoint_round_trip(cur):
+    stats = make_stats()
+    record(stats)
+    stats.write_checkpoint(cur, 1, 4, extra={"count": 4})
+
+    restored = make_stats()
+    assert restored.restore_checkpoint(cur, 1, 4) == {"count": 4}
+    assert restored.record_stats == stats.record_stats
+    for name in ("sum", "count", "max", "min"):
+        np.testing.assert_array_equal(getattr(restored, name), getattr(stats, name))
+
+    # the restored stats continue like the original ones
+    i2c = {"total_ascent": 4.0, "total_descent": 1.0}
+    sample = integrated(140, 95, 7.5, 300, 40.0, 930)
+    stats.update(sample, i2c, 2, 5)
+    restored.update(sample, i2c, 2, 5)
+    assert restored.record_stats == stats.record_stats
+
+
+def test_checkpoint_averages_exclude_zero_cadence(cur):
+    stats = make_stats()
+    record(stats)
+    cadence = RideStats.AVERAGE_KEYS.index("cadence")
+    power = RideStats.AVERAGE_KEYS.index("power")
+    assert stats.count[RideStats.ENTIRE, cadence] == 3
+    assert stats.count[RideStats.ENTIRE, power] == 4
+    assert stats.record_stats["entire_avg"]["cadence"] == pytest.approx(85)
+
+
+@pytest.mark.parametrize("lap, total_timer_time", [(0, 4), (1, 3)])
+def test_checkpoint_of_another_row_is_ignored(cur, lap, total_timer_time):
+    stats = make_stats()
+    record(stats)
+    stats.write_checkpoint(cur, 1, 4)
+
+    restored = make_stats()
+    assert restored.restore_checkpoint(cur, lap, total_timer_time) is None
+    assert restored.record_stats["entire_max"]["heart_rate"] == 0
+    assert not restored.count.any()
+
+
+def test_missing_checkpoint(cur):
+    assert make_stats().restore_checkpoint(cur, 0, 0) is None
+
+
+def test_broken_checkpoint_resets_the_stats(cur):
+    cur.execute(f"INSERT INTO {RideStats.TABLE} VALUES(0, 1, 4, '{{}}')")
+    stats = make_stats()
+    record(stats)
+    assert stats.restore_checkpoint(cur, 1, 4) is None
+    assert not stats.count.any()
+    assert stats.record_stats["lap_max"]["power"] == 0
@@ -0,0 +1,107 @@
+import math
+
+import numpy as np
+import pytest
+
+from modules.utils.ring_buffer import RingBuffer
+
+
+def samples(n, seed=0, nan_ratio=0.2):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(100, 30, n)
+    x[rng.random(n) < nan_ratio] = np.nan
+    return x
+
+
+def assert_stats(buffer, window):
+    window = np.asarray(window, dtype=np.float64)
+    np.testing.assert_array_equal(buffer.view(), window)
+    assert buffer.count == np.count_nonzero(~np.isnan(window))
+    if not buffer.count:
+        assert buffer.sum() == 0
+        assert math.isnan(buffer.mean())
+        assert math.isnan(buffer.var())
+        return
+    assert buffer.sum() == pytest.approx(np.nansum(window))
+    assert buffer.mean() == pytest.approx(np.nanmean(window))
+    assert buffer.var() == pytest.approx(np.nanvar(window), rel=1e-6, abs=1e-9)
+    if buffer._sorted is not None:
+        assert buffer.median() == pytest.approx(np.nanmedian(window))
+
+
+@pytest.mark.parametrize("capacity", [1, 2, 7, 60])
+def test_window_statistics(capacity):
+    buffer = RingBuffer(capacity, median=True)
+    window = np.full(capacity, np.nan)
+    for x in samples(5 * capacity + 3, seed=capacity):
+        buffer.push(x)
+        window = np.append(window[1:], x)
+        assert_stats(buffer, window)
+
+
+def test_fill_value():
+    buffer = RingBuffer(5, fill=0.0, median=True)
+    assert_stats(buffer, np.zeros(5))
+    buffer.push(10.0)
+    assert_stats(buffer, [0, 0, 0, 0, 10])
+    buffer.fill(np.nan)
+    assert_stats(buffer, np.full(5, np.nan))
+
+
+def test_constant_window_has_no_variance():
+    buffer = RingBuffer(30)
+    for _ in range(100):
+        buffer.push(0.1)
+    assert buffer.var() == 0.0
+    assert buffer.mean() == pytest.approx(0.1)
+
+
+def test_resum_keeps_the_statistics(monkeypatch):
+    monkeypatch.setattr(RingBuffer, "RESUM_INTERVAL", 10)
+    buffer = RingBuffer(8, median=True)
+    window = np.full(8, np.nan)
+    for x in samples(95, seed=3):
+        buffer.push(x)
+        window = np.append(window[1:], x)
+    assert buffer._pushes == 5
+    assert_stats(buffer, window)
+
+
+def test_array_protocol():
+    buffer = RingBuffer(4)
+    for x in range(6):
+        buffer.push(x)
+    np.testing.assert_array_equal(np.asarray(buffer), [2, 3, 4, 5])
+    assert list(buffer) == [2, 3, 4, 5]
+    assert buffer[-1] == 5 and len(buffer) == 4
+    # view() is not a copy
+    assert np.shares_memory(buffer.view(), buffer._buf)
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+def test_width():
+    buffer = RingBuffer(6, width=3)
+    window = np.full((3, 6), np.nan)
+    data = samples(60, seed=4).reshape(20, 3)
+    for x in data:
+        buffer.push(x)
+        window = np.column_stack([window[:, 1:], x])
+        np.testing.assert_array_equal(buffer.view(), window)
+        np.testing.assert_array_equal(
+            buffer.count, np.count_nonzero(~np.isnan(window), axis=1)
+        )
+        # np.nanmean of a row of nan warns and returns nan like mean()
+        np.testing.assert_allclose(buffer.sum(), np.nansum(window, axis=1))
+        np.testing.assert_allclose(buffer.mean(), np.nanmean(window, axis=1))
+        np.testing.assert_allclose(
+            buffer.var(), np.nanvar(window, axis=1), rtol=1e-6, atol=1e-9
+        )
+
+
+def test_bad_arguments():
+    with pytest.raises(ValueError):
+        RingBuffer(0)
+    with pytest.raises(ValueError):
+        RingBuffer(5, width=2, median=True)
+    with pytest.raises(ValueError):
+        RingBuffer(5).median()
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+from modules.utils.geo import get_dist_on_earth_array
+from modules.utils.segment_index import (
+    METER_PER_DEG_LAT,
+    SegmentGridIndex,
+    _make_course,
+)
+
+RADIUS = 100.0
+
+
+@pytest.fixture(scope="module")
+def course():
+    lon, lat = _make_course(2000)
+    return lon, lat, SegmentGridIndex(lon, lat, cell_size=2 * RADIUS)
+
+
+def fixes(lon, lat, n, noise, seed):
+    rng = np.random.default_rng(seed)
+    i = rng.integers(0, len(lon) - 1, n)
+    t = rng.random(n)
+    p_lon = lon[i] + (lon[i + 1] - lon[i]) * t
+    p_lat = lat[i] + (lat[i + 1] - lat[i]) * t
+    noise = noise / METER_PER_DEG_LAT
+    return p_lon + rng.normal(0, noise, n), p_lat + rng.normal(0, noise, n)
+
+
+def segment_dist(lon, lat, p_lon, p_lat, clip=True):
+    # [m] distance of the point from each segment, or with clip=False from
+    # the projection on the segment (inf if it falls outside)
+    a_lon, a_lat = lon[:-1], lat[:-1]
+    b_a_x, b_a_y = np.diff(lon), np.diff(lat)
+    fraction = ((p_lon - a_lon) * b_a_x + (p_lat - a_lat) * b_a_y) / (
+        b_a_x**2 + b_a_y**2
+    )
+    outside = (fraction < 0.0) | (1.0 < fraction)
+    fraction = np.clip(fraction, 0.0, 1.0)
+    with np.errstate(invalid="ignore"):
+        dist = get_dist_on_earth_array(
+            a_lon + b_a_x * fraction,
+            a_lat + b_a_y * fraction,
+            np.full(len(a_lon), p_lon),
+            np.full(len(a_lat), p_lat),
+        )
+    dist = np.nan_to_num(dist)
+    if not clip:
+        dist[outside] = np.inf
+    return dist
+
+
+def test_query_finds_all_near_segments(course):
+    lon, lat, index = course
+    for p_lon, p_lat in zip(*fixes(lon, lat, 200, 30.0, seed=0)):
+        near = np.flatnonzero(segment_dist(lon, lat, p_lon, p_lat) < RADIUS)
+        candidates = index.query(p_lon, p_lat, RADIUS)
+        assert np.all(np.diff(candidates) > 0)
+        assert np.isin(near, candidates).all()
+        assert len(candidates) < index.segment_n
+
+
+def test_query_far_from_course(course):
+    lon, lat, index = course
+    assert len(index.query(lon.max() + 0.1, lat.max() + 0.1, RADIUS)) == 0
+    assert len(index.query(lon.min() - 0.1, lat.min() - 0.1, RADIUS)) == 0
+
+
+def test_query_points_matches_query(course):
+    lon, lat, index = course
+    p_lon, p_lat = fixes(lon, lat, 50, 30.0, seed=1)
+    points, segments = index.query_points(p_lon, p_lat, RADIUS)
+    for i, (x, y) in enumerate(zip(p_lon, p_lat)):
+        assert np.isin(index.query(x, y, RADIUS), segments[points == i]).all()
+
+
+def test_project_points(course):
+    lon, lat, index = course
+    p_lon, p_lat = fixes(lon, lat, 100, 20.0, seed=2)
+    points, segments, fraction, dist = index.project_points(p_lon, p_lat, RADIUS)
+
+    assert len(points) and np.all(np.diff(points) >= 0)
+    assert np.all((0.0 <= fraction) & (fraction <= 1.0))
+    assert np.all(dist < RADIUS)
+    h_lon = lon[segments] + (lon[segments + 1] - lon[segments]) * fraction
+    h_lat = lat[segments] + (lat[segments + 1] - lat[segments]) * fraction
+    np.testing.assert_allclose(
+        get_dist_on_earth_array(h_lon, h_lat, p_lon[points], p_lat[points]),
+        dist,
+        atol=1e-3,
+    )
+    # every projection within radius is found
+    for i, (x, y) in enumerate(zip(p_lon, p_lat)):
+        near = np.flatnonzero(segment_dist(lon, lat, x, y, clip=False) < RADIUS)
+        np.testing.assert_array_equal(segments[points == i], near)
+
+
+def test_project_points_on_the_course():
+    lon = np.array([139.70, 139.71, 139.71])
+    lat = np.array([35.60, 35.60, 35.61])
+    index = SegmentGridIndex(lon, lat)
+    points, segments, fraction, dist = index.project_points(
+        [139.705, 139.71], [35.60, 35.605], 10.0
+    )
+    np.testing.assert_array_equal(points, [0, 1])
+    np.testing.assert_array_equal(segments, [0, 1])
+    np.testing.assert_allclose(fraction, [0.5, 0.5])
+    np.testing.assert_allclose(dist, [0.0, 0.0], atol=1e-3)
+
+
+@pytest.mark.parametrize("n", [0, 1])
+def test_empty_course(n):
+    index = SegmentGridIndex(np.full(n, 139.7), np.full(n, 35.6))
+    assert len(index.query(139.7, 35.6, RADIUS)) == 0
+    points, segments, _, _ = index.project_points([139.7], [35.6], RADIUS)
+    assert len(points) == len(segments) == 0
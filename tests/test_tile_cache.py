@@ -0,0 +1,53 @@
+import numpy as np
+
+from modules.utils.tile_cache import TileBitmapCache
+
+
+def tile(value=0):
+    return np.full((16, 16), value, dtype=np.uint8)
+
+
+def test_lru_eviction_by_bytes():
+    cache = TileBitmapCache(3 * tile().nbytes)
+    for i in range(3):
+        cache.put(i, tile(i))
+    cache.get(0)
+    cache.put(3, tile(3))
+    assert cache.get(1) is None
+    assert [cache.get(i)[0, 0] for i in (0, 2, 3)] == [0, 2, 3]
+    assert cache.bytes == 3 * tile().nbytes
+
+    cache.put("large", np.zeros(cache.max_bytes + 1, dtype=np.uint8))
+    assert cache.get("large") is None and len(cache) == 3
+
+
+def test_pop_source():
+    cache = TileBitmapCache(10 * tile().nbytes)
+    # an expanded tile file is decoded into several entries
+    cache.put("a0", tile(), source="a.png")
+    cache.put("a1", tile(), source="a.png")
+    cache.put("b0", tile(), source="b.png")
+    cache.put("c0", tile())
+
+    assert cache.pop_source("a.png") == 2
+    assert cache.get("a0") is None and cache.get("a1") is None
+    assert cache.get("b0") is not None and cache.get("c0") is not None
+    assert cache.bytes == 2 * tile().nbytes
+    assert cache.pop_source("a.png") == 0
+
+
+def test_source_follows_replace_and_eviction():
+    cache = TileBitmapCache(2 * tile().nbytes)
+    cache.put("a0", tile(), source="a.png")
+    # put again from another source
+    cache.put("a0", tile(1), source="b.png")
+    assert cache.pop_source("a.png") == 0
+    assert cache.get("a0")[0, 0] == 1
+
+    cache.put("c0", tile(), source="c.png")
+    cache.put("d0", tile(), source="d.png")
+    # a0 is evicted, its source is forgotten
+    assert cache.pop_source("b.png") == 0
+    assert not cache._sources.keys() - {"c.png", "d.png"}
+    cache.clear()
+    assert cache.bytes == 0 and not cache._sources and not cache._key_sources
@@ -0,0 +1,124 @@
+import numpy as np
+
+from modules.logger.track_history import TrackHistory
+
+
+def points(n, start=0):
+    t = np.arange(start, start + n, dtype=np.float64)
+    # a zigzag so that RDP keeps some of the points
+    zigzag = np.where(t % 20 < 10, t % 10, 10 - t % 10)
+    return t * 10, 139.7 + t * 1e-4, 35.6 + zigzag * 1e-4
+
+
+class Reader:
+    """Keep the track like the map: committed points and the latest tail."""
+
+    def __init__(self, history):
+        self.history = history
+        self.cursor = None
+        self.lon = []
+        self.lat = []
+        self.tail_lon = []
+        self.tail_lat = []
+
+    def read(self):
+        cursor = self.cursor
+        self.cursor, lon, lat, tail_lon, tail_lat = self.history.get_since(cursor)
+        if cursor is None or cursor[0] != self.cursor[0]:
+            self.lon, self.lat = [], []
+        self.lon.extend(lon)
+        self.lat.extend(lat)
+        self.tail_lon = list(tail_lon)
+        self.tail_lat = list(tail_lat)
+        return lon, lat
+
+    @property
+    def track(self):
+        return np.array(self.lon + self.tail_lon), np.array(self.lat + self.tail_lat)
+
+
+def whole_track(history):
+    _, lon, lat, tail_lon, tail_lat = history.get_since(None)
+    return np.concatenate([lon, tail_lon]), np.concatenate([lat, tail_lat])
+
+
+def test_get_since_returns_only_new_commits():
+    history = TrackHistory(tail_limit=10)
+    reader = Reader(history)
+    dist, lon, lat = points(25)
+    history.extend(dist[:15], lon[:15], lat[:15])
+    reader.read()
+    assert not history.has_new_points(reader.cursor)
+    assert len(reader.tail_lon) == 5
+
+    _, new_lon, new_lat = history.get_since(reader.cursor)[:3]
+    assert len(new_lon) == len(new_lat) == 0
+
+    history.extend(dist[15:], lon[15:], lat[15:])
+    assert history.has_new_points(reader.cursor)
+    new_lon, _ = reader.read()
+    assert len(new_lon) > 0
+    assert reader.cursor == (history.generation, 25, history.committed)
+
+    # the increments are the same as reading everything at once
+    for a, b in zip(reader.track, whole_track(history)):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_read_after_every_point():
+    history = TrackHistory(tail_limit=8)
+    reader = Reader(history)
+    dist, lon, lat = points(100)
+    for i, (d, x, y) in enumerate(zip(dist, lon, lat)):
+        history.append(d, x, y)
+        reader.read()
+        track_lon, track_lat = reader.track
+        assert track_lon[-1] == np.float32(x) and track_lat[-1] == np.float32(y)
+        for a, b in zip(reader.track, whole_track(history)):
+            np.testing.assert_array_equal(a, b)
+    # the committed points are simplified
+    assert history.committed < 100
+
+
+def test_get_since_after_clear():
+    history = TrackHistory(tail_limit=10)
+    reader = Reader(history)
+    dist, lon, lat = points(30)
+    history.extend(dist, lon, lat)
+    reader.read()
+    old_cursor = reader.cursor
+
+    history.clear()
+    assert history.has_new_points(old_cursor)
+    reader.read()
+    assert reader.cursor == (old_cursor[0] + 1, 0, 0)
+    assert len(reader.track[0]) == 0
+
+    # an old cursor reads the new generation from the beginning
+    dist, lon, lat = points(15, start=100)
+    history.extend(dist, lon, lat)
+    reader.cursor = old_cursor
+    reader.read()
+    assert reader.cursor == (old_cursor[0] + 1, 15, history.committed)
+    for a, b in zip(reader.track, whole_track(history)):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_simplified_track_keeps_the_end_points():
+    history = TrackHistory(epsilon=1e-4, tail_limit=10, capacity=4)
+    dist, lon, lat = points(200)
+    history.extend(dist, lon, lat)
+    x, y = whole_track(history)
+    assert len(x) < 200
+    assert x[0] == np.float32(lon[0]) and x[-1] == np.float32(lon[-1])
+    assert y[0] == np.float32(lat[0]) and y[-1] == np.float32(lat[-1])
+    assert np.all(np.diff(history.index[: history.committed]) > 0)
+
+
+def test_stopped_and_invalid_points_are_skipped():
+    history = TrackHistory()
+    history.append(0.0, 139.7, 35.6)
+    history.append(0.0, 139.8, 35.7)
+    history.append(10.0, 139.7, 35.6)
+    history.append(20.0, np.nan, 35.6)
+    assert history.count == 1